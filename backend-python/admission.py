@@ -0,0 +1,128 @@
+import itertools
+import math
+import random
+import threading
+import time
+
+# Share of max_inflight a group's priority may fill: when the server is
+# that busy, the group's requests are shed and higher priorities still run
+PRIORITIES = {'high': 1.0, 'normal': 0.75, 'low': 0.5}
+
+# group -> (priority, requests per second per user, burst)
+GROUPS = {
+    # Each one pays a save: a person snoozes a few times a minute at most
+    'alarm_action': ('high', 0.5, 5),    # agent snooze/acknowledge/cancel, alarm creation, batches
+    'alarm_list': ('normal', 2.0, 10),   # a user's alarms and their history
+    'search': ('low', 2.0, 10),          # user search (sent as the user types)
+    'social': ('low', 1.0, 10),          # friend lists, requests, suggestions, stats
+}
+
+
+def parse_rates(spec, groups=GROUPS):
+    """GROUPS with overrides from "group=rate/burst,...", e.g. "search=1/5,alarm_action=5/20"."""
+    groups = dict(groups)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in groups:
+            raise ValueError(f"unknown admission group {name!r} in {item!r}; groups are {', '.join(groups)}")
+        rate, _, burst = value.partition('/')
+        priority, _, default_burst = groups[name]
+        try:
+            rate, burst = float(rate), int(burst) if burst else default_burst
+        except ValueError:
+            raise ValueError(f"bad admission rate {item!r}: expected group=rate or group=rate/burst") from None
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"bad admission rate {item!r}: rate must be positive and burst at least 1")
+        groups[name] = (priority, rate, burst)
+    return groups
+
+
+class AdmissionControl:
+    """
+    Decides whether a request may run, before it does any work.
+
+    Each (user, route group) pair has a token bucket of `burst` requests
+    refilled at `rate` per second, kept as a single float in one dict: the
+    time at which the bucket would be full again (GCRA, the "virtual
+    scheduling" form of a token bucket). A key whose time has passed is
+    the same as a missing one, so idle keys are swept out in passing, and
+    the dict is capped at MAX_ENTRIES.
+
+    On top of that, requests still in progress are counted: once
+    `max_inflight` * PRIORITIES[priority] are running, that priority's
+    groups are shed, so under overload search and friend lists go first
+    and alarm actions last.
+
+    admit() returns None and counts the request as in flight (leave()
+    when it ends), or (reason, retry after seconds) with reason 'rate' or
+    'overload'.
+    """
+
+    MAX_ENTRIES = 200000
+    SWEEP_EVERY = 1.0  # seconds
+    SWEEP_BATCH = 1000  # keys looked at per sweep
+
+    def __init__(self, max_inflight, groups=GROUPS):
+        self.max_inflight = max_inflight
+        self.groups = {name: (priority, 1.0 / rate, (burst - 1) / rate)
+                       for name, (priority, rate, burst) in groups.items()}
+        self.limits = {name: max(1, int(max_inflight * PRIORITIES[priority]))
+                       for name, (priority, _, _) in groups.items()}
+        self.inflight = 0
+        self._full_at = {}  # (user, group) -> when its bucket is full again; oldest update first
+        self._swept = 0.0
+        self._lock = threading.Lock()
+        self.admitted = dict.fromkeys(groups, 0)
+        self.shed = {(name, reason): 0 for name in groups for reason in ('rate', 'overload')}
+        self.evicted = 0
+
+    def admit(self, group, user, now=None):
+        now = time.monotonic() if now is None else now
+        _, interval, window = self.groups[group]
+        key = (user, group)
+        with self._lock:
+            if now - self._swept >= self.SWEEP_EVERY:
+                self._sweep(now)
+            full_at = max(self._full_at.get(key, now), now)
+            if full_at - now > window:
+                self.shed[group, 'rate'] += 1
+                return 'rate', math.ceil(full_at - now - window)
+            if self.inflight >= self.limits[group]:
+                self.shed[group, 'overload'] += 1
+                # Spread the retries out rather than bring them back as one wave
+                return 'overload', 1 + random.randrange(2)
+            # Re-inserted so the dict stays ordered by last update
+            self._full_at.pop(key, None)
+            self._full_at[key] = full_at + interval
+            if len(self._full_at) > self.MAX_ENTRIES:
+                self._full_at.pop(next(iter(self._full_at)))
+                self.evicted += 1
+            self.inflight += 1
+            self.admitted[group] += 1
+            return None
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _sweep(self, now):
+        """Drop idle keys from the least recently updated end."""
+        self._swept = now
+        table = self._full_at
+        for key, full_at in list(itertools.islice(table.items(), self.SWEEP_BATCH)):
+            if full_at > now:
+                break  # the rest were updated more recently, so mostly still live
+            del table[key]
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inflight': self.inflight,
+                'maxInflight': self.max_inflight,
+                'keys': len(self._full_at),
+                'evicted': self.evicted,
+                'admitted': dict(self.admitted),
+                'shed': {f"{group}.{reason}": count for (group, reason), count in self.shed.items()},
+            }
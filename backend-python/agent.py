@@ -1,3 +1,6 @@
+import random
+
+
 class WakeyAgent:
     """
     Rule-based agent for Wakey alarm responses.
@@ -8,8 +11,16 @@ class WakeyAgent:
     SOFT_THRESHOLD = 2
     PLAYFUL_THRESHOLD = 4
     STRICT_THRESHOLD = 6
+
+    TONES = ('soft', 'playful', 'strict')
+    ACTIONS = ('snooze', 'acknowledge', 'cancel')
     
-    def __init__(self):
+    def __init__(self, rng=None):
+        """
+        rng: anything with a choice() method; pass random.Random(seed) for
+        reproducible messages. Defaults to the shared `random` module.
+        """
+        self.rng = rng if rng is not None else random
         self.messages = {
             'soft': {
                 'snooze': [
@@ -69,8 +80,60 @@ class WakeyAgent:
                 'strict': [
                     "Your accountability partner cancelled. Don't use this as an excuse to sleep in. ⚠️"
                 ]
+            },
+            # Group alarms: snoozing once at least half the group is up,
+            # and the acknowledgement that gets the last member out of bed
+            'group_snooze': {
+                'soft': [
+                    "Some of your crew are already up. Join them soon! ☀️"
+                ],
+                'playful': [
+                    "The group chat is awake and wondering where you are 👀",
+                    "Half the squad is up. Don't be the last one! 😅"
+                ],
+                'strict': [
+                    "Everyone else is making it. You're holding the group back. GET UP! 🚨",
+                    "The whole group is waiting on you. Up. NOW. ⚠️"
+                ]
+            },
+            'group_all_awake': {
+                'soft': [
+                    "That's everyone! The whole crew is up. Have a great day! 🌟"
+                ],
+                'playful': [
+                    "Last one up, but the squad is complete! 🎉"
+                ],
+                'strict': [
+                    "Everyone's up. Finally. You were the last one. 😐"
+                ]
             }
         }
+        self._build_tables()
+
+    def _build_tables(self):
+        """
+        Precompute the lookups process_events() uses: tone by snooze count
+        below the strict threshold, and message pools keyed action -> tone as
+        (messages, len, len.bit_length()). Call again after editing self.messages.
+        """
+        def pool(messages):
+            return tuple(messages), len(messages), len(messages).bit_length()
+
+        self._tone_by_count = tuple(self._get_tone(count) for count in range(self.PLAYFUL_THRESHOLD))
+        self._pools = {
+            action: {tone: pool(self.messages[tone][action]) for tone in self.TONES if action in self.messages[tone]}
+            for action in self.ACTIONS
+        }
+        self._notify_pools = {tone: pool(self.messages['cancel_notify_other'][tone]) for tone in self.TONES}
+        self._stricter = dict(zip(self.TONES, self.TONES[1:] + self.TONES[-1:]))
+
+    def message_table(self):
+        """Every distinct message, in definition order, after "" (no message)."""
+        table = {"": None}
+        for groups in self.messages.values():
+            for messages in groups.values():
+                table.update(dict.fromkeys(messages))
+        return tuple(table)
     
     def _get_tone(self, snooze_count, alarm_tone=None):
         """
@@ -90,18 +153,20 @@ class WakeyAgent:
         """
         Get a contextual message based on tone and action.
         """
-        import random
-        
         if action not in self.messages[tone]:
             return ""
         
         messages = self.messages[tone][action]
-        return random.choice(messages)
+        return self.rng.choice(messages)
     
     def snooze_alarm(self, alarm, user_id):
         """
         Handle snooze action: increment count, determine tone, generate message.
         """
+        if 'members' in alarm:
+            self._group_action(alarm, user_id, 'snooze')
+            return alarm
+
         user_id_str = str(user_id)
         
         # Initialize snoozeCount if missing
@@ -129,6 +194,10 @@ class WakeyAgent:
         Handle acknowledge action: mark as acknowledged, generate message.
         Only generate message on FIRST acknowledgement.
         """
+        if 'members' in alarm:
+            self._group_action(alarm, user_id, 'acknowledge')
+            return alarm
+
         user_id_str = str(user_id)
         
         # Initialize acknowledged list if missing
@@ -169,6 +238,10 @@ class WakeyAgent:
         """
         Handle cancel action: mark as cancelled, generate messages for both users.
         """
+        if 'members' in alarm:
+            self._group_action(alarm, user_id, 'cancel')
+            return alarm
+
         user_id_str = str(user_id)
         
         # Mark who cancelled
@@ -184,22 +257,187 @@ class WakeyAgent:
         cancel_message = self._get_message(tone, 'cancel')
         
         # Message for the other user (notification)
-        import random
-        other_user_message = random.choice(self.messages['cancel_notify_other'][tone])
+        other_user_message = self.rng.choice(self.messages['cancel_notify_other'][tone])
         
         alarm['agentMessage'] = cancel_message
         alarm['agentTone'] = tone
         alarm['cancelNotifyMessage'] = other_user_message  # For the friend
         
         return alarm
-    
+
+    def _group_tone(self, alarm, snooze_count, awake):
+        """
+        Tone for a group alarm member: the alarm-level override if there is
+        one, else the usual tone for their snooze count, one step stricter
+        for a member still in bed once at least half the group is up.
+        """
+        alarm_tone = alarm.get('tone')
+        tone = self._get_tone(snooze_count, alarm_tone)
+        if alarm_tone in self.TONES or awake or alarm['ackCount'] * 2 < len(alarm['members']):
+            return tone, False
+        return self._stricter[tone], True
+
+    def _group_action(self, alarm, user_id, action):
+        """
+        Apply an action to a group alarm. Only the acting member's
+        [snoozes, ack order] entry and the ackCount/snoozeTotal counters
+        change, so the cost doesn't grow with the group; the alarm is done
+        once ackCount reaches the member count.
+
+        Returns (agentMessage, agentTone, cancelNotifyMessage) like process_events().
+        """
+        members = alarm['members']
+        key = str(user_id)
+        state = members.get(key)
+        if state is None:
+            raise ValueError(f"User {user_id} isn't a member of alarm {alarm.get('id')}")
+        snoozes, ack = state
+        notify = None
+
+        if action == 'snooze':
+            snoozes += 1
+            members[key] = [snoozes, ack]
+            alarm['snoozeTotal'] += 1
+            tone, pressured = self._group_tone(alarm, snoozes, ack)
+            pool = self.messages['group_snooze'][tone] if pressured else self.messages[tone]['snooze']
+            message = self.rng.choice(pool)
+        elif action == 'acknowledge':
+            if ack:
+                alarm['agentMessage'] = ""
+                alarm['agentTone'] = ""
+                return "", "", None
+            alarm['ackCount'] += 1
+            members[key] = [snoozes, alarm['ackCount']]
+            tone, _ = self._group_tone(alarm, snoozes, True)
+            if alarm['ackCount'] >= len(members):
+                alarm['isActive'] = False
+                message = self.rng.choice(self.messages['group_all_awake'][tone])
+            else:
+                message = self._get_message(tone, 'acknowledge', snoozes)
+        elif action == 'cancel':
+            alarm['cancelledBy'] = user_id
+            alarm['isActive'] = False
+            tone, _ = self._group_tone(alarm, snoozes, True)
+            message = self._get_message(tone, 'cancel')
+            notify = self.rng.choice(self.messages['cancel_notify_other'][tone])
+            alarm['cancelNotifyMessage'] = notify
+        else:
+            raise ValueError(f"Unknown agent action: {action!r}")
+
+        alarm['agentMessage'] = message
+        alarm['agentTone'] = tone
+        return message, tone, notify
+
+    def process_events(self, events):
+        """
+        Apply a stream of (alarm, user_id, action) events in order, action
+        being 'snooze', 'acknowledge' or 'cancel'.
+
+        Each event changes its alarm exactly as the matching *_alarm() call
+        would and draws from self.rng in the same order, so with the same seed
+        the result is identical to calling them one by one. Tones and message
+        pools come from the precomputed tables instead of nested dict lookups.
+
+        Returns one (agentMessage, agentTone, cancelNotifyMessage) tuple per
+        event; cancelNotifyMessage is None for snoozes and acknowledgements.
+        Group alarms go through _group_action(), which draws the same way.
+        """
+        rng = self.rng
+        # random.Random.choice(pool) is pool[r] for the first r < len(pool)
+        # from getrandbits(len(pool).bit_length()); drawing that inline skips
+        # two Python calls per message and consumes the RNG identically.
+        inline_draw = rng is random or type(rng) is random.Random
+        getrandbits = rng.getrandbits if inline_draw else None
+        choice = rng.choice
+        tones = self.TONES
+        tone_by_count = self._tone_by_count
+        count_limit = len(tone_by_count)
+        pools = self._pools
+        notify_pools = self._notify_pools
+        results = []
+        append = results.append
+
+        for alarm, user_id, action in events:
+            if 'members' in alarm:
+                append(self._group_action(alarm, user_id, action))
+                continue
+            if action == 'snooze':
+                if 'snoozeCount' not in alarm:
+                    alarm['snoozeCount'] = {}
+                counts = alarm['snoozeCount']
+                user_id_str = str(user_id)
+                count = counts.get(user_id_str, 0) + 1
+                counts[user_id_str] = count
+            elif action == 'acknowledge':
+                if 'acknowledged' not in alarm:
+                    alarm['acknowledged'] = []
+                acknowledged = alarm['acknowledged']
+                if user_id in acknowledged:
+                    alarm['agentMessage'] = ""
+                    alarm['agentTone'] = ""
+                    append(("", "", None))
+                    continue
+                acknowledged.append(user_id)
+                count = alarm.get('snoozeCount', {}).get(str(user_id), 0)
+            elif action == 'cancel':
+                alarm['cancelledBy'] = user_id
+                alarm['isActive'] = False
+                count = alarm.get('snoozeCount', {}).get(str(user_id), 0)
+            else:
+                raise ValueError(f"Unknown agent action: {action!r}")
+
+            alarm_tone = alarm.get('tone', None)
+            if alarm_tone and alarm_tone in tones:
+                tone = alarm_tone
+            elif type(count) is int and 0 <= count < count_limit:
+                tone = tone_by_count[count]
+            else:
+                tone = self._get_tone(count)
+
+            pool = pools[action].get(tone)
+            if pool is None:
+                message = ""
+            elif inline_draw:
+                messages, size, bits = pool
+                r = getrandbits(bits)
+                while r >= size:
+                    r = getrandbits(bits)
+                message = messages[r]
+            else:
+                message = choice(pool[0])
+            alarm['agentMessage'] = message
+            alarm['agentTone'] = tone
+
+            if action == 'acknowledge':
+                if alarm['user1Id'] in acknowledged and alarm['user2Id'] in acknowledged:
+                    alarm['isActive'] = False
+                append((message, tone, None))
+            elif action == 'cancel':
+                messages, size, bits = notify_pools[tone]
+                if inline_draw:
+                    r = getrandbits(bits)
+                    while r >= size:
+                        r = getrandbits(bits)
+                    notify = messages[r]
+                else:
+                    notify = choice(messages)
+                alarm['cancelNotifyMessage'] = notify
+                append((message, tone, notify))
+            else:
+                append((message, tone, None))
+
+        return results
+
     def get_alarm_status(self, alarm, user_id):
         """
         Get current status message for an alarm without modifying it.
         Useful for checking state without triggering actions.
         """
         user_id_str = str(user_id)
-        snooze_count = alarm.get('snoozeCount', {}).get(user_id_str, 0)
+        if 'members' in alarm:
+            snooze_count = alarm['members'].get(user_id_str, (0, 0))[0]
+        else:
+            snooze_count = alarm.get('snoozeCount', {}).get(user_id_str, 0)
         
         if snooze_count == 0:
             return {
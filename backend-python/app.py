@@ -1,9 +1,37 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
 from agent import WakeyAgent
+from archive import Archive, archivable
+from stats import LEADERBOARD_METRICS, SnoozeStats
+from records import alarm_members
+from store import Store, empty_db
+from journal import Journal, load_snapshot_file, write_snapshot
+from ndjson import TABLES, export_chunks, json_chunks
+from snapshot import write_binary
+from group_commit import GroupCommitter
+from sqlite_store import SqliteStore, SqliteVersionTracker
+from scheduler import AlarmScheduler
+from events import EventBus
+from sync import VersionTracker
+from suggestions import SuggestionCache
+from passwords import DUMMY_HASH, HasherBusy, PasswordHasher, needs_rehash
+from sessions import SessionTokens
+from search_index import InvalidCursor
+from locks import LockStripes, alarm_key, pair_key, username_key
+from metrics import Metrics, SlowRequestSampler
+from capture import TrafficCapture
+from admission import AdmissionControl, parse_rates
+import copy
+import itertools
 import json
 import os
+import secrets
+import sqlite3
+import threading
+import time
 
 # ============================
 # 💾 PERSISTENCE LAYER
@@ -11,76 +39,444 @@ import os
 
 DATA_FILE = "data.json"
 
+# 'json' keeps everything in memory and persists to data.json; 'sqlite' keeps
+# it in WAKEY_SQLITE_PATH, which several worker processes can share.
+STORAGE_BACKEND = os.environ.get('WAKEY_STORAGE', 'json')
+SQLITE_PATH = os.environ.get('WAKEY_SQLITE_PATH', 'wakey.db')
+
+# 'snapshot' rewrites data.json on every save; 'journal' appends each change
+# to data.json.log and compacts it into data.json in the background.
+PERSISTENCE_MODE = os.environ.get('WAKEY_PERSISTENCE', 'snapshot')
+
+# 'binary' keeps the snapshot in data.wkb instead (see snapshot.py): it is
+# memory-mapped at startup and cold records are only decoded when read.
+# The first binary start converts data.json; `python snapshot.py to-json`
+# converts back.
+SNAPSHOT_FORMAT = os.environ.get('WAKEY_SNAPSHOT_FORMAT', 'json')
+BINARY_FILE = "data.wkb"
+SNAPSHOT_FILE = BINARY_FILE if SNAPSHOT_FORMAT == 'binary' else DATA_FILE
+
+# The in-memory store keeps records in the compact forms from records.py
+# (about half the memory, slower load and dump); WAKEY_COMPACT_RECORDS=0
+# keeps plain dicts. Either way the API sees the same JSON.
+COMPACT_RECORDS = os.environ.get('WAKEY_COMPACT_RECORDS', '1') == '1'
+
+# Group commit: save_db() only marks the DB dirty and one writer thread flushes
+# at most every WAKEY_GROUP_COMMIT_MS or every WAKEY_GROUP_COMMIT_MAX saves.
+# 'durable' requests wait for that flush, 'fast' ones don't; clients can pick
+# per request with the X-Wakey-Durability header.
+GROUP_COMMIT = os.environ.get('WAKEY_GROUP_COMMIT') == '1'
+DEFAULT_DURABILITY = os.environ.get('WAKEY_DURABILITY', 'durable')
+
+# Archive tier: with WAKEY_ARCHIVE=1 a background thread moves finished
+# alarms and answered friend requests out of the hot store every
+# WAKEY_ARCHIVE_INTERVAL seconds into per-day segments under
+# WAKEY_ARCHIVE_DIR (see archive.py); /api/alarms/<id>/history pages
+# through both tiers.
+ARCHIVE_ENABLED = os.environ.get('WAKEY_ARCHIVE') == '1'
+ARCHIVE_DIR = os.environ.get('WAKEY_ARCHIVE_DIR', 'archive')
+ARCHIVE_INTERVAL = float(os.environ.get('WAKEY_ARCHIVE_INTERVAL', 60))
+ARCHIVE_BATCH = 1000
+
+# Passwords are stored as scrypt hashes (see passwords.py), computed in
+# WAKEY_AUTH_WORKERS forked processes (0: on the request thread). Plaintext
+# passwords from older data files are hashed on the user's next login, or
+# all at once with `python passwords.py migrate`. Login and signup return a
+# session token; a request carrying one (Authorization: Bearer, or ?token=
+# for EventSource) may only act as its user, and with WAKEY_REQUIRE_AUTH=1
+# requests without one are turned away. Set WAKEY_SESSION_SECRET to keep
+# tokens valid across restarts and worker processes. Logout ends all of the
+# user's sessions, through a generation kept in the store.
+AUTH_WORKERS = int(os.environ.get('WAKEY_AUTH_WORKERS', min(4, os.cpu_count() or 1)))
+AUTH_MAX_PENDING = int(os.environ.get('WAKEY_AUTH_MAX_PENDING', 64))
+REQUIRE_AUTH = os.environ.get('WAKEY_REQUIRE_AUTH') == '1'
+SESSION_SECRET = os.environ.get('WAKEY_SESSION_SECRET')
+SESSION_TTL = int(os.environ.get('WAKEY_SESSION_TTL', 30 * 24 * 3600))
+
+# /api/export streams the whole database as NDJSON (see ndjson.py),
+# password hashes included, so it is off unless WAKEY_EXPORT=1.
+EXPORT_ENABLED = os.environ.get('WAKEY_EXPORT') == '1'
+
+# With WAKEY_CAPTURE=<file>, requests are appended to that JSONL file with
+# their timing (see capture.py) for `python -m bench.replay` to re-drive
+# against another build. Request bodies, passwords included, are written
+# as sent.
+CAPTURE_PATH = os.environ.get('WAKEY_CAPTURE') or None
+
+# Admission control with WAKEY_ADMISSION=1 (see admission.py): each user
+# gets a token bucket per route group (rates from admission.GROUPS,
+# overridden by WAKEY_ADMISSION_RATES="search=1/5,..."), and past
+# WAKEY_ADMISSION_MAX_INFLIGHT requests in progress, search and friend
+# lists are shed before alarm listings, and those before alarm actions.
+# Refused requests get a 429 with Retry-After.
+ADMISSION_ENABLED = os.environ.get('WAKEY_ADMISSION') == '1'
+ADMISSION_MAX_INFLIGHT = int(os.environ.get('WAKEY_ADMISSION_MAX_INFLIGHT', 64))
+ADMISSION_RATES = os.environ.get('WAKEY_ADMISSION_RATES', '')
+
+# Prometheus metrics on /api/metrics when WAKEY_METRICS=1; disabled, every
+# metrics call returns after one flag check
+metrics = Metrics(enabled=os.environ.get('WAKEY_METRICS') == '1')
+metrics.counter('wakey_save_bytes_total', 'Bytes written by save_db (snapshot or journal).')
+metrics.histogram('wakey_save_duration_seconds', 'Time spent persisting in save_db.')
+metrics.counter('wakey_agent_actions_total', 'WakeyAgent actions by resulting tone.', ('action', 'tone'))
+metrics.counter('wakey_archived_records_total', 'Records moved to the archive tier.', ('table',))
+metrics.counter('wakey_logins_total', 'Login attempts by result.', ('result',))
+metrics.counter('wakey_admission_shed_total', 'Requests refused with a 429, by route group and reason.',
+                ('group', 'reason'))
+
 def load_db():
     """Load database from JSON file with error handling."""
     if not os.path.exists(DATA_FILE):
-        return {
-            "users": [],
-            "friendRequests": [],
-            "friendships": [],
-            "alarms": []
-        }
+        return empty_db()
     try:
         with open(DATA_FILE, "r") as f:
             content = f.read().strip()
             if not content:
-                return {
-                    "users": [],
-                    "friendRequests": [],
-                    "friendships": [],
-                    "alarms": []
-                }
+                return empty_db()
             return json.loads(content)
     except json.JSONDecodeError:
         print("⚠️  Warning: data.json is corrupted. Starting with fresh data.")
-        return {
-            "users": [],
-            "friendRequests": [],
-            "friendships": [],
-            "alarms": []
-        }
-
-def save_db():
-    """Persist all data to JSON file."""
-    with open(DATA_FILE, "w") as f:
-        json.dump({
-            "users": users,
-            "friendRequests": friend_requests,
-            "friendships": friendships,
-            "alarms": alarms
-        }, f, indent=2)
+        return empty_db()
+
+# Flushes from concurrent requests share data.json.tmp, so they take turns
+flush_lock = threading.Lock()
+
+def flush_db():
+    """Write changes made since the last flush."""
+    with flush_lock:
+        started = time.perf_counter()
+        if journal is not None:
+            changes = store.drain_changes()
+            try:
+                written = journal.append(changes)
+            except OSError:
+                # Keep the batch so the next flush (or group-commit retry) writes it.
+                store.requeue_changes(changes)
+                raise
+        elif SNAPSHOT_FORMAT == 'binary':
+            store.drain_changes()
+            written = write_binary(BINARY_FILE, store.to_dict())
+        else:
+            store.drain_changes()
+            written = write_snapshot(DATA_FILE, store.to_dict())
+        metrics.observe('wakey_save_duration_seconds', (), time.perf_counter() - started)
+        metrics.inc('wakey_save_bytes_total', (), written)
+
+def end_transaction():
+    """
+    Commit this thread's SQLite transaction while its entity locks are still
+    held: other threads read through their own connections, so a commit after
+    unlocking would let the next lock holder read the old row.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        started = time.perf_counter()
+        store.commit()
+        metrics.observe('wakey_save_duration_seconds', (), time.perf_counter() - started)
+
+@contextmanager
+def write_transaction():
+    """
+    Run a read-modify-write in one SQLite write transaction, opened before
+    its first read. Entity locks only cover this process; BEGIN IMMEDIATE
+    also keeps other processes sharing the database file from changing the
+    rows in between. Rolled back if the body or the commit raises. Use
+    inside the locks.
+    """
+    if STORAGE_BACKEND != 'sqlite':
+        yield
+        return
+    store.begin()
+    try:
+        yield
+        end_transaction()
+    except BaseException:
+        store.rollback()
+        raise
+
+def save_db(durability=None):
+    """
+    Persist changes, directly or through the group-commit writer. Durability
+    defaults to the request's X-Wakey-Durability header.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        store.commit()
+        return
+    if committer is None:
+        flush_db()
+        return
+    if durability is None:
+        durability = request.headers.get('X-Wakey-Durability', DEFAULT_DURABILITY)
+    committer.mark(wait=durability != 'fast')
+
+# Forked before the data loads and before any thread starts
+hasher = PasswordHasher(AUTH_WORKERS, AUTH_MAX_PENDING).start()
+
+if SESSION_SECRET is None:
+    print("⚠️  Warning: WAKEY_SESSION_SECRET is not set: sessions end when this process does.")
+# Tokens carry their user's session generation, read from the store at check time
+sessions = SessionTokens((SESSION_SECRET or secrets.token_hex(32)).encode(), ttl=SESSION_TTL,
+                         generation=lambda user_id: store.session_generation(user_id))
 
 # ============================
 # 🧠 LOAD DATA ON STARTUP
 # ============================
 
-_db = load_db()
+journal = None
+LOAD_BYTES = sum(os.path.getsize(path) for path in (
+    [SQLITE_PATH] if STORAGE_BACKEND == 'sqlite' else [SNAPSHOT_FILE, SNAPSHOT_FILE + '.log', SNAPSHOT_FILE + '.log.compacting']
+) if os.path.exists(path))
 
-users = _db["users"]
-friend_requests = _db["friendRequests"]
-friendships = _db["friendships"]
-alarms = _db["alarms"]
+load_started = time.perf_counter()
+
+if STORAGE_BACKEND == 'sqlite':
+    store = SqliteStore(SQLITE_PATH)
+    if not any(store.counts().values()) and os.path.exists(DATA_FILE):
+        # First start on SQLite: seed it from the existing data.json
+        store.load(Store(load_db(), compact=False).to_dict())
+else:
+    if SNAPSHOT_FORMAT == 'binary' and not os.path.exists(BINARY_FILE) and os.path.exists(DATA_FILE):
+        # First binary start: convert data.json, plus any journal it still has
+        write_binary(BINARY_FILE, Journal(DATA_FILE).replay(Store(compact=False))[0].to_dict())
+    if PERSISTENCE_MODE == 'journal':
+        journal = Journal(SNAPSHOT_FILE, fsync=os.environ.get('WAKEY_JOURNAL_FSYNC') == '1',
+                          binary=SNAPSHOT_FORMAT == 'binary')
+        store, _replayed = journal.replay(Store(compact=COMPACT_RECORDS))
+        journal.start_compactor()
+    elif SNAPSHOT_FORMAT == 'binary':
+        store = load_snapshot_file(Store(compact=COMPACT_RECORDS), BINARY_FILE, binary=True)
+    else:
+        store = Store(load_db(), compact=COMPACT_RECORDS)
+
+LOAD_SECONDS = time.perf_counter() - load_started
+committer = GroupCommitter(
+    flush_db,
+    interval_ms=int(os.environ.get('WAKEY_GROUP_COMMIT_MS', 50)),
+    max_batch=int(os.environ.get('WAKEY_GROUP_COMMIT_MAX', 256))
+).start() if GROUP_COMMIT and STORAGE_BACKEND != 'sqlite' else None
 
 # Initialize Flask app
 app = Flask(__name__)
 
 # Simple CORS - allow everything
-CORS(app)
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'ETag', 'X-Wakey-Version', 'Retry-After']
+CORS(app, expose_headers=CORS_EXPOSE_HEADERS)
 
 # Initialize agent
 agent = WakeyAgent()
 
+metrics.install(app)
+if metrics.enabled and os.environ.get('WAKEY_PROFILE_SLOWEST'):
+    # Opt-in: sample stacks of the N slowest requests for /api/metrics/slow
+    metrics.sampler = SlowRequestSampler(
+        keep=int(os.environ['WAKEY_PROFILE_SLOWEST']),
+        interval=int(os.environ.get('WAKEY_PROFILE_INTERVAL_MS', 5)) / 1000
+    )
+
+# Opt-in traffic capture; streams, scrapes and dumps aren't worth replaying
+capture = TrafficCapture(CAPTURE_PATH, identify=lambda: session_user(),
+                         skip={'stream_events', 'metrics_endpoint', 'metrics_slow', 'debug', 'export',
+                               'debug_persistence', 'debug_scheduler', 'debug_admission'})
+capture.install(app)
+
+# Live alarm updates for /api/events/<user_id>
+events = EventBus()
+
+# Per-user list versions for ETags and ?since= delta sync; kept in the
+# database on SQLite, where several processes serve the same lists
+versions = SqliteVersionTracker(store) if STORAGE_BACKEND == 'sqlite' else VersionTracker()
+
+# Per-entity locks: agent actions lock their alarm, friend operations lock
+# the user pair, signup locks the username. Unrelated requests run in parallel.
+entity_locks = LockStripes()
+
+def run_mutation(lock_keys, operation, *args):
+    """
+    Run a do_* operation holding its entity locks, save if it succeeded, then
+    run the follow-ups it queued (scheduler, versions, events) once saved.
+    """
+    after = []
+    with entity_locks.hold(lock_keys), write_transaction():
+        result = operation(*args, after)
+    if result.get('success'):
+        save_db()
+        for callback in after:
+            callback()
+    return result
+
+def publish_alarm(alarm, event_type='alarm'):
+    """Push an alarm to its partners' (or group members') event streams."""
+    events.publish(alarm_members(alarm), event_type, alarm)
+
+def alarm_changed(alarm):
+    """Bump the partners' (or group members') alarm list versions and push the update."""
+    versions.bump('alarms', alarm_members(alarm), alarm['id'])
+    publish_alarm(alarm)
+
+def list_response(list_name, user_id, build_full, build_delta):
+    """
+    Serve a per-user list with ETag/If-None-Match (304 without building the
+    list) and ?since=<version> delta mode returning only changed/removed items.
+    """
+    since = request.args.get('since')
+    if since is not None:
+        keys, version = versions.changed_since(list_name, user_id, since)
+        if keys is None:
+            # Unknown or too old a version: send everything
+            return jsonify({'version': version, 'reset': True, 'changed': build_full(), 'removed': []})
+        changed, removed = build_delta(keys)
+        return jsonify({'version': version, 'reset': False, 'changed': changed, 'removed': removed})
+
+    version = versions.version(list_name, user_id)
+    etag = f"{list_name}-{user_id}-{version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_full())
+    response.set_etag(etag)
+    response.headers['X-Wakey-Version'] = version
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def on_alarm_due(alarm_id, reason, fire_at):
+    alarm = store.get_alarm(alarm_id)
+    if alarm and alarm.get('isActive', True):
+        publish_alarm(alarm, 'fire')
+
+# Server-side alarm timer (set WAKEY_SCHEDULER=0 on all but one worker when
+# several processes share a SQLite file)
+scheduler = AlarmScheduler()
+scheduler.add_listener(on_alarm_due)
+if os.environ.get('WAKEY_SCHEDULER', '1') == '1':
+    scheduler.schedule_many(store.active_alarms())
+    scheduler.start()
+
 # Create data file if it doesn't exist
-if not os.path.exists(DATA_FILE):
-    save_db()
+if STORAGE_BACKEND != 'sqlite' and not os.path.exists(DATA_FILE):
+    write_snapshot(DATA_FILE, store.to_dict())
     print("✅ Created data.json file")
 else:
-    print(f"✅ Loaded {len(users)} users, {len(friend_requests)} requests, {len(friendships)} friendships, {len(alarms)} alarms")
+    counts = store.counts()
+    print(f"✅ Loaded {counts['users']} users, {counts['friendRequests']} requests, {counts['friendships']} friendships, {counts['alarms']} alarms")
 
 # ============================================
 # 🔐 AUTHENTICATION ROUTES
 # ============================================
 
+# Reachable without a session even with WAKEY_REQUIRE_AUTH=1
+PUBLIC_ENDPOINTS = {'home', 'signup', 'login', 'metrics_endpoint'}
+
+# Body fields naming the user a request acts as (batch items included)
+ACTING_USER_FIELDS = ('userId', 'fromUserId')
+
+def request_token():
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        return auth[7:].strip()
+    return request.args.get('token')
+
+def session_user():
+    """The user the request's token was issued to: None without a token, -1 for a bad one."""
+    token = request_token()
+    if not token:
+        return None
+    user_id = sessions.check(token)
+    return -1 if user_id is None else user_id
+
+def claimed_user_ids():
+    """User ids the request says it acts as: path, ?currentUserId= and body fields."""
+    claimed = []
+    if request.view_args and 'user_id' in request.view_args:
+        claimed.append(request.view_args['user_id'])
+    if 'currentUserId' in request.args:
+        claimed.append(request.args['currentUserId'])
+    body = request.get_json(silent=True) if request.is_json else None
+    items = [body] if isinstance(body, dict) else []
+    if items and isinstance(body.get('operations'), list):
+        items += [operation for operation in body['operations'] if isinstance(operation, dict)]
+    for item in items:
+        claimed.extend(item[field] for field in ACTING_USER_FIELDS if field in item)
+    return claimed
+
+def identity_error(token, claimed, public=False):
+    """None if the request may go ahead, else (status, message). O(1) for a known token."""
+    if token:
+        user_id = sessions.check(token)
+        if user_id is None:
+            return 401, 'Invalid or expired session'
+        if any(str(claimed_id) != str(user_id) for claimed_id in claimed):
+            return 403, 'Session belongs to another user'
+        return None
+    if REQUIRE_AUTH and not public:
+        return 401, 'Login required'
+    return None
+
+@app.before_request
+def authenticate():
+    if request.method == 'OPTIONS':
+        return None  # CORS preflight carries no credentials
+    error = identity_error(request_token(), claimed_user_ids(), request.endpoint in PUBLIC_ENDPOINTS)
+    if error is not None:
+        status, message = error
+        return jsonify({'success': False, 'message': message}), status
+
+# Route groups for admission control; other endpoints are always admitted
+ADMISSION_GROUPS = {
+    'agent_acknowledge': 'alarm_action', 'agent_snooze': 'alarm_action', 'agent_cancel': 'alarm_action',
+    'create_alarm': 'alarm_action', 'create_group_alarm': 'alarm_action', 'batch': 'alarm_action',
+    'get_alarms': 'alarm_list', 'get_alarm_history': 'alarm_list',
+    'search_users': 'search',
+    'get_friends': 'social', 'get_friend_requests': 'social', 'get_friend_suggestions': 'social',
+    'send_friend_request': 'social', 'accept_friend_request': 'social',
+    'get_user_stats': 'social', 'get_pair_stats': 'social', 'get_leaderboard': 'social',
+}
+
+admission = AdmissionControl(ADMISSION_MAX_INFLIGHT, parse_rates(ADMISSION_RATES)) if ADMISSION_ENABLED else None
+
+def admission_key():
+    """
+    Who a request's bucket belongs to: its session user once the token has
+    been verified, else its address. A claimed userId is never used, or any
+    client could drain someone else's bucket.
+    """
+    user_id = session_user()
+    if user_id is not None and user_id != -1:
+        return str(user_id)
+    return request.remote_addr
+
+@app.before_request
+def admit():
+    # After authenticate(): requests it turns away never take a token
+    group = ADMISSION_GROUPS.get(request.endpoint)
+    if admission is None or group is None or request.method == 'OPTIONS':
+        return None
+    refused = admission.admit(group, admission_key())
+    if refused is not None:
+        reason, retry_after = refused
+        metrics.inc('wakey_admission_shed_total', (group, reason))
+        response = jsonify({'success': False, 'message': 'Too many requests, try again shortly'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    g.admitted = True
+
+@app.teardown_request
+def release_admission(error):
+    if g.pop('admitted', False):
+        admission.leave()
+
+def busy_response():
+    return jsonify({'success': False, 'message': 'Too many logins right now, try again shortly'}), 503
+
+def upgrade_password(user, password):
+    """Replace a plaintext (or outdated) stored password with a fresh hash after a good login."""
+    try:
+        hashed = hasher.hash(password)
+    except HasherBusy:
+        return  # next login
+    with entity_locks.hold([username_key(user['username'])]), write_transaction():
+        store.set_password(user['id'], hashed)
+    save_db()
+
 @app.route('/')
 def home():
     """Health check endpoint."""
@@ -99,25 +495,32 @@ def signup():
 
     if not username or not password:
         return jsonify({'success': False, 'message': 'Username and password required'})
-
-    existing = next((u for u in users if u['username'].lower() == username.lower()), None)
-    if existing:
+    if store.find_user(username):
         return jsonify({'success': False, 'message': 'Username already taken'})
 
-    new_user = {
-        'id': len(users) + 1,
-        'username': username,
-        'password': password,
-        'createdAt': datetime.now().isoformat()
-    }
+    # Hashed before taking the lock: it is the slow part
+    try:
+        hashed = hasher.hash(password)
+    except HasherBusy:
+        return busy_response()
 
-    users.append(new_user)
+    try:
+        with entity_locks.hold([username_key(username)]), write_transaction():
+            existing = store.find_user(username)
+            if existing:
+                return jsonify({'success': False, 'message': 'Username already taken'})
+
+            new_user = store.add_user(username, hashed)
+    except sqlite3.IntegrityError:
+        # Another process sharing the database signed this name up first
+        return jsonify({'success': False, 'message': 'Username already taken'})
     save_db()
 
     return jsonify({
         'success': True,
         'message': 'Account created successfully',
-        'user': {'id': new_user['id'], 'username': new_user['username']}
+        'user': {'id': new_user['id'], 'username': new_user['username']},
+        'token': sessions.issue(new_user['id'])
     })
 
 @app.route('/api/login', methods=['POST'])
@@ -130,162 +533,218 @@ def login():
     if not username or not password:
         return jsonify({'success': False, 'message': 'Username and password required'})
 
-    user = next(
-        (u for u in users if u['username'].lower() == username.lower() and u['password'] == password),
-        None
-    )
+    user = store.find_user(username)
 
-    if not user:
+    try:
+        # An unknown username costs a hash check too, so timing doesn't reveal it
+        valid = hasher.verify(user['password'] if user else DUMMY_HASH, password) and user is not None
+    except HasherBusy:
+        metrics.inc('wakey_logins_total', ('busy',))
+        return busy_response()
+
+    if not valid:
+        metrics.inc('wakey_logins_total', ('invalid',))
         return jsonify({'success': False, 'message': 'Invalid username or password'})
 
+    metrics.inc('wakey_logins_total', ('ok',))
+    if needs_rehash(user['password']):
+        upgrade_password(user, password)
+
     return jsonify({
         'success': True,
         'message': 'Login successful',
-        'user': {'id': user['id'], 'username': user['username']}
+        'user': {'id': user['id'], 'username': user['username']},
+        'token': sessions.issue(user['id'])
     })
 
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    """End the sessions of the user the request's token was issued to, on every worker."""
+    token = request_token()
+    user_id = sessions.revoke(token) if token else None
+    if user_id is not None:
+        with write_transaction():
+            store.end_sessions(user_id)
+        save_db()
+    return jsonify({'success': True})
+
 # ============================================
 # 👥 FRIEND SYSTEM
 # ============================================
 
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
 @app.route('/api/users/search')
 def search_users():
-    """Search for users by username."""
+    """Search for users by username (exact and prefix matches first, paginated)."""
     query = request.args.get('query', '').strip()
     current_user_id = int(request.args.get('currentUserId', 0))
+    limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
 
     if not query:
         return jsonify([])
 
-    return jsonify([
-        {'id': u['id'], 'username': u['username']}
-        for u in users
-        if query.lower() in u['username'].lower() and u['id'] != current_user_id
-    ])
-
-@app.route('/api/friends/request', methods=['POST'])
-def send_friend_request():
-    """Send a friend request."""
-    data = request.json
+    try:
+        matches, next_cursor = store.search_users(query, exclude_id=current_user_id, limit=limit, cursor=cursor)
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': 'invalid cursor'}), 400
+    response = jsonify([{'id': u['id'], 'username': u['username']} for u in matches])
+    if next_cursor:
+        # Pass back as ?cursor= to get the next page
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def friend_request_lock_keys(data):
+    return [pair_key(data.get('fromUserId'), data.get('toUserId'))]
+
+def do_send_friend_request(data, after):
+    """Send a friend request (shared by the route and /api/batch)."""
     from_user_id = data.get('fromUserId')
     to_user_id = data.get('toUserId')
 
     if not from_user_id or not to_user_id:
-        return jsonify({'success': False, 'message': 'Invalid user IDs'})
+        return {'success': False, 'message': 'Invalid user IDs'}
 
     # Check if already friends
-    already_friends = next(
-        (f for f in friendships
-         if (f['user1Id'] == from_user_id and f['user2Id'] == to_user_id)
-         or (f['user1Id'] == to_user_id and f['user2Id'] == from_user_id)),
-        None
-    )
-
-    if already_friends:
-        return jsonify({'success': False, 'message': 'Already friends'})
+    if store.are_friends(from_user_id, to_user_id):
+        return {'success': False, 'message': 'Already friends'}
 
     # Check if request already exists
-    existing_request = next(
-        (r for r in friend_requests
-         if r['fromUserId'] == from_user_id and r['toUserId'] == to_user_id and r['status'] == 'pending'),
-        None
-    )
+    if store.has_pending_request(from_user_id, to_user_id):
+        return {'success': False, 'message': 'Friend request already sent'}
 
-    if existing_request:
-        return jsonify({'success': False, 'message': 'Friend request already sent'})
+    req = store.add_friend_request(from_user_id, to_user_id)
+    suggestion_cache.requests_changed(from_user_id, to_user_id)
+    after.append(lambda: versions.bump('requests', (to_user_id,), req['id']))
 
-    request_obj = {
-        'id': len(friend_requests) + 1,
-        'fromUserId': from_user_id,
-        'toUserId': to_user_id,
-        'status': 'pending',
-        'createdAt': datetime.now().isoformat()
-    }
+    return {'success': True, 'message': 'Friend request sent'}
 
-    friend_requests.append(request_obj)
-    save_db()
-    
-    return jsonify({'success': True, 'message': 'Friend request sent'})
+@app.route('/api/friends/request', methods=['POST'])
+def send_friend_request():
+    """Send a friend request."""
+    data = request.json
+    return jsonify(run_mutation(friend_request_lock_keys(data), do_send_friend_request, data))
 
 @app.route('/api/friends/requests/<int:user_id>')
 def get_friend_requests(user_id):
     """Get pending friend requests for a user."""
-    pending = [
-        {
-            'id': r['id'],
-            'fromUserId': r['fromUserId'],
-            'fromUsername': next((u['username'] for u in users if u['id'] == r['fromUserId']), 'Unknown'),
-            'createdAt': r['createdAt']
-        }
-        for r in friend_requests
-        if r['toUserId'] == user_id and r['status'] == 'pending'
-    ]
-    
-    return jsonify(pending)
+    def full():
+        return [_pending_request_json(r) for r in store.pending_requests_for(user_id)]
+
+    def delta(request_ids):
+        changed, removed = [], []
+        for request_id in request_ids:
+            r = store.get_friend_request(request_id)
+            if r and r['status'] == 'pending' and r['toUserId'] == user_id:
+                changed.append(_pending_request_json(r))
+            else:
+                removed.append(request_id)
+        return changed, removed
+
+    return list_response('requests', user_id, full, delta)
+
+def _pending_request_json(r):
+    return {
+        'id': r['id'],
+        'fromUserId': r['fromUserId'],
+        'fromUsername': (store.get_user(r['fromUserId']) or {}).get('username', 'Unknown'),
+        'createdAt': r['createdAt']
+    }
 
-@app.route('/api/friends/accept', methods=['POST'])
-def accept_friend_request():
-    """Accept a friend request."""
-    data = request.json
+def accept_lock_keys(data):
+    req = store.get_friend_request(data.get('requestId'))
+    return [pair_key(req['fromUserId'], req['toUserId'])] if req else []
+
+def do_accept_friend_request(data, after):
+    """Accept a friend request (shared by the route and /api/batch)."""
     request_id = data.get('requestId')
     user_id = data.get('userId')
 
     if not request_id or not user_id:
-        return jsonify({'success': False, 'message': 'Invalid request'})
+        return {'success': False, 'message': 'Invalid request'}
 
-    req = next((r for r in friend_requests if r['id'] == request_id), None)
+    req = store.get_friend_request(request_id)
 
     if not req:
-        return jsonify({'success': False, 'message': 'Request not found'})
+        return {'success': False, 'message': 'Request not found'}
 
     if req['toUserId'] != user_id:
-        return jsonify({'success': False, 'message': 'Unauthorized'})
+        return {'success': False, 'message': 'Unauthorized'}
 
-    req['status'] = 'accepted'
+    store.set_request_status(req, 'accepted')
+    store.add_friendship(req['fromUserId'], req['toUserId'])
+    suggestion_cache.friendship_added(req['fromUserId'], req['toUserId'])
+    suggestion_cache.requests_changed(req['fromUserId'], req['toUserId'])
 
-    friendships.append({
-        'id': len(friendships) + 1,
-        'user1Id': req['fromUserId'],
-        'user2Id': req['toUserId'],
-        'createdAt': datetime.now().isoformat()
-    })
+    def bump_versions():
+        versions.bump('requests', (user_id,), req['id'])
+        versions.bump('friends', (req['fromUserId'],), req['toUserId'])
+        versions.bump('friends', (req['toUserId'],), req['fromUserId'])
+    after.append(bump_versions)
 
-    save_db()
+    return {'success': True, 'message': 'Friend request accepted'}
 
-    return jsonify({'success': True, 'message': 'Friend request accepted'})
+@app.route('/api/friends/accept', methods=['POST'])
+def accept_friend_request():
+    """Accept a friend request."""
+    data = request.json
+    return jsonify(run_mutation(accept_lock_keys(data), do_accept_friend_request, data))
 
 @app.route('/api/friends/<int:user_id>')
 def get_friends(user_id):
     """Get all friends for a user."""
-    result = []
-
-    for f in friendships:
-        if f['user1Id'] == user_id or f['user2Id'] == user_id:
-            friend_id = f['user2Id'] if f['user1Id'] == user_id else f['user1Id']
-            friend = next((u for u in users if u['id'] == friend_id), None)
-            if friend:
-                result.append({'id': friend['id'], 'username': friend['username']})
-
-    return jsonify(result)
+    def full():
+        return [
+            {'id': friend['id'], 'username': friend['username']}
+            for friend in store.friends_of(user_id)
+        ]
+
+    def delta(friend_ids):
+        changed, removed = [], []
+        for friend_id in friend_ids:
+            friend = store.get_user(friend_id)
+            if friend and store.are_friends(user_id, friend_id):
+                changed.append({'id': friend['id'], 'username': friend['username']})
+            else:
+                removed.append(friend_id)
+        return changed, removed
+
+    return list_response('friends', user_id, full, delta)
+
+SUGGESTIONS_PAGE_SIZE = 10
+SUGGESTIONS_MAX_PAGE_SIZE = 50
+
+# Friend-of-friend suggestions, computed from the store's friendship
+# adjacency index and cached per user until the graph around them changes
+suggestion_cache = SuggestionCache(lambda user_id: store.friend_suggestions(user_id, SUGGESTIONS_MAX_PAGE_SIZE))
+
+@app.route('/api/friends/suggestions/<int:user_id>')
+def get_friend_suggestions(user_id):
+    """People a user may know: friends of friends by mutual friend count, minus friends and pending requests."""
+    limit = min(max(request.args.get('limit', SUGGESTIONS_PAGE_SIZE, type=int), 1), SUGGESTIONS_MAX_PAGE_SIZE)
+    suggestions = suggestion_cache.get(user_id, store.friend_ids(user_id))[:limit]
+    return jsonify([{
+        'id': candidate_id,
+        'username': (store.get_user(candidate_id) or {}).get('username', 'Unknown'),
+        'mutualFriends': mutual
+    } for candidate_id, mutual in suggestions])
 
 # ============================================
 # ⏰ ALARM SYSTEM
 # ============================================
 
-@app.route('/api/alarms', methods=['POST'])
-def create_alarm():
-    """Create a new shared alarm."""
-    data = request.json
-    user_id = data.get('userId')
-    friend_id = data.get('friendId')
+# Friends a group alarm can wake up together with its creator
+MAX_GROUP_FRIENDS = 50
+
+def alarm_settings(data):
+    """(time, label, sound, tone) of a new alarm, defaults filled in."""
     time = data.get('time')
     label = data.get('label', 'Wake up!')
     sound = data.get('sound', 'baddie')
     tone = data.get('tone', None)  # Optional: soft, playful, strict
 
-    if not user_id or not friend_id or not time:
-        return jsonify({'success': False, 'message': 'Missing required fields'})
-
     allowed_sounds = ['baddie', 'manifestation', 'getshitdone']
     if sound not in allowed_sounds:
         sound = 'baddie'
@@ -294,19 +753,32 @@ def create_alarm():
     if tone and tone not in ['soft', 'playful', 'strict']:
         tone = None
 
-    # Check if users are friends
-    are_friends = next(
-        (f for f in friendships
-         if (f['user1Id'] == user_id and f['user2Id'] == friend_id)
-         or (f['user1Id'] == friend_id and f['user2Id'] == user_id)),
-        None
-    )
+    return time, label, sound, tone
+
+def alarm_created(new_alarm, after):
+    stats.alarm_changed(None, new_alarm)
+
+    def schedule():
+        scheduler.schedule(new_alarm)
+        alarm_changed(new_alarm)
+    after.append(schedule)
 
-    if not are_friends:
-        return jsonify({'success': False, 'message': 'Can only create alarms with friends'})
+    return {'success': True, 'alarm': new_alarm}
 
-    new_alarm = {
-        'id': len(alarms) + 1,
+def do_create_alarm(data, after):
+    """Create a new shared alarm (shared by the route and /api/batch)."""
+    user_id = data.get('userId')
+    friend_id = data.get('friendId')
+    time, label, sound, tone = alarm_settings(data)
+
+    if not user_id or not friend_id or not time:
+        return {'success': False, 'message': 'Missing required fields'}
+
+    # Check if users are friends
+    if not store.are_friends(user_id, friend_id):
+        return {'success': False, 'message': 'Can only create alarms with friends'}
+
+    new_alarm = store.add_alarm({
         'user1Id': user_id,
         'user2Id': friend_id,
         'time': time,
@@ -324,105 +796,456 @@ def create_alarm():
         'agentTone': '',
         'cancelNotifyMessage': '',
         'createdAt': datetime.now().isoformat()
-    }
+    })
 
-    alarms.append(new_alarm)
-    save_db()
-    
-    return jsonify({'success': True, 'alarm': new_alarm})
+    return alarm_created(new_alarm, after)
+
+def do_create_group_alarm(data, after):
+    """
+    Create an alarm for the creator and up to MAX_GROUP_FRIENDS of their
+    friends (shared by the route and /api/batch). It is one record: each
+    member's [snoozes, ack order] sits in `members` and ackCount counts
+    acknowledgements, so an action rewrites one alarm whatever the group size.
+    """
+    user_id = data.get('userId')
+    member_ids = data.get('memberIds')
+    time, label, sound, tone = alarm_settings(data)
+
+    if not user_id or not isinstance(member_ids, list) or not member_ids or not time:
+        return {'success': False, 'message': 'Missing required fields'}
+    if any(type(member_id) is not int for member_id in member_ids):
+        return {'success': False, 'message': 'memberIds must be user ids'}
+    friend_ids = [member_id for member_id in dict.fromkeys(member_ids) if member_id != user_id]
+    if not friend_ids or len(friend_ids) > MAX_GROUP_FRIENDS:
+        return {'success': False, 'message': f"A group alarm needs 1 to {MAX_GROUP_FRIENDS} friends"}
+    if not all(store.are_friends(user_id, friend_id) for friend_id in friend_ids):
+        return {'success': False, 'message': 'Can only create alarms with friends'}
+
+    new_alarm = store.add_alarm({
+        'user1Id': user_id,
+        'user2Id': None,
+        'members': {str(member_id): [0, 0] for member_id in [user_id] + friend_ids},
+        'ackCount': 0,
+        'time': time,
+        'label': label,
+        'sound': sound,
+        'tone': tone,
+        'isActive': True,
+        'snoozeTotal': 0,
+        'cancelledBy': None,
+        'agentMessage': '',
+        'agentTone': '',
+        'cancelNotifyMessage': '',
+        'createdAt': datetime.now().isoformat()
+    })
+
+    return alarm_created(new_alarm, after)
+
+@app.route('/api/alarms', methods=['POST'])
+def create_alarm():
+    """Create a new shared alarm."""
+    return jsonify(run_mutation([], do_create_alarm, request.json))
+
+@app.route('/api/alarms/group', methods=['POST'])
+def create_group_alarm():
+    """Create an alarm for a group of friends."""
+    return jsonify(run_mutation([], do_create_group_alarm, request.json))
 
 @app.route('/api/alarms/<int:user_id>')
 def get_alarms(user_id):
     """Get all active alarms for a user."""
-    user_alarms = [
-        a for a in alarms 
-        if (a['user1Id'] == user_id or a['user2Id'] == user_id) and a.get('isActive', True)
-    ]
-    return jsonify(user_alarms)
+    def delta(alarm_ids):
+        changed, removed = [], []
+        for alarm_id in alarm_ids:
+            alarm = store.get_alarm(alarm_id)
+            if alarm and alarm.get('isActive', True):
+                changed.append(alarm)
+            else:
+                removed.append(alarm_id)
+        return changed, removed
+
+    return list_response('alarms', user_id, lambda: store.alarms_for_user(user_id), delta)
+
+# ============================================
+# 🗄️ ARCHIVE
+# ============================================
+
+archive = Archive(ARCHIVE_DIR)
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+def is_finished(table, record):
+    if table == 'alarms':
+        return not record.get('isActive', True)
+    return record['status'] != 'pending'
+
+def archive_finished():
+    """
+    Move one batch of finished alarms and answered friend requests to the
+    archive. Returns how many were moved. Waits for the stats rebuild,
+    which reads the hot store and then the archive.
+    """
+    if not stats.ready:
+        return 0
+    candidates = [(table, record) for table, record in store.finished_records(ARCHIVE_BATCH)
+                  if archivable(table, record)]
+    if not candidates:
+        return 0
+    lock_keys = [alarm_key(record['id']) if table == 'alarms' else pair_key(record['fromUserId'], record['toUserId'])
+                 for table, record in candidates]
+    with entity_locks.hold(lock_keys), write_transaction():
+        # Re-read under the locks; only records that are still finished move
+        moved = []
+        for table, record in candidates:
+            current = store.get_alarm(record['id']) if table == 'alarms' else store.get_friend_request(record['id'])
+            if current is not None and is_finished(table, current):
+                moved.append((table, current))
+        # Archive first: a crash in between leaves a record in both tiers,
+        # and the next pass only removes it from the hot one
+        archive.add(moved)
+        for table in ('alarms', 'friendRequests'):
+            record_ids = [record['id'] for t, record in moved if t == table]
+            if record_ids:
+                store.remove(table, record_ids)
+                metrics.inc('wakey_archived_records_total', (table,), len(record_ids))
+    if moved:
+        save_db('durable')
+    return len(candidates)
+
+def run_archiver():
+    while True:
+        time.sleep(ARCHIVE_INTERVAL)
+        try:
+            while archive_finished() >= ARCHIVE_BATCH:
+                pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Warning: archiving failed: {e}")
+
+if ARCHIVE_ENABLED:
+    threading.Thread(target=run_archiver, name="wakey-archiver", daemon=True).start()
+
+metrics.gauge('wakey_archived_records', 'Records in the archive tier.',
+              lambda: {(table,): archive.count(table) for table in ('alarms', 'friendRequests')}, ('table',))
+
+def parse_history_cursor(cursor):
+    """'h<n>' = hot finished alarms before the n-th, 'a<n>' = archived ones before archive position n."""
+    if cursor and cursor[0] in 'ha' and cursor[1:].isdigit():
+        return cursor[0], int(cursor[1:])
+    if cursor == 'a':
+        return 'a', None
+    return None, None
+
+@app.route('/api/alarms/<int:user_id>/history')
+def get_alarm_history(user_id):
+    """
+    Finished alarms of a user, newest first, paginated with ?limit= and the
+    X-Next-Cursor header: ones still in the hot store first, then archived
+    ones, streamed as stored.
+    """
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    kind, position = parse_history_cursor(request.args.get('cursor'))
+
+    hot, page, next_cursor = [], [], None
+    if kind != 'a':
+        finished = [alarm for alarm in store.alarms_for_user(user_id, active_only=False)
+                    if not alarm.get('isActive', True)]
+        end = len(finished) if kind is None else min(position, len(finished))
+        start = max(0, end - limit)
+        hot = finished[start:end][::-1]
+        if start > 0:
+            next_cursor = f"h{start}"
+        position = None
+    if next_cursor is None:
+        if len(hot) < limit:
+            page, before = archive.history(user_id, limit - len(hot), position)
+            if before is not None:
+                next_cursor = f"a{before}"
+        elif archive.history(user_id, 1)[0]:
+            next_cursor = 'a'
+
+    def body():
+        yield '['
+        separator = ''
+        for alarm in hot:
+            yield separator + json.dumps(alarm, separators=(',', ':'))
+            separator = ','
+        for line in archive.read(page):
+            yield separator + line.decode()
+            separator = ','
+        yield ']\n'
+
+    response = Response(body(), mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# ============================================
+# 📊 STATS
+# ============================================
+
+# Snooze stats and leaderboards are running totals (see stats.py), rebuilt
+# from the full alarm history, archive included, at startup. The rebuild
+# runs on its own thread so startup doesn't wait on decoding every alarm;
+# until it's done the stats routes answer 503 and the archiver waits. With
+# several processes on one SQLite file each keeps its own, so each only
+# sees the other processes' changes after a restart.
+STATS_REBUILD_BATCH = 1000
+STATS_REBUILD_SECONDS = 0.0
+
+def rebuild_stats():
+    """
+    Count every alarm into the live stats while requests keep changing
+    them: hot alarms a batch at a time under their entity locks, then the
+    archived ones (nothing moves tiers meanwhile).
+    """
+    global STATS_REBUILD_SECONDS
+    started = time.perf_counter()
+    for batch in store.iter_records('alarms', STATS_REBUILD_BATCH):
+        with entity_locks.hold([alarm_key(alarm['id']) for alarm in batch]):
+            stats.add_rebuilt(batch, store.get_alarm)
+    archived = archive.records('alarms')
+    while True:
+        batch = list(itertools.islice(archived, STATS_REBUILD_BATCH))
+        if not batch:
+            break
+        stats.add_rebuilt(batch)
+    STATS_REBUILD_SECONDS = time.perf_counter() - started
+    stats.finish_rebuild()
+
+def run_stats_rebuild():
+    try:
+        rebuild_stats()
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Warning: rebuilding snooze stats failed: {e}")
+
+stats = SnoozeStats()
+stats.start_rebuild()
+threading.Thread(target=run_stats_rebuild, name="wakey-stats-rebuild", daemon=True).start()
+metrics.gauge('wakey_stats_rebuild_seconds', 'Time the startup snooze stats rebuild took (0 until done).',
+              lambda: STATS_REBUILD_SECONDS)
+
+def stats_loading_response():
+    return jsonify({'success': False, 'message': 'Stats are still loading, try again shortly'}), 503
+
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MAX_SIZE = 100
+
+@app.route('/api/stats/<int:user_id>')
+def get_user_stats(user_id):
+    """Snooze, wake-up and streak totals of a user."""
+    if not stats.ready:
+        return stats_loading_response()
+    return jsonify({'userId': user_id, **stats.user_stats(user_id)})
+
+@app.route('/api/stats/<int:user_id>/<int:friend_id>')
+def get_pair_stats(user_id, friend_id):
+    """Totals over the alarms two users share, per user (who snoozes more, who wakes first)."""
+    if not stats.ready:
+        return stats_loading_response()
+    return jsonify(stats.pair_stats(user_id, friend_id))
+
+@app.route('/api/leaderboard/<int:user_id>')
+def get_leaderboard(user_id):
+    """A user and their friends ranked by ?by= (default streak), top ?limit= only."""
+    if not stats.ready:
+        return stats_loading_response()
+    by = request.args.get('by', 'streak')
+    if by not in LEADERBOARD_METRICS:
+        return jsonify({'success': False, 'message': f"by must be one of {', '.join(LEADERBOARD_METRICS)}"}), 400
+    limit = min(max(request.args.get('limit', LEADERBOARD_SIZE, type=int), 1), LEADERBOARD_MAX_SIZE)
+    top = stats.leaderboard([user_id] + store.friend_ids(user_id), by, limit)
+    return jsonify([{
+        'rank': rank,
+        'userId': member_id,
+        'username': (store.get_user(member_id) or {}).get('username', 'Unknown'),
+        'value': member_stats[by if by != 'streak' else 'currentStreak'],
+        'stats': member_stats
+    } for rank, (member_id, member_stats) in enumerate(top, 1)])
 
 # ============================================
 # 🤖 AI AGENT ROUTES
 # ============================================
 
-@app.route('/api/agent/acknowledge', methods=['POST'])
-def agent_acknowledge():
-    """Acknowledge an alarm (mark as awake)."""
-    data = request.json
+def agent_lock_keys(data):
+    return [alarm_key(data.get('alarmId'))]
+
+def do_agent_action(action, data, after):
+    """Run a WakeyAgent action on an alarm (shared by the routes and /api/batch)."""
     alarm_id = data.get('alarmId')
     user_id = data.get('userId')
 
     if not alarm_id or not user_id:
-        return jsonify({'success': False, 'message': 'Missing alarmId or userId'})
-
-    alarm = next((a for a in alarms if a['id'] == alarm_id), None)
-    if not alarm:
-        return jsonify({'success': False, 'message': 'Alarm not found'})
-
-    updated_alarm = agent.acknowledge_alarm(alarm, user_id)
-    
-    # Update alarm in list
-    for i, a in enumerate(alarms):
-        if a['id'] == alarm_id:
-            alarms[i] = updated_alarm
-            break
-    
-    save_db()
-    
-    return jsonify({'success': True, 'alarm': updated_alarm})
+        return {'success': False, 'message': 'Missing alarmId or userId'}
+
+    previous = store.get_alarm(alarm_id)
+    if not previous:
+        return {'success': False, 'message': 'Alarm not found'}
+    if 'members' in previous:
+        if str(user_id) not in previous['members']:
+            return {'success': False, 'message': 'Not a member of this alarm'}
+        # One member can't call off everyone's wake-up
+        if action == 'cancel' and str(user_id) != str(previous['user1Id']):
+            return {'success': False, 'message': 'Only the creator can cancel a group alarm'}
+
+    # Stored records are shared with concurrent readers: the agent edits a copy
+    alarm = copy.deepcopy(previous)
+    if action == 'acknowledge':
+        updated_alarm = agent.acknowledge_alarm(alarm, user_id)
+    elif action == 'snooze':
+        updated_alarm = agent.snooze_alarm(alarm, user_id)
+    else:
+        updated_alarm = agent.cancel_alarm(alarm, user_id)
+    store.update_alarm(updated_alarm)
+    stats.alarm_changed(previous, updated_alarm)
+    metrics.inc('wakey_agent_actions_total', (action, updated_alarm['agentTone'] or 'none'))
+
+    def reschedule():
+        if action == 'snooze':
+            scheduler.snooze(alarm_id)
+        elif not updated_alarm['isActive']:
+            scheduler.cancel(alarm_id)
+        alarm_changed(updated_alarm)
+    after.append(reschedule)
+
+    return {'success': True, 'alarm': updated_alarm}
+
+@app.route('/api/agent/acknowledge', methods=['POST'])
+def agent_acknowledge():
+    """Acknowledge an alarm (mark as awake)."""
+    data = request.json
+    return jsonify(run_mutation(agent_lock_keys(data), do_agent_action, 'acknowledge', data))
 
 @app.route('/api/agent/snooze', methods=['POST'])
 def agent_snooze():
     """Snooze an alarm."""
     data = request.json
-    alarm_id = data.get('alarmId')
-    user_id = data.get('userId')
-
-    if not alarm_id or not user_id:
-        return jsonify({'success': False, 'message': 'Missing alarmId or userId'})
-
-    alarm = next((a for a in alarms if a['id'] == alarm_id), None)
-
-    if not alarm:
-        return jsonify({'success': False, 'message': 'Alarm not found'})
-
-    updated_alarm = agent.snooze_alarm(alarm, user_id)
-    
-    # Update alarm in list
-    for i, a in enumerate(alarms):
-        if a['id'] == alarm_id:
-            alarms[i] = updated_alarm
-            break
-    
-    save_db()
-
-    return jsonify({'success': True, 'alarm': updated_alarm})
+    return jsonify(run_mutation(agent_lock_keys(data), do_agent_action, 'snooze', data))
 
 @app.route('/api/agent/cancel', methods=['POST'])
 def agent_cancel():
     """Cancel an alarm."""
     data = request.json
-    alarm_id = data.get('alarmId')
-    user_id = data.get('userId')
+    return jsonify(run_mutation(agent_lock_keys(data), do_agent_action, 'cancel', data))
 
-    if not alarm_id or not user_id:
-        return jsonify({'success': False, 'message': 'Missing alarmId or userId'})
+# ============================================
+# 📦 BATCH
+# ============================================
 
-    alarm = next((a for a in alarms if a['id'] == alarm_id), None)
+MAX_BATCH_OPERATIONS = 500
+
+# op name -> (handler, lock keys)
+BATCH_OPERATIONS = {
+    'createAlarm': (do_create_alarm, lambda data: []),
+    'createGroupAlarm': (do_create_group_alarm, lambda data: []),
+    'snooze': (partial(do_agent_action, 'snooze'), agent_lock_keys),
+    'acknowledge': (partial(do_agent_action, 'acknowledge'), agent_lock_keys),
+    'cancel': (partial(do_agent_action, 'cancel'), agent_lock_keys),
+    'friendRequest': (do_send_friend_request, friend_request_lock_keys),
+    'acceptFriendRequest': (do_accept_friend_request, accept_lock_keys),
+}
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """
+    Apply an ordered list of operations with one lock acquisition (every
+    entity lock the batch needs, taken together) and one save.
+    Each item is {"op": <name>, ...same fields as the single route}; results
+    come back in the same order. Operations are independent: a failed one
+    doesn't roll back the others.
+    """
+    operations = (request.json or {}).get('operations')
+
+    if not isinstance(operations, list):
+        return jsonify({'success': False, 'message': 'operations must be a list'})
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'success': False, 'message': f'At most {MAX_BATCH_OPERATIONS} operations per batch'})
+
+    planned = []
+    lock_keys = []
+    for operation in operations:
+        entry = BATCH_OPERATIONS.get(operation.get('op')) if isinstance(operation, dict) else None
+        if entry is not None:
+            try:
+                keys = entry[1](operation)
+                hash(tuple(keys))  # a key holding a list or dict would fail in entity_locks.hold()
+                lock_keys.extend(keys)
+            except TypeError:
+                entry = None  # unhashable ids: reported as unknown below
+        planned.append(entry)
+
+    results = []
+    after = []
+    with entity_locks.hold(lock_keys), write_transaction():
+        for operation, entry in zip(operations, planned):
+            if entry is None:
+                results.append({'success': False, 'message': 'Unknown operation'})
+                continue
+            try:
+                results.append(entry[0](operation, after))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results.append({'success': False, 'message': 'Invalid operation'})
+
+    if any(r['success'] for r in results):
+        save_db()
+    for callback in after:
+        callback()
+
+    return jsonify({'success': True, 'results': results})
+
+# 📡 LIVE EVENTS
+# ============================================
 
-    if not alarm:
-        return jsonify({'success': False, 'message': 'Alarm not found'})
+@app.route('/api/events/<int:user_id>')
+def stream_events(user_id):
+    """Server-Sent Events stream of alarm updates and fire events for a user."""
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if request.environ.get('wakey.native_stream'):
+        # asgi.py streams from its event loop; this request only ran the hooks
+        return Response(mimetype='text/event-stream', headers=headers)
+    sub = events.subscribe(user_id)
+    return Response(stream_with_context(events.stream(sub)), mimetype='text/event-stream', headers=headers)
 
-    updated_alarm = agent.cancel_alarm(alarm, user_id)
-    
-    # Update alarm in list
-    for i, a in enumerate(alarms):
-        if a['id'] == alarm_id:
-            alarms[i] = updated_alarm
-            break
-    
-    save_db()
+# ============================================
+# 📈 METRICS
+# ============================================
 
-    return jsonify({'success': True, 'alarm': updated_alarm})
+metrics.gauge('wakey_load_duration_seconds', 'Time to load the dataset at startup.', lambda: LOAD_SECONDS)
+metrics.gauge('wakey_load_bytes', 'Size of the files loaded at startup.', lambda: LOAD_BYTES)
+metrics.gauge('wakey_records', 'Stored records per table.',
+              lambda: {(table,): count for table, count in store.counts().items()}, ('table',))
+metrics.gauge('wakey_active_alarms', 'Alarms still active.', lambda: store.active_alarm_count())
+metrics.gauge('wakey_scheduled_alarms', 'Alarms armed in the scheduler.', lambda: len(scheduler))
+metrics.gauge('wakey_event_subscribers', 'Open /api/events streams.', lambda: events.subscriber_count())
+metrics.gauge('wakey_session_tokens', 'Session tokens in the check cache.', lambda: sessions.cached())
+metrics.gauge('wakey_password_hasher', 'Password hasher workers, jobs run and jobs turned away.',
+              lambda: {(stat,): value for stat, value in hasher.stats().items()}, ('stat',))
+metrics.gauge('wakey_suggestion_cache', 'Friend suggestion cache entries, hits and misses.',
+              lambda: {(stat,): value for stat, value in suggestion_cache.stats().items()}, ('stat',))
+if admission is not None:
+    metrics.gauge('wakey_admission_inflight', 'Requests admitted and still running.', lambda: admission.inflight)
+    metrics.gauge('wakey_admission_keys', 'Token buckets held (user, route group).',
+                  lambda: admission.stats()['keys'])
+if capture.enabled:
+    metrics.gauge('wakey_capture', 'Requests captured to WAKEY_CAPTURE, and lines not yet written.',
+                  lambda: {(stat,): value for stat, value in capture.stats().items()}, ('stat',))
+if committer is not None:
+    metrics.gauge('wakey_group_commit', 'Group-commit writer stats (see /api/debug/persistence).',
+                  lambda: {(stat,): value for stat, value in committer.stats().items()}, ('stat',))
+
+@app.route('/api/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of request, persistence and dataset metrics."""
+    if not metrics.enabled:
+        return Response("metrics disabled (set WAKEY_METRICS=1)\n", status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/slow')
+def metrics_slow():
+    """Slowest requests with their sampled stacks (WAKEY_PROFILE_SLOWEST=N)."""
+    if metrics.sampler is None:
+        return jsonify({'success': False, 'message': 'profiler disabled (set WAKEY_METRICS=1 and WAKEY_PROFILE_SLOWEST=N)'}), 404
+    return jsonify(metrics.sampler.slowest())
 
 # ============================================
 # 🧪 DEBUG (DEVELOPMENT ONLY)
@@ -430,14 +1253,50 @@ def agent_cancel():
 
 @app.route('/api/debug')
 def debug():
-    """Debug endpoint - shows all data (remove in production)."""
+    """Debug endpoint - shows all data (remove in production), streamed a batch at a time."""
+    return Response(json_chunks(store), mimetype='application/json')
+
+@app.route('/api/export')
+def export():
+    """
+    NDJSON dump of the whole database (or ?tables=users,alarms), streamed a
+    batch at a time; `python ndjson.py import` loads it into a fresh instance.
+    """
+    if not EXPORT_ENABLED:
+        return jsonify({'success': False, 'message': 'export disabled (set WAKEY_EXPORT=1)'}), 404
+    tables = request.args.get('tables')
+    tables = [t for t in TABLES if t in tables.split(',')] if tables else TABLES
+    return Response(export_chunks(store, tables), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename="wakey.ndjson"'})
+
+@app.route('/api/debug/persistence')
+def debug_persistence():
+    """Debug endpoint - persistence mode and group-commit counters."""
     return jsonify({
-        'users': users,
-        'friendRequests': friend_requests,
-        'friendships': friendships,
-        'alarms': alarms
+        'storage': STORAGE_BACKEND,
+        'mode': PERSISTENCE_MODE,
+        'groupCommit': committer.stats() if committer else None
     })
 
+@app.route('/api/debug/scheduler')
+def debug_scheduler():
+    """Debug endpoint - armed alarm count and next due alarm."""
+    next_due = scheduler.next_due()
+    return jsonify({
+        'subscribers': events.subscriber_count(),
+        'armed': len(scheduler),
+        'fired': scheduler.fired,
+        'nextDue': {
+            'alarmId': next_due[1],
+            'fireAt': datetime.fromtimestamp(next_due[0]).isoformat()
+        } if next_due else None
+    })
+
+@app.route('/api/debug/admission')
+def debug_admission():
+    """Debug endpoint - admission control: requests in flight, buckets, admitted and shed per group."""
+    return jsonify(admission.stats() if admission else {'enabled': False})
+
 
 # ============================================
 # 🚀 MAIN
@@ -0,0 +1,330 @@
+from array import array
+from collections import OrderedDict
+from datetime import date
+import json
+import os
+import re
+import struct
+import threading
+
+# ============================
+# 📐 FORMAT
+# ============================
+#
+#   <dir>/<table>-YYYY-MM-DD.ndjson   one compact JSON record per line, in
+#                                     archive order (day = day archived)
+#   <dir>/<table>-YYYY-MM-DD.idx      one ENTRY per line of the segment
+#                                     (a group alarm's line gets one per
+#                                     two members)
+#
+# Both files are append-only; lines are written (and fsynced) before their
+# index entries. The index carries what a history page needs, so a page
+# reads a few bytes per archived record of a day instead of parsing JSON,
+# and only the days it reaches. Segment lines past the last index entry (a
+# crash between the two appends) are re-indexed from the segment at the
+# next start, and a torn last line is cut off.
+
+ENTRY = struct.Struct('<qQIqq')  # id, offset, length, a, b (alarm participants / request from, to)
+POSITION = 1 << 40  # history position = day ordinal * POSITION + line offset in that day's segment
+TABLES = ('alarms', 'friendRequests')
+_SEGMENT = re.compile(r'(alarms|friendRequests)-(\d{4}-\d\d-\d\d)\.ndjson')
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+NO_USER = _INT64[0]  # index entry participant that isn't an int64 user id
+
+_encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+
+def _is_int64(value):
+    return type(value) is int and _INT64[0] <= value <= _INT64[1]
+
+
+def _user_field(value):
+    return value if _is_int64(value) and value != NO_USER else NO_USER
+
+
+def _participants(table, record):
+    """
+    (a, b) per index entry of a record: one pair, or for a group alarm its
+    members two to an entry (all entries point at the same line).
+    """
+    if table == 'alarms':
+        members = record.get('members')
+        if isinstance(members, dict):
+            user_ids = [_user_field(int(m)) if m.isdigit() else NO_USER for m in members] or [NO_USER]
+            if len(user_ids) % 2:
+                user_ids.append(NO_USER)
+            return list(zip(user_ids[::2], user_ids[1::2]))
+        pair = record.get('user1Id'), record.get('user2Id')
+    else:
+        pair = record.get('fromUserId'), record.get('toUserId')
+    return [tuple(_user_field(v) for v in pair)]
+
+
+def archivable(table, record):
+    """Records whose id fits an index entry (so, all real ones)."""
+    return _is_int64(record.get('id'))
+
+
+def _index_path(segment_path):
+    return segment_path[:-len('.ndjson')] + '.idx'
+
+
+def _index_user(users, offset, length, a, b):
+    """Add one alarm index entry to a segment's {user id: array of offset, length}."""
+    for user_id in (a, b) if a != b else (a,):
+        if user_id == NO_USER:
+            continue
+        positions = users.get(user_id)
+        if positions is None:
+            positions = users[user_id] = array('q')
+        elif positions[-2] == offset:
+            continue  # a group alarm's member already has this line
+        positions.extend((offset, length))
+
+
+class Archive:
+    """
+    Append-only cold tier for finished alarms and answered friend requests.
+
+    add() appends records to today's segment of their table. history()
+    pages through one user's archived alarms, most recently archived first,
+    and read() returns a page's raw JSON lines straight from the segments
+    (pread, no parsing), so the history route can stream them.
+
+    Nothing per archived record stays in memory for the whole history: a
+    history page loads the index of each day it reaches into a per-user
+    map of (offset, length) pairs, and the last CACHED_SEGMENTS of those
+    are kept. The ids of each table's two newest segments are remembered,
+    so archiving a record again after a crash between add() and saving the
+    hot store (the next pass retries the same records) is a no-op.
+    """
+
+    CACHED_SEGMENTS = 16
+
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self._segments = []          # segment number -> path
+        self._numbers = {}           # path -> segment number
+        self._files = {}             # segment number -> read-only fd
+        self._alarm_days = []        # (day ordinal, segment number) of alarm segments, oldest first
+        self._loaded = OrderedDict()  # segment number -> {user id: array('q') of offset, length}, LRU
+        self._recent = {table: {} for table in TABLES}  # table -> {segment number: set of ids}, newest two
+        self._counts = None          # table -> records, counted on first use
+        self._lock = threading.Lock()
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                match = _SEGMENT.fullmatch(name)
+                if match:
+                    path = os.path.join(directory, name)
+                    self._repair(match.group(1), path)
+                    self._segment_number(match.group(1), path)
+        for table in TABLES:
+            for segment in [n for n, path in enumerate(self._segments) if self._table(path) == table][-2:]:
+                self._recent[table][segment] = {entry[0] for entry in self._entries(segment)}
+
+    # ============================
+    # 📥 INDEX
+    # ============================
+
+    @staticmethod
+    def _table(path):
+        return _SEGMENT.fullmatch(os.path.basename(path)).group(1)
+
+    def _segment_number(self, table, path):
+        number = self._numbers.get(path)
+        if number is None:
+            number = self._numbers[path] = len(self._segments)
+            self._segments.append(path)
+            if table == 'alarms':
+                day = date.fromisoformat(_SEGMENT.fullmatch(os.path.basename(path)).group(2)).toordinal()
+                self._alarm_days.append((day, number))
+        return number
+
+    def _repair(self, table, path):
+        """Index the lines a crash left past the last index entry and cut off a torn last line."""
+        index_path = _index_path(path)
+        size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        whole = size - size % ENTRY.size
+        end = 0
+        if whole:
+            with open(index_path, 'rb') as f:
+                f.seek(whole - ENTRY.size)
+                _, offset, length, _, _ = ENTRY.unpack(f.read(ENTRY.size))
+            end = offset + length + 1
+
+        missing = []
+        with open(path, 'r+b') as f:
+            f.seek(end)
+            offset = end
+            for line in f:
+                try:
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    break  # torn by a crash mid-append
+                for a, b in _participants(table, record):
+                    missing.append(ENTRY.pack(record['id'], offset, len(line) - 1, a, b))
+                offset += len(line)
+            if offset < os.fstat(f.fileno()).st_size:
+                f.truncate(offset)
+        if missing or whole != size:
+            with open(index_path, 'ab') as f:
+                f.truncate(whole)
+                f.write(b''.join(missing))
+
+    def _entries(self, segment):
+        """The index entries of a segment, as (id, offset, length, a, b) tuples."""
+        index_path = _index_path(self._segments[segment])
+        if not os.path.exists(index_path):
+            return iter(())
+        with open(index_path, 'rb') as f:
+            data = f.read()
+        return ENTRY.iter_unpack(data[:len(data) - len(data) % ENTRY.size])
+
+    def _user_positions(self, segment):
+        """{user id: array('q') of offset, length} for an alarm segment, loaded on first use."""
+        with self._lock:
+            users = self._loaded.get(segment)
+            if users is not None:
+                self._loaded.move_to_end(segment)
+                return users
+            users = {}
+            for _, offset, length, a, b in self._entries(segment):
+                _index_user(users, offset, length, a, b)
+            self._loaded[segment] = users
+            while len(self._loaded) > self.CACHED_SEGMENTS:
+                self._loaded.popitem(last=False)
+            return users
+
+    def contains(self, table, record_id):
+        """Whether a record is in one of the table's two newest segments."""
+        return any(record_id in ids for ids in self._recent[table].values())
+
+    def count(self, table):
+        """Records archived in a table (the first call reads every index of the table)."""
+        with self._lock:
+            if self._counts is None:
+                self._counts = {t: 0 for t in TABLES}
+                for segment, path in enumerate(self._segments):
+                    previous = None
+                    for record_id, offset, _, _, _ in self._entries(segment):
+                        # A group alarm's entries are consecutive and share a line
+                        if (record_id, offset) != previous:
+                            self._counts[self._table(path)] += 1
+                            previous = (record_id, offset)
+            return self._counts[table]
+
+    # ============================
+    # ✍️ APPEND
+    # ============================
+
+    def add(self, records):
+        """
+        Append (table, record) pairs, durably, to today's segments. Records
+        already archived or not archivable() are skipped. Returns the number
+        of records appended.
+        """
+        today = date.today().isoformat()
+        appended = 0
+        with self._lock:
+            groups = {}
+            for table, record in records:
+                if archivable(table, record) and not self.contains(table, record['id']):
+                    groups.setdefault(table, {})[record['id']] = record  # last copy wins
+            for table, group in groups.items():
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"{table}-{today}.ndjson")
+                segment = self._segment_number(table, path)
+                lines = [(_encode(record) + "\n").encode() for record in group.values()]
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(b''.join(lines))
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                entries = []
+                for record, line in zip(group.values(), lines):
+                    for a, b in _participants(table, record):
+                        entries.append((record['id'], offset, len(line) - 1, a, b))
+                    offset += len(line)
+                with open(_index_path(path), 'ab') as f:
+                    f.write(b''.join(ENTRY.pack(*entry) for entry in entries))
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+
+                recent = self._recent[table]
+                if segment not in recent:
+                    for older in list(recent)[:-1]:
+                        del recent[older]
+                    recent[segment] = set()
+                recent[segment].update(group)
+                users = self._loaded.get(segment)
+                if users is not None:
+                    for _, offset, length, a, b in entries:
+                        _index_user(users, offset, length, a, b)
+                if self._counts is not None:
+                    self._counts[table] += len(group)
+                appended += len(group)
+        return appended
+
+    # ============================
+    # 📜 HISTORY
+    # ============================
+
+    def history(self, user_id, limit, before=None):
+        """
+        One page of user_id's archived alarms, most recently archived first:
+        ([(segment, offset, length)], position to pass as `before` for the
+        next page, or None on the last page). Reads the indexes of the days
+        from `before` back until the page is full.
+        """
+        before_day, before_offset = divmod(before, POSITION) if before is not None else (None, None)
+        page = []
+        for day, segment in reversed(list(self._alarm_days)):
+            if before_day is not None and day > before_day:
+                continue
+            positions = self._user_positions(segment).get(user_id)
+            if positions is None:
+                continue
+            for i in range(len(positions) - 2, -1, -2):
+                offset = positions[i]
+                if day == before_day and offset >= before_offset:
+                    continue
+                if len(page) == limit:
+                    last_segment, last_offset, _ = page[-1]
+                    return page, self._position(last_segment, last_offset)
+                page.append((segment, offset, positions[i + 1]))
+        return page, None
+
+    def _position(self, segment, offset):
+        day = date.fromisoformat(_SEGMENT.fullmatch(os.path.basename(self._segments[segment])).group(2))
+        return day.toordinal() * POSITION + offset
+
+    def records(self, table):
+        """Every archived record of a table, parsed, in archive order."""
+        for path in list(self._segments):
+            if self._table(path) == table:
+                with open(path, 'rb') as f:
+                    for line in f:
+                        if line.endswith(b"\n"):  # skip an append still in flight
+                            yield json.loads(line)
+
+    def read(self, page):
+        """The raw JSON line (bytes, no newline) of each page entry."""
+        for segment, offset, length in page:
+            fd = self._files.get(segment)
+            if fd is None:
+                with self._lock:
+                    fd = self._files.get(segment)
+                    if fd is None:
+                        fd = self._files[segment] = os.open(self._segments[segment], os.O_RDONLY)
+            yield os.pread(fd, length, offset)
+
+    def close(self):
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
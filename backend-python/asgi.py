@@ -0,0 +1,450 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import asyncio
+import io
+import os
+import re
+import resource
+import sys
+from urllib.parse import unquote
+
+from app import app as flask_app, events
+
+# ============================
+# ⚡ ASYNCIO SERVING MODE
+# ============================
+#
+#   python asgi.py              built-in asyncio HTTP/1.1 server on $PORT
+#   uvicorn asgi:application    or any other ASGI server
+#
+# Same routes and JSON as app.py, because every route except the live event
+# stream is the Flask app itself, run to completion on a worker thread
+# (WAKEY_ASGI_WORKERS of them): handlers, locks and blocking persistence
+# (save_db, journal appends, SQLite) stay off the event loop. The event
+# stream (/api/events/<id>) is served on the loop from an
+# AsyncSubscription, so an open stream, like an idle keep-alive
+# connection, costs a coroutine and a socket instead of a thread. Its
+# request still goes through Flask once first, so authentication,
+# admission, capture, metrics and CORS apply to it as under app.py.
+
+WORKERS = int(os.environ.get('WAKEY_ASGI_WORKERS', 32))
+KEEPALIVE_TIMEOUT = float(os.environ.get('WAKEY_ASGI_KEEPALIVE', 120))  # seconds an idle connection stays open
+BODY_TIMEOUT = float(os.environ.get('WAKEY_ASGI_BODY_TIMEOUT', 30))  # seconds to receive a whole request body
+MAX_HEAD = 64 * 1024
+MAX_BODY = 10 * 1024 * 1024
+EAGER_BODY = 256 * 1024  # response bytes read in the first worker hop; the rest streams
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='wakey-asgi')
+
+EVENTS_ROUTE = re.compile(r'/api/events/(\d+)')
+
+# ============================
+# 🔁 WSGI BRIDGE
+# ============================
+
+def _environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    for name, value in scope['headers']:
+        if name in (b'content-length', b'transfer-encoding'):
+            continue  # framing of the wire, not of wsgi.input: the body is already whole
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_wsgi(environ):
+    """
+    Run the Flask app for one request on a worker thread: (status, headers,
+    body so far, rest). Small responses come back whole (rest is None);
+    streamed ones (NDJSON export, /api/debug) leave an iterator to drain.
+    """
+    response = []
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response[:] = [int(status.split(' ', 1)[0]), headers]
+        return chunks.append
+
+    result = flask_app(environ, start_response)
+    rest = iter(result)
+    size = 0
+    try:
+        for chunk in rest:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= EAGER_BODY:
+                break
+        else:
+            rest = None
+    finally:
+        if rest is None and hasattr(result, 'close'):
+            result.close()
+    status, headers = response
+    headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+    return status, headers, b''.join(chunks), rest and (rest, result)
+
+
+def _next_chunk(rest):
+    """The next body chunk of a streamed response, or None (and the response closed) at its end."""
+    iterator, result = rest
+    for chunk in iterator:
+        if chunk:
+            return chunk
+    if hasattr(result, 'close'):
+        result.close()
+    return None
+
+
+async def _read_body(receive):
+    """The whole request body, or None if the client went away first."""
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+# ============================
+# 📡 LIVE EVENTS
+# ============================
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _stream_events(user_id, scope, receive, send):
+    # Flask runs the request hooks and either refuses the request or
+    # answers with the stream's headers (app.stream_events)
+    environ = _environ(scope, b'')
+    environ['wakey.native_stream'] = True
+    loop = asyncio.get_running_loop()
+    status, headers, content, _ = await loop.run_in_executor(executor, _call_wsgi, environ)
+    if status != 200:
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+        return
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(name, value) for name, value in headers if name != b'content-length']})
+    if scope['method'] == 'HEAD':
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    sub = events.subscribe(user_id, loop=loop)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    disconnected.add_done_callback(lambda _: sub.close())
+    try:
+        async for frame in events.astream(sub):
+            await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+
+# ============================
+# 🚪 ASGI APPLICATION
+# ============================
+
+async def application(scope, receive, send):
+    """ASGI 3 entry point for the whole API."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    match = EVENTS_ROUTE.fullmatch(scope['path'])
+    if match and scope['method'] in ('GET', 'HEAD'):
+        await _stream_events(int(match.group(1)), scope, receive, send)
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    status, headers, content, rest = await loop.run_in_executor(executor, _call_wsgi, _environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    if rest is None:
+        await send({'type': 'http.response.body', 'body': content})
+        return
+    # One worker hop per chunk; send() waits for the client to take each one
+    finished = False
+    try:
+        await send({'type': 'http.response.body', 'body': content, 'more_body': True})
+        while (chunk := await loop.run_in_executor(executor, _next_chunk, rest)) is not None:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finished = True
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if not finished and hasattr(rest[1], 'close'):
+            rest[1].close()  # client went away mid-stream
+
+# ============================
+# 🌐 BUILT-IN SERVER
+# ============================
+
+class _Responder:
+    """ASGI send() for one request on a connection: Content-Length or chunked framing."""
+
+    def __init__(self, writer, head_only, keep_alive):
+        self.writer = writer
+        self.head_only = head_only
+        self.keep_alive = keep_alive
+        self.status = None
+        self.headers = None
+        self.chunked = False
+        self.started = False
+        self.complete = False
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status, self.headers = message['status'], list(message.get('headers', []))
+            return
+        body = message.get('body', b'')
+        more = message.get('more_body', False)
+        if not self.started:
+            self.started = True
+            names = {name.lower() for name, _ in self.headers}
+            if b'content-length' not in names:
+                if more:
+                    self.chunked = True
+                    self.headers.append((b'transfer-encoding', b'chunked'))
+                elif not self.head_only:
+                    self.headers.append((b'content-length', str(len(body)).encode()))
+            if not self.keep_alive:
+                self.headers.append((b'connection', b'close'))
+            try:
+                reason = HTTPStatus(self.status).phrase
+            except ValueError:
+                reason = ''
+            head = [f"HTTP/1.1 {self.status} {reason}\r\n".encode()]
+            head += [name + b': ' + value + b'\r\n' for name, value in self.headers]
+            self.writer.write(b''.join(head) + b'\r\n')
+        if not self.head_only:
+            if self.chunked:
+                if body:
+                    self.writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+                if not more:
+                    self.writer.write(b'0\r\n\r\n')
+            else:
+                self.writer.write(body)
+        if not more:
+            self.complete = True
+        await self.writer.drain()
+
+
+class _BadRequest(Exception):
+    """A request the built-in server answers with `status` and closes."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+CHUNK_SIZE = re.compile(rb'[0-9A-Fa-f]{1,16}')
+DIGITS = re.compile(rb'[0-9]{1,19}')
+
+
+async def _read_line(reader):
+    try:
+        return (await reader.readuntil(b'\r\n'))[:-2]
+    except asyncio.LimitOverrunError:
+        raise _BadRequest(400, "line too long")
+
+
+async def _read_chunked(reader):
+    """A chunked body; trailer fields are read and dropped."""
+    body = bytearray()
+    while True:
+        size = (await _read_line(reader)).split(b';', 1)[0].strip()
+        if not CHUNK_SIZE.fullmatch(size):
+            raise _BadRequest(400, "malformed chunk size")
+        size = int(size, 16)
+        if size == 0:
+            break
+        if len(body) + size > MAX_BODY:
+            raise _BadRequest(413, "request body too large")
+        body += await reader.readexactly(size)
+        if await reader.readexactly(2) != b'\r\n':
+            raise _BadRequest(400, "malformed chunk")
+    trailer = 0
+    while line := await _read_line(reader):
+        trailer += len(line)
+        if trailer > MAX_HEAD:
+            raise _BadRequest(431, "request trailers too large")
+    return bytes(body)
+
+
+def _fields(headers):
+    """Header name -> value, repeated fields joined with ", " as RFC 9110 allows."""
+    fields = {}
+    for name, value in headers:
+        fields[name] = fields[name] + b', ' + value if name in fields else value
+    return fields
+
+
+async def _read_framed_body(reader, fields):
+    """
+    The request body as framed by the headers. Refuses what a proxy in
+    front could frame differently (request smuggling): Content-Length with
+    Transfer-Encoding, conflicting lengths, and codings other than chunked.
+    """
+    coding = fields.get(b'transfer-encoding')
+    length = fields.get(b'content-length')
+    if coding is not None:
+        if length is not None:
+            raise _BadRequest(400, "both Content-Length and Transfer-Encoding")
+        if coding.strip().lower() != b'chunked':
+            raise _BadRequest(501, "unsupported transfer coding")
+        return await _read_chunked(reader)
+    if length is None:
+        return b''
+    lengths = {value.strip() for value in length.split(b',')}
+    if len(lengths) != 1 or not DIGITS.fullmatch(next(iter(lengths))):
+        raise _BadRequest(400, "invalid Content-Length")
+    length = int(lengths.pop())
+    if length > MAX_BODY:
+        raise _BadRequest(413, "request body too large")
+    return await reader.readexactly(length) if length else b''
+
+
+async def _reply(writer, status, message):
+    body = message.encode()
+    writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\ncontent-type: text/plain\r\n"
+                 f"content-length: {len(body)}\r\nconnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+
+async def _handle_connection(reader, writer):
+    """Serve requests on one connection until it closes or goes idle."""
+    client = writer.get_extra_info('peername')
+    server = writer.get_extra_info('sockname')
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+            except asyncio.LimitOverrunError:
+                await _reply(writer, 431, "request head too large")
+                return
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                return
+            request_line, *header_lines = head[:-4].split(b'\r\n')
+            try:
+                method, target, version = request_line.decode('latin-1').split(' ')
+                headers = []
+                for line in header_lines:
+                    name, value = line.split(b':', 1)
+                    if name != name.strip():
+                        raise ValueError("whitespace around a field name")
+                    headers.append((name.lower(), value.strip()))
+            except ValueError:
+                await _reply(writer, 400, "malformed request")
+                return
+            fields = _fields(headers)
+            http_version = version.partition('/')[2] or '1.0'
+            tokens = {token.strip() for token in fields.get(b'connection', b'').lower().split(b',')}
+            keep_alive = b'close' not in tokens if http_version == '1.1' else b'keep-alive' in tokens
+            try:
+                body = await asyncio.wait_for(_read_framed_body(reader, fields), BODY_TIMEOUT)
+            except _BadRequest as e:
+                await _reply(writer, e.status, str(e))
+                return
+            except asyncio.TimeoutError:
+                await _reply(writer, 408, "request body timed out")
+                return
+
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0', 'spec_version': '2.3'},
+                'http_version': http_version,
+                'method': method.upper(),
+                'scheme': 'http',
+                'path': unquote(path),
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'root_path': '',
+                'headers': headers,
+                'client': client[:2] if client else None,
+                'server': server[:2] if server else None,
+            }
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                # Asking for more means waiting for the client to go away
+                while await reader.read(65536):
+                    pass
+                return {'type': 'http.disconnect'}
+
+            responder = _Responder(writer, scope['method'] == 'HEAD', keep_alive)
+            try:
+                await application(scope, receive, responder.send)
+            except Exception as e:
+                if not responder.started:
+                    await _reply(writer, 500, "internal server error")
+                print(f"⚠️  Warning: {method} {path} failed: {e!r}")
+                return
+            if not (responder.complete and keep_alive):
+                return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def serve(host='0.0.0.0', port=3001):
+    """Run the built-in server until interrupted."""
+    # Every open connection is a file descriptor
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    async def main():
+        server = await asyncio.start_server(_handle_connection, host, port, limit=MAX_HEAD, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    print("🚀 Wakey API v3.0 - asyncio mode")
+    print("=" * 50)
+    serve(port=int(os.environ.get('PORT', 3001)))
@@ -0,0 +1,19 @@
+"""
+Benchmark and load-test tooling; run each module from backend-python/ with
+`python -m bench.<name> --help`.
+
+generate     synthetic data.json datasets (power-law friendships, clustered alarms)
+driver       per-route throughput and p50/p95/p99, in-process or against --url
+micro        load_db / save_db / Store build and WakeyAgent micro-benchmarks
+agent_bench  WakeyAgent per-call vs process_events()
+stress       concurrency invariants under many threads
+startup      cold start with data.json vs the binary snapshot
+memory       Store memory per record, plain dicts vs compact records
+snooze_stats incremental snooze stats vs a rebuild from history, read cost
+suggestions  friend-of-friend suggestions on a power-law graph, cold vs cached
+serving      app.py (threaded WSGI) vs asgi.py (asyncio): idle streams held, req/s
+export       streamed /api/debug and NDJSON export vs jsonify, import memory
+replay       re-drive a WAKEY_CAPTURE log against a fresh app; diff two runs per route
+admission    well-behaved users vs hammering clients at an alarm peak, admission off and on
+group_alarms one group alarm vs pairwise alarms: journal writes and latency per member action
+"""
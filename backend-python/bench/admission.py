@@ -0,0 +1,127 @@
+"""
+Alarm-peak load shedding: well-behaved users' latency while a few clients hammer.
+
+Loads the app in-process twice, without and with WAKEY_ADMISSION=1, and
+runs the same peak for --duration seconds. --hammers users each send
+snoozes, alarm lists and searches back to back over --connections
+parallel connections, retrying a 429 after --retry-delay instead of
+waiting Retry-After. Every request carries the acting user's session
+token. --users threads act as a different user on every request,
+each sending one every --think seconds. Persistence is the default full
+snapshot per mutation, so the hammering snoozes are what everyone else
+queues behind.
+
+Reports each side's per-route count and p50/p95/p99, and what admission
+control shed.
+
+Run from backend-python/:  python -m bench.admission [--hammers 4] [--connections 4] [--users 16]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit, load_app, summarize
+
+ROUTES = ('snooze', 'alarms', 'search')
+
+
+def request_for(route, alarm, rng):
+    """(method, path, json body) for one request by alarm['user1Id']."""
+    user_id = alarm['user1Id']
+    if route == 'snooze':
+        return 'POST', '/api/agent/snooze', {'alarmId': alarm['id'], 'userId': user_id}
+    if route == 'alarms':
+        return 'GET', f'/api/alarms/{user_id}', None
+    return 'GET', f"/api/users/search?query={rng.choice('aeiou')}&currentUserId={user_id}", None
+
+
+def peak(app, alarms, hammers, connections, users, duration, think, retry_delay, seed):
+    tokens = {alarm['user1Id']: app.sessions.issue(alarm['user1Id']) for alarm in alarms}
+    deadline = time.perf_counter() + duration
+    results = {'hammer': [], 'user': []}  # per thread: ({route: [seconds]}, {route: 429s})
+
+    def client_thread(kind, index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.app.test_client()
+        latencies = {route: [] for route in ROUTES}
+        refused = dict.fromkeys(ROUTES, 0)
+        results[kind].append((latencies, refused))
+        own_alarm = alarms[index // connections]
+        while time.perf_counter() < deadline:
+            route = rng.choice(ROUTES)
+            alarm = own_alarm if kind == 'hammer' else rng.choice(alarms)
+            method, path, body = request_for(route, alarm, rng)
+            # Admission buckets are per session user; without a token every thread shares one address
+            headers = {'Authorization': f"Bearer {tokens[alarm['user1Id']]}"}
+            started = time.perf_counter()
+            status = client.open(path, method=method, json=body, headers=headers).status_code
+            latencies[route].append(time.perf_counter() - started)
+            if status == 429:
+                refused[route] += 1
+            if kind == 'user':
+                time.sleep(think)
+            elif status == 429:
+                time.sleep(retry_delay)
+
+    threads = [threading.Thread(target=client_thread, args=('hammer', i)) for i in range(hammers * connections)]
+    threads += [threading.Thread(target=client_thread, args=('user', hammers * connections + i)) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = {}
+    for kind, per_thread in results.items():
+        report[kind] = {route: {**summarize([s for latencies, _ in per_thread for s in latencies[route]]),
+                                'refused': sum(refused[route] for _, refused in per_thread)}
+                        for route in ROUTES}
+    report['admission'] = app.admission.stats() if app.admission else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset-users', type=int, default=1000, help='size of the generated dataset')
+    parser.add_argument('--hammers', type=int, default=4, help='misbehaving users')
+    parser.add_argument('--connections', type=int, default=4, help='parallel connections per misbehaving user')
+    parser.add_argument('--users', type=int, default=16, help='well-behaved user threads')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--think', type=float, default=1.0, help="seconds between a user thread's requests")
+    parser.add_argument('--retry-delay', type=float, default=0.05, help='seconds a hammer waits after a 429')
+    parser.add_argument('--max-inflight', type=int, default=16, help='WAKEY_ADMISSION_MAX_INFLIGHT')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    os.environ['WAKEY_ADMISSION_MAX_INFLIGHT'] = str(args.max_inflight)
+    results = {}
+    for mode in ('off', 'on'):
+        os.environ['WAKEY_ADMISSION'] = '1' if mode == 'on' else '0'
+        workdir = tempfile.mkdtemp(prefix='wakey-admission-')
+        try:
+            dataset = os.path.join(workdir, 'dataset.json')
+            generate(dataset, users=args.dataset_users, seed=args.seed)
+            with open(dataset) as f:
+                db = json.load(f)
+            app = load_app(workdir, dataset)
+            alarms = [a for a in db['alarms'] if a.get('isActive', True)]
+            random.Random(args.seed).shuffle(alarms)
+            results[mode] = peak(app, alarms, args.hammers, args.connections, args.users,
+                                 args.duration, args.think, args.retry_delay, args.seed)
+        finally:
+            os.chdir(BACKEND_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({'benchmark': 'admission', 'hammers': args.hammers, 'connections': args.connections,
+          'users': args.users, 'maxInflight': args.max_inflight, 'durationSeconds': args.duration,
+          'results': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
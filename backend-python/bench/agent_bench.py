@@ -0,0 +1,83 @@
+"""
+WakeyAgent throughput: the per-call methods vs process_events().
+
+Builds a reproducible stream of snooze/acknowledge/cancel events over a set
+of alarms, runs it through both paths with the same seed, checks that the
+alarms and messages come out identical, and prints events/sec as JSON.
+
+Run from backend-python/:  python -m bench.agent_bench [--events 200000] [--alarms 5000]
+"""
+import argparse
+import copy
+import json
+import random
+import sys
+import time
+
+from agent import WakeyAgent
+
+
+def make_workload(alarm_count, event_count, seed=1):
+    rng = random.Random(seed)
+    alarms = []
+    for alarm_id in range(1, alarm_count + 1):
+        alarms.append({
+            'id': alarm_id, 'user1Id': 2 * alarm_id, 'user2Id': 2 * alarm_id + 1,
+            'tone': rng.choice([None, None, None, 'soft', 'playful', 'strict']),
+            'isActive': True, 'snoozeCount': {}, 'acknowledged': [], 'cancelledBy': None
+        })
+    # Mostly snoozes, like a real morning; indexes into `alarms`
+    actions = ['snooze'] * 8 + ['acknowledge'] * 3 + ['cancel']
+    events = []
+    for _ in range(event_count):
+        i = rng.randrange(alarm_count)
+        events.append((i, alarms[i]['user1Id'] + rng.randrange(2), rng.choice(actions)))
+    return alarms, events
+
+
+def run_per_call(alarms, events, seed):
+    agent = WakeyAgent(rng=random.Random(seed))
+    handlers = {'snooze': agent.snooze_alarm, 'acknowledge': agent.acknowledge_alarm, 'cancel': agent.cancel_alarm}
+    messages = []
+    started = time.perf_counter()
+    for i, user_id, action in events:
+        alarm = handlers[action](alarms[i], user_id)
+        messages.append(alarm['agentMessage'])
+    return time.perf_counter() - started, messages
+
+
+def run_batch(alarms, events, seed):
+    agent = WakeyAgent(rng=random.Random(seed))
+    stream = [(alarms[i], user_id, action) for i, user_id, action in events]
+    started = time.perf_counter()
+    results = agent.process_events(stream)
+    elapsed = time.perf_counter() - started
+    return elapsed, [message for message, _, _ in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--alarms', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    alarms, events = make_workload(args.alarms, args.events)
+    per_call_alarms, batch_alarms = copy.deepcopy(alarms), copy.deepcopy(alarms)
+
+    per_call_time, per_call_messages = run_per_call(per_call_alarms, events, args.seed)
+    batch_time, batch_messages = run_batch(batch_alarms, events, args.seed)
+    identical = per_call_alarms == batch_alarms and per_call_messages == batch_messages
+
+    print(json.dumps({
+        'events': args.events,
+        'perCallEventsPerSec': round(args.events / per_call_time),
+        'batchEventsPerSec': round(args.events / batch_time),
+        'speedup': round(per_call_time / batch_time, 2),
+        'identical': identical
+    }))
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == '__main__':
+    main()
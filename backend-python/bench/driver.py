@@ -0,0 +1,179 @@
+"""
+HTTP load driver for the Wakey API.
+
+Runs a weighted mix of real routes (login, search, friend and alarm lists,
+agent actions, ...) from N threads for a fixed time, either against the Flask
+app in-process (test client, dataset copied to a temp dir) or against a
+running server with --url. Ids and usernames are sampled from the dataset,
+so with --url it must be the dataset the server was started on.
+
+Reports per-route throughput, error count and p50/p95/p99 latency as JSON.
+
+Run from backend-python/:
+  python -m bench.driver --users 10000 --duration 10 --concurrency 8
+  python -m bench.driver --dataset data.json --url http://localhost:5000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit, load_app, summarize
+
+
+class Workload:
+    """Request factories for each route, sampling ids from a dataset."""
+
+    # route name -> weight in the mix
+    MIX = {
+        'login': 15, 'search_users': 15, 'get_friends': 15, 'get_friend_requests': 5,
+        'get_alarms': 20, 'agent_snooze': 15, 'agent_acknowledge': 4, 'agent_cancel': 1,
+        'create_alarm': 5, 'friend_request': 5,
+    }
+
+    def __init__(self, db):
+        self.users = [(u['id'], u['username'], u['password']) for u in db['users']]
+        self.friendships = [(f['user1Id'], f['user2Id']) for f in db['friendships']]
+        self.alarms = [(a['id'], a['user1Id'], a['user2Id']) for a in db['alarms'] if a.get('isActive', True)]
+
+    def request(self, route, rng):
+        """(method, path, json body or None) for one request to `route`."""
+        if route == 'login':
+            _, username, password = rng.choice(self.users)
+            return 'POST', '/api/login', {'username': username, 'password': password}
+        if route == 'search_users':
+            user_id, username, _ = rng.choice(self.users)
+            start = rng.randrange(max(len(username) - 3, 1))
+            query = username[start:start + rng.randint(2, 5)]
+            return 'GET', f'/api/users/search?query={quote(query)}&currentUserId={user_id}', None
+        if route in ('get_friends', 'get_friend_requests', 'get_alarms'):
+            user_id = rng.choice(self.users)[0]
+            prefix = {'get_friends': 'friends', 'get_friend_requests': 'friends/requests', 'get_alarms': 'alarms'}
+            return 'GET', f'/api/{prefix[route]}/{user_id}', None
+        if route.startswith('agent_'):
+            alarm_id, user1, user2 = rng.choice(self.alarms)
+            return 'POST', f"/api/agent/{route[len('agent_'):]}", {'alarmId': alarm_id, 'userId': rng.choice((user1, user2))}
+        if route == 'create_alarm':
+            user_id, friend_id = rng.choice(self.friendships)
+            return 'POST', '/api/alarms', {'userId': user_id, 'friendId': friend_id,
+                                           'time': f"{rng.randrange(5, 10):02d}:{rng.choice((0, 15, 30, 45)):02d}"}
+        if route == 'friend_request':
+            return 'POST', '/api/friends/request', {'fromUserId': rng.choice(self.users)[0],
+                                                    'toUserId': rng.choice(self.users)[0]}
+        raise ValueError(f"Unknown route: {route}")
+
+
+class InProcessClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def send(self, method, path, body):
+        return self.client.open(path, method=method, json=body).status_code
+
+
+class HttpClient:
+    """One keep-alive connection per thread; http.client reopens it if the server closes it."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def send(self, method, path, body):
+        payload = None if body is None else json.dumps(body)
+        headers = {} if body is None else {'Content-Type': 'application/json'}
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+
+
+def run(workload, make_client, concurrency, duration, seed):
+    routes, weights = list(Workload.MIX), list(Workload.MIX.values())
+    deadline = time.perf_counter() + duration
+    per_thread = []
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = make_client()
+        latencies = {route: [] for route in routes}
+        errors = dict.fromkeys(routes, 0)
+        per_thread.append((latencies, errors))
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            method, path, body = workload.request(route, rng)
+            started = time.perf_counter()
+            try:
+                status = client.send(method, path, body)
+            except Exception:
+                status = None
+            latencies[route].append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors[route] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for route in routes:
+        samples = [s for latencies, _ in per_thread for s in latencies[route]]
+        report[route] = {**summarize(samples), 'errors': sum(errors[route] for _, errors in per_thread),
+                         'perSec': round(len(samples) / elapsed, 1)}
+    total = sum(r['count'] for r in report.values())
+    return {'seconds': round(elapsed, 2), 'requests': total, 'perSec': round(total / elapsed, 1), 'routes': report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', help='data.json to load (default: generate one with --users)')
+    parser.add_argument('--users', type=int, default=10000, help='size of the generated dataset')
+    parser.add_argument('--url', help='target a running server instead of an in-process app')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='wakey-bench-')
+    try:
+        dataset = os.path.abspath(args.dataset) if args.dataset else os.path.join(workdir, 'dataset.json')
+        if not args.dataset:
+            generate(dataset, users=args.users, seed=args.seed)
+        with open(dataset) as f:
+            workload = Workload(json.load(f))
+
+        if args.url:
+            make_client = lambda: HttpClient(args.url)
+        else:
+            flask_app = load_app(workdir, dataset).app
+            make_client = lambda: InProcessClient(flask_app)
+
+        result = run(workload, make_client, args.concurrency, args.duration, args.seed)
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({
+        'benchmark': 'driver', 'mode': 'http' if args.url else 'in-process', 'target': args.url,
+        'dataset': args.dataset or f"generated:{args.users}", 'concurrency': args.concurrency,
+        'env': {k: v for k, v in os.environ.items() if k.startswith('WAKEY_')}, **result
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Dump and import memory: streamed NDJSON/JSON vs building the whole response.
+
+For each dataset size, generates a dataset, loads the app in-process and
+measures the time and, in a second traced run, the Python heap peak
+(tracemalloc, over what is already resident) of: the old /api/debug body
+(jsonify(store.to_dict())), the streamed /api/debug and /api/export
+responses (consumed chunk by chunk, as a socket would), and importing the
+export with ndjson.Importer into a fresh data.json and SQLite file. Flat streaming peaks across sizes are the
+point; the jsonify peak grows with the data. Each import is also checked to
+reproduce the store exactly.
+
+Run from backend-python/:  python -m bench.export [--sizes 20000,100000]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from bench.generate import generate
+from bench.harness import emit, load_app
+
+
+def measure(run):
+    """(result, stats) of run(): timed once as is, then again under tracemalloc for the heap peak."""
+    started = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    run()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return result, {'seconds': round(seconds, 3), 'peakMb': round(peak / 2 ** 20, 2)}
+
+
+def consume(client, url):
+    """Bytes of a streamed response, read a chunk at a time."""
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def run_size(users, workdir, seed):
+    dataset = os.path.join(workdir, 'dataset.json')
+    generate(dataset, users=users, friendships_per_user=5, alarms_per_user=2, seed=seed)
+    app = load_app(workdir, dataset)
+    import ndjson
+    from sqlite_store import SqliteStore
+    client = app.app.test_client()
+    expected = {table: sorted(r['id'] for r in records) for table, records in app.store.to_dict().items()}
+    report = {'users': users, 'records': sum(map(len, expected.values()))}
+
+    def jsonify_all():
+        with app.app.app_context():
+            return len(app.jsonify(app.store.to_dict()).get_data())
+
+    size, report['debugJsonify'] = measure(jsonify_all)
+    report['debugJsonify']['bytes'] = size
+    size, report['debugStreamed'] = measure(lambda: consume(client, '/api/debug'))
+    report['debugStreamed']['bytes'] = size
+    size, report['exportStreamed'] = measure(lambda: consume(client, '/api/export'))
+    report['exportStreamed']['bytes'] = size
+
+    dump = os.path.join(workdir, 'dump.ndjson')
+    with open(dump, 'w') as f:
+        for chunk in ndjson.export_chunks(app.store):
+            f.write(chunk)
+
+    def import_into(target):
+        importer = ndjson.Importer(target)
+        with open(dump) as f:
+            importer.feed_lines(f)
+        return importer.finish()
+
+    json_path = os.path.join(workdir, 'imported.json')
+
+    def import_json():
+        writer = ndjson.SnapshotWriter(json_path)
+        result = import_into(writer)
+        writer.close()
+        return result
+
+    result, report['importJson'] = measure(import_json)
+    with open(json_path) as f:
+        imported = {table: sorted(r['id'] for r in records) for table, records in json.load(f).items()}
+    report['importJson']['rejected'] = result['rejected']
+    report['importJson']['matches'] = imported == expected
+
+    sqlite = SqliteStore(os.path.join(workdir, 'imported.db'))
+
+    def import_sqlite():
+        sqlite.load({})
+        return import_into(sqlite)
+
+    result, report['importSqlite'] = measure(import_sqlite)
+    imported = {table: sorted(r['id'] for r in records) for table, records in sqlite.to_dict().items()}
+    report['importSqlite']['rejected'] = result['rejected']
+    report['importSqlite']['matches'] = imported == expected
+    for stage in ('importJson', 'importSqlite'):
+        report[stage]['recordsPerSecond'] = round(report['records'] / report[stage]['seconds'])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='20000,100000', help='user counts, comma separated')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    os.environ.setdefault('WAKEY_PERSISTENCE', 'journal')  # snapshot saves would dominate
+    os.environ['WAKEY_EXPORT'] = '1'
+    cwd = os.getcwd()
+    results = []
+    for users in map(int, args.sizes.split(',')):
+        workdir = tempfile.mkdtemp(prefix='wakey-export-')
+        try:
+            results.append(run_size(users, workdir, args.seed))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({'benchmark': 'export', 'results': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
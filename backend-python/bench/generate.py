@@ -0,0 +1,167 @@
+"""
+Synthetic data.json generator.
+
+Produces data.json-compatible datasets of any size (10k-1M users is the
+intended range). Friendships form a power-law graph: each new user befriends
+`--friendships-per-user` existing users picked in proportion to how many
+friends they already have (preferential attachment). Alarms sit on real
+friendships and cluster on popular minutes (07:00, 06:30, ...). Records are
+streamed to disk, so memory stays at a few integer arrays, not 1M dicts.
+
+Run from backend-python/:  python -m bench.generate --users 100000 --out /tmp/wakey-100k.json
+"""
+from array import array
+from datetime import datetime, timedelta
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+
+FIRST = ['sunny', 'early', 'sleepy', 'brave', 'lazy', 'cosmic', 'quiet', 'rapid', 'golden', 'misty',
+         'lucky', 'wild', 'calm', 'happy', 'night', 'dawn', 'snooze', 'bright', 'tiny', 'mega']
+SECOND = ['owl', 'lark', 'fox', 'bear', 'panda', 'tiger', 'robin', 'otter', 'koala', 'wolf',
+          'sloth', 'eagle', 'cat', 'rooster', 'seal', 'hawk', 'moose', 'lynx', 'crane', 'bee']
+LABELS = ['Wake up!', 'Gym', 'Study Session', 'Work', 'Morning run', 'Class', 'Flight', 'Meditate']
+SOUNDS = ['baddie', 'manifestation', 'getshitdone']
+TONES = [None] * 7 + ['soft', 'playful', 'strict']
+
+# Minute of day -> weight; everything else comes from a spread around 07:00
+POPULAR_MINUTES = {
+    6 * 60: 14, 6 * 60 + 30: 12, 7 * 60: 20, 7 * 60 + 15: 6, 7 * 60 + 30: 14,
+    8 * 60: 12, 5 * 60 + 45: 4, 6 * 60 + 45: 6, 8 * 60 + 30: 6, 9 * 60: 6,
+}
+POPULAR_SHARE = 0.75
+_POPULAR = list(POPULAR_MINUTES)
+_POPULAR_CUM_WEIGHTS = list(itertools.accumulate(POPULAR_MINUTES.values()))
+
+# createdAt values fall on one of these days
+DAYS = [(datetime(2025, 12, 1) + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(60)]
+
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def _timestamp(rng):
+    seconds = rng.randrange(86400)
+    return f"{rng.choice(DAYS)}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.000Z"
+
+
+def alarm_time(rng):
+    """HH:MM, mostly on popular minutes."""
+    if rng.random() < POPULAR_SHARE:
+        minute = rng.choices(_POPULAR, cum_weights=_POPULAR_CUM_WEIGHTS)[0]
+    else:
+        minute = min(max(int(rng.gauss(7 * 60, 75)), 0), 24 * 60 - 1)
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def friendship_graph(users, per_user, rng):
+    """
+    Preferential-attachment edges over user ids 1..users as two parallel
+    arrays (a[i], b[i]); no duplicates and no self-friendships.
+    """
+    a, b = array('l'), array('l')
+    endpoints = array('l')  # every edge end, so a uniform pick is degree-weighted
+    seed = min(per_user + 1, users)
+    for u, v in itertools.combinations(range(1, seed + 1), 2):
+        a.append(u)
+        b.append(v)
+        endpoints.extend((u, v))
+    for new in range(seed + 1, users + 1):
+        targets = set()
+        while len(targets) < min(per_user, new - 1):
+            targets.add(endpoints[rng.randrange(len(endpoints))] if endpoints else rng.randrange(1, new))
+        for target in targets:
+            a.append(new)
+            b.append(target)
+            endpoints.extend((new, target))
+    return a, b
+
+
+def _write_table(f, name, records, first=False):
+    f.write(('' if first else ',\n') + json.dumps(name) + ': [')
+    count = 0
+    for record in records:
+        f.write(('\n' if count == 0 else ',\n') + _encode(record))
+        count += 1
+    f.write('\n]')
+    return count
+
+
+def generate(path, users=10000, friendships_per_user=3, alarms_per_user=1.0, requests_per_user=0.2, seed=1):
+    """Write a dataset to `path` and return its record counts."""
+    rng = random.Random(seed)
+    a, b = friendship_graph(users, friendships_per_user, rng)
+
+    def user_records():
+        for user_id in range(1, users + 1):
+            yield {'id': user_id, 'username': f"{rng.choice(FIRST)}{rng.choice(SECOND)}{user_id}",
+                   'password': f"pw{user_id}", 'createdAt': _timestamp(rng)}
+
+    def request_records():
+        seen = set()
+        for request_id in range(1, int(users * requests_per_user) + 1):
+            while True:
+                pair = (rng.randrange(1, users + 1), rng.randrange(1, users + 1))
+                if pair[0] != pair[1] and pair not in seen and pair[::-1] not in seen:
+                    break
+            seen.add(pair)
+            yield {'id': request_id, 'fromUserId': pair[0], 'toUserId': pair[1],
+                   'status': 'pending' if rng.random() < 0.7 else 'rejected', 'createdAt': _timestamp(rng)}
+
+    def friendship_records():
+        for i in range(len(a)):
+            pair = (a[i], b[i]) if rng.random() < 0.5 else (b[i], a[i])
+            yield {'id': i + 1, 'user1Id': pair[0], 'user2Id': pair[1], 'createdAt': _timestamp(rng)}
+
+    def alarm_records():
+        alarm_count = int(users * alarms_per_user) if len(a) else 0
+        for alarm_id in range(1, alarm_count + 1):
+            i = rng.randrange(len(a))
+            user1, user2 = (a[i], b[i]) if rng.random() < 0.5 else (b[i], a[i])
+            snoozes = {str(user1): min(int(rng.expovariate(0.8)), 9), str(user2): min(int(rng.expovariate(0.8)), 9)}
+            acknowledged = [u for u in (user1, user2) if rng.random() < 0.2]
+            cancelled = rng.random() < 0.05
+            yield {
+                'id': alarm_id, 'user1Id': user1, 'user2Id': user2, 'time': alarm_time(rng),
+                'label': rng.choice(LABELS), 'sound': rng.choice(SOUNDS), 'tone': rng.choice(TONES),
+                'isActive': not cancelled and len(acknowledged) < 2, 'snoozeCount': snoozes,
+                'acknowledged': acknowledged, 'cancelledBy': user1 if cancelled else None,
+                'agentMessage': '', 'agentTone': '', 'cancelNotifyMessage': '', 'createdAt': _timestamp(rng)
+            }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', buffering=1 << 20) as f:
+        f.write('{')
+        counts = {
+            'users': _write_table(f, 'users', user_records(), first=True),
+            'friendRequests': _write_table(f, 'friendRequests', request_records()),
+            'friendships': _write_table(f, 'friendships', friendship_records()),
+            'alarms': _write_table(f, 'alarms', alarm_records()),
+        }
+        f.write('\n}\n')
+    os.replace(tmp_path, path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--friendships-per-user', type=int, default=3)
+    parser.add_argument('--alarms-per-user', type=float, default=1.0)
+    parser.add_argument('--requests-per-user', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default=None, help='default: data-<users>.json')
+    args = parser.parse_args()
+
+    out = args.out or f"data-{args.users}.json"
+    started = time.perf_counter()
+    counts = generate(out, args.users, args.friendships_per_user, args.alarms_per_user,
+                      args.requests_per_user, args.seed)
+    print(json.dumps({'path': out, 'bytes': os.path.getsize(out),
+                      'seconds': round(time.perf_counter() - started, 2), **counts}))
+
+
+if __name__ == '__main__':
+    main()
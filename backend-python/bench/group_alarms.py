@@ -0,0 +1,143 @@
+"""
+Group wake-ups: one group alarm vs the pairwise alarms it replaces.
+
+For each group size N, builds a dataset of N users who are all friends
+and loads the app in-process with journal persistence. Then plays one
+morning twice, with every member snoozing once and then acknowledging, in
+a shuffled order:
+
+  group     one /api/alarms/group alarm; each action is one agent request
+  pairwise  an alarm per pair (N(N-1)/2); each member's action is one
+            /api/batch request covering their N-1 alarms
+
+Reports the alarms stored, the records and bytes written to the journal
+per member action, and the request latency per member action. The group
+side writes one record per action whatever N is.
+
+Run from backend-python/:  python -m bench.group_alarms [--sizes 10,25,50]
+"""
+import argparse
+from datetime import datetime
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench.harness import BACKEND_DIR, emit, load_app, summarize
+
+
+def dataset(path, size):
+    """data.json with users 1..size, every pair of them friends."""
+    now = datetime(2026, 1, 5, 6, 0).isoformat()
+    pairs = itertools.combinations(range(1, size + 1), 2)
+    db = {
+        'users': [{'id': i, 'username': f"user{i}", 'password': 'x', 'createdAt': now} for i in range(1, size + 1)],
+        'friendRequests': [],
+        'friendships': [{'id': i, 'user1Id': a, 'user2Id': b, 'createdAt': now} for i, (a, b) in enumerate(pairs, 1)],
+        'alarms': [],
+    }
+    with open(path, 'w') as f:
+        json.dump(db, f)
+
+
+def count_writes(journal):
+    """Wrap journal.append to tally the records and bytes it writes."""
+    totals = {'records': 0, 'bytes': 0}
+    append = journal.append
+
+    def counting_append(changes):
+        written = append(changes)
+        totals['records'] += len(changes)
+        totals['bytes'] += written
+        return written
+    journal.append = counting_append
+    return totals
+
+
+def morning(size, seed):
+    """(user id, action) for every member: a snooze each, then an acknowledgement each, shuffled."""
+    rng = random.Random(seed)
+    snoozes = [(user_id, 'snooze') for user_id in range(1, size + 1)]
+    acks = [(user_id, 'acknowledge') for user_id in range(1, size + 1)]
+    rng.shuffle(snoozes)
+    rng.shuffle(acks)
+    return snoozes + acks
+
+
+def run_group(app, client, size, actions, writes):
+    alarm = client.post('/api/alarms/group', json={
+        'userId': 1, 'memberIds': list(range(2, size + 1)), 'time': '07:00', 'label': 'Crew'}).get_json()['alarm']
+    writes.update(records=0, bytes=0)
+    latencies = []
+    for user_id, action in actions:
+        started = time.perf_counter()
+        result = client.post(f'/api/agent/{action}', json={'alarmId': alarm['id'], 'userId': user_id}).get_json()
+        latencies.append(time.perf_counter() - started)
+        assert result['success'], result
+    final = app.store.get_alarm(alarm['id'])
+    assert not final['isActive'] and final['ackCount'] == size, final
+    return 1, latencies
+
+
+def run_pairwise(app, client, size, actions, writes):
+    alarm_ids = {}  # user id -> ids of the pair alarms they're in
+    pairs = list(itertools.combinations(range(1, size + 1), 2))
+    operations = [{'op': 'createAlarm', 'userId': a, 'friendId': b, 'time': '07:00', 'label': 'Crew'} for a, b in pairs]
+    for start in range(0, len(operations), 500):
+        results = client.post('/api/batch', json={'operations': operations[start:start + 500]}).get_json()['results']
+        for result in results:
+            alarm = result['alarm']
+            for user_id in (alarm['user1Id'], alarm['user2Id']):
+                alarm_ids.setdefault(user_id, []).append(alarm['id'])
+    writes.update(records=0, bytes=0)
+    latencies = []
+    for user_id, action in actions:
+        batch = [{'op': action, 'alarmId': alarm_id, 'userId': user_id} for alarm_id in alarm_ids[user_id]]
+        started = time.perf_counter()
+        result = client.post('/api/batch', json={'operations': batch}).get_json()
+        latencies.append(time.perf_counter() - started)
+        assert result['success'], result
+    assert not any(app.store.get_alarm(i)['isActive'] for ids in alarm_ids.values() for i in ids)
+    return len(pairs), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,25,50', help='group sizes (members, creator included), comma separated')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    os.environ['WAKEY_PERSISTENCE'] = 'journal'
+    results = []
+    for size in map(int, args.sizes.split(',')):
+        actions = morning(size, args.seed)
+        result = {'members': size, 'memberActions': len(actions)}
+        for name, run in (('group', run_group), ('pairwise', run_pairwise)):
+            workdir = tempfile.mkdtemp(prefix='wakey-group-')
+            try:
+                path = os.path.join(workdir, 'dataset.json')
+                dataset(path, size)
+                app = load_app(workdir, path)
+                writes = count_writes(app.journal)
+                alarms, latencies = run(app, app.app.test_client(), size, actions, writes)
+                app.journal.close()
+            finally:
+                os.chdir(BACKEND_DIR)
+                shutil.rmtree(workdir, ignore_errors=True)
+            result[name] = {
+                'alarms': alarms,
+                'recordsPerAction': round(writes['records'] / len(actions), 2),
+                'bytesPerAction': round(writes['bytes'] / len(actions)),
+                'latency': summarize(latencies),
+            }
+        results.append(result)
+
+    emit({'benchmark': 'group_alarms', 'results': results}, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Helpers shared by the bench scripts."""
+import importlib
+import json
+import os
+import shutil
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(workdir, dataset=None):
+    """
+    Import a fresh app module whose data.json is a copy of `dataset`
+    (default: the checked-in data.json) inside workdir.
+    """
+    shutil.copy(dataset or os.path.join(BACKEND_DIR, 'data.json'), os.path.join(workdir, 'data.json'))
+    os.chdir(workdir)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('WAKEY_SCHEDULER', '0')
+    # Re-imports happen in a process that already runs threads: no forking
+    os.environ.setdefault('WAKEY_AUTH_WORKERS', '0')
+    sys.modules.pop('app', None)
+    return importlib.import_module('app')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(seconds):
+    """Count and latency percentiles (ms) for a list of durations in seconds."""
+    values = sorted(seconds)
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        'count': len(values),
+        'p50Ms': ms(percentile(values, 0.50)),
+        'p95Ms': ms(percentile(values, 0.95)),
+        'p99Ms': ms(percentile(values, 0.99)),
+        'maxMs': ms(values[-1] if values else None),
+    }
+
+
+def emit(report, out=None):
+    """Print a report as one JSON document, and also write it to `out` if given."""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if out:
+        with open(out, 'w') as f:
+            f.write(text + "\n")
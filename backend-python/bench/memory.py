@@ -0,0 +1,106 @@
+"""
+Memory benchmark: plain dict records vs the compact records in records.py.
+
+Generates a dataset of about --records records and loads it into a Store in
+a fresh interpreter per representation (and per table, for the breakdown).
+Memory is what tracemalloc still sees allocated once the parsed data.json
+is gone, so it covers records plus the Store's secondary indexes. Each run
+also hashes the Store's to_dict() dump, so the report shows whether both
+representations serialize to identical JSON.
+
+Run from backend-python/:  python -m bench.memory [--records 1000000] [--no-tables]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit
+
+CHILD = r"""
+import gc, hashlib, json, sys, time, tracemalloc
+sys.path.insert(0, sys.argv[1])
+from journal import read_snapshot
+from store import Store
+
+path, compact, table = sys.argv[2], sys.argv[3] == '1', sys.argv[4]
+tracemalloc.start()
+db = read_snapshot(path)
+if table != 'all':
+    db = {table: db[table]}
+started = time.perf_counter()
+store = Store(db, compact=compact)
+load = time.perf_counter() - started
+del db
+gc.collect()
+retained = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+started = time.perf_counter()
+dump = store.to_dict()
+to_dict = time.perf_counter() - started
+digest = hashlib.sha256(json.dumps(dump).encode()).hexdigest() if table == 'all' else None
+print(json.dumps({'bytes': retained, 'records': sum(store.counts().values()), 'loadSec': load,
+                  'toDictSec': to_dict, 'sha256': digest}))
+"""
+
+TABLES = ('users', 'friendRequests', 'friendships', 'alarms')
+
+
+def run_child(dataset, compact, table):
+    output = subprocess.run([sys.executable, '-c', CHILD, BACKEND_DIR, dataset, '1' if compact else '0', table],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(dataset, compact, tables):
+    total = run_child(dataset, compact, 'all')
+    result = {
+        'retainedMb': round(total['bytes'] / 2 ** 20, 1),
+        'bytesPerRecord': round(total['bytes'] / max(total['records'], 1)),
+        'loadSec': round(total['loadSec'], 2),
+        'toDictSec': round(total['toDictSec'], 2),
+        'sha256': total['sha256'],
+    }
+    if tables:
+        result['bytesPerRecordByTable'] = {}
+        for table in TABLES:
+            part = run_child(dataset, compact, table)
+            result['bytesPerRecordByTable'][table] = round(part['bytes'] / max(part['records'], 1))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=1000000, help='approximate total records')
+    parser.add_argument('--no-tables', action='store_true', help='skip the per-table breakdown')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='wakey-memory-')
+    try:
+        dataset = os.path.join(workdir, 'dataset.json')
+        # generate() defaults: 3 friendships, 1 alarm and 0.2 requests per user
+        counts = generate(dataset, users=max(int(args.records / 5.2), 10), seed=args.seed)
+        plain = measure(dataset, False, not args.no_tables)
+        compact = measure(dataset, True, not args.no_tables)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({
+        'benchmark': 'memory',
+        'records': sum(counts.values()),
+        'counts': counts,
+        'plain': plain,
+        'compact': compact,
+        'identicalJson': plain['sha256'] == compact['sha256'],
+        'memoryRatio': round(plain['retainedMb'] / compact['retainedMb'], 2),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmarks for the persistence path and the agent.
+
+For each dataset size: load_db() (read + parse data.json), building the
+indexed Store, and save_db() (full snapshot write). Then WakeyAgent per-call
+methods and process_events() in operations/sec. Output is one JSON document,
+so runs can be diffed or tracked over time.
+
+Run from backend-python/:  python -m bench.micro [--sizes 10000,100000] [--repeat 3]
+"""
+import argparse
+import copy
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from bench.agent_bench import make_workload
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit, load_app
+
+
+def timed(fn, repeat):
+    """min and median wall time of `repeat` calls, in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {'minSec': round(min(samples), 4), 'medianSec': round(statistics.median(samples), 4)}
+
+
+def persistence(users, repeat, seed):
+    workdir = tempfile.mkdtemp(prefix='wakey-micro-')
+    try:
+        dataset = os.path.join(workdir, 'dataset.json')
+        counts = generate(dataset, users=users, seed=seed)
+        app_module = load_app(workdir, dataset)
+        db = app_module.load_db()
+
+        def save():
+            app_module.store.drain_changes()
+            with app_module.app.test_request_context():
+                app_module.save_db()
+
+        return {
+            'users': users, 'records': sum(counts.values()), 'bytes': os.path.getsize(dataset),
+            'load_db': timed(app_module.load_db, repeat),
+            'store_build': timed(lambda: app_module.Store(db), repeat),
+            'save_db': timed(save, repeat),
+        }
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def agent(events, seed):
+    from agent import WakeyAgent
+
+    alarms, stream = make_workload(1000, events, seed)
+    wakey = WakeyAgent(rng=random.Random(seed))
+    handlers = {'snooze': wakey.snooze_alarm, 'acknowledge': wakey.acknowledge_alarm, 'cancel': wakey.cancel_alarm}
+    report = {}
+    for action, handler in handlers.items():
+        work = copy.deepcopy(alarms)
+        calls = [(work[i], user_id) for i, user_id, a in stream if a == action]
+        started = time.perf_counter()
+        for alarm, user_id in calls:
+            handler(alarm, user_id)
+        report[f'{action}_alarm'] = {'opsPerSec': round(len(calls) / (time.perf_counter() - started))}
+
+    started = time.perf_counter()
+    for i, user_id, _ in stream:
+        wakey.get_alarm_status(alarms[i], user_id)
+    report['get_alarm_status'] = {'opsPerSec': round(len(stream) / (time.perf_counter() - started))}
+
+    work = copy.deepcopy(alarms)
+    batch = [(work[i], user_id, action) for i, user_id, action in stream]
+    started = time.perf_counter()
+    wakey.process_events(batch)
+    report['process_events'] = {'opsPerSec': round(len(batch) / (time.perf_counter() - started))}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated user counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--events', type=int, default=100000, help='agent events per benchmark')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    emit({
+        'benchmark': 'micro',
+        'persistence': [persistence(int(size), args.repeat, args.seed) for size in args.sizes.split(',')],
+        'agent': agent(args.events, args.seed),
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
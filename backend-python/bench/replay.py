@@ -0,0 +1,233 @@
+"""
+Replay captured traffic against a fresh app and compare two replays.
+
+`run` loads a data.json snapshot into an in-process app (the snapshot the
+captured server started from, so ids and logins line up), seeds
+WakeyAgent's message choice and re-sends every request of a WAKEY_CAPTURE
+log in capture order: at the original pacing (--speed scales it) or, with
+--fast, back to back. Session users are given tokens issued by the replay
+app. The report has per-route throughput and latency, statuses that differ
+from the capture, and a digest of each response with volatile fields
+(tokens, timestamps, list versions) left out.
+
+`compare` diffs two run reports: per-route throughput and p50/p95/p99
+changes, routes past --threshold percent, and responses that differ. It
+exits with status 1 if there are any, so it can gate a build. With the
+default --concurrency 1, two replays of the same build give identical
+responses; higher concurrency is closer to production load but makes the
+order of writes, and so the responses, vary.
+
+Run from backend-python/:
+  WAKEY_CAPTURE=traffic.jsonl python app.py     # on the server, then copy data.json
+  python -m bench.replay run traffic.jsonl --dataset data.json --out base.json
+  python -m bench.replay run traffic.jsonl --dataset data.json --fast --out new.json
+  python -m bench.replay compare base.json new.json --threshold 10
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench.harness import BACKEND_DIR, emit, load_app, summarize
+
+# Response fields that differ between runs of the same build
+VOLATILE = {'token', 'createdAt', 'fireAt', 'version'}
+MAX_LISTED = 20  # mismatches listed individually; the rest are only counted
+
+
+def read_capture(path):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry['t'])  # lines are written as requests finish
+    return entries
+
+
+def _strip(value):
+    if isinstance(value, dict):
+        return {k: _strip(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [_strip(v) for v in value]
+    return value
+
+
+def digest(data):
+    """Short hash of a response body, volatile JSON fields removed."""
+    try:
+        data = json.dumps(_strip(json.loads(data)), sort_keys=True).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def replay(app, entries, concurrency, speed, seed):
+    """
+    Send every entry through the test client from `concurrency` threads,
+    taking them in order. speed=None sends each as soon as a thread is
+    free; otherwise entry t is due at t / speed after the start.
+    """
+    app.agent.rng = random.Random(seed)
+    tokens = {-1: 'invalid'}
+    token_lock = threading.Lock()
+    results = [None] * len(entries)  # (status, seconds, digest)
+    behind = [0.0]
+    position = iter(range(len(entries)))
+    take = threading.Lock()
+    started = time.perf_counter()
+
+    def token_for(user_id):
+        with token_lock:
+            if user_id not in tokens:
+                tokens[user_id] = app.sessions.issue(user_id)
+            return tokens[user_id]
+
+    def worker():
+        client = app.app.test_client()
+        while True:
+            with take:
+                index = next(position, None)
+            if index is None:
+                return
+            entry = entries[index]
+            if speed is not None:
+                delay = started + entry['t'] / 1000 / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    behind[0] = max(behind[0], -delay)
+            headers = dict(entry.get('h', {}))
+            if 'u' in entry:
+                headers['Authorization'] = f"Bearer {token_for(entry['u'])}"
+            body = entry.get('b')
+            sent = time.perf_counter()
+            response = client.open(
+                entry['p'], method=entry['m'], headers=headers,
+                data=body.encode() if body is not None else None,
+                content_type=entry.get('c', 'application/json') if body is not None else None
+            )
+            data = response.get_data()
+            results[index] = (response.status_code, time.perf_counter() - sent, digest(data))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started, behind[0]
+
+
+def run(args):
+    entries = read_capture(args.capture)
+    os.environ.pop('WAKEY_CAPTURE', None)  # the replay itself isn't captured
+    workdir = tempfile.mkdtemp(prefix='wakey-replay-')
+    try:
+        app = load_app(workdir, os.path.abspath(args.dataset))
+        results, elapsed, behind = replay(app, entries, args.concurrency, None if args.fast else args.speed, args.seed)
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    by_route = {}
+    for entry, (status, seconds, _) in zip(entries, results):
+        samples, errors = by_route.setdefault(f"{entry['m']} {entry.get('r') or 'unmatched'}", ([], [0]))
+        samples.append(seconds)
+        if status >= 500:
+            errors[0] += 1
+    routes = {route: {**summarize(samples), 'errors': errors[0], 'perSec': round(len(samples) / elapsed, 1)}
+              for route, (samples, errors) in sorted(by_route.items())}
+    status_changes = [{'index': i, 'request': f"{e['m']} {e['p']}", 'captured': e.get('s'), 'replayed': r[0]}
+                      for i, (e, r) in enumerate(zip(entries, results)) if e.get('s') != r[0]]
+
+    emit({
+        'benchmark': 'replay', 'capture': os.path.abspath(args.capture), 'dataset': args.dataset,
+        'pacing': 'fast' if args.fast else f"x{args.speed}", 'concurrency': args.concurrency, 'seed': args.seed,
+        'env': {k: v for k, v in os.environ.items() if k.startswith('WAKEY_')},
+        'seconds': round(elapsed, 2), 'requests': len(entries), 'perSec': round(len(entries) / elapsed, 1),
+        'maxBehindMs': round(behind * 1000, 3), 'routes': routes,
+        'statusChanges': len(status_changes), 'statusChangesListed': status_changes[:MAX_LISTED],
+        'responses': [f"{status} {response_digest}" for status, _, response_digest in results],
+    }, args.out)
+
+
+def _change(base, new):
+    """Percent change from base to new, None if either is missing."""
+    if not base or new is None:
+        return None
+    return round((new - base) / base * 100, 1)
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    routes, regressions = {}, []
+    for route in sorted(set(base['routes']) | set(new['routes'])):
+        before, after = base['routes'].get(route), new['routes'].get(route)
+        if before is None or after is None:
+            routes[route] = {'only': 'base' if after is None else 'new'}
+            continue
+        change = {'perSec': _change(before['perSec'], after['perSec'])}
+        for stat in ('p50Ms', 'p95Ms', 'p99Ms'):
+            change[stat] = _change(before[stat], after[stat])
+        routes[route] = {'base': {k: before[k] for k in ('perSec', 'p50Ms', 'p95Ms', 'p99Ms', 'errors')},
+                         'new': {k: after[k] for k in ('perSec', 'p50Ms', 'p95Ms', 'p99Ms', 'errors')},
+                         'changePct': change}
+        slower = [stat for stat in ('p50Ms', 'p95Ms', 'p99Ms') if (change[stat] or 0) > args.threshold]
+        if slower or (change['perSec'] or 0) < -args.threshold or after['errors'] > before['errors']:
+            regressions.append(route)
+
+    if len(base['responses']) == len(new['responses']):
+        differing = [i for i, (a, b) in enumerate(zip(base['responses'], new['responses'])) if a != b]
+    else:
+        differing = None  # different captures: nothing to line up
+    listed = []
+    if differing and os.path.exists(base.get('capture', '')):
+        entries = read_capture(base['capture'])
+        listed = [{'index': i, 'request': f"{entries[i]['m']} {entries[i]['p']}",
+                   'base': base['responses'][i], 'new': new['responses'][i]} for i in differing[:MAX_LISTED]]
+
+    emit({
+        'benchmark': 'replay-compare', 'base': args.base, 'new': args.new, 'thresholdPct': args.threshold,
+        'perSec': {'base': base['perSec'], 'new': new['perSec'], 'changePct': _change(base['perSec'], new['perSec'])},
+        'routes': routes, 'regressions': regressions,
+        'responseDiffs': differing if differing is None else len(differing), 'responseDiffsListed': listed,
+    }, args.out)
+    if regressions or differing:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='replay a capture against a fresh app')
+    run_parser.add_argument('capture', help='JSONL file written with WAKEY_CAPTURE')
+    run_parser.add_argument('--dataset', required=True, help='data.json the captured server started from')
+    run_parser.add_argument('--fast', action='store_true', help='send as fast as possible, not at the captured pacing')
+    run_parser.add_argument('--speed', type=float, default=1.0, help='pacing multiplier (2: twice as fast)')
+    run_parser.add_argument('--concurrency', type=int, default=1)
+    run_parser.add_argument('--seed', type=int, default=1, help="seed for WakeyAgent's message choice")
+    run_parser.add_argument('--out', help='also write the JSON report here')
+
+    compare_parser = commands.add_parser('compare', help='diff two run reports')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='percent change that counts as a regression')
+    compare_parser.add_argument('--out', help='also write the JSON report here')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Serving mode comparison: app.py (threaded WSGI) vs asgi.py (asyncio).
+
+Starts each server as a subprocess on a generated dataset, then opens
+--connections idle /api/events streams (spread over users, since each user
+is capped at a few streams) and records how many were held, the server's
+thread count and resident memory. With the streams still open it runs
+--concurrency keep-alive clients doing GET /api/alarms/<id> for --duration
+seconds and reports throughput and latency. Clients are raw asyncio
+sockets, so the load generator itself holds no thread per connection.
+
+Run from backend-python/:  python -m bench.serving [--connections 2000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit, summarize
+
+SERVERS = {'wsgi': 'app.py', 'asgi': 'asgi.py'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_status(pid):
+    """Threads and VmRSS (MB) from /proc, or None where /proc is missing."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return {'threads': None, 'rssMb': None}
+    return {'threads': int(fields['Threads']), 'rssMb': round(int(fields['VmRSS'].split()[0]) / 1024, 1)}
+
+
+def start_server(name, workdir, port):
+    env = dict(os.environ, PORT=str(port), WAKEY_SCHEDULER='0', WAKEY_PERSISTENCE='journal')
+    log = open(os.path.join(workdir, f'{name}.log'), 'w')
+    proc = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, SERVERS[name])],
+                            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} server exited, see {log.name}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{name} server did not start")
+
+
+async def read_response(reader):
+    """(status, body, keep_alive) for one Content-Length response."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (l.split(':', 1) for l in lines[1:] if ':' in l)}
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    keep_alive = lines[0].startswith('HTTP/1.1') and headers.get('connection', '').lower() != 'close'
+    return status, body, keep_alive
+
+
+async def hold_stream(port, user_id, held):
+    """Open one event stream and keep it until cancelled."""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    try:
+        writer.write(f"GET /api/events/{user_id} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+        await asyncio.wait_for(reader.readuntil(b'event: ready'), 30)
+        held.append(user_id)
+        while await reader.read(4096):
+            pass
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def load(port, user_ids, seconds, timings, errors):
+    """One keep-alive client: GET /api/alarms/<id> until the deadline."""
+    rng = random.Random(len(timings))
+    deadline = time.monotonic() + seconds
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            started = time.perf_counter()
+            writer.write(f"GET /api/alarms/{rng.choice(user_ids)} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            status, _, keep_alive = await read_response(reader)
+            timings.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def measure(name, pid, port, users, connections, concurrency, seconds):
+    held = []
+    streams = [asyncio.ensure_future(hold_stream(port, 1 + i % users, held)) for i in range(connections)]
+    for _ in range(600):
+        await asyncio.sleep(0.1)
+        if len(held) >= connections or all(s.done() for s in streams):
+            break
+    idle = {'requested': connections, 'held': len(held), **process_status(pid)}
+
+    timings, errors = [], []
+    started = time.monotonic()
+    await asyncio.gather(*(load(port, range(1, users + 1), seconds, timings, errors) for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    under_load = process_status(pid)
+
+    for s in streams:
+        s.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+    return {
+        'server': name,
+        'idleStreams': idle,
+        'requests': {
+            'concurrency': concurrency,
+            'completed': len(timings),
+            'errors': len(errors),
+            'perSecond': round(len(timings) / elapsed, 1),
+            'latency': summarize(timings),
+            **under_load,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=2000, help='idle event streams to hold open')
+    parser.add_argument('--concurrency', type=int, default=32, help='keep-alive request clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of request load')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    # Both ends of every connection live on this machine
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    workdir = tempfile.mkdtemp(prefix='wakey-serving-')
+    results = []
+    try:
+        generate(os.path.join(workdir, 'data.json'), users=args.users, seed=args.seed)
+        for name in args.servers.split(','):
+            rundir = os.path.join(workdir, name)
+            os.mkdir(rundir)
+            shutil.copy(os.path.join(workdir, 'data.json'), rundir)
+            port = free_port()
+            proc = start_server(name, rundir, port)
+            try:
+                results.append(asyncio.run(measure(name, proc.pid, port, args.users, args.connections,
+                                                   args.concurrency, args.duration)))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({
+        'benchmark': 'serving',
+        'users': args.users,
+        'fdLimit': hard,
+        'results': results,
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Snooze stats check: incremental totals vs a rebuild from history, and read cost.
+
+Generates a dataset, loads the app in-process and drives random alarm
+traffic through the API: creates, snoozes, acknowledges and cancels,
+including actions on already finished alarms (so outcomes land out of
+order), /api/batch, and archiver passes that move finished alarms out of
+the hot store. After each round the app's running stats must equal
+SnoozeStats.rebuild() over the hot store plus the archive. It then times
+/api/stats and /api/leaderboard against computing the same user's stats
+by scanning their alarm history.
+
+Run from backend-python/:  python -m bench.snooze_stats [--users 2000] [--actions 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench.generate import generate
+from bench.harness import emit, load_app, summarize
+
+
+def drive(app, client, rng, actions, alarm_ids):
+    """Random agent traffic; returns the number of requests that succeeded."""
+    friendships = app.store.to_dict()['friendships']
+    succeeded = 0
+    for _ in range(actions):
+        roll = rng.random()
+        if roll < 0.15 or not alarm_ids:
+            f = rng.choice(friendships)
+            a, b = (f['user1Id'], f['user2Id']) if rng.random() < 0.5 else (f['user2Id'], f['user1Id'])
+            body = client.post('/api/alarms', json={'userId': a, 'friendId': b, 'time': '07:00'}).get_json()
+            if body.get('success'):
+                alarm_ids.append(body['alarm']['id'])
+                succeeded += 1
+            continue
+        alarm_id = rng.choice(alarm_ids)
+        alarm = app.store.get_alarm(alarm_id)
+        if alarm is None:
+            continue  # archived
+        user_id = rng.choice((alarm['user1Id'], alarm['user2Id']))
+        action = 'snooze' if roll < 0.6 else 'acknowledge' if roll < 0.93 else 'cancel'
+        if roll > 0.98:
+            result = client.post('/api/batch', json={'operations': [
+                {'op': 'snooze', 'alarmId': alarm_id, 'userId': user_id},
+                {'op': 'acknowledge', 'alarmId': alarm_id, 'userId': user_id}]}).get_json()
+            succeeded += sum(1 for r in result['results'] if r.get('success'))
+            continue
+        body = client.post(f'/api/agent/{action}', json={'alarmId': alarm_id, 'userId': user_id}).get_json()
+        succeeded += bool(body.get('success'))
+    return succeeded
+
+
+def agrees(app):
+    from stats import SnoozeStats, alarm_history
+    rebuilt = SnoozeStats.rebuild(alarm_history(app.store, app.archive)).snapshot()
+    return app.stats.snapshot() == rebuilt
+
+
+def scan_user_stats(app, user_id):
+    """The on-demand alternative: one user's stats from a scan of their alarms."""
+    from stats import SnoozeStats
+    alarms = app.store.alarms_for_user(user_id, active_only=False)
+    alarms += [a for a in app.archive.records('alarms') if user_id in (a['user1Id'], a['user2Id'])]
+    return SnoozeStats.rebuild(alarms).user_stats(user_id)
+
+
+def time_reads(app, client, user_ids, reads):
+    timings = {'stats': [], 'leaderboard': [], 'scan': []}
+    for i in range(reads):
+        user_id = user_ids[i % len(user_ids)]
+        for name, call in (('stats', lambda: client.get(f'/api/stats/{user_id}')),
+                           ('leaderboard', lambda: client.get(f'/api/leaderboard/{user_id}?limit=5')),
+                           ('scan', lambda: scan_user_stats(app, user_id))):
+            started = time.perf_counter()
+            call()
+            timings[name].append(time.perf_counter() - started)
+    return {name: summarize(values) for name, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--actions', type=int, default=20000, help='agent/alarm requests in total')
+    parser.add_argument('--rounds', type=int, default=5, help='agreement checks (an archiver pass before each)')
+    parser.add_argument('--reads', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='wakey-stats-')
+    cwd = os.getcwd()
+    try:
+        dataset = os.path.join(workdir, 'dataset.json')
+        generate(dataset, users=args.users, seed=args.seed)
+        os.environ['WAKEY_ARCHIVE_DIR'] = os.path.join(workdir, 'archive')
+        os.environ.setdefault('WAKEY_PERSISTENCE', 'journal')  # snapshot saves would dominate
+        app = load_app(workdir, dataset)
+        app.stats.wait_ready()
+        client = app.app.test_client()
+        rng = random.Random(args.seed)
+        alarm_ids = [a['id'] for a in app.store.all_alarms()]
+
+        rounds = []
+        for _ in range(args.rounds):
+            succeeded = drive(app, client, rng, args.actions // args.rounds, alarm_ids)
+            archived = app.archive_finished()
+            rounds.append({'succeeded': succeeded, 'archived': archived, 'agrees': agrees(app)})
+        reads = time_reads(app, client, rng.sample(range(1, args.users + 1), min(50, args.users)), args.reads)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({
+        'benchmark': 'snooze_stats',
+        'users': args.users,
+        'rebuildSeconds': round(app.STATS_REBUILD_SECONDS, 3),
+        'rounds': rounds,
+        'agrees': all(r['agrees'] for r in rounds),
+        'reads': reads,
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
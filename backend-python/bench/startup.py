@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark: data.json vs the binary snapshot (snapshot.py).
+
+For each dataset size, starts the app in a fresh interpreter per format and
+reports time until `import app` returns (ready to serve), the store load
+time, first-request latency and peak RSS. data.json is written pretty-printed,
+the way save_db() writes it.
+
+Run from backend-python/:  python -m bench.startup [--sizes 10000,100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench.generate import generate
+from bench.harness import BACKEND_DIR, emit
+
+CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+import flask, flask_cors  # library imports aren't what we're measuring
+started = time.perf_counter()
+import app
+ready = time.perf_counter() - started
+client = app.app.test_client()
+started = time.perf_counter()
+client.get('/api/alarms/1')
+first = time.perf_counter() - started
+print(json.dumps({'readySec': ready, 'loadSec': app.LOAD_SECONDS, 'firstRequestMs': first * 1000,
+                  'peakRssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def start_once(workdir, snapshot_format, scheduler):
+    env = {**os.environ, 'WAKEY_SNAPSHOT_FORMAT': snapshot_format, 'WAKEY_SCHEDULER': scheduler,
+           'WAKEY_PERSISTENCE': 'snapshot', 'WAKEY_STORAGE': 'json'}
+    output = subprocess.run([sys.executable, '-c', CHILD, BACKEND_DIR], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(users, repeat, scheduler, seed):
+    from journal import read_snapshot, write_snapshot
+    from snapshot import write_binary
+    from store import Store
+
+    workdir = tempfile.mkdtemp(prefix='wakey-startup-')
+    try:
+        generated = os.path.join(workdir, 'generated.json')
+        generate(generated, users=users, seed=seed)
+        db = Store(read_snapshot(generated), compact=False).to_dict()
+        json_bytes = write_snapshot(os.path.join(workdir, 'data.json'), db)
+        binary_bytes = write_binary(os.path.join(workdir, 'data.wkb'), db)
+        del db
+
+        result = {'users': users, 'jsonBytes': json_bytes, 'binaryBytes': binary_bytes}
+        for snapshot_format in ('json', 'binary'):
+            runs = [start_once(workdir, snapshot_format, scheduler) for _ in range(repeat)]
+            result[snapshot_format] = {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+        result['readySpeedup'] = round(result['json']['readySec'] / result['binary']['readySec'], 2)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated user counts')
+    parser.add_argument('--repeat', type=int, default=3, help='starts per format (median is reported)')
+    parser.add_argument('--scheduler', default='1', help="WAKEY_SCHEDULER for the started app")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    emit({'benchmark': 'startup',
+          'results': [measure(int(size), args.repeat, args.scheduler, args.seed) for size in args.sizes.split(',')]},
+         args.out)
+
+
+if __name__ == '__main__':
+    main()
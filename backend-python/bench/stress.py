@@ -0,0 +1,171 @@
+"""
+Concurrency stress test for the Flask app.
+
+Hammers the mutation routes from many threads at once and checks the
+invariants that broke under threaded serving before entity locking:
+unique ids, no lost snoozes, one pending request per pair, and a
+persisted data.json that matches memory. Also prints throughput per
+thread count. The throughput phases give every thread its own alarm and
+its own user pairs, as real traffic mostly does, so they measure how far
+the entity locks let threads run side by side; contention on one alarm
+or one pair is only checked for correctness.
+
+Threads only add throughput where requests wait rather than compute (the
+GIL serializes the rest), e.g. on durable group commits:
+
+  WAKEY_PERSISTENCE=journal WAKEY_GROUP_COMMIT=1 WAKEY_JOURNAL_FSYNC=1 python -m bench.stress
+
+Run from backend-python/:  python -m bench.stress [--threads 1,4,16] [--ops 200]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from flask import request
+
+from bench.harness import BACKEND_DIR, load_app
+
+
+def run_threads(count, target):
+    errors = []
+
+    def wrapped(i):
+        try:
+            target(i)
+        except Exception as e:  # surfaced in the report
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=wrapped, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, errors
+
+
+def stress(app_module, threads, ops):
+    client_app = app_module.app
+    failures = []
+
+    @client_app.after_request
+    def record_server_errors(response):
+        if response.status_code >= 500:
+            failures.append(f'{request.path} -> {response.status_code}')
+        return response
+
+    # 1. Concurrent signups: every account gets a distinct id
+    def signup(i):
+        client = client_app.test_client()
+        for n in range(ops):
+            client.post('/api/signup', json={'username': f'stress-{threads}-{i}-{n}', 'password': 'pw'})
+    elapsed, errors = run_threads(threads, signup)
+    failures += errors
+    ids = [u['id'] for u in app_module.store.to_dict()['users']]
+    if len(ids) != len(set(ids)):
+        failures.append('duplicate user ids')
+    signup_rate = threads * ops / elapsed
+
+    # 2. Concurrent snoozes, each thread on its own alarm: none may be lost
+    owner = app_module.store.find_user('alice')['id']
+    friend = app_module.store.friend_ids(owner)[0]
+
+    def new_alarm(label):
+        return client_app.test_client().post('/api/alarms', json={
+            'userId': owner, 'friendId': friend, 'time': '07:00', 'label': label
+        }).get_json()['alarm']['id']
+    alarm_ids = [new_alarm(f'stress-{i}') for i in range(threads)]
+
+    def snooze(alarm_id, count):
+        client = client_app.test_client()
+        for _ in range(count):
+            client.post('/api/agent/snooze', json={'alarmId': alarm_id, 'userId': owner})
+
+    def check_snoozes(alarm_id, expected):
+        count = app_module.store.get_alarm(alarm_id)['snoozeCount'][str(owner)]
+        if count != expected:
+            failures.append(f'lost snoozes on alarm {alarm_id}: {count} != {expected}')
+
+    elapsed, errors = run_threads(threads, lambda i: snooze(alarm_ids[i], ops))
+    failures += errors
+    for alarm_id in alarm_ids:
+        check_snoozes(alarm_id, ops)
+    snooze_rate = threads * ops / elapsed
+
+    # ...and all threads on one alarm, which serializes on its lock
+    shared = new_alarm('stress-shared')
+    _, errors = run_threads(threads, lambda i: snooze(shared, max(1, ops // threads)))
+    failures += errors
+    check_snoozes(shared, threads * max(1, ops // threads))
+
+    # 3. Friend requests, each thread from its own user: one pending per pair
+    def user_id(i, n):
+        return app_module.store.find_user(f'stress-{threads}-{i}-{n}')['id']
+
+    targets = [(user_id(i, 0), [user_id(i, n) for n in range(1, ops)]) for i in range(threads)]
+
+    def request_friends(i):
+        client = client_app.test_client()
+        sender, receivers = targets[i]
+        for receiver in receivers:
+            client.post('/api/friends/request', json={'fromUserId': sender, 'toUserId': receiver})
+    elapsed, errors = run_threads(threads, request_friends)
+    failures += errors
+    for sender, receivers in targets:
+        for receiver in receivers:
+            pending = [r for r in app_module.store.pending_requests_for(receiver) if r['fromUserId'] == sender]
+            if len(pending) != 1:
+                failures.append(f'{len(pending)} pending requests from {sender} to {receiver}')
+    request_rate = threads * (ops - 1) / elapsed if ops > 1 else 0
+
+    # ...and every thread racing for one pair: exactly one stays pending
+    a = targets[0][0]
+    b = app_module.store.find_user('bob')['id']
+
+    def request_friend(i):
+        client_app.test_client().post('/api/friends/request', json={'fromUserId': a, 'toUserId': b})
+    _, errors = run_threads(threads, request_friend)
+    failures += errors
+    pending = [r for r in app_module.store.pending_requests_for(b) if r['fromUserId'] == a]
+    if len(pending) != 1:
+        failures.append(f'{len(pending)} pending requests for one pair')
+
+    # 4. What reached disk matches memory
+    if app_module.committer:
+        app_module.committer.mark(wait=True)
+    if app_module.journal is None and app_module.STORAGE_BACKEND == 'json':
+        with open(app_module.DATA_FILE) as f:
+            on_disk = json.load(f)
+        if on_disk != json.loads(json.dumps(app_module.store.to_dict())):
+            failures.append('data.json differs from memory')
+
+    return {'threads': threads, 'signupsPerSec': round(signup_rate), 'snoozesPerSec': round(snooze_rate),
+            'friendRequestsPerSec': round(request_rate), 'failures': failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', default='1,4,16', help='comma-separated thread counts')
+    parser.add_argument('--ops', type=int, default=200, help='operations per thread per phase')
+    args = parser.parse_args()
+
+    results = []
+    for threads in (int(t) for t in args.threads.split(',')):
+        workdir = tempfile.mkdtemp(prefix='wakey-stress-')
+        try:
+            results.append(stress(load_app(workdir), threads, args.ops))
+        finally:
+            os.chdir(BACKEND_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(json.dumps(results[-1]))
+
+    sys.exit(1 if any(r['failures'] for r in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Friend suggestion benchmark: 2-hop queries on a power-law friendship graph.
+
+Generates a dataset (preferential attachment, so a few users have huge
+friend lists), loads the app in-process and times GET
+/api/friends/suggestions/<id> three ways: cold (cache empty), warm (cache
+hit) and after graph changes (friend requests sent and accepted through the
+API, which invalidate the users around them). Queried users are drawn
+uniformly and from the hubs' friends, whose two-hop neighbourhood is the
+largest. Every response is also checked against an uncached
+store.friend_suggestions() call, so stale cache entries show up as
+mismatches.
+
+Run from backend-python/:  python -m bench.suggestions [--users 200000] [--friends-per-user 10]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench.generate import generate
+from bench.harness import emit, load_app, summarize
+
+
+def timed_query(app, client, user_id, timings):
+    started = time.perf_counter()
+    response = client.get(f'/api/friends/suggestions/{user_id}?limit={app.SUGGESTIONS_MAX_PAGE_SIZE}')
+    timings.append(time.perf_counter() - started)
+    served = [(s['id'], s['mutualFriends']) for s in response.get_json()]
+    return served == app.store.friend_suggestions(user_id, app.SUGGESTIONS_MAX_PAGE_SIZE)
+
+
+def befriend(client, a, b):
+    """Send and accept a friend request between a and b through the API."""
+    client.post('/api/friends/request', json={'fromUserId': a, 'toUserId': b})
+    pending = client.get(f'/api/friends/requests/{b}').get_json()
+    request_id = next((r['id'] for r in pending if r['fromUserId'] == a), None)
+    if request_id is not None:
+        client.post('/api/friends/accept', json={'requestId': request_id, 'userId': b})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--friends-per-user', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500, help='distinct users queried')
+    parser.add_argument('--updates', type=int, default=200, help='friendships added between rounds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='wakey-suggestions-')
+    cwd = os.getcwd()
+    try:
+        dataset = os.path.join(workdir, 'dataset.json')
+        counts = generate(dataset, users=args.users, friendships_per_user=args.friends_per_user,
+                          alarms_per_user=0.1, seed=args.seed)
+        os.environ.setdefault('WAKEY_PERSISTENCE', 'journal')  # snapshot saves would dominate
+        app = load_app(workdir, dataset)
+        client = app.app.test_client()
+        store = app.store
+        rng = random.Random(args.seed)
+
+        degrees = {user_id: len(store.friend_ids(user_id)) for user_id in range(1, args.users + 1)}
+        hubs = sorted(degrees, key=degrees.get, reverse=True)[:10]
+        hub_friends = [f for hub in hubs for f in store.friend_ids(hub)]
+        users = rng.sample(range(1, args.users + 1), args.queries // 2)
+        users += rng.sample(hub_friends, min(args.queries - len(users), len(hub_friends)))
+        two_hop = sorted(sum(degrees[f] for f in store.friend_ids(u)) for u in users)
+
+        timings = {'cold': [], 'warm': [], 'afterUpdates': []}
+        mismatches = 0
+        for name in ('cold', 'warm'):
+            mismatches += sum(not timed_query(app, client, u, timings[name]) for u in users)
+        for _ in range(args.updates):
+            # Mostly new friendships around the queried users, some at the hubs
+            a = rng.choice(users if rng.random() < 0.8 else hubs)
+            b = rng.randrange(1, args.users + 1)
+            if a != b and not store.are_friends(a, b):
+                befriend(client, a, b)
+        mismatches += sum(not timed_query(app, client, u, timings['afterUpdates']) for u in users)
+        cache = app.suggestion_cache.stats()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit({
+        'benchmark': 'suggestions',
+        'users': args.users,
+        'friendships': counts['friendships'],
+        'maxDegree': degrees[hubs[0]],
+        'queriedUsers': len(users),
+        'twoHopEdgesP50': two_hop[len(two_hop) // 2],
+        'twoHopEdgesMax': two_hop[-1],
+        'updates': args.updates,
+        'latency': {name: summarize(values) for name, values in timings.items()},
+        'cache': cache,
+        'mismatches': mismatches,
+    }, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import atexit
+import json
+import os
+import threading
+import time
+from urllib.parse import quote, urlencode
+
+from flask import g, request
+
+# Request headers that change what a route does, kept for replay
+CAPTURED_HEADERS = ('X-Wakey-Durability',)
+
+_encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+
+class TrafficCapture:
+    """
+    Records every request to a JSONL file, one compact line each:
+
+        {"t": ms since capture start, "m": method, "p": path and query,
+         "r": route template, "b": raw body, "c": content type if not JSON,
+         "h": captured headers, "u": session user, "s": status, "ms": duration}
+
+    Empty fields are left out. Session tokens are not written: "u" is the
+    user a valid token belonged to (-1 for an invalid one), so a replay can
+    issue its own. Request threads only append to a buffer; a daemon thread
+    writes it out every FLUSH_EVERY seconds, and once more at exit.
+
+    `identify()` returns the session user of the current request, or None.
+    Endpoints in `skip` (event streams, metrics scrapes, dumps) are not
+    recorded. When `path` is None, install() adds no hooks.
+    """
+
+    FLUSH_EVERY = 1.0  # seconds
+
+    def __init__(self, path, identify, skip=()):
+        self.path = path
+        self.identify = identify
+        self.skip = set(skip)
+        self.recorded = 0
+        self._file = None
+        self._buffer = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def install(self, app):
+        if not self.enabled:
+            return
+        # Bodies include passwords: readable by the server's user only
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._file = os.fdopen(fd, 'a', encoding='utf-8')
+        threading.Thread(target=self._run, name='wakey-capture', daemon=True).start()
+        atexit.register(self.flush)
+
+        @app.before_request
+        def start_capture():
+            if request.endpoint in self.skip or request.method == 'OPTIONS':
+                return
+            g.capture_started = time.perf_counter()
+            g.capture_user = self.identify()
+
+        @app.after_request
+        def record(response):
+            started = g.pop('capture_started', None)
+            if started is not None:
+                self.record(started, time.perf_counter() - started, response.status_code, g.pop('capture_user', None))
+            return response
+
+        @app.teardown_request
+        def record_unhandled(error):
+            # after_request is skipped when an exception escapes the app
+            started = g.pop('capture_started', None)
+            if started is not None:
+                self.record(started, time.perf_counter() - started, 500, g.pop('capture_user', None))
+
+    def record(self, started, elapsed, status, user_id):
+        entry = {
+            't': round((started - self._started) * 1000, 3),
+            'm': request.method,
+            'p': self._path(),
+            'r': request.url_rule.rule if request.url_rule is not None else None,
+        }
+        body = request.get_data(as_text=True)
+        if body:
+            entry['b'] = body
+            if request.mimetype != 'application/json':
+                entry['c'] = request.content_type
+        headers = {name: request.headers[name] for name in CAPTURED_HEADERS if name in request.headers}
+        if headers:
+            entry['h'] = headers
+        if user_id is not None:
+            entry['u'] = user_id
+        entry['s'] = status
+        entry['ms'] = round(elapsed * 1000, 3)
+        line = _encode(entry) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+
+    def _path(self):
+        """The request path and query as sent, minus a ?token= that would leak the session."""
+        path = quote(request.path)
+        if 'token' in request.args:
+            query = urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'token'])
+        else:
+            query = request.query_string.decode('latin-1')
+        return path + ('?' + query if query else '')
+
+    def _run(self):
+        while True:
+            time.sleep(self.FLUSH_EVERY)
+            self.flush()
+
+    def flush(self):
+        # The flusher thread and atexit take turns, so batches stay in order
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if lines:
+                self._file.write("".join(lines))
+                self._file.flush()
+
+    def stats(self):
+        return {'recorded': self.recorded, 'buffered': len(self._buffer)}
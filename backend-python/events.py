@@ -0,0 +1,205 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+
+
+class Subscription:
+    """
+    One streaming client. Events wait in a bounded queue; when a slow client
+    lets it fill up, the oldest events are dropped and the client is told to
+    resync (re-fetch its lists) instead of the publisher ever blocking.
+    """
+
+    def __init__(self, user_id, max_queue):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, event):
+        """Enqueue without blocking; returns False if an event had to be dropped."""
+        dropped = False
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return not dropped
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    dropped = True
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class AsyncSubscription(Subscription):
+    """
+    A Subscription consumed by a coroutine on `loop` (the ASGI server's
+    SSE route) instead of a thread: same queue and drop rules, and every
+    offer wakes the consumer through the loop.
+    """
+
+    def __init__(self, user_id, max_queue, loop):
+        super().__init__(user_id, max_queue)
+        self.loop = loop
+        self._ready = asyncio.Event()
+
+    def _wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def offer(self, event):
+        delivered = super().offer(event)
+        self._wake()
+        return delivered
+
+    def close(self):
+        super().close()
+        self._wake()
+
+    async def get(self, timeout):
+        """Next queued event; raises queue.Empty after `timeout` seconds without one."""
+        while True:
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            if self._ready.is_set():
+                self._ready.clear()
+                continue  # an offer may have landed between the get and the clear
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise queue.Empty from None
+
+
+class EventBus:
+    """
+    In-process pub/sub with per-user fan-out for Server-Sent Events.
+
+    publish() is O(subscribers of the target users) and never blocks. Each
+    stream() sends a keepalive comment every `heartbeat` seconds and ends
+    after `max_connection` seconds (the client's EventSource reconnects
+    after `retry_ms`), so an idle connection can't hold a worker thread forever.
+    """
+
+    MAX_QUEUE = 64
+    MAX_PER_USER = 4
+    HEARTBEAT = 15
+    MAX_CONNECTION = 300
+    RETRY_MS = 3000
+
+    def __init__(self, max_queue=MAX_QUEUE, max_per_user=MAX_PER_USER, heartbeat=HEARTBEAT,
+                 max_connection=MAX_CONNECTION, retry_ms=RETRY_MS):
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.heartbeat = heartbeat
+        self.max_connection = max_connection
+        self.retry_ms = retry_ms
+        self._subscribers = {}  # user id -> [Subscription]
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id, loop=None):
+        """Subscribe to a user's events; with an event loop, for astream()."""
+        sub = Subscription(user_id, self.max_queue) if loop is None else AsyncSubscription(user_id, self.max_queue, loop)
+        with self._lock:
+            subs = self._subscribers.setdefault(user_id, [])
+            # Cap connections per user: the oldest tab gets closed
+            while len(subs) >= self.max_per_user:
+                subs.pop(0).close()
+            subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id, [])
+            if sub in subs:
+                subs.remove(sub)
+            if not subs:
+                self._subscribers.pop(sub.user_id, None)
+        sub.closed = True
+
+    def publish(self, user_ids, event_type, data):
+        """Send one event to every subscriber of each user in user_ids."""
+        event = (event_type, json.dumps(data, separators=(',', ':')))
+        with self._lock:
+            targets = [sub for uid in set(user_ids) for sub in self._subscribers.get(uid, ())]
+        for sub in targets:
+            sub.offer(event)
+        self.published += 1
+        self.delivered += len(targets)
+        return len(targets)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def _frames(self, sub, event, dropped_seen):
+        """SSE frames for one dequeued event: a resync first if events were dropped."""
+        frames = []
+        if sub.dropped != dropped_seen:
+            dropped_seen = sub.dropped
+            frames.append(f"event: resync\ndata: {json.dumps({'dropped': dropped_seen})}\n\n")
+        event_type, payload = event
+        frames.append(f"event: {event_type}\ndata: {payload}\n\n")
+        return frames, dropped_seen
+
+    def stream(self, sub):
+        """Generator of SSE frames for one subscription."""
+        deadline = time.monotonic() + self.max_connection
+        dropped_seen = 0
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            yield "event: ready\ndata: {}\n\n"
+            while not sub.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = sub.queue.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                frames, dropped_seen = self._frames(sub, event, dropped_seen)
+                yield from frames
+        finally:
+            self.unsubscribe(sub)
+
+    async def astream(self, sub):
+        """stream() for an AsyncSubscription, as an async generator: waiting holds no thread."""
+        deadline = time.monotonic() + self.max_connection
+        dropped_seen = 0
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            yield "event: ready\ndata: {}\n\n"
+            while not sub.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await sub.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                frames, dropped_seen = self._frames(sub, event, dropped_seen)
+                for frame in frames:
+                    yield frame
+        finally:
+            self.unsubscribe(sub)
@@ -0,0 +1,156 @@
+import threading
+import time
+
+
+class CommitFailed(RuntimeError):
+    """A durable mark() whose flush failed, timed out or never ran."""
+
+
+class GroupCommitter:
+    """
+    Coalesces bursts of save requests into batched flushes on one writer thread.
+
+    Mutating routes call mark(); the writer runs flush() at most every
+    interval_ms milliseconds, or as soon as max_batch marks are pending.
+    mark(wait=True) blocks until a flush covering that mark has finished
+    (durable); mark(wait=False) returns immediately (fast). A failed flush
+    is retried with the next batch, but the durable marks it covered raise
+    CommitFailed, as do ones still waiting after wait_timeout seconds or
+    when the writer stops without flushing them.
+    """
+
+    def __init__(self, flush, interval_ms=50, max_batch=256, wait_timeout=30.0):
+        self.flush = flush
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._pending = 0          # marks not yet covered by a flush
+        self._first_pending = None  # monotonic time of the oldest pending mark
+        self._marked = 0           # sequence number of the last mark
+        self._flushed = 0          # highest sequence number made durable
+        self._failed = 0           # highest sequence number covered by a failed flush
+        self._error = None         # that flush's exception
+        self._stopped = False
+        self._exited = False       # writer thread has returned
+        self._thread = None
+
+        # Counters
+        self._flushes = 0
+        self._failures = 0
+        self._mutations = 0
+        self._max_batch_seen = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._last_flush_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="wakey-group-commit", daemon=True)
+            self._thread.start()
+        return self
+
+    def mark(self, wait=True):
+        """Record one mutation; optionally block until it has been flushed."""
+        with self._cond:
+            self._marked += 1
+            ticket = self._marked
+            if self._pending == 0:
+                self._first_pending = time.monotonic()
+            self._pending += 1
+            self._cond.notify_all()
+            if wait:
+                deadline = time.monotonic() + self.wait_timeout
+                while self._flushed < ticket:
+                    if self._failed >= ticket:
+                        raise CommitFailed(f"group commit flush failed: {self._error}") from self._error
+                    if self._exited:
+                        raise CommitFailed("group commit writer stopped before flushing")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise CommitFailed(f"group commit not flushed within {self.wait_timeout}s")
+                    self._cond.wait(remaining)
+        return ticket
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            with self._cond:
+                self._exited = True
+                self._cond.notify_all()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._pending >= self.max_batch:
+                        break
+                    if self._pending:
+                        remaining = self._first_pending + self.interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+                batch = self._pending
+                upto = self._marked
+                self._pending = 0
+                self._first_pending = None
+
+            started = time.perf_counter()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Warning: group commit flush failed: {e}")
+                with self._cond:
+                    self._failures += 1
+                    self._failed = max(self._failed, upto)
+                    self._error = e
+                    self._cond.notify_all()
+                    # Put the batch back so the next cycle retries it.
+                    if self._pending == 0:
+                        self._first_pending = time.monotonic()
+                    self._pending += batch
+                    stopping = self._stopped
+                if stopping:
+                    return
+                continue
+            elapsed = time.perf_counter() - started
+
+            with self._cond:
+                self._flushed = max(self._flushed, upto)
+                self._flushes += 1
+                self._mutations += batch
+                self._max_batch_seen = max(self._max_batch_seen, batch)
+                self._flush_seconds += elapsed
+                self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                self._last_flush_seconds = elapsed
+                self._cond.notify_all()
+
+    def stop(self):
+        """Flush anything pending and stop the writer thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self._cond:
+            flushes = self._flushes
+            return {
+                'flushes': flushes,
+                'failures': self._failures,
+                'mutations': self._mutations,
+                'pending': self._pending,
+                'avgBatchSize': self._mutations / flushes if flushes else 0,
+                'maxBatchSize': self._max_batch_seen,
+                'avgFlushMs': self._flush_seconds * 1000 / flushes if flushes else 0,
+                'maxFlushMs': self._max_flush_seconds * 1000,
+                'lastFlushMs': self._last_flush_seconds * 1000
+            }
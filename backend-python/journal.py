@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+
+from snapshot import BinarySnapshot, write_binary
+from store import Removed, Store, empty_db
+
+
+def read_snapshot(path):
+    """Read a data.json-shaped snapshot; a missing or empty file is an empty DB."""
+    if not os.path.exists(path):
+        return empty_db()
+    with open(path, "r") as f:
+        content = f.read().strip()
+    if not content:
+        return empty_db()
+    return json.loads(content)
+
+
+def write_snapshot(path, db):
+    """
+    Write a snapshot atomically: temp file, fsync, then rename over the old
+    one. Returns the number of bytes written.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(db, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    os.replace(tmp_path, path)
+    return written
+
+
+def load_snapshot_file(store, path, binary=False):
+    """Fill store from a JSON or binary (snapshot.py) snapshot; a missing file is an empty DB."""
+    if binary and os.path.exists(path):
+        store.load_snapshot(BinarySnapshot(path))
+    else:
+        store.load(read_snapshot(path))
+    return store
+
+
+def _encode(table, record):
+    if type(record) is Removed:
+        return json.dumps({'t': table, 'd': record.id}, separators=(',', ':')) + "\n"
+    return json.dumps({'t': table, 'r': record}, separators=(',', ':')) + "\n"
+
+
+class Journal:
+    """
+    Append-only write-ahead log next to a data.json snapshot.
+
+    Every mutation appends one compact JSON line ({"t": table, "r": record})
+    holding the full record, so replay is an idempotent upsert; a record that
+    left the store (archived) gets {"t": table, "d": id}. A background
+    compactor folds the log into a fresh snapshot without touching the live
+    store: the active log is rotated to <log>.compacting, merged into the
+    snapshot on disk, and deleted once the new snapshot is in place.
+    """
+
+    COMPACT_BYTES = 4 * 1024 * 1024
+    COMPACT_INTERVAL = 300  # seconds
+
+    def __init__(self, snapshot_path, log_path=None, fsync=False,
+                 compact_bytes=COMPACT_BYTES, compact_interval=COMPACT_INTERVAL, binary=False):
+        self.snapshot_path = snapshot_path
+        self.binary = binary  # snapshot in snapshot.py's binary format instead of JSON
+        self.log_path = log_path or snapshot_path + ".log"
+        self.rotated_path = self.log_path + ".compacting"
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._log = None
+        self._log_bytes = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+    # ============================
+    # 🔁 REPLAY
+    # ============================
+
+    def _replay_file(self, store, path):
+        """
+        Apply every complete line of a log file; a torn last line is ignored.
+        Returns (lines applied, bytes up to the end of the last good line).
+        """
+        if not os.path.exists(path):
+            return 0, 0
+        applied = end = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # crash mid-append
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                store.apply(entry['t'], Removed(entry['d']) if 'd' in entry else entry['r'])
+                applied += 1
+                end += len(line)
+        return applied, end
+
+    def replay(self, store=None):
+        """
+        Build a Store from snapshot + rotated log + active log. A torn tail
+        of the active log is cut off, so appends after it aren't lost
+        behind it at the next replay.
+        """
+        store = load_snapshot_file(store or Store(), self.snapshot_path, self.binary)
+        applied, _ = self._replay_file(store, self.rotated_path)
+        log_applied, end = self._replay_file(store, self.log_path)
+        with self._lock:
+            if self._log is None and end < self._log_bytes:
+                os.truncate(self.log_path, end)
+                self._log_bytes = end
+        store.drain_changes()
+        return store, applied + log_applied
+
+    # ============================
+    # ✍️ APPEND
+    # ============================
+
+    def append(self, changes):
+        """Append (table, record) changes; cost is proportional to the change set."""
+        if not changes:
+            return 0
+        payload = "".join(_encode(table, record) for table, record in changes).encode()
+        with self._lock:
+            if self._log is None:
+                self._log = open(self.log_path, "ab")
+                self._log_bytes = self._log.tell()
+            try:
+                self._log.write(payload)
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            except OSError:
+                self._discard_partial()
+                raise
+            self._log_bytes += len(payload)
+            oversized = self._log_bytes >= self.compact_bytes
+        if oversized:
+            self._wakeup.set()
+        return len(payload)
+
+    def _discard_partial(self):
+        """
+        Drop whatever a failed append left behind, so the caller can retry the
+        whole batch without a torn line ending replay early. Call with _lock held.
+        """
+        log, self._log = self._log, None
+        try:
+            log.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.log_path, self._log_bytes)
+        except OSError:
+            pass
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # ============================
+    # 🗜️ COMPACTION
+    # ============================
+
+    def _rotate(self):
+        """Swap the active log out so appends continue on a fresh file."""
+        with self._lock:
+            if self._log_bytes == 0 or os.path.exists(self.rotated_path):
+                return False
+            if self._log is not None:
+                self._log.close()
+            os.replace(self.log_path, self.rotated_path)
+            self._log = open(self.log_path, "ab")
+            self._log_bytes = 0
+            return True
+
+    def compact(self):
+        """Fold the log into a new snapshot. Safe to call while appends continue."""
+        with self._compact_lock:
+            rotated = self._rotate()
+            if not rotated and not os.path.exists(self.rotated_path):
+                return False
+            # Replaying snapshot + rotated log through a Store gives exactly the
+            # state the live store had when the log was rotated.
+            folded = load_snapshot_file(Store(compact=False), self.snapshot_path, self.binary)
+            self._replay_file(folded, self.rotated_path)
+            (write_binary if self.binary else write_snapshot)(self.snapshot_path, folded.to_dict())
+            os.remove(self.rotated_path)
+            return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            try:
+                self.compact()
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Warning: journal compaction failed: {e}")
+
+    def start_compactor(self):
+        """Run compaction in a daemon thread (on size threshold or interval)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="wakey-compactor", daemon=True)
+            self._thread.start()
@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+import threading
+
+
+def alarm_key(alarm_id):
+    return ('alarm', alarm_id)
+
+
+def pair_key(a, b):
+    """Same key for (a, b) and (b, a)."""
+    return ('pair',) + tuple(sorted((repr(a), repr(b))))
+
+
+def username_key(username):
+    return ('username', username.casefold())
+
+
+class LockStripes:
+    """
+    Fixed pool of locks that entity keys hash onto (lock striping), so
+    unrelated alarms or user pairs rarely contend and memory stays constant
+    however many entities exist. hold() takes several keys at once in a
+    global order, which keeps multi-key holders (like /api/batch) deadlock-free.
+    """
+
+    def __init__(self, stripes=256):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def _indexes(self, keys):
+        return sorted({hash(key) % len(self._locks) for key in keys})
+
+    @contextmanager
+    def hold(self, keys):
+        indexes = self._indexes(keys)
+        for i in indexes:
+            self._locks[i].acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(indexes):
+                self._locks[i].release()
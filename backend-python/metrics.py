@@ -0,0 +1,245 @@
+from collections import Counter
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+from flask import g, request
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Counters, histograms and scrape-time gauges rendered in the Prometheus
+    text format.
+
+    Everything is keyed by metric name plus a tuple of label values, all
+    updated under one lock (a dict lookup and an add, so contention is
+    negligible next to a request). When `enabled` is False, install() adds no
+    request hooks and the helpers return immediately, so a disabled
+    instance costs one attribute check per call site.
+    """
+
+    def __init__(self, enabled=False, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._meta = {}        # name -> (type, help, label names)
+        self._counters = {}    # name -> {label values: number}
+        self._histograms = {}  # name -> {label values: [bucket counts, sum, count]}
+        self._gauges = {}      # name -> callable returning a number or {label values: number}
+        self.sampler = None
+
+    # ============================
+    # 📝 REGISTRATION
+    # ============================
+
+    def counter(self, name, help_text, labels=()):
+        self._meta[name] = ('counter', help_text, labels)
+        self._counters[name] = {}
+
+    def histogram(self, name, help_text, labels=()):
+        self._meta[name] = ('histogram', help_text, labels)
+        self._histograms[name] = {}
+
+    def gauge(self, name, help_text, read, labels=()):
+        """`read()` is called at scrape time."""
+        self._meta[name] = ('gauge', help_text, labels)
+        self._gauges[name] = read
+
+    # ============================
+    # ➕ UPDATES
+    # ============================
+
+    def inc(self, name, labels=(), amount=1):
+        if not self.enabled:
+            return
+        series = self._counters[name]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        if not self.enabled:
+            return
+        series = self._histograms[name]
+        with self._lock:
+            entry = series.get(labels)
+            if entry is None:
+                entry = series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    # ============================
+    # 📤 EXPOSITION
+    # ============================
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {k: (list(v[0]), v[1], v[2]) for k, v in series.items()}
+                          for name, series in self._histograms.items()}
+
+        for name, (kind, help_text, label_names) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for values, number in sorted(counters[name].items()):
+                    lines.append(f"{name}{_label_text(label_names, values)} {_number(number)}")
+            elif kind == 'histogram':
+                for values, (bucket_counts, total, count) in sorted(histograms[name].items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                        cumulative += bucket_count
+                        labels = _label_text(label_names + ('le',), values + (bound,))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _label_text(label_names, values)
+                    lines.append(f"{name}_sum{labels} {_number(total)}")
+                    lines.append(f"{name}_count{labels} {count}")
+            else:
+                reading = self._gauges[name]()
+                if not isinstance(reading, dict):
+                    reading = {(): reading}
+                for values, number in sorted(reading.items()):
+                    lines.append(f"{name}{_label_text(label_names, values)} {_number(number)}")
+        return "\n".join(lines) + "\n"
+
+    # ============================
+    # 🌐 FLASK HOOKS
+    # ============================
+
+    def install(self, app):
+        """Time every request by route template (bounded label cardinality)."""
+        if not self.enabled:
+            return
+        self.counter('wakey_http_requests_total', 'HTTP requests by route, method and status.',
+                     ('route', 'method', 'status'))
+        self.counter('wakey_http_request_errors_total', 'Requests that ended in a 5xx.', ('route', 'method'))
+        self.histogram('wakey_http_request_duration_seconds', 'Time to build the response.', ('route', 'method'))
+
+        @app.before_request
+        def start_timer():
+            g.metrics_started = time.perf_counter()
+            if self.sampler is not None:
+                self.sampler.begin(request.method, request.path)
+
+        @app.after_request
+        def record(response):
+            started = g.pop('metrics_started', None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            self.observe('wakey_http_request_duration_seconds', (route, request.method), elapsed)
+            self.inc('wakey_http_requests_total', (route, request.method, str(response.status_code)))
+            if response.status_code >= 500:
+                self.inc('wakey_http_request_errors_total', (route, request.method))
+            if self.sampler is not None:
+                self.sampler.end(route, elapsed)
+            return response
+
+        @app.teardown_request
+        def record_unhandled(error):
+            # after_request is skipped when an exception escapes the app
+            started = g.pop('metrics_started', None)
+            if started is None:
+                return
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            self.observe('wakey_http_request_duration_seconds', (route, request.method), time.perf_counter() - started)
+            self.inc('wakey_http_requests_total', (route, request.method, '500'))
+            self.inc('wakey_http_request_errors_total', (route, request.method))
+            if self.sampler is not None:
+                self.sampler.end(route, time.perf_counter() - started)
+
+
+class SlowRequestSampler:
+    """
+    Opt-in sampling profiler for the slowest requests.
+
+    A daemon thread wakes every `interval` seconds and records the current
+    stack of each thread that is inside a request. When a request finishes,
+    its samples are kept if it is among the `keep` slowest seen so far, so
+    slowest() shows where those requests actually spent their time.
+    """
+
+    def __init__(self, keep=10, interval=0.005, depth=30):
+        self.keep = keep
+        self.interval = interval
+        self.depth = depth
+        self._active = {}   # thread id -> request record
+        self._slowest = []  # min-heap of (duration, seq, record)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='wakey-sampler', daemon=True)
+        self._thread.start()
+
+    def begin(self, method, path):
+        with self._lock:
+            self._active[threading.get_ident()] = {'method': method, 'path': path, 'samples': Counter()}
+
+    def end(self, route, duration):
+        with self._lock:
+            record = self._active.pop(threading.get_ident(), None)
+            if record is None:
+                return
+            record['route'] = route
+            entry = (duration, next(self._seq), record)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, record in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        record['samples'][self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        """Innermost `depth` frames as 'file:line function', outermost first."""
+        stack = []
+        while frame is not None and len(stack) < self.depth:
+            code = frame.f_code
+            stack.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def slowest(self, stacks=5):
+        """Slowest requests first, each with its most frequently sampled stacks."""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+            return [{
+                'route': record['route'],
+                'method': record['method'],
+                'path': record['path'],
+                'durationMs': round(duration * 1000, 3),
+                'samples': sum(record['samples'].values()),
+                'stacks': [{'count': count, 'stack': list(stack)}
+                           for stack, count in record['samples'].most_common(stacks)]
+            } for duration, _, record in entries]
@@ -0,0 +1,364 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from store import Store, user_pair
+
+# Export order: every record's references (users, friendships) come before it
+TABLES = Store.TABLES
+BATCH = 1000
+
+_encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+# ============================
+# 📤 EXPORT
+# ============================
+
+def export_chunks(store, tables=TABLES, batch=BATCH):
+    """
+    A dump as NDJSON, one chunk per `batch` records. Lines use the journal's
+    format, {"t": table, "r": record}, so a dump also replays as a journal.
+    """
+    for table in tables:
+        for records in store.iter_records(table, batch):
+            if records:
+                yield "".join(_encode({'t': table, 'r': record}) + "\n" for record in records)
+
+
+def json_chunks(store, batch=BATCH):
+    """The data.json layout, streamed the same way (what /api/debug returns)."""
+    yield "{"
+    for position, table in enumerate(TABLES):
+        yield f'{"," if position else ""}"{table}":['
+        separator = ""
+        for records in store.iter_records(table, batch):
+            if records:
+                yield separator + ",".join(_encode(record) for record in records)
+                separator = ","
+        yield "]"
+    yield "}\n"
+
+# ============================
+# 📥 IMPORT
+# ============================
+
+class Ledger:
+    """
+    What an import has accepted so far, kept in a scratch SQLite file rather
+    than in memory: ids per table, username keys and friend pairs. Each
+    batch is checked with a few indexed lookups, so memory stays at one
+    batch however large the dump is.
+    """
+
+    def __init__(self):
+        self._dir = tempfile.mkdtemp(prefix='wakey-import-')
+        self.conn = sqlite3.connect(os.path.join(self._dir, 'ledger.db'))
+        self.conn.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE ids (t TEXT, id INTEGER, PRIMARY KEY (t, id)) WITHOUT ROWID;
+            CREATE TABLE usernames (key TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE pairs (a INTEGER, b INTEGER, PRIMARY KEY (a, b)) WITHOUT ROWID;
+        """)
+
+    def _present(self, sql, values):
+        values = list(set(values))
+        found = set()
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            found.update(row[0] for row in self.conn.execute(sql.format(','.join('?' * len(chunk))), chunk))
+        return found
+
+    def known_ids(self, table, ids):
+        return self._present(f"SELECT id FROM ids WHERE t = '{table}' AND id IN ({{}})", ids)
+
+    def known_usernames(self, keys):
+        return self._present("SELECT key FROM usernames WHERE key IN ({})", keys)
+
+    def known_pairs(self, pairs):
+        found = set()
+        for a, b in set(pairs):
+            if self.conn.execute("SELECT 1 FROM pairs WHERE a = ? AND b = ?", (a, b)).fetchone():
+                found.add((a, b))
+        return found
+
+    def add(self, table, records):
+        self.conn.executemany("INSERT INTO ids VALUES (?, ?)", ((table, r['id']) for r in records))
+        if table == 'users':
+            self.conn.executemany("INSERT INTO usernames VALUES (?)", ((r['username'].casefold(),) for r in records))
+        elif table == 'friendships':
+            self.conn.executemany("INSERT INTO pairs VALUES (?, ?)",
+                                  (user_pair(r['user1Id'], r['user2Id']) for r in records))
+
+    def close(self):
+        self.conn.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def _partners(table, record):
+    """
+    Users a record links its first user to: [toUserId] or [user2Id], a
+    group alarm's members other than its creator, or None if those
+    aren't user ids.
+    """
+    if table == 'friendRequests':
+        return [record['toUserId']]
+    if table != 'alarms' or 'members' not in record:
+        return [record['user2Id']]
+    if not all(type(m) is str and m.isdigit() for m in record['members']):
+        return None
+    return [int(m) for m in record['members'] if int(m) != record['user1Id']]
+
+
+# Fields each table's records need, and their types
+REQUIRED = {
+    'users': {'id': int, 'username': str, 'password': str},
+    'friendRequests': {'id': int, 'fromUserId': int, 'toUserId': int, 'status': str},
+    'friendships': {'id': int, 'user1Id': int, 'user2Id': int},
+    'alarms': {'id': int, 'user1Id': int, 'user2Id': int, 'time': str},
+}
+# A group alarm has members instead of a user2Id
+GROUP_ALARM_REQUIRED = {'id': int, 'user1Id': int, 'members': dict, 'time': str}
+
+
+class Importer:
+    """
+    Feeds NDJSON dump lines into a target in batches of up to `batch`
+    records of one table, checking each batch against everything accepted
+    before it: ids are unique per table, usernames are unique, friend
+    requests and friendships reference existing users, and alarms
+    reference existing friendships (a group alarm, one between its creator
+    and every other member). A record that fails is rejected (and
+    reported) without stopping the import, unless strict.
+
+    The target takes insert_many(table, records) and commit() after each
+    batch: a SqliteStore, or a SnapshotWriter for data.json. Since
+    references are checked against what came before, dumps must list users
+    first and friendships before alarms, which export_chunks() does.
+    """
+
+    MAX_ERRORS = 20  # reported individually; the rest are only counted
+
+    def __init__(self, target, batch=BATCH, strict=False):
+        self.target = target
+        self.batch = batch
+        self.strict = strict
+        self.ledger = Ledger()
+        self._table = None
+        self._pending = []  # (line number, record) of self._table
+        self.imported = dict.fromkeys(TABLES, 0)
+        self.rejected = 0
+        self.errors = []
+
+    def _reject(self, line_number, reason):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"line {line_number}: {reason}")
+        if self.strict:
+            raise ValueError(f"line {line_number}: {reason}")
+
+    def feed(self, line_number, line):
+        if not line.strip():
+            return
+        try:
+            entry = json.loads(line)
+            table, record = entry['t'], entry['r']
+        except (ValueError, TypeError, KeyError):
+            self._reject(line_number, "not a dump line")
+            return
+        if table not in REQUIRED or not isinstance(record, dict):
+            self._reject(line_number, f"unknown table {table!r}")
+            return
+        required = GROUP_ALARM_REQUIRED if table == 'alarms' and 'members' in record else REQUIRED[table]
+        missing = [field for field, kind in required.items() if type(record.get(field)) is not kind]
+        if missing:
+            self._reject(line_number, f"{table} record without valid {', '.join(missing)}")
+            return
+        if table != self._table:
+            self.flush()
+            self._table = table
+        self._pending.append((line_number, record))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def feed_lines(self, lines):
+        for line_number, line in enumerate(lines, 1):
+            self.feed(line_number, line)
+
+    def flush(self):
+        if not self._pending:
+            return
+        table, pending = self._table, self._pending
+        self._pending = []
+        accepted = []
+        for line_number, record, reason in self._check(table, pending):
+            if reason is None:
+                accepted.append(record)
+            else:
+                self._reject(line_number, reason)
+        if accepted:
+            self.target.insert_many(table, accepted)
+            self.target.commit()
+            self.ledger.add(table, accepted)
+            self.imported[table] += len(accepted)
+
+    def _check(self, table, pending):
+        """(line number, record, reason or None) for each pending record."""
+        ledger = self.ledger
+        taken = ledger.known_ids(table, [r['id'] for _, r in pending])
+        partners = [None] * len(pending)
+        if table == 'users':
+            names = ledger.known_usernames([r['username'].casefold() for _, r in pending])
+        else:
+            a_field, b_field = ('fromUserId', 'toUserId') if table == 'friendRequests' else ('user1Id', 'user2Id')
+            partners = [_partners(table, r) for _, r in pending]
+            users = ledger.known_ids('users', [u for (_, r), others in zip(pending, partners)
+                                               for u in (r[a_field], *(others or ()))])
+            if table != 'friendRequests':
+                pairs = ledger.known_pairs([user_pair(r['user1Id'], b) for (_, r), others in zip(pending, partners)
+                                            for b in others or ()])
+
+        for (line_number, record), others in zip(pending, partners):
+            reason = None
+            if record['id'] in taken:
+                reason = f"duplicate {table} id {record['id']}"
+            elif table == 'users':
+                key = record['username'].casefold()
+                if key in names:
+                    reason = f"duplicate username {record['username']!r}"
+                names.add(key)
+            elif others is None:
+                reason = f"group alarm {record['id']} with invalid members"
+            elif table == 'alarms' and 'members' in record:
+                a = record['user1Id']
+                unknown = [u for u in (a, *others) if u not in users]
+                if str(a) not in record['members']:
+                    reason = f"group alarm {record['id']} whose creator {a} isn't a member"
+                elif unknown:
+                    reason = f"unknown user {unknown[0]}"
+                else:
+                    strangers = [b for b in others if user_pair(a, b) not in pairs]
+                    if strangers:
+                        reason = f"group alarm by user {a} with {strangers[0]}, who aren't friends"
+            else:
+                a, b = record[a_field], record[b_field]
+                pair = user_pair(a, b)
+                if a == b:
+                    reason = f"{table} record between user {a} and itself"
+                elif a not in users or b not in users:
+                    reason = f"unknown user {b if a in users else a}"
+                elif table == 'friendships' and pair in pairs:
+                    reason = f"duplicate friendship {a}-{b}"
+                elif table == 'alarms' and pair not in pairs:
+                    reason = f"alarm between users {a} and {b}, who aren't friends"
+                if reason is None and table == 'friendships':
+                    pairs.add(pair)
+            if reason is None:
+                taken.add(record['id'])
+            yield line_number, record, reason
+
+    def finish(self):
+        """Flush the last batch; returns the import report."""
+        self.flush()
+        self.ledger.close()
+        return {'imported': self.imported, 'rejected': self.rejected, 'errors': self.errors}
+
+
+class SnapshotWriter:
+    """
+    Import target that writes a data.json without holding it: each table
+    streams into its own spool file, and close() stitches them into the
+    data.json layout (temp file, fsync, rename, like write_snapshot()).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._dir = tempfile.mkdtemp(prefix='wakey-import-', dir=os.path.dirname(os.path.abspath(path)))
+        self._spools = {table: open(os.path.join(self._dir, table), 'w+') for table in TABLES}
+        self._counts = dict.fromkeys(TABLES, 0)
+
+    def insert_many(self, table, records):
+        spool = self._spools[table]
+        for record in records:
+            spool.write(("," if self._counts[table] else "") + "\n    " + _encode(record))
+            self._counts[table] += 1
+
+    def commit(self):
+        """Nothing to do per batch: close() makes the file."""
+
+    def close(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as out:
+            out.write("{")
+            for position, table in enumerate(TABLES):
+                out.write(f'{"," if position else ""}\n  "{table}": [')
+                spool = self._spools[table]
+                spool.seek(0)
+                shutil.copyfileobj(spool, out)
+                out.write("\n  ]" if self._counts[table] else "]")
+            out.write("\n}\n")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        self.abort()
+
+    def abort(self):
+        for spool in self._spools.values():
+            spool.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def open_source(path):
+    """A store to export from: SQLite pages through the file, a snapshot (plus journal) is loaded."""
+    if path.endswith(('.db', '.sqlite')):
+        from sqlite_store import SqliteStore
+        return SqliteStore(path)
+    from journal import Journal
+    # A binary snapshot loads lazily: cold records stay in the mapped file
+    store, _ = Journal(path, binary=path.endswith('.wkb')).replay(Store())
+    return store
+
+
+if __name__ == '__main__':
+    # Usage: python ndjson.py export data.json|data.wkb|wakey.db [dump.ndjson]
+    #        python ndjson.py import dump.ndjson data.json|wakey.db [--strict]
+    # Import replaces the target's contents; run it with the server stopped.
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    command = args[0] if args else None
+    if command == 'export' and len(args) in (2, 3):
+        out = open(args[2], 'w') if len(args) == 3 else sys.stdout
+        written = 0
+        for chunk in export_chunks(open_source(args[1])):
+            out.write(chunk)
+            written += chunk.count("\n")
+        out.flush()
+        print(f"✅ Exported {written} records", file=sys.stderr)
+    elif command == 'import' and len(args) == 3:
+        source, target_path = args[1], args[2]
+        if target_path.endswith(('.db', '.sqlite')):
+            from sqlite_store import SqliteStore
+            target = SqliteStore(target_path)
+            target.load({})  # start empty
+        else:
+            target = SnapshotWriter(target_path)
+        importer = Importer(target, strict='--strict' in sys.argv)
+        try:
+            with open(source) as f:
+                importer.feed_lines(f)
+            report = importer.finish()
+        except ValueError as e:
+            if isinstance(target, SnapshotWriter):
+                target.abort()
+            sys.exit(f"❌ Import failed: {e}")
+        if isinstance(target, SnapshotWriter):
+            target.close()
+            for leftover in (target_path + '.log', target_path + '.log.compacting'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)  # would replay stale changes over the import
+        print(json.dumps(report, indent=2))
+    else:
+        sys.exit("usage: python ndjson.py export SOURCE [OUT] | python ndjson.py import DUMP TARGET [--strict]")
@@ -0,0 +1,182 @@
+from concurrent.futures import ProcessPoolExecutor
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+# scrypt where OpenSSL provides it, else PBKDF2; both verify either way.
+# About 50ms of CPU per hash on a server core: the point, and the reason
+# PasswordHasher keeps it off request threads.
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+
+def hash_password(password):
+    """Salted hash string: scrypt$n$r$p$salt$key or pbkdf2_sha256$iterations$salt$key."""
+    salt = os.urandom(SALT_BYTES)
+    if hasattr(hashlib, 'scrypt'):
+        key = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                             dklen=KEY_BYTES, maxmem=256 * SCRYPT_N * SCRYPT_R)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+    key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PBKDF2_ITERATIONS, KEY_BYTES)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(key)}"
+
+
+def _parse(stored):
+    """(algorithm, params, salt, key) of a hash string, or None for a legacy plaintext password."""
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            return 'scrypt', tuple(map(int, parts[1:4])), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            return 'pbkdf2_sha256', (int(parts[1]),), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+    except ValueError:
+        pass
+    return None
+
+
+def is_hashed(stored):
+    return _parse(stored) is not None
+
+
+def needs_rehash(stored):
+    """True for plaintext and for hashes made with other parameters than hash_password() uses now."""
+    parsed = _parse(stored)
+    if parsed is None:
+        return True
+    if hasattr(hashlib, 'scrypt'):
+        return parsed[:2] != ('scrypt', (SCRYPT_N, SCRYPT_R, SCRYPT_P))
+    return parsed[:2] != ('pbkdf2_sha256', (PBKDF2_ITERATIONS,))
+
+
+def verify_password(stored, password):
+    """Constant-time check of password against a stored hash (or legacy plaintext)."""
+    parsed = _parse(stored)
+    if parsed is None:
+        return hmac.compare_digest(stored.encode(), password.encode())
+    algorithm, params, salt, key = parsed
+    if algorithm == 'scrypt':
+        n, r, p = params
+        candidate = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                   dklen=len(key), maxmem=256 * n * r)
+    else:
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params[0], len(key))
+    return hmac.compare_digest(candidate, key)
+
+
+# Checked when the username doesn't exist, so a miss costs as much as a wrong password
+DUMMY_HASH = hash_password('wakey-dummy-password')
+
+
+def _worker_init(parent_pid):
+    """Pool workers leave Ctrl-C to the server and exit if it dies without shutting them down."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, name='wakey-hasher-watch', daemon=True).start()
+
+
+class HasherBusy(Exception):
+    """More hash jobs are waiting than PasswordHasher allows."""
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded pool of worker processes, so
+    a burst of logins burns those CPUs instead of holding the GIL against
+    every other route. At most `max_pending` jobs wait at once; beyond that
+    callers get HasherBusy rather than an ever-growing queue. workers=0
+    does the work inline on the calling thread.
+
+    Workers are forked by start(), which should run before the process
+    starts any thread: forking later could copy a lock some other thread
+    holds.
+    """
+
+    def __init__(self, workers, max_pending, wait=5.0):
+        self.workers = workers
+        self.wait = wait  # seconds a caller waits for a free slot
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self.jobs = 0
+        self.rejected = 0
+
+    def start(self):
+        if self.workers > 0 and 'fork' in multiprocessing.get_all_start_methods():
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'),
+                                             initializer=_worker_init, initargs=(os.getpid(),))
+            self._pool.submit(int).result()  # forks every worker now
+        return self
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            self.rejected += 1
+            raise HasherBusy()
+        try:
+            self.jobs += 1
+            if self._pool is None:
+                return function(*args)
+            return self._pool.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def verify(self, stored, password):
+        if not is_hashed(stored):
+            return verify_password(stored, password)  # legacy plaintext: nothing to offload
+        return self._run(verify_password, stored, password)
+
+    def stats(self):
+        return {'workers': self.workers if self._pool else 0, 'jobs': self.jobs, 'rejected': self.rejected}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def migrate(path):
+    """
+    Hash every plaintext password in a data.json (after folding in its
+    journal), using all CPUs. Returns how many changed.
+    """
+    from journal import Journal, read_snapshot, write_snapshot
+
+    journal = Journal(path)
+    journal.compact()
+    journal.close()
+    db = read_snapshot(path)
+    plain = [user for user in db['users'] if not is_hashed(user['password'])]
+    if plain:
+        with ProcessPoolExecutor() as pool:
+            for user, hashed in zip(plain, pool.map(hash_password, [u['password'] for u in plain], chunksize=64)):
+                user['password'] = hashed
+        write_snapshot(path, db)
+    return len(plain)
+
+
+if __name__ == '__main__':
+    # Usage: python passwords.py migrate [data.json]
+    # Offline, with the server stopped; a running server hashes plaintext
+    # passwords on each user's next login anyway.
+    import sys
+
+    if sys.argv[1:2] != ['migrate']:
+        sys.exit("usage: python passwords.py migrate [data.json]")
+    path = sys.argv[2] if len(sys.argv) > 2 else 'data.json'
+    print(f"✅ Hashed {migrate(path)} plaintext passwords in {path}")
@@ -0,0 +1,560 @@
+from array import array
+from collections.abc import Mapping
+from datetime import date
+import re
+import sys
+import threading
+
+from agent import WakeyAgent
+
+# ============================
+# 🕐 TIMESTAMPS
+# ============================
+#
+# createdAt strings come in two shapes: datetime.isoformat() from this
+# server ('2026-01-05T07:00:00.123456', no fraction when it's zero) and JS
+# toISOString() ('2026-01-05T07:00:00.123Z') from older data. Both pack
+# into one int, microseconds since the epoch times two plus a shape bit,
+# and unpack to the exact original string. Parsing works on fixed slices
+# with the date part cached, since datetime round trips cost several
+# microseconds per record at load and dump time.
+
+_ISO, _JS = 0, 1
+_EPOCH = date(1970, 1, 1).toordinal()
+_TIMESTAMP = re.compile(r'\d{4}-\d\d-\d\dT(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d(?:\.\d{6}|\.\d{3}Z)?', re.ASCII)
+_DAY_CACHE_SIZE = 1 << 16
+_days = {}   # 'YYYY-MM-DD' -> days since the epoch
+_dates = {}  # days since the epoch -> 'YYYY-MM-DD'
+
+
+def _day(text):
+    day = _days.get(text)
+    if day is None:
+        try:
+            parsed = date.fromisoformat(text)
+        except ValueError:
+            return None
+        day = parsed.toordinal() - _EPOCH
+        if len(_days) < _DAY_CACHE_SIZE:
+            _days[text] = day
+    return day
+
+
+def _date(day):
+    text = _dates.get(day)
+    if text is None:
+        text = date.fromordinal(day + _EPOCH).isoformat()
+        if len(_dates) < _DAY_CACHE_SIZE:
+            _dates[day] = text
+    return text
+
+
+def pack_time(value):
+    """Integer form of a createdAt string, or None if it wouldn't round-trip."""
+    if type(value) is not str or _TIMESTAMP.fullmatch(value) is None:
+        return None
+    day = _day(value[:10])
+    if day is None:
+        return None
+    clock = int(value[11:13] + value[14:16] + value[17:19])  # HHMMSS
+    seconds = day * 86400 + clock // 10000 * 3600 + clock // 100 % 100 * 60 + clock % 100
+    if len(value) == 24:
+        return (seconds * 1000000 + int(value[20:23]) * 1000) * 2 + _JS
+    if len(value) == 26:
+        micros = int(value[20:26])
+        # isoformat() drops an all-zero fraction, so that string can't come back
+        return (seconds * 1000000 + micros) * 2 + _ISO if micros else None
+    return seconds * 1000000 * 2 + _ISO
+
+
+def unpack_time(packed):
+    micros, shape = divmod(packed, 2)
+    seconds, micros = divmod(micros, 1000000)
+    day, seconds = divmod(seconds, 86400)
+    hours, minutes, seconds = seconds // 3600, seconds // 60 % 60, seconds % 60
+    if shape == _JS:
+        return '%sT%02d:%02d:%02d.%03dZ' % (_date(day), hours, minutes, seconds, micros // 1000)
+    if micros:
+        return '%sT%02d:%02d:%02d.%06d' % (_date(day), hours, minutes, seconds, micros)
+    return '%sT%02d:%02d:%02d' % (_date(day), hours, minutes, seconds)
+
+
+# ============================
+# 🏷️ ENUMS
+# ============================
+
+class _Enum:
+    """
+    Value <-> small int code. An open enum (limit > len(values)) hands new
+    string values the next code, so a sound from older data packs too;
+    values only ever get appended, so codes stay valid for lock-free readers.
+    """
+
+    def __init__(self, values, limit=0):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._limit = limit
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        """Code of value, or None (type() first: True == 1 but isn't a tone)."""
+        if type(value) not in _ENUM_TYPES:
+            return None
+        code = self._codes.get(value)
+        if code is None and type(value) is str and len(self.values) < self._limit:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None and len(self.values) < self._limit:
+                    self.values.append(value)
+                    code = self._codes[value] = len(self.values) - 1
+        return code
+
+
+_ENUM_TYPES = (str, type(None))
+
+SOUNDS = _Enum(('baddie', 'manifestation', 'getshitdone'), limit=256)
+TONES = _Enum((None, 'soft', 'playful', 'strict'))
+AGENT_TONES = _Enum(('', 'soft', 'playful', 'strict'))
+STATUSES = _Enum(('pending', 'accepted', 'rejected'))
+# Indexes into the agent's message tables; 0 is "" (no message)
+MESSAGES = _Enum(WakeyAgent().message_table())
+
+
+# ============================
+# 📦 RECORDS
+# ============================
+#
+# pack(record) returns the compact form of a data.json-shaped dict, or None
+# when the dict has anything the compact form can't reproduce exactly
+# (extra or reordered keys, unexpected types, unknown enum values). Callers
+# then keep the dict itself, so to_dict() output is always byte-for-byte
+# what went in.
+
+class User:
+    """A user: id, username, password and createdAt."""
+
+    __slots__ = ('id', 'username', 'password', 'created')
+    KEYS = ('id', 'username', 'password', 'createdAt')
+
+    def __init__(self, user_id, username, password, created):
+        self.id = user_id
+        self.username = username
+        self.password = password
+        self.created = created
+
+    @classmethod
+    def pack(cls, record):
+        if tuple(record) != cls.KEYS:
+            return None
+        user_id, username, password = record['id'], record['username'], record['password']
+        created = pack_time(record['createdAt'])
+        if type(user_id) is not int or type(username) is not str or type(password) is not str or created is None:
+            return None
+        return cls(user_id, username, password, created)
+
+    def to_dict(self):
+        return {'id': self.id, 'username': self.username, 'password': self.password,
+                'createdAt': unpack_time(self.created)}
+
+
+class FriendRequest:
+    """A friend request; status is an index into STATUSES."""
+
+    __slots__ = ('id', 'from_id', 'to_id', 'status', 'created')
+    KEYS = ('id', 'fromUserId', 'toUserId', 'status', 'createdAt')
+
+    def __init__(self, request_id, from_id, to_id, status, created):
+        self.id = request_id
+        self.from_id = from_id
+        self.to_id = to_id
+        self.status = status
+        self.created = created
+
+    @classmethod
+    def pack(cls, record):
+        if tuple(record) != cls.KEYS:
+            return None
+        request_id, from_id, to_id = record['id'], record['fromUserId'], record['toUserId']
+        status = STATUSES.code(record['status'])
+        created = pack_time(record['createdAt'])
+        if type(request_id) is not int or type(from_id) is not int or type(to_id) is not int \
+                or status is None or created is None:
+            return None
+        return cls(request_id, from_id, to_id, status, created)
+
+    def to_dict(self):
+        return {'id': self.id, 'fromUserId': self.from_id, 'toUserId': self.to_id,
+                'status': STATUSES.values[self.status], 'createdAt': unpack_time(self.created)}
+
+
+def _acknowledged_code(acknowledged, u1, u2):
+    """Code of an acknowledged list in _ACKNOWLEDGED, or None."""
+    if type(acknowledged) is not list or len(acknowledged) > 2:
+        return None
+    if any(type(uid) is not int for uid in acknowledged):
+        return None
+    if not acknowledged:
+        return 0
+    if len(acknowledged) == 1:
+        return 1 if acknowledged[0] == u1 else 2 if acknowledged[0] == u2 else None
+    if acknowledged[0] == u1 and acknowledged[1] == u2:
+        return 3
+    return 4 if acknowledged[0] == u2 and acknowledged[1] == u1 else None
+
+
+# acknowledged lists an alarm can have, by code
+_ACKNOWLEDGED = (
+    lambda u1, u2: [],
+    lambda u1, u2: [u1],
+    lambda u1, u2: [u2],
+    lambda u1, u2: [u1, u2],
+    lambda u1, u2: [u2, u1],
+)
+
+
+class Alarm:
+    """
+    A shared alarm. sound, tone and agentTone are enum codes, the agent
+    messages are indexes into MESSAGES, snoozeCount is one int per
+    participant, and acknowledged/cancelledBy are codes relative to the two
+    participants. time and label repeat a lot, so they are interned.
+    """
+
+    __slots__ = ('id', 'user1', 'user2', 'time', 'label', 'sound', 'tone', 'active', 'snoozes1', 'snoozes2',
+                 'acknowledged', 'cancelled_by', 'message', 'agent_tone', 'notify', 'created')
+    KEYS = ('id', 'user1Id', 'user2Id', 'time', 'label', 'sound', 'tone', 'isActive', 'snoozeCount',
+            'acknowledged', 'cancelledBy', 'agentMessage', 'agentTone', 'cancelNotifyMessage', 'createdAt')
+
+    @classmethod
+    def pack(cls, record):
+        keys = tuple(record)
+        if keys != cls.KEYS:
+            return GroupAlarm.pack(record) if keys == GroupAlarm.KEYS else None
+        u1, u2 = record['user1Id'], record['user2Id']
+        if type(record['id']) is not int or type(u1) is not int or type(u2) is not int or u1 == u2:
+            return None
+        time, label, active = record['time'], record['label'], record['isActive']
+        if type(time) is not str or type(label) is not str or type(active) is not bool:
+            return None
+
+        snoozes = record['snoozeCount']
+        if type(snoozes) is not dict or tuple(snoozes) != (str(u1), str(u2)):
+            return None
+        snoozes1, snoozes2 = snoozes.values()
+        if type(snoozes1) is not int or type(snoozes2) is not int:
+            return None
+
+        acknowledged_code = _acknowledged_code(record['acknowledged'], u1, u2)
+        cancelled_by = record['cancelledBy']
+        if cancelled_by is None:
+            cancelled_code = 0
+        elif type(cancelled_by) is int and cancelled_by in (u1, u2):
+            cancelled_code = 1 if cancelled_by == u1 else 2
+        else:
+            cancelled_code = None
+
+        codes = (
+            SOUNDS.code(record['sound']),
+            TONES.code(record['tone']),
+            MESSAGES.code(record['agentMessage']),
+            AGENT_TONES.code(record['agentTone']),
+            MESSAGES.code(record['cancelNotifyMessage']),
+            pack_time(record['createdAt']),
+        )
+        if acknowledged_code is None or cancelled_code is None or None in codes:
+            return None
+
+        alarm = cls.__new__(cls)
+        alarm.id, alarm.user1, alarm.user2 = record['id'], u1, u2
+        alarm.time, alarm.label, alarm.active = sys.intern(time), sys.intern(label), active
+        alarm.snoozes1, alarm.snoozes2 = snoozes1, snoozes2
+        alarm.acknowledged, alarm.cancelled_by = acknowledged_code, cancelled_code
+        alarm.sound, alarm.tone, alarm.message, alarm.agent_tone, alarm.notify, alarm.created = codes
+        return alarm
+
+    def to_dict(self):
+        u1, u2 = self.user1, self.user2
+        return {
+            'id': self.id,
+            'user1Id': u1,
+            'user2Id': u2,
+            'time': self.time,
+            'label': self.label,
+            'sound': SOUNDS.values[self.sound],
+            'tone': TONES.values[self.tone],
+            'isActive': self.active,
+            'snoozeCount': {str(u1): self.snoozes1, str(u2): self.snoozes2},
+            'acknowledged': _ACKNOWLEDGED[self.acknowledged](u1, u2),
+            'cancelledBy': (None, u1, u2)[self.cancelled_by],
+            'agentMessage': MESSAGES.values[self.message],
+            'agentTone': AGENT_TONES.values[self.agent_tone],
+            'cancelNotifyMessage': MESSAGES.values[self.notify],
+            'createdAt': unpack_time(self.created)
+        }
+
+
+class GroupAlarm:
+    """
+    A group alarm. Member ids, snooze counts and acknowledgement order (0
+    for not yet, else 1 for the first to acknowledge, 2 for the next...)
+    are three parallel arrays in member order; cancelledBy is 0 or a
+    member's position + 1. The other fields are coded as in Alarm.
+    """
+
+    __slots__ = ('id', 'creator', 'members', 'snoozes', 'acks', 'ack_count', 'time', 'label', 'sound', 'tone',
+                 'active', 'snooze_total', 'cancelled_by', 'message', 'agent_tone', 'notify', 'created')
+    KEYS = ('id', 'user1Id', 'user2Id', 'members', 'ackCount', 'time', 'label', 'sound', 'tone', 'isActive',
+            'snoozeTotal', 'cancelledBy', 'agentMessage', 'agentTone', 'cancelNotifyMessage', 'createdAt')
+
+    @classmethod
+    def pack(cls, record):
+        if tuple(record) != cls.KEYS or record['user2Id'] is not None:
+            return None
+        creator, members = record['user1Id'], record['members']
+        if type(record['id']) is not int or type(creator) is not int or type(members) is not dict \
+                or len(members) > 0xffff:
+            return None
+        time, label, active = record['time'], record['label'], record['isActive']
+        ack_count, snooze_total = record['ackCount'], record['snoozeTotal']
+        if type(time) is not str or type(label) is not str or type(active) is not bool \
+                or type(ack_count) is not int or type(snooze_total) is not int:
+            return None
+
+        ids, snoozes, acks = array('q'), array('l'), array('H')
+        for key, state in members.items():
+            # Keys must be what str() gives back, and state [snoozes, ack]
+            if type(key) is not str or not key.isdigit() or str(int(key)) != key \
+                    or type(state) is not list or len(state) != 2:
+                return None
+            snooze, ack = state
+            if type(snooze) is not int or type(ack) is not int or not 0 <= ack <= 0xffff:
+                return None
+            try:
+                ids.append(int(key))
+                snoozes.append(snooze)
+            except OverflowError:
+                return None
+            acks.append(ack)
+
+        cancelled_by = record['cancelledBy']
+        if cancelled_by is None:
+            cancelled_code = 0
+        elif type(cancelled_by) is int and str(cancelled_by) in members:
+            cancelled_code = ids.index(cancelled_by) + 1
+        else:
+            return None
+
+        codes = (
+            SOUNDS.code(record['sound']),
+            TONES.code(record['tone']),
+            MESSAGES.code(record['agentMessage']),
+            AGENT_TONES.code(record['agentTone']),
+            MESSAGES.code(record['cancelNotifyMessage']),
+            pack_time(record['createdAt']),
+        )
+        if None in codes:
+            return None
+
+        alarm = cls.__new__(cls)
+        alarm.id, alarm.creator = record['id'], creator
+        alarm.members, alarm.snoozes, alarm.acks, alarm.ack_count = ids, snoozes, acks, ack_count
+        alarm.time, alarm.label, alarm.active = sys.intern(time), sys.intern(label), active
+        alarm.snooze_total, alarm.cancelled_by = snooze_total, cancelled_code
+        alarm.sound, alarm.tone, alarm.message, alarm.agent_tone, alarm.notify, alarm.created = codes
+        return alarm
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user1Id': self.creator,
+            'user2Id': None,
+            'members': {str(m): [s, a] for m, s, a in zip(self.members, self.snoozes, self.acks)},
+            'ackCount': self.ack_count,
+            'time': self.time,
+            'label': self.label,
+            'sound': SOUNDS.values[self.sound],
+            'tone': TONES.values[self.tone],
+            'isActive': self.active,
+            'snoozeTotal': self.snooze_total,
+            'cancelledBy': self.members[self.cancelled_by - 1] if self.cancelled_by else None,
+            'agentMessage': MESSAGES.values[self.message],
+            'agentTone': AGENT_TONES.values[self.agent_tone],
+            'cancelNotifyMessage': MESSAGES.values[self.notify],
+            'createdAt': unpack_time(self.created)
+        }
+
+
+def unpack(value):
+    """A stored value (compact record or plain dict) as a data.json-shaped dict."""
+    return value if type(value) is dict else value.to_dict()
+
+
+def is_active(value):
+    """isActive of a stored alarm without unpacking it."""
+    return value.get('isActive', True) if type(value) is dict else value.active
+
+
+def alarm_members(alarm):
+    """User ids taking part in an alarm (a data.json-shaped dict): the two partners, or a group's members."""
+    members = alarm.get('members')
+    if members is not None:
+        return [int(member) for member in members]
+    return [alarm['user1Id'], alarm['user2Id']]
+
+
+# ============================
+# 🗄️ TABLES
+# ============================
+
+class RecordTable(Mapping):
+    """
+    id -> record mapping that stores records in their compact form.
+
+    Records go in and come out as data.json-shaped dicts: setting packs the
+    dict (or keeps it as is if it doesn't pack), reading builds a fresh dict.
+    Friendships never leave the store; alarms and requests can (archiving).
+    stored_values() hands out the stored values themselves, for scans that
+    only need a field or two (see is_active()).
+    """
+
+    def __init__(self, record_type):
+        self._type = record_type
+        self._records = {}
+
+    def __setitem__(self, record_id, record):
+        packed = self._type.pack(record)
+        self._records[record_id] = record if packed is None else packed
+
+    def __delitem__(self, record_id):
+        del self._records[record_id]
+
+    def __getitem__(self, record_id):
+        return unpack(self._records[record_id])
+
+    def get(self, record_id, default=None):
+        value = self._records.get(record_id)
+        return default if value is None else unpack(value)
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def clear(self):
+        self._records.clear()
+
+    def values(self):
+        return [unpack(v) for v in list(self._records.values())]
+
+    def items(self):
+        return [(k, unpack(v)) for k, v in list(self._records.items())]
+
+    def stored_values(self):
+        return list(self._records.values())
+
+
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+class FriendshipTable(Mapping):
+    """
+    Columnar friendships: id, user1Id, user2Id and createdAt live in four
+    int64 arrays, one row per friendship in insertion order, so a friendship
+    costs 32 bytes instead of a dict.
+
+    Ids are normally handed out densely (id == row + 1), which needs no
+    lookup structure at all; any other id goes through `_rows`. A record
+    that doesn't fit the columns keeps a row of zeros and is stored as is
+    in `_dicts`. Rows are only appended or overwritten, so readers can go
+    without a lock.
+    """
+
+    KEYS = ('id', 'user1Id', 'user2Id', 'createdAt')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._ids, self._user1, self._user2, self._created = (array('q') for _ in range(4))
+        self._rows = {}   # id -> row, for ids that aren't row + 1
+        self._dicts = {}  # row -> record that doesn't fit the columns
+
+    def _row(self, friendship_id):
+        if type(friendship_id) is int:
+            row = friendship_id - 1
+            if 0 <= row < len(self._ids) and self._ids[row] == friendship_id:
+                return row
+        return self._rows.get(friendship_id)
+
+    def _columns(self, record):
+        """(id, user1Id, user2Id, packed createdAt), or None if it doesn't fit."""
+        if tuple(record) != self.KEYS:
+            return None
+        columns = (record['id'], record['user1Id'], record['user2Id'], pack_time(record['createdAt']))
+        for value in columns:
+            if type(value) is not int or not _INT64[0] <= value <= _INT64[1]:
+                return None
+        return columns
+
+    def __setitem__(self, friendship_id, record):
+        columns = self._columns(record)
+        row = self._row(friendship_id)
+        if row is None:
+            # Readers size rows by _ids, so it grows last
+            row = len(self._ids)
+            if columns is None:
+                self._dicts[row] = record
+            if friendship_id != row + 1 or columns is None:
+                self._rows[friendship_id] = row
+            record_id, user1, user2, created = columns or (0, 0, 0, 0)
+            self._user1.append(user1)
+            self._user2.append(user2)
+            self._created.append(created)
+            self._ids.append(record_id)
+        elif columns is None:
+            self._dicts[row] = record
+        else:
+            self._ids[row], self._user1[row], self._user2[row], self._created[row] = columns
+            self._dicts.pop(row, None)
+
+    def _record(self, row):
+        if self._dicts:
+            record = self._dicts.get(row)
+            if record is not None:
+                return record
+        return {'id': self._ids[row], 'user1Id': self._user1[row], 'user2Id': self._user2[row],
+                'createdAt': unpack_time(self._created[row])}
+
+    def __getitem__(self, friendship_id):
+        row = self._row(friendship_id)
+        if row is None:
+            raise KeyError(friendship_id)
+        return self._record(row)
+
+    def get(self, friendship_id, default=None):
+        row = self._row(friendship_id)
+        return default if row is None else self._record(row)
+
+    def __contains__(self, friendship_id):
+        return self._row(friendship_id) is not None
+
+    def __iter__(self):
+        for row in range(len(self._ids)):
+            record = self._dicts.get(row)
+            yield self._ids[row] if record is None else record['id']
+
+    def __len__(self):
+        return len(self._ids)
+
+    def values(self):
+        return [self._record(row) for row in range(len(self._ids))]
+
+    def items(self):
+        return [(record['id'], record) for record in self.values()]
+
+    def stored_values(self):
+        return self.values()
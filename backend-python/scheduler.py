@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import threading
+import time
+
+
+def next_fire_time(hhmm, now=None):
+    """Epoch seconds of the next local occurrence of an 'HH:MM' alarm time."""
+    now = now if now is not None else time.time()
+    try:
+        hours, minutes = (int(part) for part in hhmm.split(':')[:2])
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    current = datetime.fromtimestamp(now)
+    candidate = current.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if candidate.timestamp() <= now:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+class AlarmScheduler:
+    """
+    Server-side alarm timer backed by a min-heap keyed by next fire time.
+
+    Each alarm id maps to its live heap entry; re-arming or dropping an alarm
+    just marks the old entry dead (lazy deletion), so schedule/snooze/cancel
+    are O(log n) and the worker only wakes when the earliest live entry is due.
+    Listeners are called as listener(alarm_id, reason, fire_at) from the
+    worker thread, reason being 'scheduled' or 'snooze'.
+    """
+
+    SNOOZE_MINUTES = 5
+
+    def __init__(self, clock=time.time, snooze_minutes=SNOOZE_MINUTES):
+        self.clock = clock
+        self.snooze_seconds = snooze_minutes * 60
+        self._heap = []           # [fire_at, seq, alarm_id, reason, alive]
+        self._entries = {}        # alarm id -> live heap entry
+        self._times = {}          # alarm id -> 'HH:MM' for daily re-arming
+        self._seq = itertools.count()
+        self._dead = 0            # invalidated entries still sitting in the heap
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._thread = None
+        self._stopped = False
+        self.fired = 0
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    # ============================
+    # 📅 ARMING
+    # ============================
+
+    def _push(self, alarm_id, fire_at, reason):
+        self._kill(self._entries.get(alarm_id))
+        entry = [fire_at, next(self._seq), alarm_id, reason, True]
+        self._entries[alarm_id] = entry
+        heapq.heappush(self._heap, entry)
+        # Only wake the worker if this entry became the new head
+        if self._heap[0] is entry:
+            self._cond.notify()
+
+    def schedule(self, alarm):
+        """Arm an active alarm for its next daily occurrence."""
+        if not alarm.get('isActive', True):
+            self.cancel(alarm['id'])
+            return
+        fire_at = next_fire_time(alarm.get('time'), self.clock())
+        if fire_at is None:
+            return
+        with self._cond:
+            self._times[alarm['id']] = alarm['time']
+            self._push(alarm['id'], fire_at, 'scheduled')
+
+    def schedule_many(self, alarms):
+        """Bulk-load alarms at startup: one O(n) heapify instead of n pushes."""
+        now = self.clock()
+        fire_times = {}  # alarms cluster on popular minutes: compute each once
+        with self._cond:
+            for alarm in alarms:
+                if not alarm.get('isActive', True):
+                    continue
+                hhmm = alarm.get('time')
+                if hhmm not in fire_times:
+                    fire_times[hhmm] = next_fire_time(hhmm, now)
+                fire_at = fire_times[hhmm]
+                if fire_at is None:
+                    continue
+                self._kill(self._entries.get(alarm['id']))
+                entry = [fire_at, next(self._seq), alarm['id'], 'scheduled', True]
+                self._entries[alarm['id']] = entry
+                self._times[alarm['id']] = alarm['time']
+                self._heap.append(entry)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def snooze(self, alarm_id):
+        """Re-arm an alarm to fire again after the snooze interval."""
+        with self._cond:
+            if alarm_id in self._times:
+                self._push(alarm_id, self.clock() + self.snooze_seconds, 'snooze')
+
+    def cancel(self, alarm_id):
+        """Drop an acknowledged or cancelled alarm."""
+        with self._cond:
+            entry = self._entries.pop(alarm_id, None)
+            self._times.pop(alarm_id, None)
+            self._kill(entry)
+
+    def next_due(self):
+        """(fire_at, alarm_id) of the earliest live entry, or None."""
+        with self._cond:
+            self._drop_dead()
+            if not self._heap:
+                return None
+            return self._heap[0][0], self._heap[0][2]
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ============================
+    # ⏰ FIRING
+    # ============================
+
+    def _kill(self, entry):
+        if entry is None:
+            return
+        entry[4] = False
+        self._dead += 1
+        # Snooze-heavy traffic leaves dead entries mid-heap; rebuild once
+        # they outnumber the live ones so the heap stays O(live alarms).
+        if self._dead > len(self._entries) + 1024:
+            self._heap = [e for e in self._heap if e[4]]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _drop_dead(self):
+        while self._heap and not self._heap[0][4]:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+
+    def pop_due(self, now=None):
+        """Pop every live entry due at or before now and re-arm it for tomorrow."""
+        now = now if now is not None else self.clock()
+        due = []
+        fire_times = {}
+        with self._cond:
+            while self._heap:
+                self._drop_dead()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                fire_at, _, alarm_id, reason, _ = heapq.heappop(self._heap)
+                del self._entries[alarm_id]
+                due.append((alarm_id, reason, fire_at))
+                # Daily alarms stay armed until acknowledged or cancelled
+                hhmm = self._times[alarm_id]
+                if hhmm not in fire_times:
+                    fire_times[hhmm] = next_fire_time(hhmm, now)
+                next_at = fire_times[hhmm]
+                if next_at is not None:
+                    self._push(alarm_id, next_at, 'scheduled')
+        self.fired += len(due)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    self._drop_dead()
+                    if self._heap and self._heap[0][0] <= self.clock():
+                        break
+                    timeout = self._heap[0][0] - self.clock() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+            for alarm_id, reason, fire_at in self.pop_due():
+                for listener in self._listeners:
+                    try:
+                        listener(alarm_id, reason, fire_at)
+                    except Exception as e:
+                        print(f"⚠️  Warning: alarm listener failed for alarm {alarm_id}: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="wakey-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
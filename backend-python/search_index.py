@@ -0,0 +1,148 @@
+import base64
+import bisect
+import json
+import threading
+
+
+MAX_GRAM = 3
+# Sorts after any character that appears in a real username
+_PREFIX_END = '\U0010ffff'
+
+
+def encode_cursor(tier, key, user_id):
+    raw = json.dumps([tier, key, user_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+class InvalidCursor(ValueError):
+    """A ?cursor= that encode_cursor() didn't produce."""
+
+
+def decode_cursor(cursor):
+    """Return (tier, key, user_id), None for a missing cursor; raises InvalidCursor for a garbled one."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        tier, key, user_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor) from None
+    # Checked here so a crafted cursor can't reach the comparisons below
+    if tier not in ('p', 's') or type(key) is not str or type(user_id) is not int \
+            or not -2 ** 63 <= user_id < 2 ** 63:
+        raise InvalidCursor(cursor)
+    return tier, key, user_id
+
+
+def _grams(key):
+    """All 1-, 2- and 3-grams of a casefolded username."""
+    return {key[i:i + n] for n in range(1, MAX_GRAM + 1) for i in range(len(key) - n + 1)}
+
+
+class UsernameIndex:
+    """
+    Username search index: a sorted (key, id) list for prefix ranges plus
+    n-gram posting lists (ids ascending) for substring matches.
+
+    Results come in two tiers. Prefix matches come first, in key order, so an
+    exact match is always at the top. Then other substring matches come in id
+    order. Pages are cut with an opaque cursor, so each page costs
+    O(log n + page size), not O(users).
+
+    Inserts shift the sorted list and posting lists in place, so add() and
+    search() both hold the index lock; a search holds it for one page's
+    worth of work.
+    """
+
+    def __init__(self):
+        self._sorted = []    # [(casefolded username, id)]
+        self._keys = {}      # id -> casefolded username
+        self._postings = {}  # gram -> [id, ...] ascending
+        self._unsorted = False
+        self._lock = threading.Lock()
+
+    def add(self, user_id, username, bulk=False):
+        """bulk=True defers sorting to finish_bulk() (for loading many users)."""
+        key = username.casefold()
+        with self._lock:
+            if self._keys.get(user_id) == key:
+                return
+            self._keys[user_id] = key
+            if bulk:
+                self._sorted.append((key, user_id))
+                self._unsorted = True
+            else:
+                bisect.insort(self._sorted, (key, user_id))
+            for gram in _grams(key):
+                ids = self._postings.setdefault(gram, [])
+                if not ids or ids[-1] < user_id:
+                    ids.append(user_id)  # signups arrive in id order
+                else:
+                    bisect.insort(ids, user_id)
+
+    def finish_bulk(self):
+        with self._lock:
+            if self._unsorted:
+                self._sorted.sort()
+                self._unsorted = False
+
+    def clear(self):
+        with self._lock:
+            self._sorted.clear()
+            self._keys.clear()
+            self._postings.clear()
+
+    def _candidates(self, needle):
+        """Posting list that must contain every user whose key contains needle."""
+        if len(needle) <= MAX_GRAM:
+            return self._postings.get(needle, [])
+        grams = [needle[i:i + MAX_GRAM] for i in range(len(needle) - MAX_GRAM + 1)]
+        return min((self._postings.get(g, []) for g in grams), key=len)
+
+    def search(self, query, exclude_id=None, limit=20, cursor=None):
+        """Return ([user ids], next cursor or None)."""
+        needle = query.casefold()
+        if not needle:
+            return [], None
+        after = decode_cursor(cursor)
+        with self._lock:
+            found = self._page(needle, exclude_id, limit, after)
+
+        next_cursor = None
+        if len(found) > limit:
+            found = found[:limit]
+            next_cursor = encode_cursor(*found[-1])
+        return [user_id for _, _, user_id in found], next_cursor
+
+    def _page(self, needle, exclude_id, limit, after):
+        """Up to limit + 1 (tier, key, id) matches after the cursor; the extra one means there is a next page."""
+        found = []
+
+        if after is None or after[0] == 'p':
+            if after is None:
+                start = bisect.bisect_left(self._sorted, (needle,))
+            else:
+                start = bisect.bisect_right(self._sorted, (after[1], after[2]))
+            end = bisect.bisect_left(self._sorted, (needle + _PREFIX_END,))
+            for i in range(start, end):
+                key, user_id = self._sorted[i]
+                if user_id != exclude_id:
+                    found.append(('p', key, user_id))
+                    if len(found) > limit:
+                        break
+            after_id = None
+        else:
+            after_id = after[2]
+
+        if len(found) > limit:
+            return found  # the prefix tier filled the page: no substring scan
+        ids = self._candidates(needle)
+        start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+        for i in range(start, len(ids)):
+            user_id = ids[i]
+            key = self._keys[user_id]
+            if needle in key and not key.startswith(needle) and user_id != exclude_id:
+                found.append(('s', key, user_id))
+                if len(found) > limit:
+                    break
+        return found
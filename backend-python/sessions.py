@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+
+class SessionTokens:
+    """
+    Signed bearer tokens issued at login:
+    "<user id>.<generation>.<expires>.<nonce>.<sig>", sig being an
+    HMAC-SHA256 of the rest under the server secret.
+
+    Checking a token is one dict lookup once it has been seen; a token this
+    process hasn't seen yet (issued before a restart, or by another worker
+    with the same secret) is verified by its signature and then cached.
+
+    `generation(user_id)` reads the user's session generation from the
+    shared store; a token is only good while it carries the current one,
+    so ending a user's sessions (bumping it) reaches every worker and
+    survives restarts. Without it every token is generation 0.
+    """
+
+    SIZE = 100000
+    TTL = 30 * 24 * 3600  # seconds
+
+    def __init__(self, secret, ttl=TTL, size=SIZE, generation=None):
+        self.secret = secret
+        self.ttl = ttl
+        self.size = size
+        self.generation = generation or (lambda user_id: 0)
+        self._cache = {}  # token -> (user id, generation, expires)
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id):
+        expires = int(time.time()) + self.ttl
+        generation = self.generation(user_id)
+        payload = f"{user_id}.{generation}.{expires}.{secrets.token_hex(8)}"
+        token = f"{payload}.{self._sign(payload)}"
+        self._remember(token, (user_id, generation, expires))
+        return token
+
+    def _remember(self, token, entry):
+        with self._lock:
+            if len(self._cache) >= self.size:
+                # Dicts keep insertion order: drop the oldest entry
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[token] = entry
+
+    def _forget(self, token):
+        with self._lock:
+            self._cache.pop(token, None)
+
+    def check(self, token):
+        """The user id a token was issued to, or None if it is forged, expired or revoked."""
+        entry = self._cache.get(token)
+        if entry is None:
+            entry = self._verify(token)
+            if entry is None:
+                return None
+            self._remember(token, entry)
+        user_id, generation, expires = entry
+        if expires <= time.time() or self.generation(user_id) != generation:
+            self._forget(token)
+            return None
+        return user_id
+
+    def _verify(self, token):
+        """(user id, generation, expires) of a token with a good signature, else None."""
+        payload, _, signature = token.rpartition('.')
+        # As bytes: compare_digest() raises on a str with non-ASCII characters
+        if not hmac.compare_digest(self._sign(payload).encode(), signature.encode()):
+            return None
+        try:
+            user_id, generation, expires, _ = payload.split('.')
+            return int(user_id), int(generation), int(expires)
+        except ValueError:
+            return None
+
+    def revoke(self, token):
+        """
+        Drop a token from this process's cache and return the user it was
+        issued to (None if it is no good). Ending the session everywhere is
+        the caller's bump of that user's generation in the shared store.
+        """
+        user_id = self.check(token)
+        self._forget(token)
+        return user_id
+
+    def cached(self):
+        return len(self._cache)
@@ -0,0 +1,289 @@
+from collections.abc import MutableMapping
+import json
+import mmap
+import os
+import struct
+import threading
+
+from records import unpack
+
+# ============================
+# 📐 FORMAT
+# ============================
+#
+#   MAGIC
+#   per table    hot segment: one JSON array of the records decoded at load
+#                cold records: repeated u32 length + compact JSON of one record
+#   index        per table: u16 name length + name + u64 count
+#                + u64 hot segment offset + u64 hot segment length + count entries
+#   footer       u64 index offset + MAGIC
+#
+# Every record is addressable on its own: its index entry has the offset and
+# length of its JSON. Hot records (users, pending requests, active alarms)
+# are needed at startup anyway, so they sit together and decode in one
+# json.loads call. Each entry also carries the fields the Store's secondary
+# indexes need (alarm participants, friendship pair, request from/to), so
+# cold records are never decoded until someone reads them.
+
+MAGIC = b'WAKEYBS1'
+TABLES = ('users', 'friendRequests', 'friendships', 'alarms')
+
+_LENGTH = struct.Struct('<I')
+_TABLE_HEADER = struct.Struct('<QQQ')  # count, hot offset, hot length
+_FOOTER = struct.Struct('<Q8s')
+# id, offset, length, a, b, flags
+ENTRY = struct.Struct('<qQIqqB')
+
+LIVE = 1   # active alarm / pending request: decoded eagerly at load
+EAGER = 2  # a or b isn't an int (a group alarm has no user2Id), so the index fields can't be trusted
+
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+def _index_fields(table, record):
+    """(a, b, flags) stored in the index entry for a record."""
+    if table == 'friendRequests':
+        a, b = record.get('fromUserId'), record.get('toUserId')
+        flags = LIVE if record.get('status') == 'pending' else 0
+    elif table == 'friendships':
+        a, b = record.get('user1Id'), record.get('user2Id')
+        flags = 0
+    elif table == 'alarms':
+        a, b = record.get('user1Id'), record.get('user2Id')
+        flags = LIVE if record.get('isActive', True) else 0
+    else:
+        a, b, flags = 0, 0, LIVE
+    for value in (a, b, record['id']):
+        if type(value) is not int or not _INT64[0] <= value <= _INT64[1]:
+            return 0, 0, flags | EAGER
+    return a, b, flags
+
+
+def write_binary(path, db):
+    """
+    Write a data.json-shaped dict as a binary snapshot, atomically (temp file,
+    fsync, rename). Returns the number of bytes written.
+    """
+    encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+    tmp_path = path + ".tmp"
+    index = []
+    with open(tmp_path, 'wb', buffering=1 << 20) as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for table in TABLES:
+            encoded = []
+            for record in db.get(table, []):
+                a, b, flags = _index_fields(table, record)
+                encoded.append((record['id'] if not flags & EAGER else 0, a, b, flags, encode(record).encode()))
+            entries = [None] * len(encoded)
+
+            # Hot segment: "[" record "," record ... "]"
+            hot_offset = offset
+            f.write(b'[')
+            offset += 1
+            first = True
+            for i, (record_id, a, b, flags, payload) in enumerate(encoded):
+                if flags & (LIVE | EAGER):
+                    if not first:
+                        f.write(b',')
+                        offset += 1
+                    first = False
+                    f.write(payload)
+                    entries[i] = ENTRY.pack(record_id, offset, len(payload), a, b, flags)
+                    offset += len(payload)
+            f.write(b']')
+            offset += 1
+            hot_length = offset - hot_offset
+
+            for i, (record_id, a, b, flags, payload) in enumerate(encoded):
+                if entries[i] is None:
+                    f.write(_LENGTH.pack(len(payload)))
+                    f.write(payload)
+                    entries[i] = ENTRY.pack(record_id, offset + _LENGTH.size, len(payload), a, b, flags)
+                    offset += _LENGTH.size + len(payload)
+            index.append((table, hot_offset, hot_length, entries))
+
+        index_offset = offset
+        for table, hot_offset, hot_length, entries in index:
+            name = table.encode()
+            f.write(struct.pack('<H', len(name)) + name)
+            f.write(_TABLE_HEADER.pack(len(entries), hot_offset, hot_length))
+            f.write(b''.join(entries))
+        f.write(_FOOTER.pack(index_offset, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    os.replace(tmp_path, path)
+    return written
+
+
+class BinarySnapshot:
+    """
+    A memory-mapped binary snapshot. Opening it reads only the footer and
+    table headers; entries() walks a table's index, hot_records() decodes
+    its hot segment and decode() decodes any single record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Wakey binary snapshot")
+        index_offset, trailer = _FOOTER.unpack_from(self._buffer, len(self._buffer) - _FOOTER.size)
+        if trailer != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        self._tables = {}
+        position = index_offset
+        while position < len(self._buffer) - _FOOTER.size:
+            (name_length,) = struct.unpack_from('<H', self._buffer, position)
+            position += 2
+            name = self._buffer[position:position + name_length].decode()
+            position += name_length
+            count, hot_offset, hot_length = _TABLE_HEADER.unpack_from(self._buffer, position)
+            position += _TABLE_HEADER.size
+            self._tables[name] = (position, count, hot_offset, hot_length)
+            position += count * ENTRY.size
+
+    def count(self, table):
+        return self._tables[table][1] if table in self._tables else 0
+
+    def entries(self, table):
+        """(id, offset, length, a, b, flags) for each record of a table, in table order."""
+        if table not in self._tables:
+            return iter(())
+        start, count, _, _ = self._tables[table]
+        return ENTRY.iter_unpack(memoryview(self._buffer)[start:start + count * ENTRY.size])
+
+    def hot_records(self, table):
+        """The table's LIVE/EAGER records, decoded in one go, in table order."""
+        if table not in self._tables:
+            return []
+        _, _, hot_offset, hot_length = self._tables[table]
+        return json.loads(self._buffer[hot_offset:hot_offset + hot_length])
+
+    def decode(self, offset, length):
+        return json.loads(self._buffer[offset:offset + length])
+
+    def records(self, table):
+        """Every record of a table, decoded, in table order."""
+        hot = iter(self.hot_records(table))
+        for _, offset, length, _, _, flags in self.entries(table):
+            yield next(hot) if flags & (LIVE | EAGER) else self.decode(offset, length)
+
+    def to_dict(self):
+        return {table: list(self.records(table)) for table in TABLES}
+
+
+class _Cold:
+    """Placeholder for a record that is still only bytes in the snapshot."""
+
+    __slots__ = ('offset', 'length')
+
+    def __init__(self, offset, length):
+        self.offset = offset
+        self.length = length
+
+
+class LazyTable(MutableMapping):
+    """
+    id -> record mapping whose cold records stay undecoded in the snapshot
+    until first read (then they are cached like any other record).
+
+    With a `record_type` (see records.py), stored and cached records are
+    kept in its compact form and read back as fresh dicts, like RecordTable.
+
+    values()/items() decode cold records on the fly without caching them,
+    so dumping the table doesn't pull the whole snapshot into memory.
+    stored_values() skips cold records entirely; the Store uses it where
+    only live records matter (active alarms), since cold ones never are.
+    """
+
+    def __init__(self, snapshot, record_type=None):
+        self._snapshot = snapshot
+        self._pack = record_type.pack if record_type is not None else lambda record: None
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def add_cold(self, record_id, offset, length):
+        self._records[record_id] = _Cold(offset, length)
+
+    def is_cold(self, record_id):
+        return type(self._records.get(record_id)) is _Cold
+
+    def __getitem__(self, record_id):
+        value = self._records[record_id]
+        if type(value) is not _Cold:
+            return unpack(value)
+        record = self._snapshot.decode(value.offset, value.length)
+        packed = self._pack(record)
+        with self._lock:
+            # A writer may have stored a newer record meanwhile; keep theirs
+            current = self._records.get(record_id)
+            if current is value:
+                self._records[record_id] = record if packed is None else packed
+                return record
+        return self[record_id]
+
+    def get(self, record_id, default=None):
+        try:
+            return self[record_id]
+        except KeyError:
+            return default
+
+    def peek(self, record_id, default=None):
+        """get() that leaves a cold record cold."""
+        value = self._records.get(record_id)
+        return default if value is None else self._read(value)
+
+    def __setitem__(self, record_id, record):
+        packed = self._pack(record)
+        self._records[record_id] = record if packed is None else packed
+
+    def __delitem__(self, record_id):
+        del self._records[record_id]
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def clear(self):
+        self._records.clear()
+
+    def _read(self, value):
+        return self._snapshot.decode(value.offset, value.length) if type(value) is _Cold else unpack(value)
+
+    def values(self):
+        return [self._read(v) for v in list(self._records.values())]
+
+    def items(self):
+        return [(k, self._read(v)) for k, v in list(self._records.items())]
+
+    def stored_values(self):
+        return [v for v in list(self._records.values()) if type(v) is not _Cold]
+
+    def cold_count(self):
+        return sum(1 for v in list(self._records.values()) if type(v) is _Cold)
+
+
+if __name__ == '__main__':
+    # Usage: python snapshot.py to-binary data.json data.wkb
+    #        python snapshot.py to-json data.wkb data.json
+    import sys
+    from journal import read_snapshot, write_snapshot
+    from store import Store
+
+    command, source, target = sys.argv[1:4]
+    if command == 'to-binary':
+        # Through a Store, so legacy duplicate ids are fixed on the way
+        written = write_binary(target, Store(read_snapshot(source), compact=False).to_dict())
+    elif command == 'to-json':
+        written = write_snapshot(target, BinarySnapshot(source).to_dict())
+    else:
+        sys.exit(f"unknown command {command!r}: use to-binary or to-json")
+    print(f"✅ Wrote {target} ({written} bytes)")
@@ -0,0 +1,570 @@
+from datetime import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from store import StorageBackend
+from search_index import decode_cursor, encode_cursor
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    username_key TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS friend_requests (
+    id INTEGER PRIMARY KEY,
+    from_user_id INTEGER NOT NULL,
+    to_user_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_requests_to_status ON friend_requests (to_user_id, status);
+CREATE INDEX IF NOT EXISTS idx_requests_pair_status ON friend_requests (from_user_id, to_user_id, status);
+CREATE TABLE IF NOT EXISTS friendships (
+    id INTEGER PRIMARY KEY,
+    user1_id INTEGER NOT NULL,
+    user2_id INTEGER NOT NULL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_friendships_user1 ON friendships (user1_id, user2_id);
+CREATE INDEX IF NOT EXISTS idx_friendships_user2 ON friendships (user2_id, user1_id);
+CREATE TABLE IF NOT EXISTS alarms (
+    id INTEGER PRIMARY KEY,
+    user1_id INTEGER NOT NULL,
+    user2_id INTEGER NOT NULL,
+    is_active INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alarms_user1 ON alarms (user1_id, is_active);
+CREATE INDEX IF NOT EXISTS idx_alarms_user2 ON alarms (user2_id, is_active);
+CREATE TABLE IF NOT EXISTS alarm_members (
+    user_id INTEGER NOT NULL,
+    alarm_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, alarm_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_alarm_members_alarm ON alarm_members (alarm_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5 (key, tokenize = 'trigram');
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS list_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    list TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    key NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_list_changes_slot ON list_changes (list, user_id, seq);
+CREATE TABLE IF NOT EXISTS list_floors (
+    list TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    floor INTEGER NOT NULL,
+    PRIMARY KEY (list, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_generations (
+    user_id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# prepares each one once per connection and reuses it.
+SQL_USER_BY_ID = "SELECT id, username, password, created_at FROM users WHERE id = ?"
+SQL_USER_BY_KEY = "SELECT id, username, password, created_at FROM users WHERE username_key = ?"
+SQL_INSERT_USER = "INSERT INTO users (id, username, username_key, password, created_at) VALUES (?, ?, ?, ?, ?)"
+SQL_SET_PASSWORD = "UPDATE users SET password = ? WHERE id = ?"
+SQL_SESSION_GENERATION = ("SELECT COALESCE(g.generation, 0) FROM users u "
+                          "LEFT JOIN session_generations g ON g.user_id = u.id WHERE u.id = ?")
+SQL_INSERT_SESSION_GENERATION = "INSERT INTO session_generations (user_id, generation) VALUES (?, ?)"
+SQL_END_SESSIONS = ("INSERT INTO session_generations (user_id, generation) VALUES (?, 1) "
+                    "ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1 RETURNING generation")
+SQL_ALL_USERS = "SELECT id, username, password, created_at FROM users ORDER BY id"
+SQL_INSERT_USER_SEARCH = "INSERT INTO user_search (rowid, key) VALUES (?, ?)"
+SQL_SEARCH_PREFIX = ("SELECT id, username, password, created_at, username_key FROM users "
+                     "WHERE username_key >= ? AND username_key < ? AND username_key > ? AND id != ? "
+                     "ORDER BY username_key LIMIT ?")
+# Trigram FTS handles substrings of 3+ characters; shorter ones walk ids in
+# order, which stops as soon as the page is full.
+SQL_SEARCH_TRIGRAM = ("SELECT u.id, u.username, u.password, u.created_at, u.username_key "
+                      "FROM user_search s JOIN users u ON u.id = s.rowid "
+                      "WHERE s.key MATCH ? AND instr(u.username_key, ?) > 1 AND u.id > ? AND u.id != ? "
+                      "ORDER BY u.id LIMIT ?")
+SQL_SEARCH_SCAN = ("SELECT id, username, password, created_at, username_key FROM users "
+                   "WHERE instr(username_key, ?) > 1 AND id > ? AND id != ? ORDER BY id LIMIT ?")
+
+SQL_REQUEST_BY_ID = "SELECT id, from_user_id, to_user_id, status, created_at FROM friend_requests WHERE id = ?"
+SQL_PENDING_PAIR = ("SELECT 1 FROM friend_requests "
+                    "WHERE from_user_id = ? AND to_user_id = ? AND status = 'pending' LIMIT 1")
+SQL_PENDING_TO = ("SELECT id, from_user_id, to_user_id, status, created_at FROM friend_requests "
+                  "WHERE to_user_id = ? AND status = 'pending' ORDER BY id")
+SQL_INSERT_REQUEST = ("INSERT INTO friend_requests (id, from_user_id, to_user_id, status, created_at) "
+                      "VALUES (?, ?, ?, ?, ?)")
+SQL_SET_REQUEST_STATUS = "UPDATE friend_requests SET status = ? WHERE id = ?"
+SQL_ALL_REQUESTS = "SELECT id, from_user_id, to_user_id, status, created_at FROM friend_requests ORDER BY id"
+
+SQL_ARE_FRIENDS = ("SELECT 1 FROM friendships WHERE (user1_id = ? AND user2_id = ?) "
+                   "OR (user1_id = ? AND user2_id = ?) LIMIT 1")
+SQL_FRIEND_IDS = ("SELECT id, user2_id FROM friendships WHERE user1_id = ? "
+                  "UNION ALL SELECT id, user1_id FROM friendships WHERE user2_id = ? ORDER BY 1")
+SQL_FRIENDS_OF = ("SELECT u.id, u.username, u.password, u.created_at FROM ("
+                  "SELECT id AS fid, user2_id AS friend_id FROM friendships WHERE user1_id = ? "
+                  "UNION ALL SELECT id, user1_id FROM friendships WHERE user2_id = ?) f "
+                  "JOIN users u ON u.id = f.friend_id ORDER BY f.fid")
+SQL_FRIEND_SUGGESTIONS = (
+    "WITH friends(f) AS ("
+    "SELECT user2_id FROM friendships WHERE user1_id = ?1 UNION SELECT user1_id FROM friendships WHERE user2_id = ?1), "
+    "fof(f, c) AS ("
+    "SELECT f, user2_id FROM friends JOIN friendships ON user1_id = f "
+    "UNION SELECT f, user1_id FROM friends JOIN friendships ON user2_id = f) "
+    "SELECT c, COUNT(*) AS mutual FROM fof WHERE c != ?1 AND c NOT IN friends "
+    "AND c NOT IN (SELECT to_user_id FROM friend_requests WHERE from_user_id = ?1 AND status = 'pending') "
+    "AND c NOT IN (SELECT from_user_id FROM friend_requests WHERE to_user_id = ?1 AND status = 'pending') "
+    "GROUP BY c ORDER BY mutual DESC, c LIMIT ?2")
+SQL_INSERT_FRIENDSHIP = "INSERT INTO friendships (id, user1_id, user2_id, created_at) VALUES (?, ?, ?, ?)"
+SQL_ALL_FRIENDSHIPS = "SELECT id, user1_id, user2_id, created_at FROM friendships ORDER BY id"
+
+SQL_ALARM_BY_ID = "SELECT body FROM alarms WHERE id = ?"
+SQL_ALARMS_FOR_USER = ("SELECT id, body FROM alarms WHERE user1_id = ?1 AND is_active >= ?2 "
+                       "UNION SELECT id, body FROM alarms WHERE user2_id = ?1 AND is_active >= ?2 "
+                       "UNION SELECT id, body FROM alarms WHERE id IN "
+                       "(SELECT alarm_id FROM alarm_members WHERE user_id = ?1) AND is_active >= ?2 ORDER BY 1")
+SQL_INSERT_ALARM = "INSERT INTO alarms (id, user1_id, user2_id, is_active, body) VALUES (?, ?, ?, ?, ?)"
+SQL_INSERT_ALARM_MEMBER = "INSERT OR IGNORE INTO alarm_members (user_id, alarm_id) VALUES (?, ?)"
+SQL_UPDATE_ALARM = "UPDATE alarms SET is_active = ?, body = ? WHERE id = ?"
+SQL_ALL_ALARMS = "SELECT body FROM alarms ORDER BY id"
+SQL_ACTIVE_ALARMS = "SELECT body FROM alarms WHERE is_active = 1 ORDER BY id"
+SQL_COUNT_ACTIVE_ALARMS = "SELECT COUNT(*) FROM alarms WHERE is_active = 1"
+# The newest row of a table is never finished: ids come from MAX(id) + 1
+SQL_FINISHED_ALARMS = ("SELECT body FROM alarms WHERE is_active = 0 "
+                       "AND id < (SELECT MAX(id) FROM alarms) ORDER BY id LIMIT ?")
+SQL_ANSWERED_REQUESTS = ("SELECT id, from_user_id, to_user_id, status, created_at FROM friend_requests "
+                         "WHERE status != 'pending' AND id < (SELECT MAX(id) FROM friend_requests) "
+                         "ORDER BY id LIMIT ?")
+# Keyset pages for iter_records(): (id, record fields...) rows after an id
+SQL_PAGE = {
+    'users': "SELECT id, username, password, created_at FROM users WHERE id > ? ORDER BY id LIMIT ?",
+    'friendRequests': ("SELECT id, from_user_id, to_user_id, status, created_at FROM friend_requests "
+                       "WHERE id > ? ORDER BY id LIMIT ?"),
+    'friendships': "SELECT id, user1_id, user2_id, created_at FROM friendships WHERE id > ? ORDER BY id LIMIT ?",
+    'alarms': "SELECT id, body FROM alarms WHERE id > ? ORDER BY id LIMIT ?",
+}
+SQL_DELETE = {'alarms': "DELETE FROM alarms WHERE id = ?", 'friendRequests': "DELETE FROM friend_requests WHERE id = ?"}
+SQL_DELETE_ALARM_MEMBERS = "DELETE FROM alarm_members WHERE alarm_id = ?"
+
+SQL_INSERT_META = "INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)"
+SQL_META = "SELECT value FROM meta WHERE name = ?"
+SQL_INSERT_CHANGE = "INSERT INTO list_changes (list, user_id, key) VALUES (?, ?, ?)"
+SQL_SLOT_VERSION = "SELECT MAX(seq) FROM list_changes WHERE list = ? AND user_id = ?"
+SQL_SLOT_CHANGES = "SELECT seq, key FROM list_changes WHERE list = ? AND user_id = ? AND seq > ? ORDER BY seq"
+SQL_SLOT_FLOOR = "SELECT floor FROM list_floors WHERE list = ? AND user_id = ?"
+# The seq of the newest change past the log size, if the log is that long
+SQL_SLOT_EVICT = ("SELECT seq FROM list_changes WHERE list = ? AND user_id = ? "
+                  "ORDER BY seq DESC LIMIT 1 OFFSET ?")
+SQL_EVICT_CHANGES = "DELETE FROM list_changes WHERE list = ? AND user_id = ? AND seq <= ?"
+SQL_SET_FLOOR = ("INSERT INTO list_floors (list, user_id, floor) VALUES (?, ?, ?) "
+                 "ON CONFLICT (list, user_id) DO UPDATE SET floor = excluded.floor")
+
+
+def _user(row):
+    return {'id': row[0], 'username': row[1], 'password': row[2], 'createdAt': row[3]}
+
+
+def _request(row):
+    return {'id': row[0], 'fromUserId': row[1], 'toUserId': row[2], 'status': row[3], 'createdAt': row[4]}
+
+
+def _friendship(row):
+    return {'id': row[0], 'user1Id': row[1], 'user2Id': row[2], 'createdAt': row[3]}
+
+
+def _alarm_row(alarm):
+    # A group alarm has no user2Id: the column gets the creator, and the
+    # members go in alarm_members
+    user2_id = alarm['user2Id'] if alarm['user2Id'] is not None else alarm['user1Id']
+    return (alarm['id'], alarm['user1Id'], user2_id,
+            1 if alarm.get('isActive', True) else 0, json.dumps(alarm, separators=(',', ':')))
+
+
+def _member_rows(alarms):
+    return ((int(member), alarm['id']) for alarm in alarms for member in alarm.get('members') or ())
+
+
+class SqliteStore(StorageBackend):
+    """
+    SQLite storage backend. Each thread gets its own connection (WAL mode, so
+    readers never block the writer), and several processes can share one
+    database file. Changes made by a request are committed by commit(),
+    which save_db() calls, so each route's writes land in one transaction.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    # ============================
+    # 🔌 CONNECTION POOL
+    # ============================
+
+    def _conn(self):
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def begin(self):
+        """
+        BEGIN IMMEDIATE: take the database write lock before the caller's
+        reads, so no other process can change those rows before commit().
+        """
+        conn = self._conn()
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.commit()
+
+    def rollback(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _one(self, sql, params):
+        return self._conn().execute(sql, params).fetchone()
+
+    def _all(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def _insert(self, sql, params):
+        return self._conn().execute(sql, params).lastrowid
+
+    # ============================
+    # 🔐 USERS
+    # ============================
+
+    def get_user(self, user_id):
+        row = self._one(SQL_USER_BY_ID, (user_id,))
+        return _user(row) if row else None
+
+    def find_user(self, username):
+        row = self._one(SQL_USER_BY_KEY, (username.casefold(),))
+        return _user(row) if row else None
+
+    def add_user(self, username, password):
+        created_at = datetime.now().isoformat()
+        user_id = self._insert(SQL_INSERT_USER, (None, username, username.casefold(), password, created_at))
+        self._conn().execute(SQL_INSERT_USER_SEARCH, (user_id, username.casefold()))
+        return {'id': user_id, 'username': username, 'password': password, 'createdAt': created_at}
+
+    def set_password(self, user_id, password):
+        self._conn().execute(SQL_SET_PASSWORD, (password, user_id))
+        return self.get_user(user_id)
+
+    def session_generation(self, user_id):
+        row = self._one(SQL_SESSION_GENERATION, (user_id,))
+        return row[0] if row else None
+
+    def end_sessions(self, user_id):
+        return self._one(SQL_END_SESSIONS, (user_id,))[0]
+
+    def search_users(self, query, exclude_id=None, limit=20, cursor=None):
+        needle = query.casefold()
+        if not needle:
+            return [], None
+        after = decode_cursor(cursor)
+        exclude = exclude_id if exclude_id is not None else -1
+        found = []  # (tier, row)
+
+        if after is None or after[0] == 'p':
+            after_key = after[1] if after else ''
+            rows = self._all(SQL_SEARCH_PREFIX, (needle, needle + '\U0010ffff', after_key, exclude, limit + 1))
+            found.extend(('p', row) for row in rows)
+            after_id = 0
+        else:
+            after_id = after[2]
+
+        if len(found) <= limit:
+            remaining = limit + 1 - len(found)
+            if len(needle) >= 3:
+                match = '"' + needle.replace('"', '""') + '"'
+                rows = self._all(SQL_SEARCH_TRIGRAM, (match, needle, after_id, exclude, remaining))
+            else:
+                rows = self._all(SQL_SEARCH_SCAN, (needle, after_id, exclude, remaining))
+            found.extend(('s', row) for row in rows)
+
+        next_cursor = None
+        if len(found) > limit:
+            found = found[:limit]
+            tier, row = found[-1]
+            next_cursor = encode_cursor(tier, row[4], row[0])
+        return [_user(row) for _, row in found], next_cursor
+
+    # ============================
+    # 👥 FRIEND REQUESTS
+    # ============================
+
+    def get_friend_request(self, request_id):
+        row = self._one(SQL_REQUEST_BY_ID, (request_id,))
+        return _request(row) if row else None
+
+    def has_pending_request(self, from_user_id, to_user_id):
+        return self._one(SQL_PENDING_PAIR, (from_user_id, to_user_id)) is not None
+
+    def pending_requests_for(self, user_id):
+        return [_request(row) for row in self._all(SQL_PENDING_TO, (user_id,))]
+
+    def add_friend_request(self, from_user_id, to_user_id):
+        created_at = datetime.now().isoformat()
+        request_id = self._insert(SQL_INSERT_REQUEST, (None, from_user_id, to_user_id, 'pending', created_at))
+        return {'id': request_id, 'fromUserId': from_user_id, 'toUserId': to_user_id,
+                'status': 'pending', 'createdAt': created_at}
+
+    def set_request_status(self, req, status):
+        self._conn().execute(SQL_SET_REQUEST_STATUS, (status, req['id']))
+        req['status'] = status
+        return req
+
+    # ============================
+    # 🤝 FRIENDSHIPS
+    # ============================
+
+    def are_friends(self, a, b):
+        return self._one(SQL_ARE_FRIENDS, (a, b, b, a)) is not None
+
+    def friend_ids(self, user_id):
+        return list(dict.fromkeys(row[1] for row in self._all(SQL_FRIEND_IDS, (user_id, user_id))))
+
+    def friends_of(self, user_id):
+        seen = {}
+        for row in self._all(SQL_FRIENDS_OF, (user_id, user_id)):
+            seen.setdefault(row[0], _user(row))
+        return list(seen.values())
+
+    def friend_suggestions(self, user_id, limit):
+        return [(row[0], row[1]) for row in self._all(SQL_FRIEND_SUGGESTIONS, (user_id, limit))]
+
+    def add_friendship(self, user1_id, user2_id):
+        created_at = datetime.now().isoformat()
+        friendship_id = self._insert(SQL_INSERT_FRIENDSHIP, (None, user1_id, user2_id, created_at))
+        return {'id': friendship_id, 'user1Id': user1_id, 'user2Id': user2_id, 'createdAt': created_at}
+
+    # ============================
+    # ⏰ ALARMS
+    # ============================
+
+    def get_alarm(self, alarm_id):
+        row = self._one(SQL_ALARM_BY_ID, (alarm_id,))
+        return json.loads(row[0]) if row else None
+
+    def alarms_for_user(self, user_id, active_only=True):
+        floor = 1 if active_only else 0
+        return [json.loads(row[1]) for row in self._all(SQL_ALARMS_FOR_USER, (user_id, floor))]
+
+    def add_alarm(self, fields):
+        # The id lives inside the JSON body too: let SQLite allocate it, then
+        # write the body (safe across processes sharing the file).
+        alarm = {'id': None, **fields}
+        row = _alarm_row(alarm)
+        alarm['id'] = self._insert(SQL_INSERT_ALARM, row[:4] + ('{}',))
+        self._conn().executemany(SQL_INSERT_ALARM_MEMBER, _member_rows([alarm]))
+        return self.update_alarm(alarm)
+
+    def update_alarm(self, alarm):
+        row = _alarm_row(alarm)
+        self._conn().execute(SQL_UPDATE_ALARM, (row[3], row[4], row[0]))
+        return alarm
+
+    def active_alarms(self):
+        return [json.loads(row[0]) for row in self._all(SQL_ACTIVE_ALARMS)]
+
+    def active_alarm_count(self):
+        return self._conn().execute(SQL_COUNT_ACTIVE_ALARMS).fetchone()[0]
+
+    def all_alarms(self):
+        return [json.loads(row[0]) for row in self._all(SQL_ALL_ALARMS)]
+
+    # ============================
+    # 🗄️ ARCHIVE TIER
+    # ============================
+
+    def finished_records(self, limit):
+        found = [('alarms', json.loads(row[0])) for row in self._all(SQL_FINISHED_ALARMS, (limit,))]
+        if len(found) < limit:
+            found.extend(('friendRequests', _request(row))
+                         for row in self._all(SQL_ANSWERED_REQUESTS, (limit - len(found),)))
+        return found
+
+    def remove(self, table, record_ids):
+        conn = self._conn()
+        conn.executemany(SQL_DELETE[table], ((record_id,) for record_id in record_ids))
+        if table == 'alarms':
+            conn.executemany(SQL_DELETE_ALARM_MEMBERS, ((record_id,) for record_id in record_ids))
+
+    # ============================
+    # 💾 WHOLE DATABASE
+    # ============================
+
+    def load(self, db):
+        """Import a data.json-shaped dict (replaces existing rows)."""
+        conn = self._conn()
+        with conn:
+            for table in ('users', 'user_search', 'session_generations', 'friend_requests', 'friendships',
+                          'alarms', 'alarm_members'):
+                conn.execute(f"DELETE FROM {table}")
+            for table in ('users', 'friendRequests', 'friendships', 'alarms'):
+                self.insert_many(table, db.get(table, []))
+
+    def insert_many(self, table, records):
+        """Insert data.json-shaped records into a table (in the caller's transaction)."""
+        conn = self._conn()
+        if table == 'users':
+            users = list(records)
+            conn.executemany(SQL_INSERT_USER, (
+                (u['id'], u['username'], u['username'].casefold(), u['password'], u.get('createdAt'))
+                for u in users
+            ))
+            conn.executemany(SQL_INSERT_USER_SEARCH, ((u['id'], u['username'].casefold()) for u in users))
+            conn.executemany(SQL_INSERT_SESSION_GENERATION,
+                             ((u['id'], u['sessionGen']) for u in users if u.get('sessionGen')))
+        elif table == 'friendRequests':
+            conn.executemany(SQL_INSERT_REQUEST, (
+                (r['id'], r['fromUserId'], r['toUserId'], r['status'], r.get('createdAt')) for r in records
+            ))
+        elif table == 'friendships':
+            conn.executemany(SQL_INSERT_FRIENDSHIP, (
+                (f['id'], f['user1Id'], f['user2Id'], f.get('createdAt')) for f in records
+            ))
+        else:
+            alarms = list(records)
+            conn.executemany(SQL_INSERT_ALARM, (_alarm_row(a) for a in alarms))
+            conn.executemany(SQL_INSERT_ALARM_MEMBER, _member_rows(alarms))
+
+    def iter_records(self, table, batch=1000):
+        """Lists of up to `batch` records of one table in id order, one keyset page each."""
+        decode = {'users': _user, 'friendRequests': _request, 'friendships': _friendship,
+                  'alarms': lambda row: json.loads(row[1])}[table]
+        after = -2 ** 63
+        while True:
+            rows = self._all(SQL_PAGE[table], (after, batch))
+            if not rows:
+                return
+            yield [decode(row) for row in rows]
+            after = rows[-1][0]
+
+    def to_dict(self):
+        return {
+            "users": [_user(row) for row in self._all(SQL_ALL_USERS)],
+            "friendRequests": [_request(row) for row in self._all(SQL_ALL_REQUESTS)],
+            "friendships": [_friendship(row) for row in self._all(SQL_ALL_FRIENDSHIPS)],
+            "alarms": [json.loads(row[0]) for row in self._all(SQL_ALL_ALARMS)]
+        }
+
+    def counts(self):
+        conn = self._conn()
+        return {
+            'users': conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            'friendRequests': conn.execute("SELECT COUNT(*) FROM friend_requests").fetchone()[0],
+            'friendships': conn.execute("SELECT COUNT(*) FROM friendships").fetchone()[0],
+            'alarms': conn.execute("SELECT COUNT(*) FROM alarms").fetchone()[0]
+        }
+
+
+class SqliteVersionTracker:
+    """
+    sync.VersionTracker kept in the database, for processes sharing one
+    SQLite file: every process then hands out and checks the same
+    versions, so one never answers 304 (or an empty delta) for a change
+    another made. Versions are "<epoch>.<seq>" with seq from the change
+    log's AUTOINCREMENT and epoch random per database file.
+    """
+
+    LOG_SIZE = 256
+
+    def __init__(self, store, log_size=LOG_SIZE):
+        self._store = store
+        self.log_size = log_size
+        conn = store._conn()
+        with conn:
+            conn.execute(SQL_INSERT_META, ('versionEpoch', os.urandom(4).hex()))
+        self.epoch = conn.execute(SQL_META, ('versionEpoch',)).fetchone()[0]
+
+    def _token(self, seq):
+        return f"{self.epoch}.{seq}"
+
+    def _parse(self, token):
+        epoch, _, seq = (token or '').partition('.')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _seq(self, conn, list_name, user_id):
+        return conn.execute(SQL_SLOT_VERSION, (list_name, user_id)).fetchone()[0] or 0
+
+    def bump(self, list_name, user_ids, key):
+        """Record that item `key` of each user's list changed (in its own transaction, after the change committed)."""
+        conn = self._store._conn()
+        with conn:
+            for user_id in set(user_ids):
+                conn.execute(SQL_INSERT_CHANGE, (list_name, user_id, key))
+                evict = conn.execute(SQL_SLOT_EVICT, (list_name, user_id, self.log_size)).fetchone()
+                if evict is not None:
+                    conn.execute(SQL_EVICT_CHANGES, (list_name, user_id, evict[0]))
+                    conn.execute(SQL_SET_FLOOR, (list_name, user_id, evict[0]))
+
+    def version(self, list_name, user_id):
+        return self._token(self._seq(self._store._conn(), list_name, user_id))
+
+    def changed_since(self, list_name, user_id, since):
+        """Like VersionTracker.changed_since(), read in one transaction."""
+        since_seq = self._parse(since)
+        conn = self._store._conn()
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")  # one snapshot for the version, floor and log
+            current = self._seq(conn, list_name, user_id)
+            floor = conn.execute(SQL_SLOT_FLOOR, (list_name, user_id)).fetchone()
+            if since_seq is None or since_seq < (floor[0] if floor else 0) or since_seq > current:
+                return None, self._token(current)
+            keys = {}
+            for seq, key in conn.execute(SQL_SLOT_CHANGES, (list_name, user_id, since_seq)).fetchall():
+                keys[key] = seq
+        return sorted(keys, key=keys.get), self._token(current)
+
+
+if __name__ == '__main__':
+    # Usage: python sqlite_store.py data.json wakey.db
+    from store import Store
+    from journal import read_snapshot
+
+    source, target = sys.argv[1], sys.argv[2]
+    # Going through Store renumbers legacy duplicate ids the same way the
+    # JSON backend does, so both backends see the same records.
+    db = Store(read_snapshot(source), compact=False).to_dict()
+    sqlite_store = SqliteStore(target)
+    sqlite_store.load(db)
+    print(f"✅ Imported {sqlite_store.counts()} into {target}")
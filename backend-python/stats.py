@@ -0,0 +1,370 @@
+from array import array
+from bisect import bisect_left
+import gc
+import heapq
+import threading
+
+from store import user_pair
+
+# Leaderboard orderings: ?by= name -> UserStats attribute, highest first
+LEADERBOARD_METRICS = {
+    'streak': 'streak',
+    'bestStreak': 'best_streak',
+    'wakeUps': 'wake_ups',
+    'firstToWake': 'first_to_wake',
+    'snoozes': 'snoozes',
+}
+
+
+class UserStats:
+    """
+    One user's running totals over every alarm they take part in.
+
+    A wake-up is an alarm the user acknowledged; "first to wake" counts
+    alarms everyone (both partners, or the whole group) acknowledged where
+    this user did so first. Streaks
+    run over finished (inactive) alarms in alarm id order: streak is the
+    number of wake-ups since the last finished alarm the user didn't
+    acknowledge, best_streak the longest such run. Finished alarms' ids and
+    outcomes are kept in two flat arrays, so an alarm that finishes after a
+    newer one (or changes outcome) is slotted in and the streaks recounted.
+    """
+
+    __slots__ = ('alarms', 'finished', 'wake_ups', 'missed', 'snoozes', 'first_to_wake',
+                 'streak', 'best_streak', '_ids', '_woke', '_sorted')
+
+    def __init__(self):
+        self.alarms = self.finished = self.wake_ups = self.missed = self.snoozes = self.first_to_wake = 0
+        self.streak = self.best_streak = 0
+        self._ids = None   # array('q') of finished alarm ids, ascending
+        self._woke = None  # bytearray, 1 where the user acknowledged that alarm
+        self._sorted = True  # False after append_outcome(), until sort_outcomes()
+
+    def append_outcome(self, alarm_id, woke):
+        """Record an outcome without ordering it (rebuilds; see sort_outcomes())."""
+        if self._ids is None:
+            self._ids, self._woke = array('q'), bytearray()
+        self._ids.append(alarm_id)
+        self._woke.append(woke)
+        self._sorted = False
+
+    def set_outcome(self, alarm_id, woke):
+        if self._ids is None:
+            self._ids, self._woke = array('q'), bytearray()
+        if not self._sorted:
+            self.sort_outcomes()
+        ids = self._ids
+        if not ids or alarm_id > ids[-1]:
+            # The usual case: the newest alarm finished
+            ids.append(alarm_id)
+            self._woke.append(woke)
+            self.streak = self.streak + 1 if woke else 0
+            self.best_streak = max(self.best_streak, self.streak)
+            return
+        i = bisect_left(ids, alarm_id)
+        if i < len(ids) and ids[i] == alarm_id:
+            self._woke[i] = woke
+        else:
+            ids.insert(i, alarm_id)
+            self._woke.insert(i, woke)
+        self.recount()
+
+    def drop_outcome(self, alarm_id):
+        if self._ids is None:
+            return
+        if not self._sorted:
+            self.sort_outcomes()
+        i = bisect_left(self._ids, alarm_id)
+        if i < len(self._ids) and self._ids[i] == alarm_id:
+            del self._ids[i]
+            del self._woke[i]
+            self.recount()
+
+    def sort_outcomes(self):
+        """Put outcomes appended out of order back in id order (after a rebuild)."""
+        if self._ids is None or self._sorted:
+            return
+        order = sorted(range(len(self._ids)), key=self._ids.__getitem__)
+        self._ids = array('q', (self._ids[i] for i in order))
+        self._woke = bytearray(self._woke[i] for i in order)
+        self._sorted = True
+        self.recount()
+
+    def recount(self):
+        streak = best = 0
+        for woke in self._woke or ():
+            streak = streak + 1 if woke else 0
+            best = max(best, streak)
+        self.streak, self.best_streak = streak, best
+
+    def to_dict(self):
+        return {
+            'alarms': self.alarms,
+            'finished': self.finished,
+            'wakeUps': self.wake_ups,
+            'missed': self.missed,
+            'snoozes': self.snoozes,
+            'avgSnoozesPerAlarm': round(self.snoozes / self.alarms, 2) if self.alarms else 0,
+            'firstToWake': self.first_to_wake,
+            'currentStreak': self.streak,
+            'bestStreak': self.best_streak,
+        }
+
+
+class SnoozeStats:
+    """
+    Per-user and per-friend-pair snooze statistics, kept up to date as
+    alarms change instead of recomputed from the alarm history. Group
+    alarms count towards each member's totals but no pair's.
+
+    Every alarm contributes a fixed amount to its partners' totals (its
+    snoozes, whether each acknowledged, who woke first, its outcome once
+    finished), so alarm_changed(old, new) takes the old version's
+    contribution out and puts the new one's in. Callers hold the alarm's
+    entity lock, so per alarm the old versions arrive in order. That makes
+    the running totals equal to what rebuild() computes from all alarms at
+    once, whatever order alarms change in. Archiving an alarm doesn't touch
+    them: it only moves the alarm to another tier.
+
+    A server doesn't rebuild() before it starts serving: it calls
+    start_rebuild() and counts the history in with add_rebuilt() while
+    requests keep changing alarms, and ready turns true at finish_rebuild().
+    """
+
+    def __init__(self):
+        self._users = {}  # user id -> UserStats
+        # user_pair() -> [alarms, then per user: user id, snoozes, wake-ups, first to wake]
+        self._pairs = {}
+        self._lock = threading.Lock()
+        # During a live rebuild: alarm ids counted so far, and ids changed
+        # before the rebuild got to them (their batch copy may be stale)
+        self._counted = None
+        self._stale = None
+        self._ready = threading.Event()
+        self._ready.set()
+
+    @classmethod
+    def rebuild(cls, alarms):
+        """
+        Stats from scratch over an iterable of alarms (the full history).
+        Like Store loads, this pauses the cyclic GC: it allocates a few
+        long-lived objects per user and collections would keep rescanning them.
+        """
+        stats = cls()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with stats._lock:
+                for alarm in alarms:
+                    stats._add(alarm, 1, rebuilding=True)
+                for user_stats in stats._users.values():
+                    user_stats.sort_outcomes()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return stats
+
+    @property
+    def ready(self):
+        """False while a live rebuild is still counting the history."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def start_rebuild(self):
+        """Empty the totals and start a live rebuild (see add_rebuilt())."""
+        with self._lock:
+            self._users, self._pairs = {}, {}
+            self._counted, self._stale = set(), set()
+            self._ready.clear()
+
+    def add_rebuilt(self, alarms, reread=None):
+        """
+        Count a batch of the history into a live rebuild; alarms already
+        counted are skipped. Pass hot alarms with their entity locks held and
+        reread(alarm id) returning an alarm's current version: one changed
+        since the batch was read is counted as it is now. Archived alarms
+        don't change and need neither.
+        """
+        with self._lock:
+            for alarm in alarms:
+                alarm_id = alarm['id']
+                if alarm_id in self._counted:
+                    continue
+                if alarm_id in self._stale:
+                    alarm = reread(alarm_id)
+                    if alarm is None:
+                        continue
+                self._counted.add(alarm_id)
+                self._add(alarm, 1, rebuilding=True)
+
+    def finish_rebuild(self):
+        with self._lock:
+            for user_stats in self._users.values():
+                user_stats.sort_outcomes()
+            self._counted = self._stale = None
+        self._ready.set()
+
+    def _applies_now(self, old, new):
+        """
+        Whether a change lands during a live rebuild. Changes are made under
+        the alarm's entity lock, which add_rebuilt() callers hold too, so a
+        change to a counted alarm is a delta from the version counted. One
+        the rebuild hasn't reached yet is left for it, marked stale so it
+        rereads the alarm. A new alarm counts now unless it already did.
+        """
+        alarm_id = (new or old)['id']
+        if alarm_id in self._counted:
+            return old is not None
+        if old is None:
+            self._counted.add(alarm_id)
+            return True
+        self._stale.add(alarm_id)
+        return False
+
+    def alarm_changed(self, old, new):
+        """Apply one alarm change; old is None for a new alarm."""
+        with self._lock:
+            if self._counted is not None and not self._applies_now(old, new):
+                return
+            if old is not None:
+                self._add(old, -1)
+            if new is not None:
+                self._add(new, 1)
+
+    def _add(self, alarm, sign, rebuilding=False):
+        members = alarm.get('members')
+        first = pair = None
+        if members is None:
+            user1_id, user2_id = alarm['user1Id'], alarm['user2Id']
+            user_ids = (user1_id, user2_id) if user1_id != user2_id else (user1_id,)
+            snooze_counts = alarm.get('snoozeCount') or {}
+            acknowledged = alarm.get('acknowledged') or ()
+            if len(acknowledged) >= 2 and len(user_ids) == 2 and user1_id in acknowledged and user2_id in acknowledged:
+                first = user1_id if acknowledged.index(user1_id) < acknowledged.index(user2_id) else user2_id
+            outcomes = [(user_id, snooze_counts.get(str(user_id), 0), user_id in acknowledged) for user_id in user_ids]
+        else:
+            # [snoozes, ack order] per member; first to wake once everyone has
+            everyone = len(members) >= 2 and alarm.get('ackCount') == len(members)
+            outcomes = []
+            for member, (snoozes, ack) in members.items():
+                outcomes.append((int(member), snoozes, ack > 0))
+                if everyone and ack == 1:
+                    first = int(member)
+        finished = not alarm.get('isActive', True)
+        track_outcome = finished and type(alarm.get('id')) is int
+
+        if members is None and len(user_ids) == 2:
+            key = user_pair(user1_id, user2_id)
+            pair = self._pairs.get(key)
+            if pair is None:
+                pair = self._pairs[key] = [0, user1_id, 0, 0, 0, user2_id, 0, 0, 0]
+            pair[0] += sign
+
+        for user_id, snoozes, woke in outcomes:
+            user_stats = self._users.get(user_id)
+            if user_stats is None:
+                user_stats = self._users[user_id] = UserStats()
+            snoozes *= sign
+            first_to_wake = sign if user_id == first else 0
+            user_stats.alarms += sign
+            user_stats.finished += sign if finished else 0
+            user_stats.wake_ups += sign if woke else 0
+            user_stats.missed += sign if finished and not woke else 0
+            user_stats.snoozes += snoozes
+            user_stats.first_to_wake += first_to_wake
+            if pair is not None:
+                side = 2 if pair[1] == user_id else 6
+                pair[side] += snoozes
+                pair[side + 1] += sign if woke else 0
+                pair[side + 2] += first_to_wake
+            if not track_outcome:
+                continue
+            if rebuilding:
+                user_stats.append_outcome(alarm['id'], woke)
+            elif sign > 0:
+                user_stats.set_outcome(alarm['id'], woke)
+            else:
+                user_stats.drop_outcome(alarm['id'])
+
+    # ============================
+    # 📖 READS
+    # ============================
+
+    def user_stats(self, user_id):
+        with self._lock:
+            user_stats = self._users.get(user_id)
+            return (user_stats or UserStats()).to_dict()
+
+    def pair_stats(self, user_id, friend_id):
+        """Totals over the alarms two users share, per side."""
+        with self._lock:
+            pair = _pair_dict(self._pairs.get(user_pair(user_id, friend_id)))
+        return {'alarms': pair.get('alarms', 0), 'users': {str(side): {
+            'snoozes': pair.get(side, (0, 0, 0))[0],
+            'wakeUps': pair.get(side, (0, 0, 0))[1],
+            'firstToWake': pair.get(side, (0, 0, 0))[2]
+        } for side in (user_id, friend_id)}}
+
+    def leaderboard(self, user_ids, metric, k):
+        """
+        The top k of user_ids by a LEADERBOARD_METRICS value, highest first;
+        ties keep the order of user_ids. Returns [(user id, stats dict)].
+        """
+        attribute = LEADERBOARD_METRICS[metric]
+        with self._lock:
+            users = self._users
+            empty = UserStats()
+            top = heapq.nlargest(k, enumerate(user_ids), key=lambda entry: (
+                getattr(users.get(entry[1], empty), attribute), -entry[0]))
+            return [(user_id, users.get(user_id, empty).to_dict()) for _, user_id in top]
+
+    def snapshot(self):
+        """Every user's and pair's totals (to compare two SnoozeStats)."""
+        with self._lock:
+            return {
+                'users': {user_id: s.to_dict() for user_id, s in self._users.items() if s.alarms},
+                'pairs': {key: _pair_dict(pair) for key, pair in self._pairs.items() if pair[0]},
+            }
+
+
+def _pair_dict(pair):
+    if pair is None:
+        return {}
+    return {'alarms': pair[0], pair[1]: tuple(pair[2:5]), pair[5]: tuple(pair[6:9])}
+
+
+def alarm_history(store, archive=None):
+    """Every alarm there is: the hot store's, then archived ones it no longer has."""
+    hot = store.all_alarms()
+    yield from hot
+    if archive is not None:
+        hot_ids = {alarm['id'] for alarm in hot}
+        for alarm in archive.records('alarms'):
+            if alarm['id'] not in hot_ids:
+                yield alarm
+
+
+if __name__ == '__main__':
+    # Usage: python stats.py data.json|data.wkb|wakey.db [archive_dir] [user_id]
+    # Rebuilds the stats from the full alarm history and prints them
+    # (one user's, or every user's).
+    import json
+    import sys
+    from archive import Archive
+    from journal import Journal
+    from sqlite_store import SqliteStore
+    from store import Store
+
+    source = sys.argv[1]
+    if source.endswith('.db'):
+        store = SqliteStore(source)
+    else:
+        store = Journal(source, binary=source.endswith('.wkb')).replay(Store(compact=False))[0]
+    archive = Archive(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else None
+    stats = SnoozeStats.rebuild(alarm_history(store, archive))
+    if len(sys.argv) > 3:
+        print(json.dumps(stats.user_stats(int(sys.argv[3])), indent=2))
+    else:
+        print(json.dumps(stats.snapshot()['users'], indent=2))
@@ -0,0 +1,672 @@
+from abc import ABC, abstractmethod
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import gc
+import heapq
+import itertools
+import threading
+
+from records import Alarm, FriendRequest, FriendshipTable, RecordTable, User, alarm_members, is_active, unpack
+from search_index import UsernameIndex
+from snapshot import EAGER, LIVE, LazyTable
+
+
+def empty_db():
+    """Return an empty database in the data.json layout."""
+    return {
+        "users": [],
+        "friendRequests": [],
+        "friendships": [],
+        "alarms": []
+    }
+
+
+# drain_changes() entry for a record that left the store (moved to the archive tier)
+Removed = namedtuple('Removed', 'id')
+
+
+def user_pair(a, b):
+    """Order-independent key for a pair of user ids."""
+    if type(a) is int and type(b) is int:
+        return (a, b) if a <= b else (b, a)  # a third the size of a frozenset
+    return frozenset((a, b))
+
+
+class StorageBackend(ABC):
+    """
+    Interface every storage backend implements. Routes only talk to these
+    methods; records go in and come out in the data.json shapes. A backend
+    missing one of the abstract methods fails when it is constructed.
+    """
+
+    # Users
+    @abstractmethod
+    def get_user(self, user_id): ...
+    @abstractmethod
+    def find_user(self, username): ...
+    @abstractmethod
+    def add_user(self, username, password): ...
+    @abstractmethod
+    def set_password(self, user_id, password): ...
+    @abstractmethod
+    def session_generation(self, user_id): ...
+    @abstractmethod
+    def end_sessions(self, user_id): ...
+    @abstractmethod
+    def search_users(self, query, exclude_id=None, limit=20, cursor=None): ...
+
+    # Friend requests
+    @abstractmethod
+    def get_friend_request(self, request_id): ...
+    @abstractmethod
+    def has_pending_request(self, from_user_id, to_user_id): ...
+    @abstractmethod
+    def pending_requests_for(self, user_id): ...
+    @abstractmethod
+    def add_friend_request(self, from_user_id, to_user_id): ...
+    @abstractmethod
+    def set_request_status(self, req, status): ...
+
+    # Friendships
+    @abstractmethod
+    def are_friends(self, a, b): ...
+    @abstractmethod
+    def friend_ids(self, user_id): ...
+    @abstractmethod
+    def friends_of(self, user_id): ...
+    @abstractmethod
+    def add_friendship(self, user1_id, user2_id): ...
+    @abstractmethod
+    def friend_suggestions(self, user_id, limit): ...
+
+    # Alarms
+    @abstractmethod
+    def get_alarm(self, alarm_id): ...
+    @abstractmethod
+    def alarms_for_user(self, user_id, active_only=True): ...
+    @abstractmethod
+    def add_alarm(self, fields): ...
+    @abstractmethod
+    def update_alarm(self, alarm): ...
+    @abstractmethod
+    def active_alarms(self): ...
+    @abstractmethod
+    def all_alarms(self): ...
+
+    def active_alarm_count(self):
+        return len(self.active_alarms())
+
+    # Archive tier
+    @abstractmethod
+    def finished_records(self, limit): ...
+    @abstractmethod
+    def remove(self, table, record_ids): ...
+
+    # Whole database
+    @abstractmethod
+    def load(self, db): ...
+    @abstractmethod
+    def iter_records(self, table, batch=1000): ...
+    @abstractmethod
+    def to_dict(self): ...
+    @abstractmethod
+    def counts(self): ...
+
+    def begin(self):
+        """Start this thread's write transaction now (no-op without transactions)."""
+
+    def commit(self):
+        """Make this thread's changes durable (no-op where save_db() persists)."""
+
+    def rollback(self):
+        """Discard this thread's uncommitted changes (no-op without transactions)."""
+
+    def drain_changes(self):
+        """Changed (table, record or Removed) pairs for journaling; empty if not tracked."""
+        return []
+
+
+class Store(StorageBackend):
+    """
+    Indexed in-memory store for users, friend requests, friendships and alarms.
+    Records go in and come out as plain dicts (same shape as data.json); the
+    indexes make every route lookup O(1) or O(result) instead of a scan over
+    whole tables. With compact=True (the default) the tables keep records in
+    the slotted/columnar forms from records.py and build a fresh dict per read.
+
+    Thread safety: writers serialize on a short internal lock. Readers take no
+    lock. Stored records and per-user index dicts are never mutated after
+    being published; writers swap in updated copies (copy-on-write), so a
+    reader always iterates a consistent snapshot. Callers wanting to modify a
+    record (e.g. WakeyAgent on an alarm) work on a copy and hand it back.
+    """
+
+    TABLES = ('users', 'friendRequests', 'friendships', 'alarms')
+
+    def __init__(self, db=None, compact=True):
+        self.compact = compact
+        if compact:
+            self.users = RecordTable(User)
+            self.friend_requests = RecordTable(FriendRequest)
+            self.friendships = FriendshipTable()
+            self.alarms = RecordTable(Alarm)
+        else:
+            self.users, self.friend_requests, self.friendships, self.alarms = {}, {}, {}, {}
+
+        # Secondary indexes
+        self._username_index = {}    # casefolded username -> user id
+        self._friends = {}           # user id -> {friend id: friendship id}
+        self._friendship_pairs = {}  # frozenset({a, b}) -> friendship id
+        self._user_alarms = {}       # user id -> {alarm id: None} (ordered set)
+        self._pending_to = {}        # to user id -> {request id: None}
+        self._pending_pairs = {}     # (from id, to id) -> request id
+        self._search = UsernameIndex()
+        # table -> {id: None} of inactive alarms and answered requests still
+        # in the store, in the order they finished (for finished_records())
+        self._finished = {'alarms': {}, 'friendRequests': {}}
+
+        # Monotonic id counters (next id to hand out)
+        self._next_ids = {}
+
+        # Records touched since the last drain_changes(), for journaled persistence
+        self._changes = []
+        self._changes_lock = threading.Lock()
+
+        self._lock = threading.RLock()
+        self._bulk = False  # True while loading: nobody is reading yet
+
+        self.load(db or empty_db())
+
+    # ============================
+    # 💾 LOAD / DUMP
+    # ============================
+
+    def load(self, db):
+        """Replace the store contents with a data.json-shaped dict."""
+        with self._lock, self._bulk_loading():
+            self._load(db)
+
+    @contextmanager
+    def _bulk_loading(self):
+        """
+        Index mutations happen in place, the username index sorts once at the
+        end, and the cyclic GC is paused: a load allocates millions of
+        long-lived objects, and every full collection along the way would
+        rescan all of them for nothing.
+        """
+        self._bulk = True
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            yield
+        finally:
+            self._search.finish_bulk()
+            self._bulk = False
+            if gc_was_enabled:
+                gc.enable()
+
+    def _load(self, db):
+        self._reset()
+        loaders = (
+            ('users', self.users, self._index_user),
+            ('friendRequests', self.friend_requests, self._index_friend_request),
+            ('friendships', self.friendships, self._index_friendship),
+            ('alarms', self.alarms, self._index_alarm),
+        )
+        for table, records, index in loaders:
+            # Older files can contain duplicate ids (handed out by len(list) + 1).
+            # Keep every record: duplicates get fresh ids once the table is loaded.
+            duplicates = []
+            for record in db.get(table, []):
+                if record['id'] in records:
+                    duplicates.append(record)
+                else:
+                    index(record)
+            for record in duplicates:
+                record['id'] = self._take_id(table)
+                index(record)
+
+    def load_snapshot(self, snapshot):
+        """
+        Replace the store contents with a snapshot.BinarySnapshot. Users,
+        pending requests, active alarms and any record whose index fields
+        aren't plain ints are decoded now. Everything else (friendships,
+        inactive alarms, answered requests) stays in the mapped file until
+        first read; the secondary indexes come from the snapshot's index.
+        """
+        with self._lock, self._bulk_loading():
+            self._reset()
+            # Cold friendships are cheaper in the mapped file than in columns
+            record_types = (User, FriendRequest, None, Alarm) if self.compact else (None,) * 4
+            self.users, self.friend_requests, self.friendships, self.alarms = (
+                LazyTable(snapshot, record_type) for record_type in record_types)
+            linkers = {
+                'users': (self.users, self._index_user, None),
+                'friendRequests': (self.friend_requests, self._index_friend_request, None),
+                'friendships': (self.friendships, self._index_friendship, self._link_friendship),
+                'alarms': (self.alarms, self._index_alarm, self._link_alarm),
+            }
+            for table, (records, index, link) in linkers.items():
+                hot = iter(snapshot.hot_records(table))
+                for record_id, offset, length, a, b, flags in snapshot.entries(table):
+                    if flags & (LIVE | EAGER):
+                        index(next(hot))
+                        continue
+                    records.add_cold(record_id, offset, length)
+                    if link is not None:
+                        link(record_id, a, b)
+                    if table in self._finished and records.is_cold(record_id):
+                        self._finished[table][record_id] = None  # only finished records are left cold
+                    self._bump_id(table, record_id)
+
+    def _reset(self):
+        for table in (self.users, self.friend_requests, self.friendships, self.alarms,
+                      self._username_index, self._friends, self._friendship_pairs,
+                      self._user_alarms, self._pending_to, self._pending_pairs):
+            table.clear()
+        for finished in self._finished.values():
+            finished.clear()
+        self._search.clear()
+        self._next_ids = {table: 1 for table in self.TABLES}
+
+    def to_dict(self):
+        """Dump the store in the data.json layout (a consistent point-in-time copy)."""
+        with self._lock:
+            return {
+                "users": list(self.users.values()),
+                "friendRequests": list(self.friend_requests.values()),
+                "friendships": list(self.friendships.values()),
+                "alarms": list(self.alarms.values())
+            }
+
+    def iter_records(self, table, batch=1000):
+        """
+        Lists of up to `batch` records of one table in id order, without
+        copying the table: ids are walked in ranges up to the next id to hand
+        out, and records are read (a snapshot's cold ones decoded, not
+        cached) one batch at a time. Records added meanwhile may be left out,
+        removed ones are skipped.
+        """
+        records = self._table(table)
+        read = records.peek if isinstance(records, LazyTable) else records.get
+        with self._lock:
+            end = self._next_ids[table]
+            # Legacy files can have non-integer ids; there are never many
+            odd_ids = [record_id for record_id in records if type(record_id) is not int or record_id < 1]
+        chunk = []
+        for record_id in itertools.chain(range(1, end), odd_ids):
+            record = read(record_id)
+            if record is not None:
+                chunk.append(record)
+                if len(chunk) == batch:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def apply(self, table, record):
+        """Upsert a full record, or drop a Removed one (used to replay journaled changes)."""
+        with self._lock:
+            if type(record) is Removed:
+                self._remove(table, [record.id])
+            else:
+                self._apply(table, record)
+
+    def _apply(self, table, record):
+        records = self._table(table)
+        old = records.get(record['id'])
+        if old is None:
+            {
+                'users': self._index_user,
+                'friendRequests': self._index_friend_request,
+                'friendships': self._index_friendship,
+                'alarms': self._index_alarm,
+            }[table](record)
+            return
+        # Only a friend request's status can change the secondary indexes;
+        # usernames, friendship pairs and alarm participants are immutable.
+        if table == 'friendRequests' and old['status'] == 'pending' and record['status'] != 'pending':
+            self._unindex_pending(old)
+        records[record['id']] = record
+        if table in self._finished:
+            self._track_finished(table, record)
+
+    def _table(self, table):
+        return {
+            'users': self.users,
+            'friendRequests': self.friend_requests,
+            'friendships': self.friendships,
+            'alarms': self.alarms,
+        }[table]
+
+    def _track_finished(self, table, record):
+        """Add record to (or drop it from) the finished set finished_records() drains."""
+        if table == 'alarms':
+            finished = not record.get('isActive', True)
+        else:
+            finished = record['status'] != 'pending'
+        if finished:
+            self._finished[table][record['id']] = None
+        else:
+            self._finished[table].pop(record['id'], None)
+
+    def _changed(self, table, record):
+        with self._changes_lock:
+            self._changes.append((table, record))
+
+    def drain_changes(self):
+        """Return and forget the (table, record) pairs changed since the last call."""
+        with self._changes_lock:
+            changes, self._changes = self._changes, []
+        return changes
+
+    def requeue_changes(self, changes):
+        """Put drained changes back ahead of newer ones, e.g. after a failed journal append."""
+        with self._changes_lock:
+            self._changes[:0] = changes
+
+    def counts(self):
+        """Record counts per table."""
+        return {
+            'users': len(self.users),
+            'friendRequests': len(self.friend_requests),
+            'friendships': len(self.friendships),
+            'alarms': len(self.alarms)
+        }
+
+    def _add_member(self, index, key, member, value=None):
+        """index[key][member] = value, copying index[key] unless bulk loading."""
+        if self._bulk:
+            index.setdefault(key, {})[member] = value
+        else:
+            index[key] = {**index.get(key, {}), member: value}
+
+    def _take_id(self, table):
+        new_id = self._next_ids[table]
+        self._next_ids[table] = new_id + 1
+        return new_id
+
+    def _bump_id(self, table, record_id):
+        if isinstance(record_id, int) and record_id >= self._next_ids[table]:
+            self._next_ids[table] = record_id + 1
+
+    # ============================
+    # 🔐 USERS
+    # ============================
+
+    def _index_user(self, user):
+        self.users[user['id']] = user
+        self._username_index[user['username'].casefold()] = user['id']
+        self._search.add(user['id'], user['username'], bulk=self._bulk)
+        self._bump_id('users', user['id'])
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def find_user(self, username):
+        """Case-insensitive username lookup."""
+        user_id = self._username_index.get(username.casefold())
+        return self.users.get(user_id) if user_id is not None else None
+
+    def add_user(self, username, password):
+        with self._lock:
+            user = {
+                'id': self._take_id('users'),
+                'username': username,
+                'password': password,
+                'createdAt': datetime.now().isoformat()
+            }
+            self._index_user(user)
+            self._changed('users', user)
+        return user
+
+    def set_password(self, user_id, password):
+        """Store a copy of the user with a new password (hash) and return it."""
+        with self._lock:
+            updated = {**self.users[user_id], 'password': password}
+            self.users[user_id] = updated
+            self._changed('users', updated)
+        return updated
+
+    def session_generation(self, user_id):
+        """The generation session tokens must carry to be valid (None for an unknown user)."""
+        user = self.users.get(user_id)
+        return user.get('sessionGen', 0) if user is not None else None
+
+    def end_sessions(self, user_id):
+        """Invalidate every token issued to the user so far; returns the new generation."""
+        with self._lock:
+            user = self.users[user_id]
+            updated = {**user, 'sessionGen': user.get('sessionGen', 0) + 1}
+            self.users[user_id] = updated
+            self._changed('users', updated)
+        return updated['sessionGen']
+
+    def search_users(self, query, exclude_id=None, limit=20, cursor=None):
+        """One page of users whose username contains query: ([users], next cursor)."""
+        ids, next_cursor = self._search.search(query, exclude_id, limit, cursor)
+        return [self.users[uid] for uid in ids], next_cursor
+
+    # ============================
+    # 👥 FRIEND REQUESTS
+    # ============================
+
+    def _index_friend_request(self, req):
+        self.friend_requests[req['id']] = req
+        self._bump_id('friendRequests', req['id'])
+        if req['status'] == 'pending':
+            self._add_member(self._pending_to, req['toUserId'], req['id'])
+            self._pending_pairs[(req['fromUserId'], req['toUserId'])] = req['id']
+        self._track_finished('friendRequests', req)
+
+    def _unindex_pending(self, req):
+        pending = self._pending_to.get(req['toUserId'], {})
+        if req['id'] in pending:
+            self._pending_to[req['toUserId']] = {rid: None for rid in pending if rid != req['id']}
+        if self._pending_pairs.get((req['fromUserId'], req['toUserId'])) == req['id']:
+            del self._pending_pairs[(req['fromUserId'], req['toUserId'])]
+
+    def get_friend_request(self, request_id):
+        return self.friend_requests.get(request_id)
+
+    def has_pending_request(self, from_user_id, to_user_id):
+        return (from_user_id, to_user_id) in self._pending_pairs
+
+    def pending_requests_for(self, user_id):
+        """Pending requests addressed to user_id, oldest first."""
+        return [self.friend_requests[rid] for rid in self._pending_to.get(user_id, {})]
+
+    def add_friend_request(self, from_user_id, to_user_id):
+        with self._lock:
+            req = {
+                'id': self._take_id('friendRequests'),
+                'fromUserId': from_user_id,
+                'toUserId': to_user_id,
+                'status': 'pending',
+                'createdAt': datetime.now().isoformat()
+            }
+            self._index_friend_request(req)
+            self._changed('friendRequests', req)
+        return req
+
+    def set_request_status(self, req, status):
+        """Store a copy of req with the new status and return it."""
+        with self._lock:
+            old = self.friend_requests.get(req['id'], req)
+            if old['status'] == 'pending' and status != 'pending':
+                self._unindex_pending(old)
+            updated = {**old, 'status': status}
+            self.friend_requests[updated['id']] = updated
+            self._track_finished('friendRequests', updated)
+            self._changed('friendRequests', updated)
+        return updated
+
+    # ============================
+    # 🤝 FRIENDSHIPS
+    # ============================
+
+    def _index_friendship(self, friendship):
+        self.friendships[friendship['id']] = friendship
+        self._link_friendship(friendship['id'], friendship['user1Id'], friendship['user2Id'])
+        self._bump_id('friendships', friendship['id'])
+
+    def _link_friendship(self, fid, a, b):
+        self._add_member(self._friends, a, b, fid)
+        self._add_member(self._friends, b, a, fid)
+        self._friendship_pairs[user_pair(a, b)] = fid
+
+    def are_friends(self, a, b):
+        return user_pair(a, b) in self._friendship_pairs
+
+    def friend_ids(self, user_id):
+        """Friend ids of user_id in friendship order."""
+        return list(self._friends.get(user_id, {}))
+
+    def friends_of(self, user_id):
+        """Friend user records of user_id in friendship order."""
+        return [self.users[fid] for fid in self._friends.get(user_id, {}) if fid in self.users]
+
+    def friend_suggestions(self, user_id, limit):
+        """
+        Up to `limit` (user id, mutual friend count) for friends of friends of
+        user_id, most mutual friends first (then lowest id). Existing friends
+        and users with a pending request to or from user_id are left out.
+        """
+        friends = self._friends.get(user_id, {})
+        counts = Counter()
+        for friend_id in friends:
+            # Adjacency dicts are replaced, not mutated, so iterating is safe
+            counts.update(iter(self._friends.get(friend_id, ())))
+        for excluded in (user_id, *friends):
+            counts.pop(excluded, None)
+        for candidate in [c for c in counts if (user_id, c) in self._pending_pairs or (c, user_id) in self._pending_pairs]:
+            del counts[candidate]
+        return heapq.nlargest(limit, counts.items(),
+                              key=lambda item: (item[1], -item[0] if type(item[0]) is int else 0))
+
+    def add_friendship(self, user1_id, user2_id):
+        with self._lock:
+            friendship = {
+                'id': self._take_id('friendships'),
+                'user1Id': user1_id,
+                'user2Id': user2_id,
+                'createdAt': datetime.now().isoformat()
+            }
+            self._index_friendship(friendship)
+            self._changed('friendships', friendship)
+        return friendship
+
+    # ============================
+    # ⏰ ALARMS
+    # ============================
+
+    def _index_alarm(self, alarm):
+        self.alarms[alarm['id']] = alarm
+        self._link_alarm(alarm['id'], *alarm_members(alarm))
+        self._bump_id('alarms', alarm['id'])
+        self._track_finished('alarms', alarm)
+
+    def _link_alarm(self, aid, *user_ids):
+        for user_id in user_ids:
+            self._add_member(self._user_alarms, user_id, aid)
+
+    def get_alarm(self, alarm_id):
+        return self.alarms.get(alarm_id)
+
+    def alarms_for_user(self, user_id, active_only=True):
+        """Alarms user_id takes part in, oldest first."""
+        result = []
+        lazy = isinstance(self.alarms, LazyTable)
+        for aid in self._user_alarms.get(user_id, {}):
+            if active_only and lazy and self.alarms.is_cold(aid):
+                continue  # only inactive alarms are left cold
+            alarm = self.alarms[aid]
+            if not active_only or alarm.get('isActive', True):
+                result.append(alarm)
+        return result
+
+    def add_alarm(self, fields):
+        """Insert a new alarm; fields is everything except the id."""
+        with self._lock:
+            alarm = {'id': self._take_id('alarms'), **fields}
+            self._index_alarm(alarm)
+            self._changed('alarms', alarm)
+        return alarm
+
+    def _live_alarms(self):
+        """
+        Stored alarms that may be active, compact or not (a snapshot's cold
+        alarms never are), for is_active() to check without unpacking.
+        """
+        if isinstance(self.alarms, (RecordTable, LazyTable)):
+            return self.alarms.stored_values()
+        return list(self.alarms.values())
+
+    def active_alarms(self):
+        return [unpack(a) for a in self._live_alarms() if is_active(a)]
+
+    def active_alarm_count(self):
+        return sum(1 for a in self._live_alarms() if is_active(a))
+
+    def all_alarms(self):
+        """Every alarm, oldest first (decodes a snapshot's cold ones)."""
+        with self._lock:
+            return list(self.alarms.values())
+
+    def update_alarm(self, alarm):
+        """Store an updated alarm (a modified copy, e.g. from WakeyAgent)."""
+        with self._lock:
+            self.alarms[alarm['id']] = alarm
+            self._track_finished('alarms', alarm)
+            self._changed('alarms', alarm)
+        return alarm
+
+    # ============================
+    # 🗄️ ARCHIVE TIER
+    # ============================
+
+    def finished_records(self, limit):
+        """
+        Up to `limit` (table, record) pairs that are done changing: inactive
+        alarms and answered friend requests, in the order they finished per
+        table. Reads the finished sets the write paths keep, so a pass costs
+        O(limit) rather than a scan of every hot record. The record holding a
+        table's highest id stays, since a reload takes the next id from it.
+        """
+        found = []
+        for table, records in (('alarms', self.alarms), ('friendRequests', self.friend_requests)):
+            with self._lock:
+                newest = self._next_ids[table] - 1
+                record_ids = list(itertools.islice(self._finished[table], limit - len(found) + 1))
+            for record_id in record_ids:
+                if len(found) >= limit:
+                    return found
+                record = records.get(record_id)
+                if record is not None and record_id != newest:
+                    found.append((table, record))
+        return found
+
+    def remove(self, table, record_ids):
+        """Drop records (and their index entries), e.g. once they are archived."""
+        with self._lock:
+            self._remove(table, record_ids)
+            for record_id in record_ids:
+                self._changed(table, Removed(record_id))
+
+    def _remove(self, table, record_ids):
+        records = self._table(table)
+        for record_id in record_ids:
+            record = records.get(record_id)
+            if record is None:
+                continue
+            if table == 'alarms':
+                for user_id in alarm_members(record):
+                    alarm_ids = self._user_alarms.get(user_id, {})
+                    if record_id in alarm_ids:
+                        self._user_alarms[user_id] = {aid: None for aid in alarm_ids if aid != record_id}
+            elif table == 'friendRequests' and record['status'] == 'pending':
+                self._unindex_pending(record)
+            if table in self._finished:
+                self._finished[table].pop(record_id, None)
+            del records[record_id]
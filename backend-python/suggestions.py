@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class SuggestionCache:
+    """
+    Per-user cache of friend-of-friend suggestions, invalidated by change
+    stamps instead of by walking the graph.
+
+    A user's suggestions depend on their own friends and pending requests
+    and on each friend's friends. Writers only stamp the users whose
+    friendships or requests changed (O(1) per change, even for users with
+    huge friend lists); a cached entry is served while neither its user nor
+    any of their current friends has a stamp newer than the entry. Stamps
+    come from one counter read before computing, so a change racing with
+    the computation makes the entry stale rather than wrong. Entries also
+    expire after max_age seconds, which bounds staleness from writers in
+    other processes sharing a SQLite file.
+    """
+
+    SIZE = 10000
+    MAX_AGE = 300  # seconds
+
+    def __init__(self, compute, size=SIZE, max_age=MAX_AGE):
+        self.compute = compute  # user id -> suggestions
+        self.size = size
+        self.max_age = max_age
+        self._seq = 0
+        self._graph = {}     # user id -> seq of their last friendship change
+        self._requests = {}  # user id -> seq of their last pending request change
+        self._entries = OrderedDict()  # user id -> (seq, computed at, suggestions), LRU order
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _stamp(self, stamps, user_ids):
+        with self._lock:
+            self._seq += 1
+            for user_id in user_ids:
+                stamps[user_id] = self._seq
+
+    def friendship_added(self, a, b):
+        self._stamp(self._graph, (a, b))
+
+    def requests_changed(self, a, b):
+        self._stamp(self._requests, (a, b))
+
+    def get(self, user_id, friend_ids):
+        """Suggestions for user_id, whose current friends are friend_ids."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and self._fresh(entry, user_id, friend_ids):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            seq = self._seq
+        suggestions = self.compute(user_id)
+        with self._lock:
+            self._entries[user_id] = (seq, time.monotonic(), suggestions)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return suggestions
+
+    def _fresh(self, entry, user_id, friend_ids):
+        seq, computed_at, _ = entry
+        if time.monotonic() - computed_at > self.max_age:
+            return False
+        if self._graph.get(user_id, 0) > seq or self._requests.get(user_id, 0) > seq:
+            return False
+        graph = self._graph
+        return all(graph.get(friend_id, 0) <= seq for friend_id in friend_ids)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,73 @@
+from collections import deque
+import os
+import threading
+
+
+class VersionTracker:
+    """
+    Per-user version counters and short change logs for the alarm, friend
+    and friend-request lists, used for ETags and ?since= delta sync.
+
+    Versions are opaque strings "<epoch>.<seq>": seq comes from one
+    process-wide counter and epoch is random per process, so a version issued
+    by another process (or before a restart) never matches and the client
+    simply gets a full list instead of a wrong delta.
+    """
+
+    LISTS = ('alarms', 'friends', 'requests')
+    LOG_SIZE = 256
+
+    def __init__(self, log_size=LOG_SIZE):
+        self.epoch = os.urandom(4).hex()
+        self.log_size = log_size
+        self._seq = 0
+        self._versions = {}  # (list, user id) -> seq of last change
+        self._logs = {}      # (list, user id) -> deque[(seq, key)]
+        self._floors = {}    # (list, user id) -> highest seq evicted from the log
+        self._lock = threading.Lock()
+
+    def _token(self, seq):
+        return f"{self.epoch}.{seq}"
+
+    def _parse(self, token):
+        """seq of a token issued by this process, else None."""
+        epoch, _, seq = (token or '').partition('.')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def bump(self, list_name, user_ids, key):
+        """Record that item `key` of each user's list changed (added, updated or removed)."""
+        with self._lock:
+            self._seq += 1
+            for user_id in set(user_ids):
+                slot = (list_name, user_id)
+                self._versions[slot] = self._seq
+                log = self._logs.get(slot)
+                if log is None:
+                    log = self._logs[slot] = deque()
+                log.append((self._seq, key))
+                if len(log) > self.log_size:
+                    self._floors[slot] = log.popleft()[0]
+
+    def version(self, list_name, user_id):
+        with self._lock:
+            return self._token(self._versions.get((list_name, user_id), 0))
+
+    def changed_since(self, list_name, user_id, since):
+        """
+        Keys changed after version `since`, oldest first, plus the current
+        version; keys is None when a delta can't be computed (full refresh).
+        """
+        since_seq = self._parse(since)
+        slot = (list_name, user_id)
+        with self._lock:
+            current = self._token(self._versions.get(slot, 0))
+            if since_seq is None or since_seq < self._floors.get(slot, 0) or since_seq > self._seq:
+                return None, current
+            keys = {}
+            for seq, key in reversed(self._logs.get(slot, ())):
+                if seq <= since_seq:
+                    break
+                keys.setdefault(key, seq)
+        return sorted(keys, key=keys.get), current
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from bench.harness import load_app  # noqa: E402
+
+# Settings every test app starts from; a test passes its own on top
+BASE_ENV = {
+    'WAKEY_SCHEDULER': '0',
+    'WAKEY_AUTH_WORKERS': '0',
+    'WAKEY_ARCHIVE': '0',
+    'WAKEY_SESSION_SECRET': 'test-secret',
+}
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """make_app(**env) -> a freshly imported app module on a copy of data.json in tmp_path, stats rebuilt."""
+    monkeypatch.chdir(BACKEND_DIR)  # load_app() moves into tmp_path; undone after the test
+    for name in [name for name in os.environ if name.startswith('WAKEY_')]:
+        monkeypatch.delenv(name)
+
+    def make(dataset=None, **env):
+        for name, value in {**BASE_ENV, **env}.items():
+            monkeypatch.setenv(name, value)
+        module = load_app(str(tmp_path), dataset)
+        assert module.stats.wait_ready(30)
+        return module
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
@@ -0,0 +1,54 @@
+import pytest
+
+from admission import AdmissionControl, GROUPS, parse_rates
+
+
+@pytest.fixture
+def admission_app(make_app):
+    return make_app(WAKEY_ADMISSION='1', WAKEY_ADMISSION_RATES='alarm_list=0.001/2')
+
+
+def get_alarms(client, user_id, address, token=None):
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    return client.get(f'/api/alarms/{user_id}', headers=headers, environ_base={'REMOTE_ADDR': address}).status_code
+
+
+def test_claimed_user_id_does_not_drain_that_users_bucket(admission_app):
+    client = admission_app.app.test_client()
+    statuses = [get_alarms(client, 1, '10.0.0.9') for _ in range(4)]
+    assert statuses[:2] == [200, 200] and statuses[2:] == [429, 429]
+    token = admission_app.sessions.issue(1)
+    assert get_alarms(client, 1, '10.0.0.9', token) == 200
+
+
+def test_authenticated_user_is_limited_across_addresses(admission_app):
+    client = admission_app.app.test_client()
+    token = admission_app.sessions.issue(2)
+    statuses = [get_alarms(client, 2, f'10.0.1.{i}', token) for i in range(3)]
+    assert statuses == [200, 200, 429]
+
+
+def test_overload_sheds_low_priority_first():
+    control = AdmissionControl(4, GROUPS)
+    assert control.admit('search', 'a', now=0) is None
+    assert control.admit('search', 'b', now=0) is None
+    assert control.admit('search', 'c', now=0)[0] == 'overload'
+    assert control.admit('alarm_action', 'c', now=0) is None
+
+
+def test_parse_rates_overrides_groups():
+    groups = parse_rates(' search=1/5 , alarm_action=4')
+    assert groups['search'] == ('low', 1.0, 5)
+    assert groups['alarm_action'] == ('high', 4.0, GROUPS['alarm_action'][2])
+    assert groups['social'] == GROUPS['social']
+
+
+@pytest.mark.parametrize('spec, message', [
+    ('serach=1/5', "unknown admission group 'serach'.*alarm_action, alarm_list, search, social"),
+    ('search=fast', 'bad admission rate'),
+    ('search=1/x', 'bad admission rate'),
+    ('search=0/5', 'rate must be positive'),
+])
+def test_parse_rates_rejects_bad_specs(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_rates(spec)
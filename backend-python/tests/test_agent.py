@@ -0,0 +1,75 @@
+import copy
+import random
+
+import pytest
+
+from agent import WakeyAgent
+
+ACTIONS = ('snooze', 'snooze', 'snooze', 'acknowledge', 'cancel')
+
+
+class ChoiceOnly:
+    """An rng with nothing but choice(), as the agent allows."""
+
+    def __init__(self, seed):
+        self._random = random.Random(seed)
+
+    def choice(self, seq):
+        return self._random.choice(seq)
+
+
+def alarms():
+    pairs = [{'id': i, 'user1Id': 1, 'user2Id': 2, 'time': '07:00', 'tone': tone, 'isActive': True,
+              'snoozeCount': {'1': 0, '2': 0}, 'acknowledged': [], 'cancelledBy': None,
+              'agentMessage': '', 'agentTone': '', 'cancelNotifyMessage': ''}
+             for i, tone in enumerate([None, 'soft', 'playful', 'strict', 'unknown'])]
+    pairs.append({'id': 10, 'user1Id': 1, 'user2Id': 2, 'isActive': True})  # legacy: counters missing
+    group = {'id': 20, 'user1Id': 1, 'time': '07:00', 'tone': None, 'isActive': True,
+             'members': {str(m): [0, 0] for m in range(1, 7)}, 'ackCount': 0, 'snoozeTotal': 0,
+             'cancelledBy': None, 'agentMessage': '', 'agentTone': '', 'cancelNotifyMessage': ''}
+    return pairs + [group]
+
+
+def events(count, seed):
+    """(alarm index, user id, action): snooze-heavy, like a real morning."""
+    pick = random.Random(seed)
+    result = []
+    for _ in range(count):
+        index = pick.randrange(7)
+        user_id = pick.randint(1, 6) if index == 6 else pick.choice((1, 2))
+        action = pick.choice(ACTIONS) if pick.random() < 0.2 else 'snooze'
+        result.append((index, user_id, action))
+    return result
+
+
+def one_by_one(agent, state, stream):
+    results = []
+    for index, user_id, action in stream:
+        alarm = state[index]
+        getattr(agent, f'{action}_alarm')(alarm, user_id)
+        notify = alarm['cancelNotifyMessage'] if action == 'cancel' else None
+        results.append((alarm['agentMessage'], alarm['agentTone'], notify))
+    return results
+
+
+@pytest.mark.parametrize('make_rng', [random.Random, ChoiceOnly], ids=['random', 'choice-only'])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_process_events_matches_one_call_per_event(make_rng, seed):
+    stream = events(2000, seed)
+    expected_state = alarms()
+    expected = one_by_one(WakeyAgent(make_rng(seed)), expected_state, stream)
+
+    state = alarms()
+    batch = [(state[index], user_id, action) for index, user_id, action in stream]
+    assert WakeyAgent(make_rng(seed)).process_events(batch) == expected
+    assert state == expected_state
+    # The stream reached every tone and path
+    assert {tone for _, tone, _ in expected} >= {'soft', 'playful', 'strict'}
+    assert any(notify for _, _, notify in expected) and ('', '', None) in expected
+
+
+def test_process_events_rejects_unknown_actions():
+    agent = WakeyAgent(random.Random(0))
+    alarm = copy.deepcopy(alarms()[0])
+    with pytest.raises(ValueError, match='nap'):
+        agent.process_events([(alarm, 1, 'nap')])
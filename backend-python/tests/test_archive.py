@@ -0,0 +1,98 @@
+from datetime import date
+import json
+import os
+
+import pytest
+
+import archive as archive_module
+from archive import Archive
+
+
+def alarm(alarm_id, user1, user2):
+    return ('alarms', {'id': alarm_id, 'user1Id': user1, 'user2Id': user2, 'isActive': False})
+
+
+def on_day(monkeypatch, day):
+    class Day(date):
+        @classmethod
+        def today(cls):
+            return date.fromisoformat(day)
+    monkeypatch.setattr(archive_module, 'date', Day)
+
+
+def page_ids(archive, user_id, limit):
+    """Every archived alarm id of a user, one page of `limit` at a time."""
+    ids, before = [], None
+    while True:
+        page, before = archive.history(user_id, limit, before)
+        ids.append([json.loads(line)['id'] for line in archive.read(page)])
+        if before is None:
+            return ids
+
+
+@pytest.fixture
+def filled(tmp_path, monkeypatch):
+    """An archive with alarms 1..9 of user 1 over three days, plus other users' and a group alarm."""
+    archive = Archive(str(tmp_path), fsync=False)
+    for day, ids in (('2026-01-01', [1, 2, 3]), ('2026-01-02', [4, 5]), ('2026-01-03', [6, 7, 8, 9])):
+        on_day(monkeypatch, day)
+        archive.add([alarm(i, 1, 2) for i in ids] + [alarm(100 + i, 3, 4) for i in ids])
+    group = {'id': 50, 'isActive': False, 'members': {str(m): {} for m in (1, 5, 6, 7)}}
+    assert archive.add([('alarms', group)]) == 1  # one record, two index entries
+    return archive
+
+
+def test_history_pages_newest_first_across_days(filled):
+    assert page_ids(filled, 1, 4) == [[50, 9, 8, 7], [6, 5, 4, 3], [2, 1]]
+    assert page_ids(filled, 1, 10) == [[50, 9, 8, 7, 6, 5, 4, 3, 2, 1]]
+    assert page_ids(filled, 7, 4) == [[50]]
+    assert filled.history(99, 4) == ([], None)
+
+
+def test_reopened_archive_pages_the_same_with_few_cached_days(filled, tmp_path, monkeypatch):
+    monkeypatch.setattr(Archive, 'CACHED_SEGMENTS', 1)
+    reopened = Archive(str(tmp_path), fsync=False)
+    assert page_ids(reopened, 1, 3) == [[50, 9, 8], [7, 6, 5], [4, 3, 2], [1]]
+    assert len(reopened._loaded) == 1
+    assert reopened.count('alarms') == 19
+    assert reopened.count('friendRequests') == 0
+
+
+def test_add_counts_records_and_skips_recent_repeats(filled, tmp_path, monkeypatch):
+    assert filled.add([alarm(9, 1, 2), alarm(10, 1, 2), alarm(10, 1, 2)]) == 1
+    # After a restart on a later day, the last segment's records are still known
+    on_day(monkeypatch, '2026-02-01')
+    reopened = Archive(str(tmp_path), fsync=False)
+    assert reopened.add([alarm(10, 1, 2), alarm(11, 1, 2)]) == 1
+    assert page_ids(reopened, 1, 3)[0] == [11, 10, 50]
+
+
+def test_torn_append_is_repaired_at_start(filled, tmp_path):
+    segment = str(tmp_path / 'alarms-2026-01-03.ndjson')
+    line = json.dumps(alarm(12, 1, 2)[1], separators=(',', ':')).encode()
+    with open(segment, 'ab') as f:
+        f.write(line + b'\n' + b'{"id":13,')  # indexed line missing, last line torn
+    with open(segment[:-len('.ndjson')] + '.idx', 'ab') as f:
+        f.write(b'\0' * 5)  # torn index entry
+    reopened = Archive(str(tmp_path), fsync=False)
+    assert page_ids(reopened, 1, 3)[0] == [12, 50, 9]
+    with open(segment, 'rb') as f:
+        assert f.read().endswith(line + b'\n')
+    assert os.path.getsize(segment[:-len('.ndjson')] + '.idx') % archive_module.ENTRY.size == 0
+
+
+def test_history_route_pages_hot_then_archived(make_app, tmp_path):
+    app = make_app(WAKEY_ARCHIVE_DIR=str(tmp_path / 'archive'))
+    user_id = 1
+    finished = {alarm['id'] for alarm in app.store.alarms_for_user(user_id, active_only=False)
+                if not alarm.get('isActive', True)}
+    assert app.archive_finished() > 0
+    client = app.app.test_client()
+    seen, cursor = [], None
+    while True:
+        response = client.get(f'/api/alarms/{user_id}/history', query_string={'limit': 1, 'cursor': cursor})
+        seen += [alarm['id'] for alarm in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(finished) and len(seen) == len(finished)
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+import json
+import re
+import sys
+
+import pytest
+
+LOGIN = json.dumps({'username': '', 'password': ''}).encode()
+
+
+@pytest.fixture
+def asgi(app):
+    sys.modules.pop('asgi', None)
+    return importlib.import_module('asgi')
+
+
+def exchange(asgi, raw, timeout=5):
+    """Send raw bytes to the built-in server and return everything it writes back before closing."""
+    async def run():
+        server = await asyncio.start_server(asgi._handle_connection, '127.0.0.1', 0, limit=asgi.MAX_HEAD)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(raw)
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+            return data
+    return asyncio.run(run())
+
+
+def statuses(data):
+    return [int(status) for status in re.findall(rb'^HTTP/1\.1 (\d{3}) ', data, re.M)]
+
+
+def login(framing, body=LOGIN, close=True):
+    head = b'POST /api/login HTTP/1.1\r\nhost: x\r\ncontent-type: application/json\r\n' + framing
+    return head + (b'connection: close\r\n' if close else b'') + b'\r\n' + body
+
+
+def chunked(body, trailer=b''):
+    return b'%x\r\n%s\r\n0\r\n%s\r\n' % (len(body), body, trailer)
+
+
+def test_content_length_body(asgi):
+    data = exchange(asgi, login(b'content-length: %d\r\n' % len(LOGIN)))
+    assert statuses(data) == [200]
+    assert b'Username and password required' in data
+
+
+def test_chunked_body_with_trailers_keeps_connection_in_sync(asgi):
+    first = login(b'transfer-encoding: chunked\r\n', chunked(LOGIN, b'x-check: 1\r\n'), close=False)
+    second = login(b'content-length: %d\r\n' % len(LOGIN))
+    assert statuses(exchange(asgi, first + second)) == [200, 200]
+
+
+@pytest.mark.parametrize('framing, body, status', [
+    (b'content-length: %d\r\ntransfer-encoding: chunked\r\n' % len(LOGIN), chunked(LOGIN), 400),
+    (b'content-length: -1\r\n', LOGIN, 400),
+    (b'content-length: 5\r\ncontent-length: 6\r\n', LOGIN, 400),
+    (b'content-length: 99999999999\r\n', LOGIN, 413),
+    (b'transfer-encoding: gzip\r\n', LOGIN, 501),
+    (b'transfer-encoding: chunked\r\n', b'-5\r\n', 400),
+    (b'transfer-encoding: chunked\r\n', b'3\r\nabcdef\r\n0\r\n\r\n', 400),
+    (b'transfer-encoding: chunked\r\n', b'1' * (70 * 1024), 400),
+    (b'transfer-encoding: chunked\r\n', b'%x\r\n' % (11 * 1024 * 1024), 413),
+])
+def test_bad_framing_is_refused(asgi, framing, body, status):
+    assert statuses(exchange(asgi, login(framing, body))) == [status]
+
+
+def test_repeated_identical_content_length_is_one_length(asgi):
+    data = exchange(asgi, login(b'content-length: %d\r\ncontent-length: %d\r\n' % (len(LOGIN), len(LOGIN))))
+    assert statuses(data) == [200]
+
+
+def test_slow_body_times_out(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, 'BODY_TIMEOUT', 0.2)
+    data = exchange(asgi, login(b'content-length: 100\r\n', b'{'))
+    assert statuses(data) == [408]
+
+
+def test_event_stream_runs_flask_hooks(asgi):
+    data = exchange(asgi, b'GET /api/events/1 HTTP/1.1\r\nhost: x\r\nauthorization: Bearer 1.1.a.b\r\nconnection: close\r\n\r\n')
+    assert statuses(data) == [401]
@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def pair_alarm(app):
+    return next(a for a in app.store.active_alarms() if 'members' not in a)
+
+
+def run_batch(client, operations):
+    response = client.post('/api/batch', json={'operations': operations})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_operations_apply_in_order_with_one_save(app, pair_alarm, monkeypatch):
+    saves = []
+    save_db = app.save_db
+    monkeypatch.setattr(app, 'save_db', lambda *args: saves.append(args) or save_db(*args))
+    alarm_id, user_id = pair_alarm['id'], pair_alarm['user1Id']
+    before = pair_alarm['snoozeCount'].get(str(user_id), 0)
+    action = {'alarmId': alarm_id, 'userId': user_id}
+
+    body = run_batch(app.app.test_client(), [
+        {'op': 'snooze', **action},
+        {'op': 'snooze', **action},
+        {'op': 'createAlarm', 'userId': user_id, 'friendId': pair_alarm['user2Id'], 'time': '06:15'},
+        {'op': 'cancel', **action},
+    ])
+    results = body['results']
+    assert body['success'] and [r['success'] for r in results] == [True] * 4
+    # Each operation sees the ones before it
+    assert [r['alarm']['snoozeCount'][str(user_id)] for r in results[:2]] == [before + 1, before + 2]
+    assert results[3]['alarm']['isActive'] is False and results[3]['alarm']['snoozeCount'][str(user_id)] == before + 2
+    assert app.store.get_alarm(results[2]['alarm']['id'])['time'] == '06:15'
+    assert app.store.get_alarm(alarm_id)['isActive'] is False
+    assert len(saves) == 1
+
+
+def test_failed_operations_are_reported_in_place(app, pair_alarm, monkeypatch):
+    saves = []
+    monkeypatch.setattr(app, 'save_db', lambda *args: saves.append(args))
+    action = {'alarmId': pair_alarm['id'], 'userId': pair_alarm['user1Id']}
+    results = run_batch(app.app.test_client(), [
+        {'op': 'teleport'},
+        'snooze',
+        {'op': 'snooze', 'alarmId': [1], 'userId': 1},   # unhashable id
+        {'op': 'snooze', 'alarmId': 10 ** 9, 'userId': 1},
+        {'op': 'snooze', 'userId': 1},
+        {'op': 'snooze', **action},
+        {'op': 'createAlarm', 'userId': 1, 'friendId': 10 ** 9, 'time': '06:00'},
+    ])['results']
+    assert results[:5] == [
+        {'success': False, 'message': 'Unknown operation'},
+        {'success': False, 'message': 'Unknown operation'},
+        {'success': False, 'message': 'Unknown operation'},
+        {'success': False, 'message': 'Alarm not found'},
+        {'success': False, 'message': 'Missing alarmId or userId'},
+    ]
+    assert results[5]['success']
+    assert results[6] == {'success': False, 'message': 'Can only create alarms with friends'}
+    assert len(saves) == 1
+
+
+def test_batch_without_successes_does_not_save(app, monkeypatch):
+    saves = []
+    monkeypatch.setattr(app, 'save_db', lambda *args: saves.append(args))
+    results = run_batch(app.app.test_client(), [{'op': 'teleport'}])['results']
+    assert results == [{'success': False, 'message': 'Unknown operation'}] and saves == []
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'operations': {'op': 'snooze'}}, 'operations must be a list'),
+    ({}, 'operations must be a list'),
+    ({'operations': [{'op': 'teleport'}] * 501}, 'At most 500 operations per batch'),
+])
+def test_malformed_batches_are_refused(client, body, message):
+    assert client.post('/api/batch', json=body).get_json() == {'success': False, 'message': message}
@@ -0,0 +1,48 @@
+import json
+
+from bench.driver import InProcessClient, Workload, run
+from bench.generate import generate
+from bench.harness import percentile, summarize
+from store import Store
+
+
+def test_generated_dataset_is_consistent_and_seeded(tmp_path):
+    path, again, other = (str(tmp_path / name) for name in ('a.json', 'b.json', 'c.json'))
+    counts = generate(path, users=300, seed=7)
+    generate(again, users=300, seed=7)
+    generate(other, users=300, seed=8)
+    with open(path, 'rb') as f, open(again, 'rb') as g, open(other, 'rb') as h:
+        data = f.read()
+        assert data == g.read() and data != h.read()
+
+    db = json.loads(data)
+    assert counts == {table: len(records) for table, records in db.items()}
+    assert counts['users'] == 300 and counts['alarms'] == 300 and counts['friendRequests'] == 60
+    for records in db.values():
+        assert len({r['id'] for r in records}) == len(records)
+    users = {u['id'] for u in db['users']}
+    pairs = [frozenset((f['user1Id'], f['user2Id'])) for f in db['friendships']]
+    assert all(len(pair) == 2 and pair <= users for pair in pairs) and len(set(pairs)) == len(pairs)
+    assert all(frozenset((a['user1Id'], a['user2Id'])) in set(pairs) for a in db['alarms'])
+    requests = [frozenset((r['fromUserId'], r['toUserId'])) for r in db['friendRequests']]
+    assert all(len(pair) == 2 for pair in requests) and len(set(requests)) == len(requests)
+    assert Store(db).counts() == counts
+
+
+def test_driver_runs_the_mix_in_process(make_app, tmp_path):
+    dataset = str(tmp_path / 'dataset.json')
+    generate(dataset, users=200, seed=3)
+    app = make_app(dataset)
+    with open(dataset) as f:
+        workload = Workload(json.load(f))
+    report = run(workload, lambda: InProcessClient(app.app), concurrency=2, duration=0.5, seed=1)
+    assert report['requests'] > 0 and set(report['routes']) == set(Workload.MIX)
+    assert sum(route['errors'] for route in report['routes'].values()) == 0
+    assert report['routes']['get_alarms']['count'] > 0
+
+
+def test_summary_percentiles():
+    assert percentile([], 0.5) is None
+    assert percentile([1, 2, 3, 4], 0.5) == 2 and percentile([1, 2, 3, 4], 0.99) == 4
+    summary = summarize([0.003, 0.001, 0.002])
+    assert summary['count'] == 3 and summary['p50Ms'] == 2.0
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import stat
+
+import pytest
+
+from bench import replay
+
+
+def capture_traffic(app):
+    """A morning's worth of mixed requests; returns the signed-up user's id."""
+    client = app.app.test_client()
+    signup = client.post('/api/signup', json={'username': 'zoe_capture', 'password': 'hunter2'}).get_json()
+    token, user_id = signup['token'], signup['user']['id']
+    alarm = next(a for a in app.store.active_alarms() if 'members' not in a)
+    client.get(f'/api/alarms/{user_id}?token={token}&since=0')
+    client.get(f'/api/friends/{user_id}', headers={'Authorization': 'Bearer not-a-token'})
+    client.post('/api/agent/snooze', json={'alarmId': alarm['id'], 'userId': alarm['user1Id']},
+                headers={'X-Wakey-Durability': 'relaxed'})
+    client.post('/api/agent/snooze', json={'alarmId': alarm['id'], 'userId': alarm['user1Id']})
+    client.post('/api/batch', data='operations=none', content_type='application/x-www-form-urlencoded')
+    client.get('/api/metrics')  # skipped
+    client.options('/api/alarms')  # skipped
+    client.get('/api/nowhere')
+    app.capture.flush()
+    return user_id
+
+
+@pytest.fixture
+def captured(make_app, tmp_path):
+    path = str(tmp_path / 'traffic.jsonl')
+    app = make_app(WAKEY_CAPTURE=path)
+    user_id = capture_traffic(app)
+    return path, user_id
+
+
+def test_capture_lines(captured):
+    path, user_id = captured
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600  # bodies carry passwords
+    entries = replay.read_capture(path)
+    assert [(e['m'], e.get('r'), e['s']) for e in entries] == [
+        ('POST', '/api/signup', 200),
+        ('GET', '/api/alarms/<int:user_id>', 200),
+        ('GET', '/api/friends/<int:user_id>', 401),
+        ('POST', '/api/agent/snooze', 200),
+        ('POST', '/api/agent/snooze', 200),
+        ('POST', '/api/batch', 415),
+        ('GET', None, 404),
+    ]
+    signup, alarms, friends, relaxed, snooze, form, _ = entries
+    assert json.loads(signup['b']) == {'username': 'zoe_capture', 'password': 'hunter2'} and 'c' not in signup
+    assert 'u' not in signup and alarms['u'] == user_id and friends['u'] == -1
+    assert alarms['p'] == f'/api/alarms/{user_id}?since=0'  # the token stays out of the file
+    assert relaxed['h'] == {'X-Wakey-Durability': 'relaxed'} and 'h' not in snooze
+    assert form['b'] == 'operations=none' and form['c'] == 'application/x-www-form-urlencoded'
+    assert all(e['t'] >= 0 and e['ms'] >= 0 for e in entries)
+    assert [e['t'] for e in entries] == sorted(e['t'] for e in entries)
+
+
+def test_replays_reproduce_the_capture(captured, make_app):
+    path, _ = captured
+    entries = replay.read_capture(path)
+    size = os.path.getsize(path)
+    runs = []
+    for _ in range(2):
+        app = make_app(WAKEY_CAPTURE='')  # a fresh copy of the dataset the capture started from
+        results, seconds, _ = replay.replay(app, entries, concurrency=1, speed=None, seed=7)
+        assert not app.capture.enabled and seconds > 0
+        runs.append(results)
+    assert os.path.getsize(path) == size
+    assert [status for status, _, _ in runs[0]] == [e['s'] for e in entries]
+    assert [digest for _, _, digest in runs[0]] == [digest for _, _, digest in runs[1]]
+
+
+def test_digest_ignores_volatile_fields():
+    assert replay.digest(b'{"token": "a", "user": {"id": 1, "createdAt": "x"}}') == \
+        replay.digest(b'{"user": {"createdAt": "y", "id": 1}, "token": "b"}')
+    assert replay.digest(b'{"id": 1}') != replay.digest(b'{"id": 2}')
+    assert replay.digest(b'not json') == replay.digest(b'not json')
+
+
+def report(per_sec, p95, errors, responses):
+    route = {'perSec': per_sec, 'p50Ms': 1.0, 'p95Ms': p95, 'p99Ms': p95, 'errors': errors}
+    return {'perSec': per_sec, 'routes': {'GET /api/alarms/<int:user_id>': route}, 'responses': responses}
+
+
+@pytest.mark.parametrize('new, regressed, exits', [
+    (report(100, 2.1, 0, ['200 a', '200 b']), [], False),
+    (report(100, 3.0, 0, ['200 a', '200 b']), ['GET /api/alarms/<int:user_id>'], True),
+    (report(80, 2.0, 0, ['200 a', '200 b']), ['GET /api/alarms/<int:user_id>'], True),
+    (report(100, 2.0, 1, ['200 a', '200 b']), ['GET /api/alarms/<int:user_id>'], True),
+    (report(100, 2.0, 0, ['200 a', '500 c']), [], True),
+])
+def test_compare_flags_regressions(tmp_path, new, regressed, exits):
+    paths = []
+    for name, data in (('base', report(100, 2.0, 0, ['200 a', '200 b'])), ('new', new)):
+        paths.append(str(tmp_path / f'{name}.json'))
+        with open(paths[-1], 'w') as f:
+            json.dump(data, f)
+    out = str(tmp_path / 'compare.json')
+    args = argparse.Namespace(base=paths[0], new=paths[1], threshold=10, out=out)
+    if exits:
+        with pytest.raises(SystemExit) as exit_info:
+            replay.compare(args)
+        assert exit_info.value.code == 1
+    else:
+        replay.compare(args)
+    with open(out) as f:
+        result = json.load(f)
+    assert result['regressions'] == regressed
+    assert result['responseDiffs'] == (1 if new['responses'][1] == '500 c' else 0)
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from store import Store
+
+THREADS = 8
+SNOOZES = 25
+
+
+@pytest.fixture(params=[
+    {},
+    {'WAKEY_PERSISTENCE': 'journal', 'WAKEY_GROUP_COMMIT': '1', 'WAKEY_GROUP_COMMIT_MS': '1'},
+    {'WAKEY_STORAGE': 'sqlite'},
+], ids=['snapshot', 'group-commit', 'sqlite'])
+def app(request, make_app):
+    app = make_app(**request.param)
+    yield app
+    if app.committer is not None:
+        app.committer.stop()
+
+
+def test_mutations_on_different_alarms_are_not_lost(app):
+    client = app.app.test_client()
+    alarm_ids = [client.post('/api/alarms', json={'userId': 1, 'friendId': 2, 'time': '07:00', 'label': f'a{i}'})
+                 .get_json()['alarm']['id'] for i in range(THREADS)]
+    errors = []
+
+    def wake(alarm_id):
+        client = app.app.test_client()
+        try:
+            for _ in range(SNOOZES):
+                assert client.post('/api/agent/snooze', json={'alarmId': alarm_id, 'userId': 1}).get_json()['success']
+            assert client.post('/api/agent/acknowledge', json={'alarmId': alarm_id, 'userId': 2}).get_json()['success']
+        except AssertionError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=wake, args=(alarm_id,)) for alarm_id in alarm_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    for alarm_id in alarm_ids:
+        alarm = app.store.get_alarm(alarm_id)
+        assert alarm['snoozeCount']['1'] == SNOOZES and 2 in alarm['acknowledged'], alarm
+    if app.journal is not None:
+        app.journal.close()
+        replayed, _ = app.journal.replay(Store())
+        assert [replayed.get_alarm(i) for i in alarm_ids] == [app.store.get_alarm(i) for i in alarm_ids]
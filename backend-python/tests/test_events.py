@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+
+from events import EventBus
+
+
+def frames_of(bus, sub, count):
+    stream = bus.stream(sub)
+    return [next(stream) for _ in range(count)], stream
+
+
+def test_publish_reaches_only_the_target_users():
+    bus = EventBus()
+    alice, bob, carol = bus.subscribe(1), bus.subscribe(2), bus.subscribe(3)
+    assert bus.publish([1, 2, 2], 'alarm', {'id': 9}) == 2
+    assert alice.queue.get_nowait() == bob.queue.get_nowait() == ('alarm', '{"id":9}')
+    assert carol.queue.empty()
+    assert (bus.published, bus.delivered) == (1, 2)
+
+
+def test_stream_frames_and_unsubscribe_on_close():
+    bus = EventBus(heartbeat=0.01)
+    sub = bus.subscribe(1)
+    bus.publish([1], 'alarm', {'id': 9})
+    frames, stream = frames_of(bus, sub, 4)
+    assert frames == ['retry: 3000\n\n', 'event: ready\ndata: {}\n\n',
+                      'event: alarm\ndata: {"id":9}\n\n', ': keepalive\n\n']
+    stream.close()
+    assert bus.subscriber_count() == 0 and sub.closed
+
+
+def test_slow_client_drops_oldest_and_is_told_to_resync():
+    bus = EventBus(max_queue=2)
+    sub = bus.subscribe(1)
+    for i in range(5):
+        bus.publish([1], 'alarm', {'id': i})
+    assert sub.dropped == 3
+    frames, _ = frames_of(bus, sub, 5)
+    assert frames[2:] == ['event: resync\ndata: {"dropped": 3}\n\n', 'event: alarm\ndata: {"id":3}\n\n',
+                          'event: alarm\ndata: {"id":4}\n\n']
+
+
+def test_oldest_connection_of_a_user_is_closed_past_the_cap():
+    bus = EventBus(max_per_user=2)
+    first = bus.subscribe(1)
+    bus.subscribe(1)
+    bus.subscribe(1)
+    assert first.closed and first.queue.get_nowait() is None
+    assert bus.subscriber_count() == 2
+    # A stream on a closed subscription ends after its preamble
+    frames = list(bus.stream(first))
+    assert frames[-1] == 'event: ready\ndata: {}\n\n'
+
+
+def test_stream_ends_after_max_connection():
+    bus = EventBus(heartbeat=0.01, max_connection=0.05)
+    frames = list(bus.stream(bus.subscribe(1)))
+    assert frames[:2] == ['retry: 3000\n\n', 'event: ready\ndata: {}\n\n']
+    assert set(frames[2:]) <= {': keepalive\n\n'}
+    assert bus.subscriber_count() == 0
+
+
+def test_async_stream_wakes_on_a_publish_from_another_thread():
+    bus = EventBus(heartbeat=5)
+
+    async def run():
+        sub = bus.subscribe(1, loop=asyncio.get_running_loop())
+        stream = bus.astream(sub)
+        assert [await stream.__anext__() for _ in range(2)][1] == 'event: ready\ndata: {}\n\n'
+        threading.Timer(0.05, bus.publish, ([1], 'alarm', {'id': 9})).start()
+        frame = await asyncio.wait_for(stream.__anext__(), 2)
+        sub.close()
+        rest = [frame async for frame in stream]
+        return frame, rest
+    frame, rest = asyncio.run(run())
+    assert frame == 'event: alarm\ndata: {"id":9}\n\n' and rest == []
+    assert bus.subscriber_count() == 0
+
+
+def test_partner_is_pushed_an_alarm_change(app):
+    alarm = next(a for a in app.store.active_alarms() if 'members' not in a)
+    partner = alarm['user2Id']
+    sub = app.events.subscribe(partner)
+    client = app.app.test_client()
+    response = client.post('/api/agent/snooze', json={'alarmId': alarm['id'], 'userId': alarm['user1Id']})
+    assert response.get_json()['success']
+    event_type, payload = sub.queue.get(timeout=5)
+    assert event_type == 'alarm'
+    pushed = json.loads(payload)
+    assert pushed['id'] == alarm['id'] and pushed['snoozeCount'] == app.store.get_alarm(alarm['id'])['snoozeCount']
+    app.events.unsubscribe(sub)
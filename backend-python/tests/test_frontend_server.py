@@ -0,0 +1,158 @@
+import gzip
+import http.client
+import importlib.util
+import os
+import threading
+
+import pytest
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'frontend')
+
+spec = importlib.util.spec_from_file_location('frontend_server', os.path.join(FRONTEND_DIR, 'server.py'))
+server = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(server)
+
+CSS = ('body { margin: 0; }\n' * 40).encode()
+AUDIO = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / 'index.html').write_text(
+        '<link rel="stylesheet" href="styles.css"><script src="app.js"></script><img src="missing.png">')
+    (tmp_path / 'styles.css').write_bytes(CSS)
+    (tmp_path / 'app.js').write_text('console.log(1)')
+    (tmp_path / 'server.py').write_text('secret = 1')
+    (tmp_path / 'audio').mkdir()
+    (tmp_path / 'audio' / 'tone.mp3').write_bytes(AUDIO)
+    assets = server.Assets(str(tmp_path))
+    httpd = server.StaticServer(('127.0.0.1', 0), server.StaticHandler, assets)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield tmp_path, assets, httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetch(site):
+    _, _, port = site
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    def fetch(path, method='GET', **headers):
+        # One keep-alive connection for the whole test
+        connection.request(method, path, headers={k.replace('_', '-'): v for k, v in headers.items()})
+        response = connection.getresponse()
+        return response, response.read()
+    yield fetch
+    connection.close()
+
+
+def test_index_links_versioned_assets(site, fetch):
+    _, assets, _ = site
+    response, body = fetch('/')
+    css, js = assets.get('/styles.css'), assets.get('/app.js')
+    assert body.decode() == (f'<link rel="stylesheet" href="styles.css?v={css.digest}">'
+                             f'<script src="app.js?v={js.digest}"></script><img src="missing.png">')
+    assert response.getheader('Cache-Control') == 'no-cache'
+    assert response.getheader('Content-Type') == 'text/html; charset=utf-8'
+
+    response, _ = fetch(f'/styles.css?v={css.digest}')
+    assert response.getheader('Cache-Control') == server.IMMUTABLE
+    response, _ = fetch('/styles.css?v=stale')
+    assert response.getheader('Cache-Control') == 'no-cache'
+    assert fetch('/server.py')[0].status == 404 and fetch('/nowhere.js')[0].status == 404
+
+
+@pytest.mark.parametrize('accept, compressed', [
+    ('gzip', True), ('br, gzip;q=0.5', True), ('*', True), ('gzip;q=0', False), ('gzip;q=abc', False), ('', False),
+])
+def test_gzip_variant_follows_accept_encoding(fetch, accept, compressed):
+    response, body = fetch('/styles.css', Accept_Encoding=accept)
+    assert response.status == 200 and response.getheader('Vary') == 'Accept-Encoding'
+    assert (response.getheader('Content-Encoding') == 'gzip') is compressed
+    assert (gzip.decompress(body) if compressed else body) == CSS
+    assert int(response.getheader('Content-Length')) == len(body)
+    assert response.getheader('ETag').endswith('-gz"') is compressed
+
+
+def test_small_and_binary_files_are_not_compressed(fetch):
+    for path in ('/app.js', '/audio/tone.mp3'):
+        response, _ = fetch(path, Accept_Encoding='gzip')
+        assert response.getheader('Content-Encoding') is None and response.getheader('Vary') is None
+
+
+def test_conditional_requests_get_304(fetch):
+    response, _ = fetch('/styles.css')
+    etag, last_modified = response.getheader('ETag'), response.getheader('Last-Modified')
+    gzip_etag = fetch('/styles.css', Accept_Encoding='gzip')[0].getheader('ETag')
+
+    for headers in ({'If-None-Match': etag}, {'If-None-Match': f'"other", W/{gzip_etag}'},
+                    {'If-None-Match': '*'}, {'If-Modified-Since': last_modified}):
+        response, body = fetch('/styles.css', **{k.replace('-', '_'): v for k, v in headers.items()})
+        assert response.status == 304 and body == b'' and response.getheader('ETag') == etag
+    # If-None-Match wins over If-Modified-Since
+    response, _ = fetch('/styles.css', If_None_Match='"other"', If_Modified_Since=last_modified)
+    assert response.status == 200
+    assert fetch('/styles.css', If_Modified_Since='Thu, 01 Jan 1970 00:00:00 GMT')[0].status == 200
+    assert fetch('/styles.css', If_Modified_Since='yesterday')[0].status == 200
+
+
+@pytest.mark.parametrize('header, content_range', [
+    ('bytes=0-9', 'bytes 0-9/1024'),
+    ('bytes=1000-', 'bytes 1000-1023/1024'),
+    ('bytes=-24', 'bytes 1000-1023/1024'),
+    ('bytes=1020-5000', 'bytes 1020-1023/1024'),
+    ('bytes=-5000', 'bytes 0-1023/1024'),
+    ('bytes=1024-', 'bytes */1024'),
+    ('bytes=-0', 'bytes */1024'),
+    ('bytes=9-3', 'bytes */1024'),
+    ('bytes=0-1,4-5', None),
+    ('lines=0-1', None),
+])
+def test_single_byte_ranges(fetch, header, content_range):
+    response, body = fetch('/audio/tone.mp3', Range=header)
+    assert response.getheader('Content-Range') == content_range
+    assert response.getheader('Accept-Ranges') == 'bytes'
+    if content_range is None:
+        assert response.status == 200 and body == AUDIO
+    elif content_range.startswith('bytes */'):
+        assert response.status == 416 and body == b''
+    else:
+        first, last = map(int, content_range[6:].split('/')[0].split('-'))
+        assert response.status == 206 and body == AUDIO[first:last + 1]
+
+
+def test_ranges_ignore_gzip_and_stale_if_range(fetch):
+    response, body = fetch('/styles.css', Range='bytes=0-3', Accept_Encoding='gzip')
+    assert response.status == 206 and body == CSS[:4] and response.getheader('Content-Encoding') is None
+    etag = response.getheader('ETag')
+    assert fetch('/styles.css', Range='bytes=0-3', If_Range=etag)[0].status == 206
+    response, body = fetch('/styles.css', Range='bytes=0-3', If_Range='"old"')
+    assert response.status == 200 and body == CSS
+
+
+def test_head_sends_headers_only(fetch):
+    response, body = fetch('/audio/tone.mp3', method='HEAD')
+    assert response.status == 200 and body == b'' and response.getheader('Content-Length') == '1024'
+    # The connection is still usable afterwards
+    assert fetch('/app.js')[1] == b'console.log(1)'
+
+
+def test_edited_files_are_picked_up(site, fetch, monkeypatch):
+    root, assets, _ = site
+    monkeypatch.setattr(server.Assets, 'RESCAN', 0)
+    before = assets.get('/styles.css')
+    untouched = assets.get('/audio/tone.mp3')
+    (root / 'styles.css').write_bytes(CSS + b'p { color: red; }\n')
+    os.utime(root / 'styles.css', ns=(before.mtime * 10 ** 9 + 5 * 10 ** 9,) * 2)
+
+    response, body = fetch('/')
+    after = assets.get('/styles.css')
+    assert after.digest != before.digest and f'styles.css?v={after.digest}' in body.decode()
+    assert assets.get('/audio/tone.mp3') is untouched
+    assert fetch('/styles.css')[1].endswith(b'red; }\n')
+
+    (root / 'app.js').unlink()
+    assert fetch('/app.js')[0].status == 404
+    assert 'src="app.js"' in fetch('/')[1].decode()
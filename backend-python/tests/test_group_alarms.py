@@ -0,0 +1,125 @@
+import pytest
+
+from bench.group_alarms import count_writes, dataset, morning
+from journal import Journal
+from store import Store
+
+SIZE = 8
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    path = str(tmp_path / 'crew.json')
+    dataset(path, SIZE)  # users 1..SIZE, all friends with each other
+    return make_app(path, WAKEY_PERSISTENCE='journal')
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+
+def create(client, **fields):
+    return client.post('/api/alarms/group', json={'userId': 1, 'time': '07:00', 'label': 'Crew', **fields}).get_json()
+
+
+def act(client, action, alarm_id, user_id):
+    return client.post(f'/api/agent/{action}', json={'alarmId': alarm_id, 'userId': user_id}).get_json()
+
+
+def test_create_checks_members(app, client):
+    app.store.add_user('loner', 'x')
+    assert create(client)['message'] == 'Missing required fields'
+    assert create(client, memberIds=[])['message'] == 'Missing required fields'
+    assert create(client, memberIds=['2'])['message'] == 'memberIds must be user ids'
+    assert create(client, memberIds=[1])['message'] == 'A group alarm needs 1 to 50 friends'
+    assert create(client, memberIds=[2, SIZE + 1])['message'] == 'Can only create alarms with friends'
+
+    alarm = create(client, memberIds=[3, 2, 3, 1, 2])['alarm']
+    assert alarm['members'] == {'1': [0, 0], '3': [0, 0], '2': [0, 0]}
+    assert alarm['user2Id'] is None and alarm['ackCount'] == alarm['snoozeTotal'] == 0
+    for user_id in (1, 2, 3):
+        assert alarm['id'] in [a['id'] for a in app.store.alarms_for_user(user_id)]
+    assert alarm['id'] not in [a['id'] for a in app.store.alarms_for_user(4)]
+
+
+def test_too_many_friends_are_refused(make_app, tmp_path):
+    path = str(tmp_path / 'crowd.json')
+    dataset(path, 52)
+    client = make_app(path).app.test_client()
+    assert create(client, memberIds=list(range(2, 53)))['message'] == 'A group alarm needs 1 to 50 friends'
+    assert create(client, memberIds=list(range(2, 52)))['success']
+
+
+def test_every_member_action_is_one_write(app, client):
+    alarm_id = create(client, memberIds=list(range(2, SIZE + 1)))['alarm']['id']
+    writes = count_writes(app.journal)
+    actions = morning(SIZE, seed=3)
+    for count, (user_id, action) in enumerate(actions, 1):
+        result = act(client, action, alarm_id, user_id)
+        assert result['success'] and writes['records'] == count
+
+    alarm = app.store.get_alarm(alarm_id)
+    acknowledged = [user_id for user_id, action in actions if action == 'acknowledge']
+    assert alarm['members'] == {str(user_id): [1, acknowledged.index(user_id) + 1] for user_id in range(1, SIZE + 1)}
+    assert (alarm['ackCount'], alarm['snoozeTotal'], alarm['isActive']) == (SIZE, SIZE, False)
+    assert result['alarm']['agentMessage'] in sum(app.agent.messages['group_all_awake'].values(), [])
+
+    # The journal replays to the same alarm
+    app.journal.close()
+    replayed, _ = Journal(app.DATA_FILE).replay(Store())
+    assert replayed.get_alarm(alarm_id) == alarm
+
+
+def test_members_still_in_bed_feel_the_pressure(app, client):
+    alarm_id = create(client, memberIds=[2, 3, 4])['alarm']['id']
+    first = act(client, 'snooze', alarm_id, 4)['alarm']
+    act(client, 'acknowledge', alarm_id, 1)
+    act(client, 'acknowledge', alarm_id, 2)  # half the group is up
+    pressured = act(client, 'snooze', alarm_id, 3)['alarm']
+    tone = app.agent._get_tone(1)
+    assert first['agentTone'] == tone and pressured['agentTone'] == app.agent._stricter[tone]
+    assert pressured['agentMessage'] in app.agent.messages['group_snooze'][pressured['agentTone']]
+    # An alarm-level tone is never overridden
+    soft = create(client, memberIds=[2], tone='soft')['alarm']['id']
+    act(client, 'acknowledge', soft, 1)
+    assert act(client, 'snooze', soft, 2)['alarm']['agentTone'] == 'soft'
+
+
+def test_member_rules(app, client):
+    alarm_id = create(client, memberIds=[2, 3])['alarm']['id']
+    assert act(client, 'snooze', alarm_id, 4) == {'success': False, 'message': 'Not a member of this alarm'}
+    assert act(client, 'cancel', alarm_id, 2) == {'success': False, 'message': 'Only the creator can cancel a group alarm'}
+
+    act(client, 'acknowledge', alarm_id, 2)
+    again = act(client, 'acknowledge', alarm_id, 2)['alarm']
+    assert again['ackCount'] == 1 and again['members']['2'] == [0, 1] and again['agentMessage'] == ''
+
+    cancelled = act(client, 'cancel', alarm_id, 1)['alarm']
+    assert cancelled['cancelledBy'] == 1 and not cancelled['isActive'] and cancelled['cancelNotifyMessage']
+
+
+def test_changes_reach_every_member(app, client):
+    alarm_id = create(client, memberIds=[2, 3])['alarm']['id']
+    subscriptions = [app.events.subscribe(user_id) for user_id in (1, 2, 3, 4)]
+    act(client, 'snooze', alarm_id, 3)
+    for sub in subscriptions[:3]:
+        assert sub.queue.get(timeout=5)[0] == 'alarm'
+    assert subscriptions[3].queue.empty()
+    for sub in subscriptions:
+        app.events.unsubscribe(sub)
+
+
+def test_batch_and_sqlite(make_app, tmp_path):
+    path = str(tmp_path / 'crew.json')
+    dataset(path, 4)
+    app = make_app(path, WAKEY_STORAGE='sqlite')
+    client = app.app.test_client()
+    results = client.post('/api/batch', json={'operations': [
+        {'op': 'createGroupAlarm', 'userId': 1, 'memberIds': [2, 3], 'time': '07:00'},
+    ]}).get_json()['results']
+    alarm_id = results[0]['alarm']['id']
+    assert act(client, 'snooze', alarm_id, 3)['success']
+    assert [a['id'] for a in app.store.alarms_for_user(3)] == [alarm_id]
+    assert app.store.alarms_for_user(4) == []
+    assert app.store.get_alarm(alarm_id)['members']['3'] == [1, 0]
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from group_commit import CommitFailed, GroupCommitter
+
+
+class Flusher:
+    """flush() that records the calls and fails the first `failures` of them."""
+
+    def __init__(self, failures=0, delay=0):
+        self.calls = 0
+        self.failures = failures
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise OSError(28, 'No space left on device')
+
+
+def mark_all(committer, count):
+    errors = []
+
+    def mark():
+        try:
+            committer.mark(wait=True)
+        except CommitFailed as e:
+            errors.append(e)
+    threads = [threading.Thread(target=mark) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_marks_share_flushes():
+    flush = Flusher(delay=0.01)
+    committer = GroupCommitter(flush, interval_ms=20).start()
+    assert mark_all(committer, 32) == []
+    committer.stop()
+    stats = committer.stats()
+    assert stats['mutations'] == 32 and stats['flushes'] == flush.calls < 32
+
+
+def test_max_batch_flushes_without_waiting_for_the_interval():
+    committer = GroupCommitter(Flusher(), interval_ms=60000, max_batch=3).start()
+    committer.mark(wait=False)
+    committer.mark(wait=False)
+    started = time.monotonic()
+    committer.mark(wait=True)
+    assert time.monotonic() - started < 5
+    committer.stop()
+
+
+def test_durable_mark_returns_after_its_flush():
+    flushed = []
+    committer = GroupCommitter(lambda: flushed.append(time.monotonic()), interval_ms=30).start()
+    committer.mark(wait=False)
+    assert flushed == []
+    ticket = committer.mark(wait=True)
+    assert flushed and committer.stats()['mutations'] == ticket == 2
+    committer.stop()
+
+
+def test_failed_flush_raises_and_is_retried():
+    flush = Flusher(failures=1)
+    committer = GroupCommitter(flush, interval_ms=5).start()
+    with pytest.raises(CommitFailed) as failed:
+        committer.mark(wait=True)
+    assert isinstance(failed.value.__cause__, OSError)
+    # The batch is retried together with the next mark
+    committer.mark(wait=True)
+    committer.stop()
+    assert flush.calls == 2 and committer.stats()['mutations'] == 2 and committer.stats()['failures'] == 1
+
+
+def test_stop_does_not_release_unflushed_waiters():
+    committer = GroupCommitter(Flusher(failures=10 ** 6), interval_ms=60000).start()
+    errors = []
+    waiter = threading.Thread(target=lambda: errors.extend(mark_all(committer, 1)))
+    waiter.start()
+    time.sleep(0.05)
+    committer.stop()
+    waiter.join(5)
+    assert not waiter.is_alive() and len(errors) == 1
+    with pytest.raises(CommitFailed):
+        committer.mark(wait=True)
+
+
+def test_durable_wait_is_bounded():
+    release = threading.Event()
+    committer = GroupCommitter(release.wait, interval_ms=1, wait_timeout=0.1).start()
+    started = time.monotonic()
+    with pytest.raises(CommitFailed, match='within'):
+        committer.mark(wait=True)
+    assert time.monotonic() - started < 5
+    release.set()
+    committer.stop()
+
+
+def test_app_answers_500_when_the_group_commit_fails(make_app, monkeypatch):
+    app = make_app(WAKEY_PERSISTENCE='journal', WAKEY_GROUP_COMMIT='1', WAKEY_GROUP_COMMIT_MS='1')
+    monkeypatch.setattr(app.committer, 'flush', Flusher(failures=1))
+    client = app.app.test_client()
+    body = {'userId': 1, 'friendId': 2, 'time': '07:00'}
+    assert client.post('/api/alarms', json=body).status_code == 500
+    assert client.post('/api/alarms', json=body).status_code == 200
+    app.committer.stop()
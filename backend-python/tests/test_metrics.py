@@ -0,0 +1,78 @@
+import time
+
+from metrics import Metrics, SlowRequestSampler
+
+
+def series(text):
+    """{'name{labels}': value} for every sample line of an exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            key, value = line.rsplit(' ', 1)
+            samples[key] = float(value)
+    return samples
+
+
+def test_render_counters_histograms_and_gauges():
+    metrics = Metrics(enabled=True, buckets=(0.1, 1))
+    metrics.counter('jobs_total', 'Jobs.', ('kind',))
+    metrics.histogram('job_seconds', 'Job time.')
+    metrics.gauge('queue', 'Queue depth.', lambda: {('a"b\n',): 2.0}, ('name',))
+    metrics.inc('jobs_total', ('x',))
+    metrics.inc('jobs_total', ('x',), 2)
+    for value in (0.05, 0.1, 0.5, 3):
+        metrics.observe('job_seconds', (), value)
+
+    text = metrics.render()
+    assert '# TYPE jobs_total counter' in text and '# TYPE job_seconds histogram' in text
+    assert series(text) == {
+        'jobs_total{kind="x"}': 3,
+        'job_seconds_bucket{le="0.1"}': 2,   # buckets are cumulative, bounds inclusive
+        'job_seconds_bucket{le="1"}': 3,
+        'job_seconds_bucket{le="+Inf"}': 4,
+        'job_seconds_sum': 3.65,
+        'job_seconds_count': 4,
+        'queue{name="a\\"b\\n"}': 2,
+    }
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    metrics.counter('jobs_total', 'Jobs.')
+    metrics.inc('jobs_total')
+    assert series(metrics.render()) == {}
+
+
+def test_sampler_keeps_the_slowest_requests():
+    sampler = SlowRequestSampler(keep=2, interval=0.001)
+    for route, duration in (('/a', 0.2), ('/b', 0.1), ('/c', 0.3)):
+        sampler.begin('GET', route)
+        if route == '/c':
+            time.sleep(0.05)
+        sampler.end(route, duration)
+    sampler.end('/never-begun', 9)
+    slowest = sampler.slowest()
+    assert [(r['route'], r['durationMs']) for r in slowest] == [('/c', 300.0), ('/a', 200.0)]
+    assert slowest[0]['samples'] > 0 and slowest[0]['stacks'][0]['stack'][-1].endswith('test_sampler_keeps_the_slowest_requests')
+
+
+def test_endpoint_reports_requests_by_route(make_app):
+    app = make_app(WAKEY_METRICS='1')
+    client = app.app.test_client()
+    user_id = app.store.active_alarms()[0]['user1Id']
+    for _ in range(3):
+        assert client.get(f'/api/alarms/{user_id}').status_code == 200
+    client.get('/api/nowhere')
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    samples = series(response.get_data(as_text=True))
+    assert samples['wakey_http_requests_total{route="/api/alarms/<int:user_id>",method="GET",status="200"}'] == 3
+    assert samples['wakey_http_requests_total{route="unmatched",method="GET",status="404"}'] == 1
+    assert samples['wakey_http_request_duration_seconds_count{route="/api/alarms/<int:user_id>",method="GET"}'] == 3
+    assert samples['wakey_active_alarms'] == app.store.active_alarm_count()
+    assert client.get('/api/metrics/slow').status_code == 404
+
+
+def test_endpoint_is_off_by_default(client):
+    assert client.get('/api/metrics').status_code == 404
@@ -0,0 +1,155 @@
+import json
+import os
+
+import pytest
+
+from journal import read_snapshot
+from ndjson import Importer, SnapshotWriter, export_chunks, json_chunks
+from sqlite_store import SqliteStore
+from store import Store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CREATED = '2026-01-05T07:00:00'
+
+
+@pytest.fixture
+def store():
+    with open(os.path.join(BACKEND_DIR, 'data.json')) as f:
+        return Store(json.load(f))
+
+
+def line(table, **record):
+    return json.dumps({'t': table, 'r': record})
+
+
+def user(user_id, username):
+    return line('users', id=user_id, username=username, password='x', createdAt=CREATED)
+
+
+def friendship(friendship_id, a, b):
+    return line('friendships', id=friendship_id, user1Id=a, user2Id=b, createdAt=CREATED)
+
+
+def alarm(alarm_id, a, b):
+    return line('alarms', id=alarm_id, user1Id=a, user2Id=b, time='07:00', isActive=True)
+
+
+def group(alarm_id, creator, *members):
+    return line('alarms', id=alarm_id, user1Id=creator, user2Id=None, time='07:00',
+                members={str(m): [0, 0] for m in members})
+
+
+class Target:
+    """Records the ids of what an import accepted, per table."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def insert_many(self, table, records):
+        self.tables.setdefault(table, []).extend(r['id'] for r in records)
+
+    def commit(self):
+        pass
+
+
+def run(lines, batch=2, strict=False):
+    target = Target()
+    importer = Importer(target, batch=batch, strict=strict)
+    importer.feed_lines(lines)
+    return target, importer.finish()
+
+
+@pytest.mark.parametrize('batch', [1, 3, 1000])
+def test_export_imports_back_into_a_snapshot(store, tmp_path, batch):
+    dump = "".join(export_chunks(store, batch=batch))
+    assert dump.count("\n") == sum(store.counts().values())
+
+    writer = SnapshotWriter(str(tmp_path / 'data.json'))
+    importer = Importer(writer, batch=batch)
+    importer.feed_lines(dump.splitlines())
+    report = importer.finish()
+    writer.close()
+    assert report == {'imported': store.counts(), 'rejected': 0, 'errors': []}
+    assert read_snapshot(str(tmp_path / 'data.json')) == store.to_dict()
+    assert os.listdir(tmp_path) == ['data.json']  # spools cleaned up
+
+
+def test_export_imports_into_sqlite(store, tmp_path):
+    target = SqliteStore(str(tmp_path / 'wakey.db'))
+    target.load({})
+    importer = Importer(target, batch=4)
+    importer.feed_lines("".join(export_chunks(store)).splitlines())
+    assert importer.finish()['rejected'] == 0
+    assert target.to_dict() == store.to_dict()
+
+
+def test_json_chunks_are_the_data_json_layout(store):
+    assert json.loads("".join(json_chunks(store, batch=2))) == store.to_dict()
+    assert json.loads("".join(json_chunks(Store()))) == {'users': [], 'friendRequests': [], 'friendships': [],
+                                                         'alarms': []}
+
+
+def test_dangling_and_duplicate_records_are_rejected():
+    target, report = run([
+        user(1, 'ann'), user(2, 'bob'), user(3, 'cy'),
+        user(2, 'dup-id'), user(4, 'ANN'), '', 'not json', json.dumps({'t': 'pets', 'r': {}}),
+        line('users', id=5, username='eve'),
+        line('friendRequests', id=1, fromUserId=1, toUserId=3, status='pending'),
+        line('friendRequests', id=2, fromUserId=1, toUserId=99, status='pending'),
+        friendship(1, 1, 2), friendship(2, 2, 1), friendship(3, 3, 3), friendship(4, 1, 42),
+        friendship(5, 2, 3),
+        alarm(1, 2, 1), alarm(2, 1, 3), alarm(3, 1, 77), alarm(1, 2, 3),
+        group(4, 2, 1, 2, 3), group(5, 1, 1, 2, 3), group(6, 2, 1, 3), group(7, 2, 2, 8),
+        line('alarms', id=8, user1Id=2, user2Id=None, time='07:00', members={'x': [0, 0]}),
+    ])
+    # Malformed lines are reported as read, the rest when their batch is checked
+    assert sorted(report['errors'], key=lambda error: int(error.split()[1].rstrip(':'))) == [
+        "line 4: duplicate users id 2",
+        "line 5: duplicate username 'ANN'",
+        "line 7: not a dump line",
+        "line 8: unknown table 'pets'",
+        "line 9: users record without valid password",
+        "line 11: unknown user 99",
+        "line 13: duplicate friendship 2-1",
+        "line 14: friendships record between user 3 and itself",
+        "line 15: unknown user 42",
+        "line 18: alarm between users 1 and 3, who aren't friends",
+        "line 19: unknown user 77",
+        "line 20: duplicate alarms id 1",
+        "line 22: group alarm by user 1 with 3, who aren't friends",
+        "line 23: group alarm 6 whose creator 2 isn't a member",
+        "line 24: unknown user 8",
+        "line 25: group alarm 8 with invalid members",
+    ]
+    assert report['rejected'] == 16
+    assert report['imported'] == {'users': 3, 'friendRequests': 1, 'friendships': 2, 'alarms': 2}
+    assert target.tables == {'users': [1, 2, 3], 'friendRequests': [1], 'friendships': [1, 5], 'alarms': [1, 4]}
+
+
+def test_references_must_come_first():
+    _, report = run([alarm(1, 1, 2), user(1, 'ann'), user(2, 'bob'), friendship(1, 1, 2)])
+    assert report['errors'] == ["line 1: unknown user 1"]
+
+
+def test_strict_import_stops_at_the_first_rejection():
+    with pytest.raises(ValueError, match='line 2: duplicate users id 1'):
+        run([user(1, 'ann'), user(1, 'bob'), user(2, 'cy')], strict=True)
+
+
+def test_only_the_first_errors_are_listed():
+    _, report = run(['nope'] * 30)
+    assert report['rejected'] == 30 and len(report['errors']) == Importer.MAX_ERRORS
+
+
+def test_export_route(make_app):
+    client = make_app().app.test_client()
+    assert client.get('/api/export').status_code == 404
+
+    app = make_app(WAKEY_EXPORT='1')
+    response = app.app.test_client().get('/api/export?tables=alarms,users')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    tables = [json.loads(entry)['t'] for entry in response.get_data(as_text=True).splitlines()]
+    counts = app.store.counts()
+    assert tables == ['users'] * counts['users'] + ['alarms'] * counts['alarms']  # in dump order
+    debug = app.app.test_client().get('/api/debug')
+    assert debug.get_json() == app.store.to_dict()
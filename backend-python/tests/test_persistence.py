@@ -0,0 +1,111 @@
+import os
+
+from journal import Journal, read_snapshot, write_snapshot
+from store import Removed, Store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def new_alarm(client, label):
+    return client.post('/api/alarms', json={'userId': 1, 'friendId': 2, 'time': '07:00', 'label': label})
+
+
+def test_failed_journal_append_is_retried(make_app):
+    app = make_app(WAKEY_PERSISTENCE='journal')
+    client = app.app.test_client()
+    append, calls = app.journal.append, []
+
+    def failing_once(changes):
+        calls.append(len(changes))
+        if len(calls) == 1:
+            raise OSError(28, 'No space left on device')
+        return append(changes)
+    app.journal.append = failing_once
+
+    assert new_alarm(client, 'lost?').status_code == 500
+    kept = new_alarm(client, 'after').get_json()['alarm']
+    app.journal.close()
+
+    replayed, _ = app.journal.replay(Store())
+    labels = {alarm['label'] for alarm in replayed.alarms_for_user(1)}
+    assert {'lost?', 'after'} <= labels and kept['label'] == 'after'
+    assert calls[1] > calls[0]
+
+
+def test_failed_write_leaves_no_torn_line(make_app, monkeypatch):
+    app = make_app(WAKEY_PERSISTENCE='journal')
+    client = app.app.test_client()
+    new_alarm(client, 'first')
+    log = app.journal._log
+
+    class BrokenLog:
+        def write(self, payload):
+            log.write(payload[:len(payload) // 2])
+            log.flush()
+            raise OSError(5, 'Input/output error')
+
+        def __getattr__(self, name):
+            return getattr(log, name)
+    app.journal._log = BrokenLog()
+
+    assert new_alarm(client, 'second').status_code == 500
+    new_alarm(client, 'third')
+    app.journal.close()
+
+    replayed, _ = app.journal.replay(Store())
+    labels = {alarm['label'] for alarm in replayed.alarms_for_user(1)}
+    assert {'first', 'second', 'third'} <= labels
+
+
+def journal_at(tmp_path):
+    path = str(tmp_path / 'data.json')
+    write_snapshot(path, Store(read_snapshot(os.path.join(BACKEND_DIR, 'data.json')), compact=False).to_dict())
+    return Journal(path, compact_bytes=1 << 30)
+
+
+def alarm(alarm_id, label):
+    return {'id': alarm_id, 'user1Id': 1, 'user2Id': 2, 'time': '07:00', 'label': label, 'isActive': True}
+
+
+def labels(store):
+    return {alarm['label'] for alarm in store.alarms_for_user(1)}
+
+
+def test_replay_cuts_a_torn_tail_so_later_appends_survive(tmp_path):
+    journal = journal_at(tmp_path)
+    journal.append([('alarms', alarm(100, 'before'))])
+    journal.close()
+    with open(journal.log_path, 'ab') as f:
+        f.write(b'{"t":"alarms","r":{"id":101,')  # crash mid-append
+
+    restarted = Journal(journal.snapshot_path, compact_bytes=1 << 30)
+    store, applied = restarted.replay(Store())
+    assert applied == 1 and 'before' in labels(store)
+    restarted.append([('alarms', alarm(102, 'after'))])
+    restarted.close()
+
+    store, applied = Journal(journal.snapshot_path).replay(Store())
+    assert applied == 2 and {'before', 'after'} <= labels(store)
+
+
+def test_replay_applies_upserts_and_removals_in_order(tmp_path):
+    journal = journal_at(tmp_path)
+    journal.append([('alarms', alarm(100, 'draft')), ('alarms', alarm(101, 'gone'))])
+    journal.append([('alarms', alarm(100, 'final')), ('alarms', Removed(101)), ('alarms', Removed(2))])
+    journal.close()
+    store, applied = Journal(journal.snapshot_path).replay(Store())
+    assert applied == 5
+    assert store.get_alarm(100)['label'] == 'final'
+    assert store.get_alarm(101) is None and store.get_alarm(2) is None
+
+
+def test_compaction_folds_the_log_into_the_snapshot(tmp_path):
+    journal = journal_at(tmp_path)
+    journal.append([('alarms', alarm(100, 'folded'))])
+    assert journal.compact()
+    journal.append([('alarms', alarm(101, 'logged'))])  # after the rotation
+    journal.close()
+    assert not os.path.exists(journal.rotated_path)
+    assert any(a['id'] == 100 for a in read_snapshot(journal.snapshot_path)['alarms'])
+    store, applied = Journal(journal.snapshot_path).replay(Store())
+    assert applied == 1 and {'folded', 'logged'} <= labels(store)
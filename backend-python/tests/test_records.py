@@ -0,0 +1,125 @@
+import copy
+import json
+import os
+
+import pytest
+
+from records import (Alarm, FriendRequest, FriendshipTable, GroupAlarm, RecordTable, User, is_active,
+                     pack_time, unpack_time)
+from store import Store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db():
+    with open(os.path.join(BACKEND_DIR, 'data.json')) as f:
+        return json.load(f)
+
+
+def alarm(**fields):
+    return {'id': 1, 'user1Id': 1, 'user2Id': 2, 'time': '07:00', 'label': 'Wake up', 'sound': 'baddie',
+            'tone': 'soft', 'isActive': True, 'snoozeCount': {'1': 0, '2': 3}, 'acknowledged': [],
+            'cancelledBy': None, 'agentMessage': '', 'agentTone': '', 'cancelNotifyMessage': '',
+            'createdAt': '2026-01-05T07:00:00.123Z', **fields}
+
+
+def group_alarm(**fields):
+    return {'id': 2, 'user1Id': 1, 'user2Id': None, 'members': {'1': [2, 1], '5': [0, 0], '12': [1, 2]},
+            'ackCount': 2, 'time': '06:30', 'label': '', 'sound': 'manifestation', 'tone': None,
+            'isActive': True, 'snoozeTotal': 3, 'cancelledBy': None, 'agentMessage': '', 'agentTone': '',
+            'cancelNotifyMessage': '', 'createdAt': '2026-01-05T06:00:00', **fields}
+
+
+@pytest.mark.parametrize('text', ['2026-01-05T07:00:00', '2026-01-05T07:00:00.000001',
+                                  '1970-01-01T00:00:00.000Z', '2026-12-31T23:59:59.999Z', '1969-07-20T20:17:40'])
+def test_timestamps_round_trip(text):
+    assert unpack_time(pack_time(text)) == text
+
+
+@pytest.mark.parametrize('text', ['2026-01-05T07:00:00.000000', '2026-02-30T07:00:00', '2026-01-05T24:00:00',
+                                  '2026-01-05 07:00:00', '2026-01-05T07:00:00+00:00', 20260105, None])
+def test_timestamps_that_would_not_round_trip_are_refused(text):
+    assert pack_time(text) is None
+
+
+def test_every_record_of_the_dataset_round_trips(db):
+    for record_type, table in ((User, 'users'), (FriendRequest, 'friendRequests'), (Alarm, 'alarms')):
+        packed = [(record, record_type.pack(record)) for record in db[table]]
+        assert any(compact is not None for _, compact in packed)
+        for record, compact in packed:
+            if compact is not None:
+                assert json.dumps(compact.to_dict()) == json.dumps(record)
+
+
+@pytest.mark.parametrize('acknowledged', [[], [1], [2], [1, 2], [2, 1]])
+@pytest.mark.parametrize('cancelled_by', [None, 1, 2])
+def test_alarm_codes_round_trip(acknowledged, cancelled_by):
+    record = alarm(acknowledged=acknowledged, cancelledBy=cancelled_by, tone='strict', agentTone='strict',
+                   isActive=cancelled_by is None)
+    packed = Alarm.pack(record)
+    assert type(packed) is Alarm and packed.to_dict() == record
+    assert is_active(packed) is is_active(record)
+
+
+@pytest.mark.parametrize('cancelled_by', [None, 5])
+def test_group_alarm_round_trips(cancelled_by):
+    record = group_alarm(cancelledBy=cancelled_by)
+    packed = Alarm.pack(record)
+    assert type(packed) is GroupAlarm and json.dumps(packed.to_dict()) == json.dumps(record)
+
+
+@pytest.mark.parametrize('record', [
+    alarm(extra=1),
+    dict(reversed(alarm().items())),
+    alarm(id=True),
+    alarm(user2Id=1),
+    alarm(tone='sarcastic'),
+    alarm(snoozeCount={'2': 3, '1': 0}),
+    alarm(acknowledged=[3]),
+    alarm(acknowledged=[1, 1]),
+    alarm(cancelledBy=3),
+    alarm(agentMessage='not a message the agent has'),
+    alarm(createdAt='2026-01-05T07:00:00.000000'),
+    group_alarm(members={'01': [0, 0]}),
+    group_alarm(members={'1': [0, 70000]}),
+    group_alarm(cancelledBy=7),
+    group_alarm(user2Id=2),
+])
+def test_records_the_compact_form_cannot_reproduce_are_kept_as_is(record):
+    assert Alarm.pack(record) is None
+    table = RecordTable(Alarm)
+    table[record['id']] = record
+    assert table[record['id']] is record and table.stored_values() == [record]
+
+
+def test_new_sounds_get_codes():
+    record = alarm(sound='birdsong-from-an-older-client')
+    assert Alarm.pack(record).to_dict() == record
+
+
+def test_friendship_columns():
+    table = FriendshipTable()
+    dense = [{'id': i, 'user1Id': i, 'user2Id': i + 1, 'createdAt': '2026-01-05T07:00:00'} for i in (1, 2, 3)]
+    sparse = {'id': 40, 'user1Id': 1, 'user2Id': 9, 'createdAt': '2026-01-05T07:00:00.5Z'}  # odd createdAt
+    odd_id = {'id': 'legacy', 'user1Id': 2, 'user2Id': 9, 'createdAt': '2026-01-05T07:00:00'}
+    for record in dense + [sparse, odd_id]:
+        table[record['id']] = record
+    assert table.values() == dense + [sparse, odd_id]
+    assert list(table) == [1, 2, 3, 40, 'legacy'] and len(table) == 5
+    assert table[40] == sparse and table.get('legacy') == odd_id and table.get(4) is None
+    assert 40 in table and 4 not in table
+
+    # Overwrites stay in place, whether or not the new record fits the columns
+    table[2] = {**dense[1], 'note': 'kept as a dict'}
+    table[40] = {**sparse, 'createdAt': '2026-01-05T07:00:00'}
+    assert table[2]['note'] == 'kept as a dict' and table[40]['createdAt'] == '2026-01-05T07:00:00'
+    table[2] = dense[1]
+    assert table[2] == dense[1] and list(table) == [1, 2, 3, 40, 'legacy']
+
+
+def test_compact_store_dumps_exactly_what_a_plain_one_does(db):
+    # Loading renumbers duplicate ids in place, so each store gets its own copy
+    compact, plain = Store(copy.deepcopy(db), compact=True), Store(db, compact=False)
+    assert json.dumps(compact.to_dict()) == json.dumps(plain.to_dict())
+    assert any(type(value) is not dict for value in compact.alarms.stored_values())
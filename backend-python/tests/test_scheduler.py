@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import threading
+
+from scheduler import AlarmScheduler, next_fire_time
+
+MORNING = datetime(2026, 1, 5, 7, 0)
+
+
+def at(hhmm, day=MORNING):
+    hours, minutes = map(int, hhmm.split(':'))
+    return day.replace(hour=hours, minute=minutes).timestamp()
+
+
+class Clock:
+    def __init__(self, now=MORNING.timestamp()):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def alarm(alarm_id, hhmm, active=True):
+    return {'id': alarm_id, 'time': hhmm, 'isActive': active}
+
+
+def test_next_fire_time():
+    now = MORNING.timestamp()
+    assert next_fire_time('07:30', now) == at('07:30')
+    assert next_fire_time('07:00', now) == at('07:00', MORNING + timedelta(days=1))
+    assert next_fire_time('06:59', now) == at('06:59', MORNING + timedelta(days=1))
+    for bad in ('24:00', '7', 'noon', None, '07:60'):
+        assert next_fire_time(bad, now) is None
+
+
+def test_fires_in_time_order_and_rearms_daily():
+    clock = Clock()
+    scheduler = AlarmScheduler(clock)
+    scheduler.schedule_many([alarm(1, '09:15'), alarm(2, '07:30'), alarm(3, '08:00', active=False)])
+    scheduler.schedule(alarm(4, '08:00'))
+    scheduler.schedule(alarm(5, 'soon'))  # unparseable time: never armed
+    assert len(scheduler) == 3
+    assert scheduler.next_due() == (at('07:30'), 2)
+    assert scheduler.pop_due(at('07:29')) == []
+
+    due = scheduler.pop_due(at('10:00'))
+    assert due == [(2, 'scheduled', at('07:30')), (4, 'scheduled', at('08:00')), (1, 'scheduled', at('09:15'))]
+    assert scheduler.fired == 3
+    # Each is armed again for tomorrow until acknowledged or cancelled
+    assert scheduler.next_due() == (at('07:30', MORNING + timedelta(days=1)), 2)
+    assert len(scheduler) == 3
+
+
+def test_rearming_and_cancelling_leave_dead_entries_behind():
+    clock = Clock()
+    scheduler = AlarmScheduler(clock, snooze_minutes=5)
+    scheduler.schedule_many([alarm(1, '07:10'), alarm(2, '07:20'), alarm(3, '07:30')])
+    scheduler.cancel(1)
+    clock.now = at('07:18')
+    scheduler.snooze(2)      # 07:23 replaces 07:20
+    scheduler.snooze(99)     # not armed: ignored
+    scheduler.schedule(alarm(3, '07:40'))  # time changed
+    assert len(scheduler._heap) == 5 and scheduler._dead == 3
+
+    assert scheduler.pop_due(at('07:35')) == [(2, 'snooze', at('07:23'))]
+    assert [alarm_id for alarm_id, _, _ in scheduler.pop_due(at('07:45'))] == [3]
+    assert scheduler._dead == 0  # popped past on the way
+
+
+def test_snooze_storm_keeps_the_heap_bounded():
+    scheduler = AlarmScheduler(Clock())
+    scheduler.schedule_many([alarm(i, '08:00') for i in range(10)])
+    for _ in range(500):
+        for i in range(10):
+            scheduler.snooze(i)
+    assert len(scheduler._heap) <= 10 + 1024 + 1
+    assert len(scheduler) == 10
+
+
+def test_worker_calls_listeners_when_due():
+    clock = Clock()
+    scheduler = AlarmScheduler(clock)
+    fired = []
+    done = threading.Event()
+
+    def listener(alarm_id, reason, fire_at):
+        fired.append((alarm_id, reason, fire_at))
+        done.set()
+
+    def failing(alarm_id, reason, fire_at):
+        raise RuntimeError('listener bug')
+    scheduler.add_listener(failing)
+    scheduler.add_listener(listener)
+    scheduler.start()
+    try:
+        scheduler.schedule(alarm(7, '07:05'))
+        clock.now = at('07:06')
+        scheduler.snooze(7)  # wakes the worker; the snooze is due at 07:11
+        clock.now = at('07:12')
+        with scheduler._cond:
+            scheduler._cond.notify()
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
+    assert fired == [(7, 'snooze', at('07:11'))]
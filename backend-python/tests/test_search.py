@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from search_index import UsernameIndex, encode_cursor
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def search_client(request, make_app):
+    return make_app(WAKEY_STORAGE=request.param).app.test_client()
+
+
+def test_pages_cover_every_match(search_client):
+    everyone = [u['id'] for u in search_client.get('/api/users/search?query=a&limit=100').get_json()]
+    paged, cursor = [], None
+    while True:
+        response = search_client.get('/api/users/search?query=a&limit=1' + (f'&cursor={cursor}' if cursor else ''))
+        paged += [u['id'] for u in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert paged == everyone and len(everyone) > 1
+
+
+@pytest.mark.parametrize('cursor', [
+    encode_cursor('p', 5, 1),
+    encode_cursor('s', 'ab', 'x'),
+    encode_cursor('s', 'ab', True),
+    encode_cursor('p', 'ab', 2 ** 70),
+    encode_cursor('x', 'ab', 1),
+    'not-base64-json',
+])
+def test_invalid_cursor_is_400(search_client, cursor):
+    response = search_client.get(f'/api/users/search?query=a&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'invalid cursor'
+
+
+class CountingKeys(dict):
+    lookups = 0
+
+    def __getitem__(self, user_id):
+        self.lookups += 1
+        return super().__getitem__(user_id)
+
+
+def test_substring_scan_stops_once_the_page_is_full():
+    index = UsernameIndex()
+    for user_id in range(1000):
+        index.add(user_id, f'user{user_id}x')
+    index._keys = CountingKeys(index._keys)
+    ids, cursor = index.search('ser', limit=5)
+    assert ids == [0, 1, 2, 3, 4] and cursor
+    assert index._keys.lookups == 6  # the page and one more to know there is a next page
+
+
+def test_search_during_out_of_order_adds():
+    index = UsernameIndex()
+    for user_id in range(0, 4000, 2):
+        index.add(user_id, f'name{user_id:05}')
+    errors = []
+    done = threading.Event()
+
+    def searches():
+        try:
+            while not done.is_set():
+                cursor, seen = None, []
+                while True:
+                    ids, cursor = index.search('am', limit=50, cursor=cursor)
+                    seen += ids
+                    if cursor is None:
+                        break
+                assert seen == sorted(seen) and len(seen) == len(set(seen))
+        except Exception as e:  # reported on the test thread
+            errors.append(e)
+    reader = threading.Thread(target=searches)
+    reader.start()
+    # Odd ids land in the middle of the sorted list and of every posting list
+    for user_id in range(3999, 0, -2):
+        index.add(user_id, f'name{user_id:05}')
+    done.set()
+    reader.join()
+    assert not errors
+    assert index.search('am', limit=10000)[0] == list(range(4000))
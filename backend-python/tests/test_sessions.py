@@ -0,0 +1,66 @@
+import shutil
+
+from sessions import SessionTokens
+
+
+def test_issued_token_checks():
+    tokens = SessionTokens(b'secret')
+    token = tokens.issue(7)
+    assert tokens.check(token) == 7
+    # A fresh instance (another worker) verifies it by signature
+    assert SessionTokens(b'secret').check(token) == 7
+    assert SessionTokens(b'other').check(token) is None
+
+
+def test_non_ascii_signature_is_rejected():
+    assert SessionTokens(b'secret').check('1.9999999999.ab.é') is None
+
+
+def test_non_ascii_token_is_401(client):
+    response = client.get('/api/friends/1', headers={'Authorization': 'Bearer 1.9999999999.ab.é'})
+    assert response.status_code == 401
+
+
+def test_bumped_generation_revokes_cached_and_uncached_tokens():
+    generations = {7: 0}
+    tokens = SessionTokens(b'secret', generation=generations.get)
+    token = tokens.issue(7)
+    other_worker = SessionTokens(b'secret', generation=generations.get)
+    assert other_worker.check(token) == 7
+    generations[7] += 1
+    assert tokens.check(token) is None
+    assert other_worker.check(token) is None
+    assert tokens.check(tokens.issue(7)) == 7
+
+
+def test_token_of_unknown_user_is_rejected():
+    tokens = SessionTokens(b'secret', generation={7: 0}.get)
+    assert tokens.check(SessionTokens(b'secret').issue(8)) is None
+
+
+def signup(client, username='zoe_logout', password='password123'):
+    body = client.post('/api/signup', json={'username': username, 'password': password}).get_json()
+    return body['user']['id'], body['token']
+
+
+def test_logout_is_shared_between_workers_on_sqlite(make_app, tmp_path):
+    env = {'WAKEY_STORAGE': 'sqlite', 'WAKEY_SQLITE_PATH': str(tmp_path / 'wakey.db')}
+    first = make_app(**env)
+    user_id, token = signup(first.app.test_client())
+    headers = {'Authorization': f'Bearer {token}'}
+    second = make_app(**env)  # another worker on the same database and secret
+    assert second.app.test_client().get(f'/api/friends/requests/{user_id}', headers=headers).status_code == 200
+    assert first.app.test_client().post('/api/logout', headers=headers).status_code == 200
+    assert first.app.test_client().get(f'/api/friends/requests/{user_id}', headers=headers).status_code == 401
+    assert second.app.test_client().get(f'/api/friends/requests/{user_id}', headers=headers).status_code == 401
+
+
+def test_logout_survives_restart_on_json(make_app, tmp_path):
+    first = make_app()
+    user_id, token = signup(first.app.test_client())
+    headers = {'Authorization': f'Bearer {token}'}
+    assert first.app.test_client().post('/api/logout', headers=headers).status_code == 200
+    first.flush_db()
+    shutil.copy(tmp_path / 'data.json', tmp_path / 'saved.json')
+    restarted = make_app(str(tmp_path / 'saved.json'))
+    assert restarted.app.test_client().get(f'/api/friends/requests/{user_id}', headers=headers).status_code == 401
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from snapshot import EAGER, LIVE, BinarySnapshot, write_binary
+from store import Store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db():
+    with open(os.path.join(BACKEND_DIR, 'data.json')) as f:
+        db = Store(json.load(f), compact=False).to_dict()  # as snapshot.py writes it: duplicate ids fixed
+    top = max(alarm['id'] for alarm in db['alarms'])
+    db['alarms'] += [
+        {'id': top + 1, 'user1Id': 1, 'time': '07:00', 'isActive': True, 'members': {'1': [0, 0], '2': [0, 0]}},
+        {'id': top + 2, 'user1Id': 1, 'user2Id': 2 ** 70, 'time': '07:00', 'isActive': False},
+        {'id': top + 3, 'user1Id': 1, 'user2Id': 2, 'time': '07:00', 'isActive': False, 'label': 'ünïcode'},
+    ]
+    return db
+
+
+@pytest.fixture
+def path(db, tmp_path):
+    path = str(tmp_path / 'data.wkb')
+    assert write_binary(path, db) == os.path.getsize(path)
+    return path
+
+
+def test_round_trip(db, path):
+    snapshot = BinarySnapshot(path)
+    assert snapshot.to_dict() == db
+    assert {table: snapshot.count(table) for table in db} == {table: len(records) for table, records in db.items()}
+    flags = [entry[-1] for entry in snapshot.entries('alarms')]
+    # A group alarm and one with an out-of-range user id can't be indexed from the entry
+    assert flags[-3] & EAGER and flags[-2] & EAGER and flags[-1] == 0
+    assert all(flag & LIVE for flag, a in zip(flags, db['alarms']) if a['isActive'])
+
+
+@pytest.mark.parametrize('compact', [True, False], ids=['compact', 'plain'])
+def test_cold_records_decode_on_first_read(db, path, compact):
+    store = Store(compact=compact)
+    store.load_snapshot(BinarySnapshot(path))
+    assert store.alarms.cold_count() == sum(1 for a in db['alarms'] if not a['isActive']) - 1
+    assert store.friendships.cold_count() == len(db['friendships'])
+    assert store.to_dict() == db
+    assert store.counts() == {table: len(records) for table, records in db.items()}
+
+    unicode_alarm = db['alarms'][-1]
+    assert store.alarms.peek(unicode_alarm['id']) == unicode_alarm
+    assert store.alarms.is_cold(unicode_alarm['id'])  # peek leaves it in the file
+    assert store.get_alarm(unicode_alarm['id']) == unicode_alarm
+    assert not store.alarms.is_cold(unicode_alarm['id'])
+
+    friendship = db['friendships'][0]
+    assert store.are_friends(friendship['user1Id'], friendship['user2Id'])
+    assert store.friendships.is_cold(friendship['id'])  # answered from the index alone
+
+    # A write replaces a cold record without decoding it
+    inactive = next(a for a in db['alarms'] if not a['isActive'] and store.alarms.is_cold(a['id']))
+    store.update_alarm({**inactive, 'label': 'rewritten'})
+    assert store.get_alarm(inactive['id'])['label'] == 'rewritten'
+    # Ids keep counting past cold records
+    assert store.add_alarm({'user1Id': 1, 'user2Id': 2, 'time': '06:00'})['id'] == db['alarms'][-1]['id'] + 1
+
+
+def test_bad_files_are_refused(path, tmp_path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    for name, content in (('other', b'{"users": []}' + bytes(16)), ('truncated', data[:-4] + bytes(4))):
+        broken = str(tmp_path / name)
+        with open(broken, 'wb') as f:
+            f.write(content)
+        with pytest.raises(ValueError):
+            BinarySnapshot(broken)
+
+
+def test_app_converts_data_json_and_persists_in_binary(make_app, tmp_path):
+    app = make_app(WAKEY_SNAPSHOT_FORMAT='binary')
+    with open(os.path.join(BACKEND_DIR, 'data.json')) as f:
+        assert app.store.to_dict() == Store(json.load(f), compact=False).to_dict()
+    alarm = next(a for a in app.store.active_alarms() if 'members' not in a)
+    user = str(alarm['user1Id'])
+    client = app.app.test_client()
+    response = client.post('/api/agent/snooze', json={'alarmId': alarm['id'], 'userId': alarm['user1Id']})
+    assert response.get_json()['success']
+
+    restarted = make_app(WAKEY_SNAPSHOT_FORMAT='binary')  # data.wkb is kept over the fresh data.json
+    assert restarted.store.get_alarm(alarm['id'])['snoozeCount'][user] == alarm['snoozeCount'].get(user, 0) + 1
+    assert BinarySnapshot(str(tmp_path / 'data.wkb')).to_dict() == restarted.store.to_dict()
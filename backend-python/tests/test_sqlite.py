@@ -0,0 +1,88 @@
+import itertools
+import sqlite3
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def apps(make_app):
+    """Two app instances sharing one SQLite file, like two server processes: separate entity locks."""
+    return make_app(WAKEY_STORAGE='sqlite'), make_app(WAKEY_STORAGE='sqlite')
+
+
+def run_together(calls):
+    """Run each call on its own thread, all released at once."""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def run(i, call):
+        barrier.wait()
+        results[i] = call()
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_snoozes_are_not_lost(apps):
+    alarm = apps[0].store.get_alarm(2)
+    user_id = alarm['user1Id']
+    before = alarm['snoozeCount'].get(str(user_id), 0)
+
+    def snoozes(app):
+        client = app.app.test_client()
+        for _ in range(20):
+            assert client.post('/api/agent/snooze', json={'alarmId': 2, 'userId': user_id}).get_json()['success']
+    run_together([lambda app=app: snoozes(app) for app in apps for _ in range(2)])
+
+    assert apps[1].store.get_alarm(2)['snoozeCount'][str(user_id)] == before + 80
+
+
+def test_concurrent_friend_requests_make_one(apps):
+    store = apps[0].store
+    users = [user['id'] for user in store.to_dict()['users']]
+    pairs = [(a, b) for a, b in itertools.permutations(users, 2)
+             if not store.are_friends(a, b) and not store.has_pending_request(a, b)
+             and not store.has_pending_request(b, a)]
+    assert pairs
+    for a, b in pairs:
+        body = {'fromUserId': a, 'toUserId': b}
+        results = run_together([lambda app=app: app.app.test_client().post('/api/friends/request', json=body).get_json()
+                                for app in apps])
+        assert sorted(r['success'] for r in results) == [False, True]
+        assert len([r for r in store.pending_requests_for(b) if r['fromUserId'] == a]) == 1
+
+
+def test_signup_race_lost_to_another_process(apps, monkeypatch):
+    first, second = (app.app.test_client() for app in apps)
+    assert first.post('/api/signup', json={'username': 'Dawn', 'password': 'pw'}).get_json()['success']
+    # The other process checked before this one inserted
+    monkeypatch.setattr(apps[1].store, 'find_user', lambda username: None)
+    response = second.post('/api/signup', json={'username': 'dawn', 'password': 'pw'})
+    assert response.status_code == 200
+    assert response.get_json() == {'success': False, 'message': 'Username already taken'}
+    assert second.post('/api/signup', json={'username': 'dusk', 'password': 'pw'}).get_json()['success']
+
+
+def test_failed_commit_rolls_back(apps, monkeypatch):
+    alarm = apps[0].store.get_alarm(2)
+    user_id = alarm['user1Id']
+    before = alarm['snoozeCount'].get(str(user_id), 0)
+    commit = apps[0].store.commit
+    failures = iter([sqlite3.OperationalError('disk I/O error')])
+
+    def failing_commit():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        commit()
+    monkeypatch.setattr(apps[0].store, 'commit', failing_commit)
+    client = apps[0].app.test_client()
+    assert client.post('/api/agent/snooze', json={'alarmId': 2, 'userId': user_id}).status_code == 500
+    assert apps[1].store.get_alarm(2)['snoozeCount'].get(str(user_id), 0) == before
+    # The connection is not left inside the failed transaction
+    assert client.post('/api/agent/snooze', json={'alarmId': 2, 'userId': user_id}).get_json()['success']
+    assert apps[1].store.get_alarm(2)['snoozeCount'][str(user_id)] == before + 1
@@ -0,0 +1,109 @@
+import random
+import threading
+
+import pytest
+
+from stats import SnoozeStats, alarm_history
+
+PAIRS = [(1, 2), (1, 3), (2, 3), (6, 7)]
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def app(request, make_app, tmp_path):
+    return make_app(WAKEY_STORAGE=request.param, WAKEY_ARCHIVE_DIR=str(tmp_path / 'archive'))
+
+
+def recount(app):
+    return SnoozeStats.rebuild(alarm_history(app.store, app.archive)).snapshot()
+
+
+def act(client, action, alarm, user_id):
+    return client.post(f'/api/agent/{action}', json={'alarmId': alarm, 'userId': user_id}).get_json()
+
+
+def create(client, a, b):
+    return client.post('/api/alarms', json={'userId': a, 'friendId': b, 'time': '07:00'}).get_json()['alarm']['id']
+
+
+def create_group(client):
+    return client.post('/api/alarms/group', json={'userId': 1, 'memberIds': [2, 3], 'time': '07:00'}).get_json()['alarm']['id']
+
+
+def test_running_totals_match_a_recount(app):
+    client = app.app.test_client()
+    assert app.stats.snapshot() == recount(app)
+
+    pair = create(client, 1, 2)
+    act(client, 'snooze', pair, 1)
+    act(client, 'snooze', pair, 2)
+    act(client, 'acknowledge', pair, 2)
+    assert app.stats.snapshot() == recount(app)
+    act(client, 'acknowledge', pair, 1)
+    assert app.stats.snapshot() == recount(app)
+
+    group = create_group(client)
+    act(client, 'snooze', group, 3)
+    act(client, 'acknowledge', group, 2)
+    act(client, 'acknowledge', group, 1)
+    act(client, 'acknowledge', group, 3)
+    assert app.stats.snapshot() == recount(app)
+
+    cancelled = create(client, 1, 3)
+    act(client, 'snooze', cancelled, 3)
+    act(client, 'cancel', cancelled, 1)
+    cancelled_group = create_group(client)
+    act(client, 'cancel', cancelled_group, 1)
+    assert app.stats.snapshot() == recount(app)
+
+    # Finished alarms move to the archive; newer ones keep changing
+    create(client, 6, 7)
+    assert app.archive_finished() > 0
+    assert app.stats.snapshot() == recount(app)
+    act(client, 'acknowledge', 2, 3)
+    act(client, 'snooze', 5, 7)
+    assert app.stats.snapshot() == recount(app)
+
+
+def test_routes_wait_for_the_rebuild(app, monkeypatch):
+    client = app.app.test_client()
+    assert client.get('/api/stats/1').status_code == 200
+    loading = SnoozeStats()
+    loading.start_rebuild()
+    monkeypatch.setattr(app, 'stats', loading)
+    for path in ('/api/stats/1', '/api/stats/1/2', '/api/leaderboard/1'):
+        assert client.get(path).status_code == 503
+    assert app.archive_finished() == 0
+
+
+def test_rebuild_while_alarms_change(app, monkeypatch):
+    client = app.app.test_client()
+    for _ in range(20):
+        create(client, *PAIRS[0])
+    create_group(client)
+    act(client, 'cancel', 2, 1)
+    app.archive_finished()
+
+    live = SnoozeStats()
+    live.start_rebuild()
+    monkeypatch.setattr(app, 'stats', live)
+    monkeypatch.setattr(app, 'STATS_REBUILD_BATCH', 1)
+    rng = random.Random(7)
+
+    def traffic():
+        client = app.app.test_client()
+        while not live.ready:
+            roll = rng.random()
+            if roll < 0.1:
+                create(client, *rng.choice(PAIRS))
+            elif roll < 0.15:
+                create_group(client)
+            else:
+                alarm = rng.choice(app.store.all_alarms())
+                members = [int(m) for m in alarm['members']] if 'members' in alarm else [alarm['user1Id'], alarm['user2Id']]
+                act(client, 'snooze' if roll < 0.7 else 'acknowledge', alarm['id'], rng.choice(members))
+    thread = threading.Thread(target=traffic)
+    thread.start()
+    app.rebuild_stats()
+    thread.join()
+
+    assert live.snapshot() == recount(app)
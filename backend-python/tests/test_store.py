@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+
+from snapshot import BinarySnapshot, write_binary
+from store import StorageBackend, Store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db():
+    with open(os.path.join(BACKEND_DIR, 'data.json')) as f:
+        return json.load(f)
+
+
+def scanned(store, limit=1000):
+    """What finished_records() used to find by scanning every hot record."""
+    found = set()
+    for table, records in (('alarms', store.alarms), ('friendRequests', store.friend_requests)):
+        newest = max(records)
+        for record in records.values():
+            done = not record.get('isActive', True) if table == 'alarms' else record['status'] != 'pending'
+            if done and record['id'] != newest:
+                found.add((table, record['id']))
+    return found
+
+
+def finished(store, limit=1000):
+    return {(table, record['id']) for table, record in store.finished_records(limit)}
+
+
+@pytest.fixture(params=['json', 'binary'])
+def store(request, db, tmp_path):
+    if request.param == 'json':
+        return Store(db)
+    path = str(tmp_path / 'data.bin')
+    write_binary(path, Store(db, compact=False).to_dict())  # as snapshot.py does: legacy duplicate ids fixed
+    store = Store()
+    store.load_snapshot(BinarySnapshot(path))
+    return store
+
+
+def test_finished_records_follow_writes(store):
+    assert finished(store) == scanned(store) and finished(store)
+
+    alarm = next(a for a in store.active_alarms() if a['id'] != max(store.alarms))
+    store.update_alarm({**alarm, 'isActive': False})
+    req = store.pending_requests_for(4)[0]
+    store.set_request_status(req, 'accepted')
+    assert ('alarms', alarm['id']) in finished(store) and ('friendRequests', req['id']) in finished(store)
+    assert finished(store) == scanned(store)
+
+    store.remove('alarms', [alarm['id']])
+    store.apply('friendRequests', {**req, 'status': 'pending'})
+    assert finished(store) == scanned(store)
+
+
+def test_finished_records_respect_limit_and_newest(store):
+    assert len(store.finished_records(2)) == 2
+    newest = store.add_alarm({'user1Id': 1, 'user2Id': 2, 'isActive': False})
+    assert ('alarms', newest['id']) not in finished(store)
+    store.add_alarm({'user1Id': 1, 'user2Id': 2, 'isActive': True})
+    assert ('alarms', newest['id']) in finished(store)
+
+
+def test_incomplete_backend_fails_at_construction():
+    class Partial(StorageBackend):
+        def get_user(self, user_id):
+            return None
+
+    with pytest.raises(TypeError, match='abstract'):
+        Partial()
+
+
+def check_against_scans(store):
+    """Every indexed lookup agrees with a linear scan of the tables, as the routes once did."""
+    db = store.to_dict()
+    users = {u['id']: u for u in db['users']}
+    for user in db['users']:
+        uid = user['id']
+        assert store.get_user(uid) == user
+        assert store.find_user(user['username'].upper()) == user
+        friends = [f['user2Id'] if f['user1Id'] == uid else f['user1Id'] for f in db['friendships']
+                   if uid in (f['user1Id'], f['user2Id'])]
+        assert store.friend_ids(uid) == friends
+        assert store.friends_of(uid) == [users[fid] for fid in friends if fid in users]
+        assert store.pending_requests_for(uid) == [r for r in db['friendRequests']
+                                                   if r['toUserId'] == uid and r['status'] == 'pending']
+        mine = [a for a in db['alarms'] if uid in (a['user1Id'], a['user2Id'])]
+        assert store.alarms_for_user(uid, active_only=False) == mine
+        assert store.alarms_for_user(uid) == [a for a in mine if a.get('isActive', True)]
+        for other in users:
+            assert store.are_friends(uid, other) == (other in friends)
+            assert store.has_pending_request(uid, other) == any(
+                r['fromUserId'] == uid and r['toUserId'] == other and r['status'] == 'pending'
+                for r in db['friendRequests'])
+    assert store.get_user(max(users) + 1) is None and store.find_user('nobody-here') is None
+    assert sorted(a['id'] for a in store.active_alarms()) == [a['id'] for a in db['alarms'] if a.get('isActive', True)]
+
+
+def test_indexes_agree_with_scans(store, db):
+    # Loading gave data.json's duplicate alarm id a fresh one, in db too
+    assert store.to_dict() == {table: sorted(records, key=lambda r: r['id']) for table, records in db.items()}
+    check_against_scans(store)
+
+
+def test_indexes_follow_writes(store):
+    newcomer = store.add_user('Zed', 'hash')
+    store.add_friendship(newcomer['id'], 1)
+    req = store.add_friend_request(newcomer['id'], 2)
+    store.add_friend_request(3, newcomer['id'])
+    alarm = store.add_alarm({'user1Id': newcomer['id'], 'user2Id': 1, 'time': '07:00', 'isActive': True})
+    store.update_alarm({**store.get_alarm(alarm['id']), 'isActive': False})
+    store.set_request_status(req, 'accepted')
+    store.add_friendship(newcomer['id'], 2)
+    assert store.find_user('zed') == newcomer
+    assert store.friend_ids(newcomer['id']) == [1, 2]
+    check_against_scans(store)
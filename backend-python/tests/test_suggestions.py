@@ -0,0 +1,118 @@
+import random
+from collections import Counter
+
+import pytest
+
+from sqlite_store import SqliteStore
+from store import Store
+from suggestions import SuggestionCache
+
+CREATED = '2026-01-05T07:00:00'
+
+
+def graph(seed, users=60, friendships=150, requests=40):
+    rng = random.Random(seed)
+    pairs = set()
+    while len(pairs) < friendships:
+        a, b = rng.sample(range(1, users + 1), 2)
+        if (b, a) not in pairs:
+            pairs.add((a, b))
+    return {
+        'users': [{'id': i, 'username': f'user{i}', 'password': 'x', 'createdAt': CREATED}
+                  for i in range(1, users + 1)],
+        'friendRequests': [{'id': i, 'fromUserId': a, 'toUserId': b, 'createdAt': CREATED,
+                            'status': rng.choice(('pending', 'accepted'))}
+                           for i, (a, b) in enumerate((rng.sample(range(1, users + 1), 2) for _ in range(requests)), 1)],
+        'friendships': [{'id': i, 'user1Id': a, 'user2Id': b, 'createdAt': CREATED}
+                        for i, (a, b) in enumerate(sorted(pairs), 1)],
+        'alarms': [],
+    }
+
+
+def brute_force(db, user_id, limit):
+    friends = {u: set() for u in range(1, len(db['users']) + 1)}
+    for f in db['friendships']:
+        friends[f['user1Id']].add(f['user2Id'])
+        friends[f['user2Id']].add(f['user1Id'])
+    pending = {r['toUserId'] if r['fromUserId'] == user_id else r['fromUserId']
+               for r in db['friendRequests'] if r['status'] == 'pending' and user_id in (r['fromUserId'], r['toUserId'])}
+    mutual = Counter(c for f in friends[user_id] for c in friends[f])
+    ranked = sorted(((c, n) for c, n in mutual.items() if c != user_id and c not in friends[user_id] | pending),
+                    key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+@pytest.mark.parametrize('seed', [1, 2])
+def test_suggestions_rank_friends_of_friends(backend, seed, tmp_path):
+    db = graph(seed)
+    if backend == 'memory':
+        store = Store(db)
+    else:
+        store = SqliteStore(str(tmp_path / 'wakey.db'))
+        store.load(db)
+    for user_id in range(1, 61):
+        assert store.friend_suggestions(user_id, 5) == brute_force(db, user_id, 5)
+
+
+class Computed:
+    def __init__(self):
+        self.calls = Counter()
+
+    def compute(self, user_id):
+        self.calls[user_id] += 1
+        return [(user_id * 10, self.calls[user_id])]
+
+
+def test_cache_serves_until_the_graph_around_a_user_changes():
+    source = Computed()
+    cache = SuggestionCache(source.compute)
+    assert cache.get(1, [2, 3]) == cache.get(1, [2, 3]) == [(10, 1)]
+    cache.friendship_added(4, 5)  # not near user 1
+    cache.requests_changed(2, 6)  # a friend's requests don't change user 1's suggestions
+    assert cache.get(1, [2, 3]) == [(10, 1)]
+    assert cache.stats() == {'entries': 1, 'hits': 2, 'misses': 1}
+
+    cache.friendship_added(3, 7)  # a friend made a new friend
+    assert cache.get(1, [2, 3]) == [(10, 2)]
+    cache.requests_changed(8, 1)
+    assert cache.get(1, [2, 3]) == [(10, 3)]
+    cache.friendship_added(1, 9)
+    assert cache.get(1, [2, 3, 9]) == [(10, 4)]
+    assert cache.get(1, [2, 3, 9]) == [(10, 4)]
+
+
+def test_cache_expires_and_evicts(monkeypatch):
+    source = Computed()
+    cache = SuggestionCache(source.compute, size=2, max_age=60)
+    now = [1000.0]
+    monkeypatch.setattr('suggestions.time.monotonic', lambda: now[0])
+    cache.get(1, [])
+    now[0] += 61
+    assert cache.get(1, []) == [(10, 2)]
+
+    cache.get(2, [])
+    cache.get(1, [])  # user 1 is now the most recently used
+    cache.get(3, [])
+    assert cache.stats()['entries'] == 2
+    assert cache.get(1, []) == [(10, 2)] and cache.get(2, []) == [(20, 2)]
+
+
+def test_route_follows_requests_and_accepts(app):
+    client = app.app.test_client()
+    app.store.load(graph(3))
+    user_id = 1
+    suggestions = client.get(f'/api/friends/suggestions/{user_id}?limit=50').get_json()
+    assert [(s['id'], s['mutualFriends']) for s in suggestions] == brute_force(graph(3), user_id, 50)
+    assert suggestions[0]['username'] == f"user{suggestions[0]['id']}"
+    assert len(client.get(f'/api/friends/suggestions/{user_id}?limit=2').get_json()) == 2
+
+    top = suggestions[0]['id']
+    assert client.post('/api/friends/request', json={'fromUserId': top, 'toUserId': user_id}).get_json()['success']
+    assert top not in [s['id'] for s in client.get(f'/api/friends/suggestions/{user_id}').get_json()]
+
+    request_id = app.store.pending_requests_for(user_id)[-1]['id']
+    assert client.post('/api/friends/accept', json={'requestId': request_id, 'userId': user_id}).get_json()['success']
+    after = client.get(f'/api/friends/suggestions/{user_id}?limit=50').get_json()
+    db = app.store.to_dict()
+    assert [(s['id'], s['mutualFriends']) for s in after] == brute_force(db, user_id, 50)
@@ -0,0 +1,53 @@
+import pytest
+
+from sqlite_store import SqliteStore, SqliteVersionTracker
+from sync import VersionTracker
+
+
+def new_alarm(client):
+    return client.post('/api/alarms', json={'userId': 1, 'friendId': 2, 'time': '07:00'}).get_json()['alarm']
+
+
+@pytest.mark.parametrize('storage', ['json', 'sqlite'])
+def test_etag_and_delta(make_app, storage):
+    client = make_app(WAKEY_STORAGE=storage).app.test_client()
+    first = client.get('/api/alarms/1')
+    assert client.get('/api/alarms/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    alarm = new_alarm(client)
+    assert client.get('/api/alarms/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+    delta = client.get(f"/api/alarms/1?since={first.headers['X-Wakey-Version']}").get_json()
+    assert not delta['reset'] and [a['id'] for a in delta['changed']] == [alarm['id']]
+
+
+def test_versions_shared_between_processes(make_app):
+    """Two app instances on one SQLite file, like two worker processes."""
+    a = make_app(WAKEY_STORAGE='sqlite').app.test_client()
+    b = make_app(WAKEY_STORAGE='sqlite').app.test_client()
+    seen = b.get('/api/alarms/1')
+
+    alarm = new_alarm(a)
+    fresh = b.get('/api/alarms/1', headers={'If-None-Match': seen.headers['ETag']})
+    assert fresh.status_code == 200 and alarm['id'] in [x['id'] for x in fresh.get_json()]
+    delta = b.get(f"/api/alarms/1?since={seen.headers['X-Wakey-Version']}").get_json()
+    assert not delta['reset'] and [x['id'] for x in delta['changed']] == [alarm['id']]
+
+
+@pytest.mark.parametrize('make_tracker', [
+    lambda tmp_path: VersionTracker(log_size=2),
+    lambda tmp_path: SqliteVersionTracker(SqliteStore(str(tmp_path / 'v.db')), log_size=2),
+], ids=['memory', 'sqlite'])
+def test_changed_since(tmp_path, make_tracker):
+    versions = make_tracker(tmp_path)
+    start = versions.version('alarms', 1)
+    versions.bump('alarms', (1, 2), 10)
+    middle = versions.version('alarms', 1)
+    versions.bump('alarms', (1,), 11)
+    versions.bump('alarms', (1,), 10)
+
+    assert versions.changed_since('alarms', 1, middle) == ([11, 10], versions.version('alarms', 1))
+    assert versions.changed_since('alarms', 2, start)[0] == [10]
+    # Older than the kept log, from elsewhere, or from the future: full refresh
+    assert versions.changed_since('alarms', 1, start)[0] is None
+    assert versions.changed_since('alarms', 1, 'other.1')[0] is None
+    assert versions.changed_since('alarms', 1, f'{versions.epoch}.999')[0] is None
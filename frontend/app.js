@@ -8,6 +8,7 @@ let alarms = [];
 let currentAlarm = null;
 let isDarkMode = false;
 let alarmAudio = null; // Audio player for alarm sounds
+let eventSource = null; // Live alarm updates from the server
 
 // ==================== THEME TOGGLE ====================
 function toggleTheme() {
@@ -63,6 +64,11 @@ async function apiCall(endpoint, method = 'GET', data = null) {
         method,
         headers: { 'Content-Type': 'application/json' }
     };
+
+    // Session token from login/signup: the server then only lets us act as this user
+    if (currentUser && currentUser.token) {
+        options.headers['Authorization'] = `Bearer ${currentUser.token}`;
+    }
     
     if (data) {
         options.body = JSON.stringify(data);
@@ -108,7 +114,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const result = await apiCall('/login', 'POST', { username, password });
         
         if (result.success) {
-            currentUser = result.user;
+            currentUser = { ...result.user, token: result.token };
             localStorage.setItem('wakeyUser', JSON.stringify(currentUser));
             loadDashboard();
         } else {
@@ -125,7 +131,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const result = await apiCall('/signup', 'POST', { username, password });
         
         if (result.success) {
-            currentUser = result.user;
+            currentUser = { ...result.user, token: result.token };
             localStorage.setItem('wakeyUser', JSON.stringify(currentUser));
             loadDashboard();
         } else {
@@ -135,8 +141,12 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Logout
     document.getElementById('logout-btn').addEventListener('click', () => {
+        if (currentUser && currentUser.token) {
+            apiCall('/logout', 'POST').catch(() => {});
+        }
         localStorage.removeItem('wakeyUser');
         currentUser = null;
+        unsubscribeFromEvents();
         showScreen('auth-screen');
     });
 
@@ -174,25 +184,36 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('create-alarm-form').addEventListener('submit', async (e) => {
         e.preventDefault();
         
-        const friendId = parseInt(document.getElementById('alarm-friend-select').value);
+        const friendIds = Array.from(document.getElementById('alarm-friend-select').selectedOptions)
+            .map(option => parseInt(option.value));
         const time = document.getElementById('alarm-time').value;
         const label = document.getElementById('alarm-label').value;
         const sound = document.getElementById('alarm-sound').value;
         const tone = document.getElementById('alarm-tone').value || null;
         
-        if (!friendId) {
+        if (friendIds.length === 0) {
             alert('Please select a friend');
             return;
         }
         
-        const result = await apiCall('/alarms', 'POST', {
-            userId: currentUser.id,
-            friendId,
-            time,
-            label,
-            sound,
-            tone
-        });
+        // One friend: a shared alarm; several: one group alarm for everyone
+        const result = friendIds.length === 1
+            ? await apiCall('/alarms', 'POST', {
+                userId: currentUser.id,
+                friendId: friendIds[0],
+                time,
+                label,
+                sound,
+                tone
+            })
+            : await apiCall('/alarms/group', 'POST', {
+                userId: currentUser.id,
+                memberIds: friendIds,
+                time,
+                label,
+                sound,
+                tone
+            });
         
         if (result.success) {
             closeModal('create-alarm-modal');
@@ -245,6 +266,53 @@ async function loadDashboard() {
     await loadFriends();
     // Then load alarms
     await loadAlarms();
+    // Keep them fresh through the event stream instead of polling
+    subscribeToEvents();
+}
+
+// ==================== LIVE EVENTS ====================
+function subscribeToEvents() {
+    unsubscribeFromEvents();
+    // EventSource can't send headers, so the token goes in the query string
+    const token = currentUser.token ? `?token=${encodeURIComponent(currentUser.token)}` : '';
+    eventSource = new EventSource(`${API_URL}/events/${currentUser.id}${token}`);
+
+    // Partner snoozed / acknowledged / cancelled, or a new alarm was created
+    eventSource.addEventListener('alarm', (e) => {
+        const alarm = JSON.parse(e.data);
+        const index = alarms.findIndex(a => a.id === alarm.id);
+        if (alarm.isActive === false) {
+            if (index !== -1) alarms.splice(index, 1);
+        } else if (index !== -1) {
+            alarms[index] = alarm;
+        } else {
+            alarms.push(alarm);
+        }
+        displayAlarms();
+
+        if (currentAlarm && currentAlarm.id === alarm.id) {
+            currentAlarm = alarm;
+            updateAlarmDisplay();
+        }
+    });
+
+    // The server's scheduler says this alarm is due now
+    eventSource.addEventListener('fire', (e) => {
+        const alarm = JSON.parse(e.data);
+        const local = alarms.find(a => a.id === alarm.id);
+        if (local) local.hasRungToday = true;
+        testAlarm(alarm.id);
+    });
+
+    // We fell behind and missed events: reload the full list
+    eventSource.addEventListener('resync', () => loadAlarms());
+}
+
+function unsubscribeFromEvents() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
 }
 
 async function loadAlarms() {
@@ -269,11 +337,14 @@ function displayAlarms() {
     }
     
     list.innerHTML = alarms.map(alarm => {
-        const partnerId = alarm.user1Id === currentUser.id ? alarm.user2Id : alarm.user1Id;
-        const partnerName = getPartnerName(partnerId);
-        const partnerInitial = partnerName.charAt(0).toUpperCase();
+        const partnerName = getAlarmPartnerName(alarm);
+        const partnerInitial = alarm.members ? '👥' : partnerName.charAt(0).toUpperCase();
         
-        console.log('Alarm:', alarm, 'Partner:', partnerId, partnerName); // Debug log
+        console.log('Alarm:', alarm, 'Partner:', partnerName); // Debug log
+        
+        const awakeBadge = alarm.members
+            ? `<span class="alarm-badge">☀️ ${alarm.ackCount}/${Object.keys(alarm.members).length} up</span>`
+            : '';
         
         return `
             <div class="alarm-card">
@@ -282,6 +353,7 @@ function displayAlarms() {
                     <p>${alarm.label}</p>
                     <span class="alarm-badge">with ${partnerName}</span>
                     <span class="alarm-badge">🔊 ${alarm.sound}</span>
+                    ${awakeBadge}
                 </div>
                 <div class="alarm-actions-card">
                     <div class="friend-avatar" style="width: 42px; height: 42px; font-size: 18px;">
@@ -300,6 +372,15 @@ function getPartnerName(partnerId) {
     return friend ? friend.username : 'Friend';
 }
 
+function getAlarmPartnerName(alarm) {
+    // Group alarms list their members instead of a second user
+    if (alarm.members) {
+        return `${Object.keys(alarm.members).length - 1} friends`;
+    }
+    const partnerId = alarm.user1Id === currentUser.id ? alarm.user2Id : alarm.user1Id;
+    return getPartnerName(partnerId);
+}
+
 // ==================== FRIENDS ====================
 async function loadFriends() {
     friends = await apiCall(`/friends/${currentUser.id}`);
@@ -365,8 +446,7 @@ async function loadFriendsForAlarm() {
     }
     
     const select = document.getElementById('alarm-friend-select');
-    select.innerHTML = '<option value="">Select a friend...</option>' + 
-        friends.map(f => `<option value="${f.id}">${f.username}</option>`).join('');
+    select.innerHTML = friends.map(f => `<option value="${f.id}">${f.username}</option>`).join('');
 }
 
 // ==================== SEARCH ====================
@@ -406,8 +486,7 @@ function testAlarm(alarmId) {
     currentAlarm = alarms.find(a => a.id === alarmId);
     if (!currentAlarm) return;
     
-    const partnerId = currentAlarm.user1Id === currentUser.id ? currentAlarm.user2Id : currentAlarm.user1Id;
-    const partnerName = getPartnerName(partnerId);
+    const partnerName = getAlarmPartnerName(currentAlarm);
     
     document.getElementById('alarm-ringing-label').textContent = currentAlarm.label;
     document.getElementById('alarm-ringing-time').textContent = currentAlarm.time;
@@ -499,10 +578,18 @@ function stopAlarmSound() {
 }
 
 function updateAlarmDisplay() {
-    const userSnoozes = currentAlarm.snoozeCount[currentUser.id] || 0;
-    const partnerId = currentAlarm.user1Id === currentUser.id ? currentAlarm.user2Id : currentAlarm.user1Id;
-    const partnerSnoozes = currentAlarm.snoozeCount[partnerId] || 0;
+    let userSnoozes, partnerSnoozes;
+    if (currentAlarm.members) {
+        // members: user id -> [snoozes, acknowledgement order]
+        userSnoozes = (currentAlarm.members[currentUser.id] || [0])[0];
+        partnerSnoozes = currentAlarm.snoozeTotal - userSnoozes;
+    } else {
+        const partnerId = currentAlarm.user1Id === currentUser.id ? currentAlarm.user2Id : currentAlarm.user1Id;
+        userSnoozes = currentAlarm.snoozeCount[currentUser.id] || 0;
+        partnerSnoozes = currentAlarm.snoozeCount[partnerId] || 0;
+    }
     
+    document.getElementById('friend-snooze-label').textContent = currentAlarm.members ? "Group's snoozes" : "Friend's snoozes";
     document.getElementById('user-snooze-count').textContent = userSnoozes;
     document.getElementById('friend-snooze-count').textContent = partnerSnoozes;
     
@@ -536,8 +623,8 @@ async function handleAlarmAction(action) {
         currentAlarm = result.alarm;
         updateAlarmDisplay();
         
-        // Close modal if acknowledged by both or cancelled
-        if (action === 'acknowledge' && currentAlarm.acknowledged.length === 2) {
+        // Close modal once everyone acknowledged (the alarm is done) or on cancel
+        if (action === 'acknowledge' && !currentAlarm.isActive) {
             setTimeout(() => {
                 closeModal('alarm-ringing-modal');
                 loadAlarms();
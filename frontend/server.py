@@ -1,9 +1,178 @@
+from email.utils import formatdate, parsedate_to_datetime
+import atexit
+import gzip
+import hashlib
 import http.server
-import socketserver
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import unquote
 
 PORT = 8000
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Text assets get a gzip variant built at startup, kept only if it is smaller
+COMPRESSIBLE = {'text/html', 'text/css', 'text/javascript', 'application/javascript',
+                'application/json', 'image/svg+xml', 'text/plain'}
+MIN_COMPRESS = 256  # bytes
+SKIP = {'server.py'}
+
+# ?v=<content hash> URLs never change meaning; everything else is revalidated
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# href="styles.css" / src="app.js" in index.html become versioned URLs
+ASSET_REF = re.compile(r'''(\s(?:href|src)=")([^":?#]+)(")''')
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+class Asset:
+    """One servable file: where its bytes live, its strong ETag and its gzip variant."""
+
+    __slots__ = ('path', 'size', 'mtime', 'content_type', 'digest', 'etag', 'gzip_path', 'gzip_size')
+
+    def __init__(self, path, data, mtime, content_type):
+        self.path = path
+        self.size = len(data)
+        self.mtime = mtime
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.etag = f'"{self.digest}"'
+        self.gzip_path = None
+        self.gzip_size = 0
+
+    def compress(self, data, cache_dir):
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) < self.size:
+            self.gzip_path = os.path.join(cache_dir, self.digest + '.gz')
+            with open(self.gzip_path, 'wb') as f:
+                f.write(packed)
+            self.gzip_size = len(packed)
+
+    @property
+    def gzip_etag(self):
+        return f'"{self.digest}-gz"'
+
+
+class Assets:
+    """
+    Everything under ROOT, hashed and compressed once at startup.
+
+    index.html is served with its stylesheet and script links rewritten to
+    ?v=<content hash>, so those can be cached forever while index.html
+    itself is revalidated. Files edited on disk are picked up by a rescan at
+    most once per RESCAN seconds, which only re-reads the ones whose mtime or
+    size changed.
+    """
+
+    RESCAN = 1.0  # seconds
+
+    def __init__(self, root):
+        self.root = root
+        self.cache_dir = tempfile.mkdtemp(prefix='wakey-frontend-')
+        atexit.register(shutil.rmtree, self.cache_dir, True)
+        self._assets = {}
+        self._stats = {}
+        self._checked = 0
+        self._lock = threading.Lock()
+        self._build(self._scan())
+
+    def _scan(self):
+        """url path -> (file path, mtime_ns, size) for every servable file."""
+        stats = {}
+        for directory, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(('.', '__'))]
+            for name in files:
+                if name.startswith('.') or name in SKIP and directory == self.root:
+                    continue
+                path = os.path.join(directory, name)
+                st = os.stat(path)
+                url = '/' + os.path.relpath(path, self.root).replace(os.sep, '/')
+                stats[url] = (path, st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _build(self, stats):
+        """
+        Assets for a scan. Files whose mtime and size are unchanged since the
+        last scan keep their Asset (no re-read, re-hash or re-compress);
+        HTML is re-rendered if it or any asset changed, since it embeds
+        their hashes.
+        """
+        assets = {}
+        changed = False
+        for url, (path, mtime_ns, _) in stats.items():
+            if url.endswith('.html'):
+                continue  # after the assets they link to
+            previous = self._assets.get(url)
+            if previous is not None and self._stats.get(url) == stats[url]:
+                assets[url] = previous
+                continue
+            changed = True
+            with open(path, 'rb') as f:
+                assets[url] = self._asset(path, f.read(), mtime_ns)
+        changed = changed or any(url not in stats for url in self._stats)
+        for url, (path, mtime_ns, _) in stats.items():
+            if url.endswith('.html'):
+                previous = self._assets.get(url)
+                if previous is not None and not changed and self._stats.get(url) == stats[url]:
+                    assets[url] = previous
+                else:
+                    assets[url] = self._html(url, path, mtime_ns, assets)
+        self._assets, self._stats = assets, stats
+
+    def _asset(self, path, data, mtime_ns):
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = Asset(path, data, mtime_ns // 1_000_000_000, content_type)
+        if content_type in COMPRESSIBLE and len(data) >= MIN_COMPRESS:
+            asset.compress(data, self.cache_dir)
+        return asset
+
+    def _html(self, url, path, mtime_ns, assets):
+        base = url.rsplit('/', 1)[0] + '/'
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        def version(match):
+            linked = assets.get(base + match.group(2))
+            if linked is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={linked.digest}{match.group(3)}"
+
+        data = ASSET_REF.sub(version, html).encode('utf-8')
+        if data == html.encode('utf-8'):
+            return self._asset(path, data, mtime_ns)
+        # Served from the rewritten copy, not the file on disk
+        rewritten = os.path.join(self.cache_dir, hashlib.sha256(data).hexdigest()[:16] + '.html')
+        with open(rewritten, 'wb') as f:
+            f.write(data)
+        asset = self._asset(path, data, mtime_ns)
+        asset.path = rewritten
+        return asset
+
+    def get(self, url):
+        now = time.monotonic()
+        # One request thread rescans; the others keep serving the current table
+        if now - self._checked >= self.RESCAN and self._lock.acquire(blocking=False):
+            try:
+                self._checked = now
+                stats = self._scan()
+                if stats != self._stats:
+                    self._build(stats)
+            finally:
+                self._lock.release()
+        return self._assets.get(url)
+
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    """GET/HEAD for Assets: ETag revalidation, gzip variants, single byte ranges, sendfile bodies."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive; every response has a Content-Length
+    server_version = 'WakeyStatic/1.0'
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
         # Add CORS headers
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -11,11 +180,140 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
 
-Handler = MyHTTPRequestHandler
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.serve(body=False)
+
+    def do_GET(self):
+        self.serve(body=True)
+
+    def serve(self, body):
+        path, _, query = self.path.partition('?')
+        path = unquote(path.split('#', 1)[0])
+        if path.endswith('/'):
+            path += 'index.html'
+        asset = self.server.assets.get(path)
+        if asset is None:
+            self.send_error(404, "File not found")
+            return
+
+        versioned = f"v={asset.digest}" in query.split('&')
+        headers = {
+            'Cache-Control': IMMUTABLE if versioned else REVALIDATE,
+            'Last-Modified': formatdate(asset.mtime, usegmt=True),
+            'Accept-Ranges': 'bytes',
+        }
+        if asset.gzip_path:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if self.not_modified(asset):
+            self.send_response(304)
+            headers['ETag'] = asset.gzip_etag if asset.gzip_path and self.accepts_gzip() else asset.etag
+            self.send_headers(headers)
+            return
+
+        # Ranges are served from the identity encoding only
+        byte_range = self.byte_range(asset)
+        if byte_range == 'unsatisfiable':
+            self.send_response(416)
+            headers['Content-Range'] = f"bytes */{asset.size}"
+            headers['Content-Length'] = '0'
+            self.send_headers(headers)
+            return
+        if byte_range is not None:
+            start, end = byte_range
+            self.send_response(206)
+            headers['Content-Range'] = f"bytes {start}-{end}/{asset.size}"
+            file_path, offset, length, etag = asset.path, start, end - start + 1, asset.etag
+        elif asset.gzip_path and self.accepts_gzip():
+            self.send_response(200)
+            headers['Content-Encoding'] = 'gzip'
+            file_path, offset, length, etag = asset.gzip_path, 0, asset.gzip_size, asset.gzip_etag
+        else:
+            self.send_response(200)
+            file_path, offset, length, etag = asset.path, 0, asset.size, asset.etag
+
+        headers['ETag'] = etag
+        headers['Content-Type'] = asset.content_type + ('; charset=utf-8' if asset.content_type.startswith('text/') else '')
+        headers['Content-Length'] = str(length)
+        self.send_headers(headers)
+        if body and length:
+            with open(file_path, 'rb') as f:
+                # os.sendfile where available: file pages go straight to the socket
+                self.connection.sendfile(f, offset, length)
+
+    def send_headers(self, headers):
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def accepts_gzip(self):
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.strip().partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                q = params.strip()
+                if not q.startswith('q='):
+                    return True
+                try:
+                    return float(q[2:] or 0) > 0
+                except ValueError:
+                    return False  # malformed qvalue: treated as not acceptable, as RFC 9110 allows
+        return False
+
+    def not_modified(self, asset):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or asset.etag in tags or asset.gzip_etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= asset.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def byte_range(self, asset):
+        """(first, last) for a single satisfiable Range, 'unsatisfiable', or None for the whole file."""
+        header = self.headers.get('Range')
+        if not header:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() != asset.etag:
+            return None  # the client's copy is stale: send it all
+        match = RANGE.match(header.strip())
+        if not match or match.groups() == ('', ''):
+            return None  # multiple or malformed ranges: ignored, as RFC 9110 allows
+        first, last = match.groups()
+        if first == '':
+            suffix = int(last)
+            if suffix == 0 or asset.size == 0:
+                return 'unsatisfiable'
+            return max(0, asset.size - suffix), asset.size - 1
+        first = int(first)
+        last = asset.size - 1 if last == '' else min(int(last), asset.size - 1)
+        if first >= asset.size or first > last:
+            return 'unsatisfiable'
+        return first, last
+
+
+class StaticServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, assets):
+        self.assets = assets
+        super().__init__(address, handler)
+
 
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    print(f"🚀 Frontend server running at http://localhost:{PORT}")
-    print(f"📂 Serving files from: {httpd.server_address}")
-    print("\n✅ Open http://localhost:8000 in your browser")
-    print("⏰ Backend should be running on http://localhost:3001\n")
-    httpd.serve_forever()
\ No newline at end of file
+if __name__ == '__main__':
+    assets = Assets(ROOT)
+    with StaticServer(("", PORT), StaticHandler, assets) as httpd:
+        print(f"🚀 Frontend server running at http://localhost:{PORT}")
+        print(f"📂 Serving files from: {ROOT}")
+        print("\n✅ Open http://localhost:8000 in your browser")
+        print("⏰ Backend should be running on http://localhost:3001\n")
+        httpd.serve_forever()